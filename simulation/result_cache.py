@@ -0,0 +1,170 @@
+"""Content-addressed cache of simulation results.
+
+A run of scratch/third is deterministic for a given config, topology, flow and trace file and
+simulator build, so its outputs can be reused. The cache key is a hash of:
+	- the config text, without the keys naming output files (so the same experiment written to
+	  another directory still hits),
+	- the contents of TOPOLOGY_FILE, FLOW_FILE and TRACE_FILE,
+	- the simulator binary and the ns-3 libraries it loads.
+Each entry is a directory <root>/<key>/ holding the output files and the stdout of the run (with
+stderr merged into it). The outputs of each FORK_VARIANT (the output files with .<name> appended)
+are kept as the entry's files with the same suffix. The stdout echoes the config, so on a hit the lines echoing the output
+files are rewritten to the paths of the new config (see replay_stdout). An entry's mtime is its
+last use; when the cache grows over its budget, least recently used entries are removed first.
+"""
+import hashlib
+import os
+import re
+import shutil
+import time
+
+# config keys of the output files, and the name of each file inside a cache entry
+OUTPUT_KEYS = [('FCT_OUTPUT_FILE', 'fct'), ('PFC_OUTPUT_FILE', 'pfc'), ('QLEN_MON_FILE', 'qlen'), ('TRACE_OUTPUT_FILE', 'trace'), ('CC_TRACE_FILE', 'cc_trace'), ('DROP_SUMMARY_FILE', 'drops'), ('EVENT_TRACE_FILE', 'events')]
+INPUT_KEYS = ['TOPOLOGY_FILE', 'FLOW_FILE', 'TRACE_FILE']
+STDOUT = 'stdout'
+
+def parse_config(config):
+	"""Return {key: value} of a config text, value being the rest of the line."""
+	res = {}
+	for line in config.splitlines():
+		fields = line.split(None, 1)
+		if len(fields) == 2:
+			res[fields[0]] = fields[1].strip()
+	return res
+
+def output_files(config):
+	"""Yield (name in a cache entry, path) of the output files of a config, and of its FORK_VARIANTs."""
+	conf = parse_config(config)
+	suffixes = ['']
+	for line in config.splitlines():
+		fields = line.split()
+		if len(fields) >= 2 and fields[0] == 'FORK_VARIANT':
+			suffixes.append('.' + fields[1])
+	for k, name in OUTPUT_KEYS:
+		if k in conf:
+			for suffix in suffixes:
+				yield name + suffix, conf[k] + suffix
+
+def replay_stdout(src, config, out):
+	"""Copy the cached stdout at src to the binary file object out, with the echoed output file
+	names (e.g. "FCT_OUTPUT_FILE\t\t<path>") replaced by those of config."""
+	conf = parse_config(config)
+	echo = re.compile(b'^(' + b'|'.join(k.encode() for k, _ in OUTPUT_KEYS) + b')(\\s+)(.*?)(\r?\n?)$')
+	with open(src, 'rb') as f:
+		for line in f:
+			m = echo.match(line)
+			if m and m.group(1).decode() in conf:
+				line = m.group(1) + m.group(2) + conf[m.group(1).decode()].encode() + m.group(4)
+			out.write(line)
+
+def hash_file(h, path, chunk = 1 << 20):
+	with open(path, 'rb') as f:
+		while True:
+			b = f.read(chunk)
+			if not b:
+				break
+			h.update(b)
+
+def binary_digest(binary, lib_dir):
+	"""Digest of the simulator binary and the libns3 libraries in lib_dir.
+
+	This is the expensive part of a key, so compute it once per batch of runs.
+	"""
+	h = hashlib.sha1()
+	hash_file(h, binary)
+	for name in sorted(os.listdir(lib_dir)):
+		if name.startswith('libns3') and '.so' in name:
+			h.update(name.encode())
+			hash_file(h, os.path.join(lib_dir, name))
+	return h.hexdigest()
+
+def dir_size(path):
+	total = 0
+	for dirpath, dirnames, filenames in os.walk(path):
+		for f in filenames:
+			try:
+				total += os.path.getsize(os.path.join(dirpath, f))
+			except OSError:
+				pass
+	return total
+
+class ResultCache(object):
+	def __init__(self, root, budget = 10 << 30):
+		self.root = root
+		self.budget = budget
+		if not os.path.isdir(root):
+			os.makedirs(root)
+
+	def key(self, config, bin_digest):
+		"""Key of a run, relative paths in config are relative to the current directory."""
+		conf = parse_config(config)
+		out_keys = set(k for k, _ in OUTPUT_KEYS)
+		h = hashlib.sha1()
+		h.update(bin_digest.encode())
+		for line in config.splitlines():
+			fields = line.split(None, 1)
+			if len(fields) == 0 or fields[0] in out_keys:
+				continue
+			h.update((' '.join(line.split()) + '\n').encode())
+		for k in INPUT_KEYS:
+			if k in conf and os.path.isfile(conf[k]):
+				h.update(k.encode())
+				hash_file(h, conf[k])
+		return h.hexdigest()
+
+	def lookup(self, key, config):
+		"""On a hit, restore the output files named in config and return the path of the cached stdout.
+		Return None on a miss."""
+		entry = os.path.join(self.root, key)
+		if not os.path.isfile(os.path.join(entry, STDOUT)):
+			return None
+		for name, path in output_files(config):
+			src = os.path.join(entry, name)
+			if os.path.isfile(src):
+				dst_dir = os.path.dirname(path)
+				if dst_dir and not os.path.isdir(dst_dir):
+					os.makedirs(dst_dir)
+				shutil.copyfile(src, path)
+		# mark as recently used
+		now = time.time()
+		os.utime(entry, (now, now))
+		return os.path.join(entry, STDOUT)
+
+	def store(self, key, config, stdout_path):
+		"""Copy the outputs of a finished run into the cache, then evict if over budget."""
+		entry = os.path.join(self.root, key)
+		if os.path.isdir(entry):
+			return
+		# build the entry aside and rename it, so that concurrent runs never see a partial entry
+		tmp = os.path.join(self.root, '.tmp_%s_%d'%(key, os.getpid()))
+		os.makedirs(tmp)
+		for name, path in output_files(config):
+			if os.path.isfile(path):
+				shutil.copyfile(path, os.path.join(tmp, name))
+		shutil.copyfile(stdout_path, os.path.join(tmp, STDOUT))
+		try:
+			os.rename(tmp, entry)
+		except OSError:
+			# another process stored the same key meanwhile
+			shutil.rmtree(tmp, ignore_errors = True)
+		self.evict()
+
+	def evict(self):
+		entries = []
+		total = 0
+		for name in os.listdir(self.root):
+			path = os.path.join(self.root, name)
+			if name.startswith('.') or not os.path.isdir(path):
+				continue
+			try:
+				size = dir_size(path)
+				entries.append((os.path.getmtime(path), size, path))
+			except OSError:
+				continue
+			total += size
+		entries.sort()
+		for mtime, size, path in entries:
+			if total <= self.budget:
+				break
+			shutil.rmtree(path, ignore_errors = True)
+			total -= size
@@ -0,0 +1,48 @@
+"""Reader of the binary CC trace (CC_TRACE_FILE in the config).
+
+The file is an array of CcTraceFormat records (see trace-format.h), one per sampled ACK of a
+Poseidon qp. load() memory-maps it, so even a large trace opens instantly and only the pages
+that are touched are read.
+"""
+import os
+import numpy as np
+
+RECORD = np.dtype([
+    ("time", "<u8"),
+    ("sip", "<u4"), ("dip", "<u4"),
+    ("sport", "<u2"), ("dport", "<u2"),
+    ("pg", "<u2"),
+    ("nhop", "u1"),
+    ("reserved0", "u1"),
+    ("mpd", "<f8"),
+    ("mpt", "<f8"),
+    ("update", "<f8"),
+    ("actual_update", "<f8"),
+    ("rate", "<f8"),  # bps
+    ("rtt", "<u8"),  # ns
+    ("cwnd", "<f8"),
+    ("qlen", "<u4", (5,)),  # per-hop signals, nhop of them are valid
+    ("reserved1", "<u4"),
+])
+assert RECORD.itemsize == 104
+
+def load(path):
+    """Return the records of the trace at path as a read-only memory-mapped structured array."""
+    # an empty file (no Poseidon update recorded) cannot be mapped
+    if os.path.getsize(path) == 0:
+        return np.empty(0, dtype=RECORD)
+    return np.memmap(path, dtype=RECORD, mode="r")
+
+def flows(tr):
+    """Split records by qp (sip, dip, sport, dport, pg), return {5-tuple: records in time order}."""
+    if len(tr) == 0:
+        return {}
+    key = np.stack([tr["sip"].astype(np.uint64) << 32 | tr["dip"], tr["sport"].astype(np.uint64) << 32 | tr["dport"].astype(np.uint64) << 16 | tr["pg"]], axis=1)
+    keys, inverse = np.unique(key, axis=0, return_inverse=True)
+    order = np.argsort(inverse.reshape(-1), kind="stable")
+    bounds = np.searchsorted(inverse.reshape(-1)[order], np.arange(len(keys) + 1))
+    res = {}
+    for i in range(len(keys)):
+        a, b = int(keys[i][0]), int(keys[i][1])
+        res[(a >> 32, a & 0xffffffff, b >> 32, (b >> 16) & 0xffff, b & 0xffff)] = tr[order[bounds[i]:bounds[i + 1]]]
+    return res
@@ -1,6 +1,67 @@
 import plotters
 import os
-from collections import deque
+import numpy as np
+import log_parser
+
+def plot_log(filename, flow_mapping, rate_legends, time_limit=None, ncol=None):
+    """Plot rate, mpd and port signals of ./data/<filename>.txt, records later than time_limit (ns) are skipped."""
+    x_axis = [[] for i in range(19)]
+    y_axis = [[] for i in range(19)]
+    x_mpd = [[] for i in range(19)]
+    y_mpd = [[] for i in range(19)]
+    signals_x = [[] for i in range(9)]
+    signals_y = [[] for i in range(9)]
+    smooth_x = [[] for i in range(9)]
+    smooth_y = [[] for i in range(9)]
+    log = log_parser.load("./data/"+filename+".txt")
+    if time_limit is not None:
+        log = dict((k, v[v["time"] <= time_limit]) for k, v in log.items())
+    flows = dict((int(ip, 16), idx) for ip, idx in flow_mapping.items())
+    for src, rec in log_parser.split(log["Rate"], "src").items():
+        if src in flows:
+            x_axis[flows[src]] = rec["time"] / 1e6 - 2000
+            y_axis[flows[src]] = rec["value"]
+    for src, rec in log_parser.split(log["SMPD"], "src").items():
+        if src in flows:
+            x_mpd[flows[src]] = rec["time"] / 1e6 - 2000
+            y_mpd[flows[src]] = rec["value"]
+    # port -1 (hop of an unmapped flow) goes to the last list, as a Python index would
+    for port, rec in log_parser.split(log["Port"], np.mod(log["Port"]["port"], 9)).items():
+        signals_x[port] = rec["time"] / 1e9
+        signals_y[port] = rec["value"]
+    for port, rec in log_parser.split(log["SPort"], np.mod(log["SPort"]["port"], 9)).items():
+        smooth_x[port] = rec["time"] / 1e9
+        smooth_y[port] = rec["value"]
+    signals_y[2] = []
+    signals_x[2] = []
+    smooth_y[2] = []
+    smooth_x[2] = []
+    extra = {} if ncol is None else {"ncol": ncol}
+    plotters.draw("line", y_axis, "./rate/"+filename+".png", x_axis=x_axis, 
+                xylabels=["Time (ms)", "Flow Rate (Gbps)"],
+                markersize=0, linewidth=1.5,
+                ylim=(-5, 105),
+                figure_size=(7, 5),
+                legends=rate_legends,
+                **extra)
+    plotters.draw("line", y_mpd, "./mpd/"+filename+".png", x_axis=x_mpd, 
+                xylabels=["Time (ms)", "MPD (%)"],
+                markersize=0, linewidth=1,
+                # ylim=(-5, 105),
+                figure_size=(7, 5),
+                legends=[k for k in range(5)])
+    plotters.draw("line", signals_y, "./signal/"+filename+"_signals.png", x_axis=signals_x, 
+                xylabels=["Time (ms)", "Utilization"],
+                markersize=0, linewidth=1,
+                # ylim=(-5, 105),
+                figure_size=(7, 5),
+                legends=[k for k in range(9)]) 
+    plotters.draw("line", smooth_y, "./smoothed_signal/"+filename+"_smooth.png", x_axis=smooth_x, 
+                xylabels=["Time (ms)", "Utilization"],
+                markersize=0, linewidth=1,
+                # ylim=(-5, 105),
+                figure_size=(7, 5),
+                legends=[k for k in range(9)])
 
 if __name__ == "__main__":
     directory = "./data/"
@@ -33,80 +94,7 @@ if __name__ == "__main__":
         if file.endswith(".txt"):
             filename = file[:-4]
             print(filename)
-            x_axis = [[] for i in range(19)]
-            y_axis = [[] for i in range(19)]
-            x_mpd = [[] for i in range(19)]
-            y_mpd = [[] for i in range(19)]
-            signals_x = [[] for i in range(9)]
-            signals_y = [[] for i in range(9)]
-            smooth_x = [[] for i in range(9)]
-            smooth_y = [[] for i in range(9)]
-            with open("./data/"+filename+".txt", "r") as raw_file:
-                q = [deque() for i in range(19)]
-                avg = [0 for i in range(19)]
-                for line in raw_file:
-                    items = line.split()
-                    if (len(items) < 4):
-                        continue
-                    if items[0] == "Rate:":
-                        time = int(items[1])
-                        srcip = items[2]
-                        rate = float(items[3])
-                        if srcip in flow_mapping:
-                            x_axis[flow_mapping[srcip]].append(time / 1e6 - 2000)
-                            y_axis[flow_mapping[srcip]].append(rate)
-                    elif items[0] == "Port:":
-                        time = int(items[1])
-                        port = int(items[2])
-                        utilization = float(items[3])
-                        signals_x[port].append(time / 1e9)
-                        signals_y[port].append(utilization)
-                    elif items[0] == "SPort:":
-                        time = int(items[1])
-                        port = int(items[2])
-                        utilization = float(items[3])
-                        smooth_x[port].append(time / 1e9)
-                        smooth_y[port].append(utilization)
-                    elif items[0] == "SMPD:":
-                        time = int(items[1])
-                        srcip = items[2]
-                        mpd = float(items[3])
-                        if srcip in flow_mapping:
-                            x_mpd[flow_mapping[srcip]].append(time / 1e6 - 2000)
-                            y_mpd[flow_mapping[srcip]].append(mpd)
-                            q[flow_mapping[srcip]].append(mpd)
-                            avg[flow_mapping[srcip]] += mpd
-                            if len(q[flow_mapping[srcip]]) == 51:
-                                oldest = q[flow_mapping[srcip]].popleft()
-                                avg[flow_mapping[srcip]] -= oldest
-            signals_y[2] = []
-            signals_x[2] = []
-            smooth_y[2] = []
-            smooth_x[2] = []
-            plotters.draw("line", y_axis, "./rate/"+filename+".png", x_axis=x_axis, 
-                        xylabels=["Time (ms)", "Flow Rate (Gbps)"],
-                        markersize=0, linewidth=1.5,
-                        ylim=(-5, 105),
-                        figure_size=(7, 5),
-                        legends=["Flow 0", "Flow 1", "Flow 2", "Flow 3"]) # ["Flow 0", "Flow 1", "Flow 2", "Flow 3", "Flow 4", "Flow 5", "Flow 6", "Flow 7", "Flow 8"]
-            plotters.draw("line", y_mpd, "./mpd/"+filename+".png", x_axis=x_mpd, 
-                        xylabels=["Time (ms)", "MPD (%)"],
-                        markersize=0, linewidth=1,
-                        # ylim=(-5, 105),
-                        figure_size=(7, 5),
-                        legends=[k for k in range(5)])
-            plotters.draw("line", signals_y, "./signal/"+filename+"_signals.png", x_axis=signals_x, 
-                        xylabels=["Time (ms)", "Utilization"],
-                        markersize=0, linewidth=1,
-                        # ylim=(-5, 105),
-                        figure_size=(7, 5),
-                        legends=[k for k in range(9)]) 
-            plotters.draw("line", smooth_y, "./smoothed_signal/"+filename+"_smooth.png", x_axis=smooth_x, 
-                        xylabels=["Time (ms)", "Utilization"],
-                        markersize=0, linewidth=1,
-                        # ylim=(-5, 105),
-                        figure_size=(7, 5),
-                        legends=[k for k in range(9)])
+            plot_log(filename, flow_mapping, ["Flow 0", "Flow 1", "Flow 2", "Flow 3"]) # ["Flow 0", "Flow 1", "Flow 2", "Flow 3", "Flow 4", "Flow 5", "Flow 6", "Flow 7", "Flow 8"]
     
     flow_mapping = {"0b000001": 0, 
 
@@ -145,80 +133,5 @@ if __name__ == "__main__":
         if file.endswith(".txt"):
             filename = file[:-4]
             print(filename)
-            x_axis = [[] for i in range(19)]
-            y_axis = [[] for i in range(19)]
-            x_mpd = [[] for i in range(19)]
-            y_mpd = [[] for i in range(19)]
-            signals_x = [[] for i in range(9)]
-            signals_y = [[] for i in range(9)]
-            smooth_x = [[] for i in range(9)]
-            smooth_y = [[] for i in range(9)]
-            with open("./data/"+filename+".txt", "r") as raw_file:
-                q = [deque() for i in range(19)]
-                avg = [0 for i in range(19)]
-                for line in raw_file:
-                    items = line.split()
-                    if (len(items) < 4):
-                        continue
-                    if items[0] == "Rate:":
-                        time = int(items[1])
-                        if time > 2050000000:
-                            break
-                        srcip = items[2]
-                        rate = float(items[3])
-                        if srcip in flow_mapping:
-                            x_axis[flow_mapping[srcip]].append(time / 1e6 - 2000)
-                            y_axis[flow_mapping[srcip]].append(rate)
-                    elif items[0] == "Port:":
-                        time = int(items[1])
-                        port = int(items[2])
-                        utilization = float(items[3])
-                        signals_x[port].append(time / 1e9)
-                        signals_y[port].append(utilization)
-                    elif items[0] == "SPort:":
-                        time = int(items[1])
-                        port = int(items[2])
-                        utilization = float(items[3])
-                        smooth_x[port].append(time / 1e9)
-                        smooth_y[port].append(utilization)
-                    elif items[0] == "SMPD:":
-                        time = int(items[1])
-                        srcip = items[2]
-                        mpd = float(items[3])
-                        if srcip in flow_mapping:
-                            x_mpd[flow_mapping[srcip]].append(time / 1e6 - 2000)
-                            y_mpd[flow_mapping[srcip]].append(mpd)
-                            q[flow_mapping[srcip]].append(mpd)
-                            avg[flow_mapping[srcip]] += mpd
-                            if len(q[flow_mapping[srcip]]) == 51:
-                                oldest = q[flow_mapping[srcip]].popleft()
-                                avg[flow_mapping[srcip]] -= oldest
-            signals_y[2] = []
-            signals_x[2] = []
-            smooth_y[2] = []
-            smooth_x[2] = []
-            plotters.draw("line", y_axis, "./rate/"+filename+".png", x_axis=x_axis, 
-                        xylabels=["Time (ms)", "Flow Rate (Gbps)"],
-                        markersize=0, linewidth=1.5,
-                        ylim=(-5, 105),
-                        figure_size=(7, 5),
-                        legends=["Flow 0", "Flow 1", "Flow 2", "Flow 3", "Flow 4", "Flow 5", "Flow 6", "Flow 7", "Flow 8"],
-                        ncol=2)
-            plotters.draw("line", y_mpd, "./mpd/"+filename+".png", x_axis=x_mpd, 
-                        xylabels=["Time (ms)", "MPD (%)"],
-                        markersize=0, linewidth=1,
-                        # ylim=(-5, 105),
-                        figure_size=(7, 5),
-                        legends=[k for k in range(5)])
-            plotters.draw("line", signals_y, "./signal/"+filename+"_signals.png", x_axis=signals_x, 
-                        xylabels=["Time (ms)", "Utilization"],
-                        markersize=0, linewidth=1,
-                        # ylim=(-5, 105),
-                        figure_size=(7, 5),
-                        legends=[k for k in range(9)]) 
-            plotters.draw("line", smooth_y, "./smoothed_signal/"+filename+"_smooth.png", x_axis=smooth_x, 
-                        xylabels=["Time (ms)", "Utilization"],
-                        markersize=0, linewidth=1,
-                        # ylim=(-5, 105),
-                        figure_size=(7, 5),
-                        legends=[k for k in range(9)])
\ No newline at end of file
+            # the parsed log is cached by the first pass, so this does not read the text again
+            plot_log(filename, flow_mapping, ["Flow 0", "Flow 1", "Flow 2", "Flow 3", "Flow 4", "Flow 5", "Flow 6", "Flow 7", "Flow 8"], time_limit=2050000000, ncol=2)
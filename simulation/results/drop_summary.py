@@ -0,0 +1,96 @@
+"""Reader of the drop summary (DROP_SUMMARY_FILE in the config).
+
+The file has one block per switch that dropped packets in its admission control (see DropSummaryHeader
+in trace-format.h): a header, the drop counters of its (port, queue, reason) with drops, and the
+snapshots of its last drops (DROP_RING_SIZE of them at most). load() returns the counters and the
+snapshots of all the switches as two NumPy structured arrays, with the node id of each record.
+
+Example:
+    python drop_summary.py mix/drops.bin
+"""
+import argparse
+import numpy as np
+
+MAGIC = 0x504f5244  # "DROP"
+REASONS = ["headroom", "egress"]  # DropReason: the port of a counter is the ingress one for headroom, the egress one for egress
+
+HEADER = np.dtype([
+    ("magic", "<u4"),
+    ("node", "<u4"),
+    ("n_count", "<u4"),
+    ("n_snapshot", "<u4"),
+    ("n_drop", "<u8"),
+])
+COUNT = np.dtype([
+    ("port", "<u2"),
+    ("qidx", "u1"),
+    ("reason", "u1"),
+    ("reserved", "<u4"),
+    ("packets", "<u8"),
+    ("bytes", "<u8"),
+])
+SNAPSHOT = np.dtype([
+    ("time", "<u8"),  # ns
+    ("in_port", "<u2"), ("out_port", "<u2"),
+    ("qidx", "u1"),
+    ("reason", "u1"),
+    ("reserved0", "<u2"),
+    ("size", "<u4"),
+    ("hdrm", "<u4"), ("ingress", "<u4"),  # of the ingress queue
+    ("egress", "<u4"),  # of the egress queue
+    ("shared_used", "<u4"), ("egress_used", "<u4"),  # of the switch
+    ("threshold", "<u4"),  # PFC threshold of the ingress queue
+    ("reserved1", "<u4"),
+])
+assert HEADER.itemsize == 24 and COUNT.itemsize == 24 and SNAPSHOT.itemsize == 48
+
+def with_node(records, node):
+    """records with a node field in front."""
+    res = np.empty(len(records), dtype=[("node", "<u4")] + [(name, records.dtype[name]) for name in records.dtype.names])
+    res["node"] = node
+    for name in records.dtype.names:
+        res[name] = records[name]
+    return res
+
+def load(path):
+    """Return (counts, snapshots) of the file at path, each with the node of the records, in order of node."""
+    data = np.fromfile(path, dtype=np.uint8)
+    counts, snapshots = [], []
+    pos = 0
+    while pos < len(data):
+        h = data[pos:pos + HEADER.itemsize].view(HEADER)[0]
+        if h["magic"] != MAGIC:
+            raise ValueError("%s: no drop summary at offset %d" % (path, pos))
+        pos += HEADER.itemsize
+        c = data[pos:pos + int(h["n_count"]) * COUNT.itemsize].view(COUNT)
+        pos += c.nbytes
+        s = data[pos:pos + int(h["n_snapshot"]) * SNAPSHOT.itemsize].view(SNAPSHOT)
+        pos += s.nbytes
+        counts.append(with_node(c, h["node"]))
+        snapshots.append(with_node(s, h["node"]))
+    if not counts:
+        return with_node(np.empty(0, dtype=COUNT), 0), with_node(np.empty(0, dtype=SNAPSHOT), 0)
+    return np.concatenate(counts), np.concatenate(snapshots)
+
+def per_switch(counts):
+    """{node: (packets, bytes)} of all the drops of each switch."""
+    res = {}
+    for node in np.unique(counts["node"]):
+        c = counts[counts["node"] == node]
+        res[int(node)] = (int(c["packets"].sum()), int(c["bytes"].sum()))
+    return res
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="print the drops of a drop summary file")
+    parser.add_argument("file", help="DROP_SUMMARY_FILE of a run")
+    parser.add_argument("--snapshots", action="store_true", help="also print the snapshots of the last drops")
+    args = parser.parse_args()
+    counts, snapshots = load(args.file)
+    print("node\tport\tqueue\treason\tpackets\tbytes")
+    for c in counts:
+        print("%d\t%d\t%d\t%s\t%d\t%d" % (c["node"], c["port"], c["qidx"], REASONS[c["reason"]], c["packets"], c["bytes"]))
+    if args.snapshots:
+        print("time\tnode\tin\tout\tqueue\treason\tsize\thdrm\tingress\tegress\tshared_used\tegress_used\tthreshold")
+        for s in snapshots:
+            print("\t".join(str(s[f]) if f != "reason" else REASONS[s[f]] for f in
+                            ["time", "node", "in_port", "out_port", "qidx", "reason", "size", "hdrm", "ingress", "egress", "shared_used", "egress_used", "threshold"]))
@@ -0,0 +1,180 @@
+"""FCT slowdown analysis of FCT_OUTPUT_FILE.
+
+Each line of an FCT file is written by qp_finish in scratch/third.cc:
+    <sip> <dip> <sport> <dport> <size (B)> <start (ns)> <fct (ns)> <standalone fct (ns)>
+load() parses a file into a NumPy structured array and caches it as <file>.npz next to it (like
+log_parser), and the slowdown of a flow is fct / standalone fct, at least 1. The flows are grouped
+by size buckets, and the slowdown percentiles of each bucket are compared across labels (e.g. CCs),
+each label being one or more FCT files (e.g. the seeds of a sweep).
+
+Example:
+    python fct_analysis.py poseidon=../sweep/*poseidon*/fct_*.txt hp='../sweep/*_hp_*/fct_*.txt' --plot fct/cmp
+"""
+import argparse
+import glob
+import os
+import numpy as np
+import log_parser
+
+FCT = np.dtype([
+    ("sip", np.uint32), ("dip", np.uint32),
+    ("sport", np.uint16), ("dport", np.uint16),
+    ("size", np.uint64),
+    ("start", np.int64),  # ns
+    ("fct", np.int64),  # ns
+    ("standalone", np.int64),  # ns, the fct of the flow alone in the network
+])
+
+PERCENTILES = [50, 95, 99, 99.9]
+# default size buckets (B): <=10KB, 10KB-100KB, 100KB-1MB, 1MB-10MB, >10MB
+BUCKETS = [10000, 100000, 1000000, 10000000]
+
+def _convert(chunk):
+    """Parse complete lines. The ips are %08x at fixed columns, so they are cut out by position and
+    the rest of the line is read as integers in one pass."""
+    buf = np.frombuffer(chunk, dtype=np.uint8).copy()
+    starts = np.concatenate([[0], np.flatnonzero(buf == 10)[:-1] + 1])
+    res = np.empty(len(starts), dtype=FCT)
+    for k, off in (("sip", 0), ("dip", 9)):
+        res[k] = log_parser.parse_hex(buf[starts[:, None] + off + np.arange(8)].view("S8").reshape(-1))
+    buf[starts[:, None] + np.arange(18)] = 32
+    nums = np.fromstring(buf.tobytes(), dtype=np.int64, sep=" ").reshape(len(starts), 6)
+    for i, k in enumerate(FCT.names[2:]):
+        res[k] = nums[:, i]
+    return res
+
+def parse(path, chunk_size=64 << 20):
+    """Read the FCT file at path into an FCT array, in the order of the file (of completion)."""
+    parts = []
+    with open(path, "rb") as f:
+        rest = b""
+        while True:
+            buf = f.read(chunk_size)
+            if not buf:
+                chunk, rest = rest.strip(), b""
+                if chunk:
+                    chunk += b"\n"
+            else:
+                # only parse complete lines; the tail goes to the next chunk
+                chunk = rest + buf
+                cut = chunk.rfind(b"\n") + 1
+                chunk, rest = chunk[:cut], chunk[cut:]
+            if chunk:
+                parts.append(_convert(chunk))
+            if not buf:
+                break
+    return np.concatenate(parts) if parts else np.empty(0, dtype=FCT)
+
+def cache_path(path):
+    return path + ".npz"
+
+def load(path, use_cache=True):
+    """Like parse(), but reuse/update the .npz cache next to the file."""
+    npz = cache_path(path)
+    st = os.stat(path)
+    if use_cache and os.path.exists(npz):
+        with np.load(npz) as data:
+            # the cache is valid for the file of the same size and mtime
+            if tuple(data["__fct__"]) == (st.st_size, int(st.st_mtime)):
+                return data["fct"]
+    res = parse(path)
+    if use_cache:
+        try:
+            with open(npz, "wb") as f:
+                np.savez(f, __fct__=np.array([st.st_size, int(st.st_mtime)], dtype=np.int64), fct=res)
+        except IOError:
+            pass
+    return res
+
+def load_many(paths, use_cache=True):
+    """Load and concatenate the FCT files of paths (glob patterns are expanded)."""
+    files = []
+    for p in paths:
+        files += sorted(glob.glob(p)) or [p]
+    parts = [load(f, use_cache) for f in files]
+    return np.concatenate(parts) if parts else np.empty(0, dtype=FCT)
+
+def slowdown(fct):
+    return np.maximum(fct["fct"] / np.maximum(fct["standalone"], 1).astype(np.float64), 1.0)
+
+def bucket_names(buckets):
+    def fmt(b):
+        for unit, v in (("GB", 1e9), ("MB", 1e6), ("KB", 1e3)):
+            if b >= v:
+                return "%g%s" % (b / v, unit)
+        return "%dB" % b
+    edges = ["0"] + [fmt(b) for b in buckets] + ["inf"]
+    return ["%s-%s" % (edges[i], edges[i + 1]) for i in range(len(edges) - 1)]
+
+def slowdown_stats(fct, buckets=BUCKETS, percentiles=PERCENTILES):
+    """Return (flow count per bucket, slowdown percentiles per bucket) of the flows in fct, the
+    latter of shape (number of buckets, len(percentiles)), NaN for empty buckets. Bucket i holds
+    the flows of size in (buckets[i-1], buckets[i]]; the last one is for the larger flows."""
+    sd = slowdown(fct)
+    idx = np.searchsorted(np.asarray(buckets, dtype=np.float64), fct["size"].astype(np.float64), side="left")
+    nb = len(buckets) + 1
+    count = np.bincount(idx, minlength=nb)
+    res = np.full((nb, len(percentiles)), np.nan)
+    # sort by (bucket, slowdown) once, then each bucket is a contiguous sorted run
+    order = np.lexsort((sd, idx))
+    sd = sd[order]
+    start = np.concatenate([[0], np.cumsum(count)])
+    for b in range(nb):
+        if count[b] > 0:
+            res[b] = np.percentile(sd[start[b]:start[b + 1]], percentiles)
+    return count, res
+
+def compare(groups, buckets=BUCKETS, percentiles=PERCENTILES):
+    """groups: [(label, FCT array)]. Return {label: (count, percentiles)} of slowdown_stats()."""
+    return dict((label, slowdown_stats(fct, buckets, percentiles)) for label, fct in groups)
+
+def format_table(groups, stats, buckets=BUCKETS, percentiles=PERCENTILES):
+    """A tab-separated table, one row per size bucket, with the count and percentiles of each label."""
+    labels = [label for label, _ in groups]
+    header = ["size"]
+    for label in labels:
+        header += ["%s.n" % label] + ["%s.p%g" % (label, p) for p in percentiles]
+    lines = ["\t".join(header)]
+    for b, name in enumerate(bucket_names(buckets)):
+        row = [name]
+        for label in labels:
+            count, res = stats[label]
+            row += ["%d" % count[b]] + ["%.3f" % v for v in res[b]]
+        lines.append("\t".join(row))
+    return "\n".join(lines)
+
+def plot(groups, stats, prefix, buckets=BUCKETS, percentiles=PERCENTILES):
+    """One figure per percentile, <prefix>_p<percentile>.png, with a line per label over the size buckets."""
+    import plotters
+    labels = [label for label, _ in groups]
+    names = bucket_names(buckets)
+    d = os.path.dirname(prefix)
+    if d and not os.path.isdir(d):
+        os.makedirs(d)
+    for i, p in enumerate(percentiles):
+        plotters.draw("line", [list(stats[label][1][:, i]) for label in labels], "%s_p%g.png" % (prefix, p),
+                      x_axis=[list(range(len(names)))] * len(labels),
+                      xylabels=["Flow size (B)", "p%g FCT slowdown" % p],
+                      xticks=list(range(len(names))), xticks_labels=names, xticks_rotation=30,
+                      xtick_labelsize=12, ytick_labelsize=12,
+                      markersize=6, linewidth=1.5,
+                      yscale="log",
+                      figure_size=(7, 5),
+                      legends=labels)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="compare FCT slowdown of FCT files")
+    parser.add_argument("groups", nargs="+", help="label=file_or_glob[,file_or_glob...]; a bare path is labeled by its name")
+    parser.add_argument("--buckets", type=float, nargs="+", default=BUCKETS, help="upper edges (B) of the size buckets")
+    parser.add_argument("--percentiles", type=float, nargs="+", default=PERCENTILES, help="slowdown percentiles to report")
+    parser.add_argument("--plot", default="", help="prefix of the output figures; empty means no figure")
+    parser.add_argument("--no_cache", action="store_true", help="do not read or write the .npz caches")
+    args = parser.parse_args()
+    groups = []
+    for g in args.groups:
+        label, paths = g.split("=", 1) if "=" in g else (os.path.basename(g), g)
+        groups.append((label, load_many(paths.split(","), not args.no_cache)))
+    stats = compare(groups, args.buckets, args.percentiles)
+    print(format_table(groups, stats, args.buckets, args.percentiles))
+    if args.plot:
+        plot(groups, stats, args.plot, args.buckets, args.percentiles)
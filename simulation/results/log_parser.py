@@ -0,0 +1,115 @@
+"""Columnar parser for the Poseidon stdout log.
+
+The simulator prints sampled CC state as text records (see RdmaHw::HandleAckPoseidon):
+    Rate: <time> <sip> <rate in Gbps>
+    SMPD: <time> <sip> <mpd>
+    Queue: <time> <sip> <total queue length>
+    Port: <time> <port> <signal>
+    SPort: <time> <port> <signal>
+load() scans a log once, in chunks, into NumPy structured arrays (one per record type), and
+caches them as <log>.npz next to the log, so that reloading takes milliseconds. The cache is
+rebuilt when the log changes.
+"""
+import os
+import re
+import numpy as np
+
+# record type -> name of its second column
+RECORDS = {"Rate": "src", "SMPD": "src", "Queue": "src", "Port": "port", "SPort": "port"}
+
+_line = re.compile(br"^(Rate|SMPD|Queue|Port|SPort): (-?\d+) (\S+) (\S+)[ \t\r]*$", re.M)
+
+# hex digit -> value, for decoding the %08x ip addresses without a Python loop
+_hex = np.zeros(256, dtype=np.uint32)
+for _i, _c in enumerate(bytearray(b"0123456789abcdef")):
+    _hex[_c] = _i
+for _i, _c in enumerate(bytearray(b"ABCDEF")):
+    _hex[_c] = 10 + _i
+
+def _dtype(kind):
+    if RECORDS[kind] == "src":
+        return np.dtype([("time", np.int64), ("src", np.uint32), ("value", np.float64)])
+    return np.dtype([("time", np.int64), ("port", np.int32), ("value", np.float64)])
+
+def parse_hex(col):
+    """Decode an array of %08x strings (bytes) into uint32."""
+    digits = np.ascontiguousarray(col.astype("S8")).view(np.uint8).reshape(-1, 8)
+    v = _hex[digits]
+    res = np.zeros(len(col), dtype=np.uint32)
+    for i in range(8):
+        res = (res << 4) | v[:, i]
+    return res
+
+def _convert(kind, rows):
+    res = np.empty(len(rows), dtype=_dtype(kind))
+    if len(rows) == 0:
+        return res
+    res["time"] = rows[:, 0].astype(np.int64)
+    if RECORDS[kind] == "src":
+        res["src"] = parse_hex(rows[:, 1])
+    else:
+        res["port"] = rows[:, 1].astype(np.int32)
+    res["value"] = rows[:, 2].astype(np.float64)
+    return res
+
+def parse(path, chunk_size=64 << 20):
+    """Scan the log at path and return {record type: structured array}."""
+    parts = dict((k, []) for k in RECORDS)
+    with open(path, "rb") as f:
+        rest = b""
+        while True:
+            buf = f.read(chunk_size)
+            if not buf:
+                chunk, rest = rest, b""
+            else:
+                # only parse complete lines; the tail goes to the next chunk
+                chunk = rest + buf
+                cut = chunk.rfind(b"\n") + 1
+                chunk, rest = chunk[:cut], chunk[cut:]
+            if chunk:
+                found = _line.findall(chunk)
+                if found:
+                    rows = np.array(found)
+                    for k in RECORDS:
+                        sel = rows[rows[:, 0] == k.encode()]
+                        if len(sel) > 0:
+                            parts[k].append(_convert(k, sel[:, 1:]))
+            if not buf:
+                break
+    res = {}
+    for k in RECORDS:
+        res[k] = np.concatenate(parts[k]) if parts[k] else np.empty(0, dtype=_dtype(k))
+    return res
+
+def cache_path(path):
+    return path + ".npz"
+
+def load(path, use_cache=True):
+    """Like parse(), but reuse/update the .npz cache next to the log."""
+    npz = cache_path(path)
+    st = os.stat(path)
+    if use_cache and os.path.exists(npz):
+        with np.load(npz) as data:
+            # the cache is valid for the log of the same size and mtime
+            if tuple(data["__log__"]) == (st.st_size, int(st.st_mtime)):
+                return dict((k, data[k]) for k in RECORDS)
+    res = parse(path)
+    if use_cache:
+        try:
+            with open(npz, "wb") as f:
+                np.savez(f, __log__=np.array([st.st_size, int(st.st_mtime)], dtype=np.int64), **res)
+        except IOError:
+            pass
+    return res
+
+def split(rec, key):
+    """Split a record array by key, the name of a field or an array of per-record keys.
+    Return {key value: sub-array}, keeping the order in time."""
+    if len(rec) == 0:
+        return {}
+    k = rec[key] if isinstance(key, str) else np.asarray(key)
+    order = np.argsort(k, kind="stable")
+    s = rec[order]
+    keys, start = np.unique(k[order], return_index=True)
+    ends = list(start[1:]) + [len(s)]
+    return dict((k, s[b:e]) for k, b, e in zip(keys.tolist(), start, ends))
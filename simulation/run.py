@@ -1,6 +1,9 @@
 import argparse
 import sys
 import os
+import subprocess
+
+import result_cache
 
 config_template="""ENABLE_QCN 1
 USE_DYNAMIC_PFC_THRESHOLD 1
@@ -10,9 +13,9 @@ PACKET_PAYLOAD_SIZE 1000
 TOPOLOGY_FILE mix/{topo}.txt
 FLOW_FILE mix/{trace}.txt
 TRACE_FILE mix/trace.txt
-TRACE_OUTPUT_FILE mix/mix_{topo}_{trace}_{cc}{failure}.tr
-FCT_OUTPUT_FILE mix/fct_{topo}_{trace}_{cc}{failure}.txt
-PFC_OUTPUT_FILE mix/pfc_{topo}_{trace}_{cc}{failure}.txt
+TRACE_OUTPUT_FILE {out_dir}/mix_{topo}_{trace}_{cc}{failure}.tr
+FCT_OUTPUT_FILE {out_dir}/fct_{topo}_{trace}_{cc}{failure}.txt
+PFC_OUTPUT_FILE {out_dir}/pfc_{topo}_{trace}_{cc}{failure}.txt
 
 SIMULATOR_STOP_TIME 2.05
 
@@ -57,15 +60,17 @@ KMAX_MAP {kmax_map}
 KMIN_MAP {kmin_map}
 PMAX_MAP {pmax_map}
 BUFFER_SIZE {buffer_size}
-QLEN_MON_FILE mix/qlen_{topo}_{trace}_{cc}{failure}.txt
+QLEN_MON_FILE {out_dir}/qlen_{topo}_{trace}_{cc}{failure}.txt
 QLEN_MON_START 2000000000
 QLEN_MON_END 3000000000
 
 POSEIDON_M {poseidon_m}
 POSEIDON_MIN_RATE {poseidon_min_rate}
 POSEIDON_MAX_RATE {poseidon_max_rate}
+
+RNG_SEED {seed}
 """
-if __name__ == "__main__":
+def get_parser():
 	parser = argparse.ArgumentParser(description='run simulation')
 	parser.add_argument('--cc', dest='cc', action='store', default='poseidon', help="poseidon/hp/dcqcn/timely/dctcp/hpccPint")
 	parser.add_argument('--trace', dest='trace', action='store', default='flow', help="the name of the flow file")
@@ -80,7 +85,16 @@ if __name__ == "__main__":
 	parser.add_argument('--enable_tr', dest='enable_tr', action = 'store', type=int, default=0, help="enable packet-level events dump")
 	parser.add_argument('--poseidon_m', dest='poseidon_m', action = 'store', type=float, default=0.01, help="Poseidon's parameter m")
 	parser.add_argument('--poseidon_min_rate', dest='poseidon_min_rate', action = 'store', type=float, default=0.1, help="Poseidon's min rate")
-	args = parser.parse_args()
+	parser.add_argument('--cache', dest='cache', action = 'store', default='', help="directory of the result cache; results of identical runs are reused. Empty means no cache")
+	parser.add_argument('--cache_budget', dest='cache_budget', action = 'store', type=float, default=10, help="disk budget of the result cache in GB")
+	return parser
+
+def gen_config(args, out_dir="mix", seed=1):
+	"""Return (config_name, config) for the experiment described by args.
+
+	args has the fields of get_parser(). Output files of the run (fct/pfc/qlen/trace) and
+	the config itself are placed under out_dir, so that several runs can co-exist.
+	"""
 
 	topo=args.topo
 	bw = int(args.bw)
@@ -100,7 +114,7 @@ if __name__ == "__main__":
 	if args.down != '0 0 0':
 		failure = '_down'
 
-	config_name = "mix/config_%s_%s_%s%s.txt"%(topo, trace, args.cc, failure)
+	config_name = "%s/config_%s_%s_%s%s.txt"%(out_dir, topo, trace, args.cc, failure)
 
 	kmax_map = "2 %d %d %d %d"%(bw*1000000000, 400*bw/25, bw*4*1000000000, 400*bw*4/25)
 	kmin_map = "2 %d %d %d %d"%(bw*1000000000, 100*bw/25, bw*4*1000000000, 100*bw*4/25)
@@ -110,13 +124,13 @@ if __name__ == "__main__":
 		hai = 50 * bw /25
 
 		if args.cc == "dcqcn":
-			config = config_template.format(bw=bw, trace=trace, topo=topo, cc=args.cc, mode=1, t_alpha=1, t_dec=4, t_inc=300, g=0.00390625, ai=ai, hai=hai, dctcp_ai=1000, has_win=0, vwin=0, us=0, u_tgt=u_tgt, mi=mi, int_multi=1, pint_log_base=pint_log_base, pint_prob=pint_prob, ack_prio=1, link_down=args.down, failure=failure, kmax_map=kmax_map, kmin_map=kmin_map, pmax_map=pmax_map, buffer_size=bfsz, enable_tr=enable_tr, poseidon_m=poseidon_m, poseidon_min_rate=poseidon_min_rate, poseidon_max_rate=poseidon_max_rate)
+			config = config_template.format(bw=bw, trace=trace, topo=topo, cc=args.cc, mode=1, t_alpha=1, t_dec=4, t_inc=300, g=0.00390625, ai=ai, hai=hai, dctcp_ai=1000, has_win=0, vwin=0, us=0, u_tgt=u_tgt, mi=mi, int_multi=1, pint_log_base=pint_log_base, pint_prob=pint_prob, ack_prio=1, link_down=args.down, failure=failure, kmax_map=kmax_map, kmin_map=kmin_map, pmax_map=pmax_map, buffer_size=bfsz, enable_tr=enable_tr, poseidon_m=poseidon_m, poseidon_min_rate=poseidon_min_rate, poseidon_max_rate=poseidon_max_rate, out_dir=out_dir, seed=seed)
 		elif args.cc == "dcqcn_paper":
-			config = config_template.format(bw=bw, trace=trace, topo=topo, cc=args.cc, mode=1, t_alpha=50, t_dec=50, t_inc=55, g=0.00390625, ai=ai, hai=hai, dctcp_ai=1000, has_win=0, vwin=0, us=0, u_tgt=u_tgt, mi=mi, int_multi=1, pint_log_base=pint_log_base, pint_prob=pint_prob, ack_prio=1, link_down=args.down, failure=failure, kmax_map=kmax_map, kmin_map=kmin_map, pmax_map=pmax_map, buffer_size=bfsz, enable_tr=enable_tr, poseidon_m=poseidon_m, poseidon_min_rate=poseidon_min_rate, poseidon_max_rate=poseidon_max_rate)
+			config = config_template.format(bw=bw, trace=trace, topo=topo, cc=args.cc, mode=1, t_alpha=50, t_dec=50, t_inc=55, g=0.00390625, ai=ai, hai=hai, dctcp_ai=1000, has_win=0, vwin=0, us=0, u_tgt=u_tgt, mi=mi, int_multi=1, pint_log_base=pint_log_base, pint_prob=pint_prob, ack_prio=1, link_down=args.down, failure=failure, kmax_map=kmax_map, kmin_map=kmin_map, pmax_map=pmax_map, buffer_size=bfsz, enable_tr=enable_tr, poseidon_m=poseidon_m, poseidon_min_rate=poseidon_min_rate, poseidon_max_rate=poseidon_max_rate, out_dir=out_dir, seed=seed)
 		elif args.cc == "dcqcn_vwin":
-			config = config_template.format(bw=bw, trace=trace, topo=topo, cc=args.cc, mode=1, t_alpha=1, t_dec=4, t_inc=300, g=0.00390625, ai=ai, hai=hai, dctcp_ai=1000, has_win=1, vwin=1, us=0, u_tgt=u_tgt, mi=mi, int_multi=1, pint_log_base=pint_log_base, pint_prob=pint_prob, ack_prio=0, link_down=args.down, failure=failure, kmax_map=kmax_map, kmin_map=kmin_map, pmax_map=pmax_map, buffer_size=bfsz, enable_tr=enable_tr, poseidon_m=poseidon_m, poseidon_min_rate=poseidon_min_rate, poseidon_max_rate=poseidon_max_rate)
+			config = config_template.format(bw=bw, trace=trace, topo=topo, cc=args.cc, mode=1, t_alpha=1, t_dec=4, t_inc=300, g=0.00390625, ai=ai, hai=hai, dctcp_ai=1000, has_win=1, vwin=1, us=0, u_tgt=u_tgt, mi=mi, int_multi=1, pint_log_base=pint_log_base, pint_prob=pint_prob, ack_prio=0, link_down=args.down, failure=failure, kmax_map=kmax_map, kmin_map=kmin_map, pmax_map=pmax_map, buffer_size=bfsz, enable_tr=enable_tr, poseidon_m=poseidon_m, poseidon_min_rate=poseidon_min_rate, poseidon_max_rate=poseidon_max_rate, out_dir=out_dir, seed=seed)
 		elif args.cc == "dcqcn_paper_vwin":
-			config = config_template.format(bw=bw, trace=trace, topo=topo, cc=args.cc, mode=1, t_alpha=50, t_dec=50, t_inc=55, g=0.00390625, ai=ai, hai=hai, dctcp_ai=1000, has_win=1, vwin=1, us=0, u_tgt=u_tgt, mi=mi, int_multi=1, pint_log_base=pint_log_base, pint_prob=pint_prob, ack_prio=0, link_down=args.down, failure=failure, kmax_map=kmax_map, kmin_map=kmin_map, pmax_map=pmax_map, buffer_size=bfsz, enable_tr=enable_tr, poseidon_m=poseidon_m, poseidon_min_rate=poseidon_min_rate, poseidon_max_rate=poseidon_max_rate)
+			config = config_template.format(bw=bw, trace=trace, topo=topo, cc=args.cc, mode=1, t_alpha=50, t_dec=50, t_inc=55, g=0.00390625, ai=ai, hai=hai, dctcp_ai=1000, has_win=1, vwin=1, us=0, u_tgt=u_tgt, mi=mi, int_multi=1, pint_log_base=pint_log_base, pint_prob=pint_prob, ack_prio=0, link_down=args.down, failure=failure, kmax_map=kmax_map, kmin_map=kmin_map, pmax_map=pmax_map, buffer_size=bfsz, enable_tr=enable_tr, poseidon_m=poseidon_m, poseidon_min_rate=poseidon_min_rate, poseidon_max_rate=poseidon_max_rate, out_dir=out_dir, seed=seed)
 	elif args.cc == "hp":
 		ai = 10 * bw / 25;
 		if args.hpai > 0:
@@ -128,10 +142,10 @@ if __name__ == "__main__":
 			cc += "mi%d"%mi
 		if args.hpai > 0:
 			cc += "ai%d"%ai
-		config_name = "mix/config_%s_%s_%s%s.txt"%(topo, trace, cc, failure)
-		config = config_template.format(bw=bw, trace=trace, topo=topo, cc=cc, mode=3, t_alpha=1, t_dec=4, t_inc=300, g=0.00390625, ai=ai, hai=hai, dctcp_ai=1000, has_win=1, vwin=1, us=1, u_tgt=u_tgt, mi=mi, int_multi=int_multi, pint_log_base=pint_log_base, pint_prob=pint_prob, ack_prio=0, link_down=args.down, failure=failure, kmax_map=kmax_map, kmin_map=kmin_map, pmax_map=pmax_map, buffer_size=bfsz, enable_tr=enable_tr, poseidon_m=poseidon_m, poseidon_min_rate=poseidon_min_rate, poseidon_max_rate=poseidon_max_rate)
+		config_name = "%s/config_%s_%s_%s%s.txt"%(out_dir, topo, trace, cc, failure)
+		config = config_template.format(bw=bw, trace=trace, topo=topo, cc=cc, mode=3, t_alpha=1, t_dec=4, t_inc=300, g=0.00390625, ai=ai, hai=hai, dctcp_ai=1000, has_win=1, vwin=1, us=1, u_tgt=u_tgt, mi=mi, int_multi=int_multi, pint_log_base=pint_log_base, pint_prob=pint_prob, ack_prio=0, link_down=args.down, failure=failure, kmax_map=kmax_map, kmin_map=kmin_map, pmax_map=pmax_map, buffer_size=bfsz, enable_tr=enable_tr, poseidon_m=poseidon_m, poseidon_min_rate=poseidon_min_rate, poseidon_max_rate=poseidon_max_rate, out_dir=out_dir, seed=seed)
 	elif args.cc == "poseidon":
-		config = config_template.format(bw=bw, trace=trace, topo=topo, cc=args.cc, mode=11, t_alpha=1, t_dec=4, t_inc=300, g=0.00390625, ai=1, hai=1, dctcp_ai=1000, has_win=1, vwin=1, us=1, u_tgt=u_tgt, mi=mi, int_multi=1, pint_log_base=pint_log_base, pint_prob=pint_prob, ack_prio=0, link_down=args.down, failure=failure, kmax_map=kmax_map, kmin_map=kmin_map, pmax_map=pmax_map, buffer_size=bfsz, enable_tr=enable_tr, poseidon_m=poseidon_m, poseidon_min_rate=poseidon_min_rate, poseidon_max_rate=poseidon_max_rate)
+		config = config_template.format(bw=bw, trace=trace, topo=topo, cc=args.cc, mode=11, t_alpha=1, t_dec=4, t_inc=300, g=0.00390625, ai=1, hai=1, dctcp_ai=1000, has_win=1, vwin=1, us=1, u_tgt=u_tgt, mi=mi, int_multi=1, pint_log_base=pint_log_base, pint_prob=pint_prob, ack_prio=0, link_down=args.down, failure=failure, kmax_map=kmax_map, kmin_map=kmin_map, pmax_map=pmax_map, buffer_size=bfsz, enable_tr=enable_tr, poseidon_m=poseidon_m, poseidon_min_rate=poseidon_min_rate, poseidon_max_rate=poseidon_max_rate, out_dir=out_dir, seed=seed)
 	elif args.cc == "dctcp":
 		ai = 10 # ai is useless for dctcp
 		hai = ai  # also useless
@@ -139,15 +153,15 @@ if __name__ == "__main__":
 		kmax_map = "2 %d %d %d %d"%(bw*1000000000, 30*bw/10, bw*4*1000000000, 30*bw*4/10)
 		kmin_map = "2 %d %d %d %d"%(bw*1000000000, 30*bw/10, bw*4*1000000000, 30*bw*4/10)
 		pmax_map = "2 %d %.2f %d %.2f"%(bw*1000000000, 1.0, bw*4*1000000000, 1.0)
-		config = config_template.format(bw=bw, trace=trace, topo=topo, cc=args.cc, mode=8, t_alpha=1, t_dec=4, t_inc=300, g=0.0625, ai=ai, hai=hai, dctcp_ai=dctcp_ai, has_win=1, vwin=1, us=0, u_tgt=u_tgt, mi=mi, int_multi=1, pint_log_base=pint_log_base, pint_prob=pint_prob, ack_prio=0, link_down=args.down, failure=failure, kmax_map=kmax_map, kmin_map=kmin_map, pmax_map=pmax_map, buffer_size=bfsz, enable_tr=enable_tr, poseidon_m=poseidon_m, poseidon_min_rate=poseidon_min_rate, poseidon_max_rate=poseidon_max_rate)
+		config = config_template.format(bw=bw, trace=trace, topo=topo, cc=args.cc, mode=8, t_alpha=1, t_dec=4, t_inc=300, g=0.0625, ai=ai, hai=hai, dctcp_ai=dctcp_ai, has_win=1, vwin=1, us=0, u_tgt=u_tgt, mi=mi, int_multi=1, pint_log_base=pint_log_base, pint_prob=pint_prob, ack_prio=0, link_down=args.down, failure=failure, kmax_map=kmax_map, kmin_map=kmin_map, pmax_map=pmax_map, buffer_size=bfsz, enable_tr=enable_tr, poseidon_m=poseidon_m, poseidon_min_rate=poseidon_min_rate, poseidon_max_rate=poseidon_max_rate, out_dir=out_dir, seed=seed)
 	elif args.cc == "timely":
 		ai = 10 * bw / 10;
 		hai = 50 * bw / 10;
-		config = config_template.format(bw=bw, trace=trace, topo=topo, cc=args.cc, mode=7, t_alpha=1, t_dec=4, t_inc=300, g=0.00390625, ai=ai, hai=hai, dctcp_ai=1000, has_win=0, vwin=0, us=0, u_tgt=u_tgt, mi=mi, int_multi=1, pint_log_base=pint_log_base, pint_prob=pint_prob, ack_prio=1, link_down=args.down, failure=failure, kmax_map=kmax_map, kmin_map=kmin_map, pmax_map=pmax_map, buffer_size=bfsz, enable_tr=enable_tr, poseidon_m=poseidon_m, poseidon_min_rate=poseidon_min_rate, poseidon_max_rate=poseidon_max_rate)
+		config = config_template.format(bw=bw, trace=trace, topo=topo, cc=args.cc, mode=7, t_alpha=1, t_dec=4, t_inc=300, g=0.00390625, ai=ai, hai=hai, dctcp_ai=1000, has_win=0, vwin=0, us=0, u_tgt=u_tgt, mi=mi, int_multi=1, pint_log_base=pint_log_base, pint_prob=pint_prob, ack_prio=1, link_down=args.down, failure=failure, kmax_map=kmax_map, kmin_map=kmin_map, pmax_map=pmax_map, buffer_size=bfsz, enable_tr=enable_tr, poseidon_m=poseidon_m, poseidon_min_rate=poseidon_min_rate, poseidon_max_rate=poseidon_max_rate, out_dir=out_dir, seed=seed)
 	elif args.cc == "timely_vwin":
 		ai = 10 * bw / 10;
 		hai = 50 * bw / 10;
-		config = config_template.format(bw=bw, trace=trace, topo=topo, cc=args.cc, mode=7, t_alpha=1, t_dec=4, t_inc=300, g=0.00390625, ai=ai, hai=hai, dctcp_ai=1000, has_win=1, vwin=1, us=0, u_tgt=u_tgt, mi=mi, int_multi=1, pint_log_base=pint_log_base, pint_prob=pint_prob, ack_prio=1, link_down=args.down, failure=failure, kmax_map=kmax_map, kmin_map=kmin_map, pmax_map=pmax_map, buffer_size=bfsz, enable_tr=enable_tr, poseidon_m=poseidon_m, poseidon_min_rate=poseidon_min_rate, poseidon_max_rate=poseidon_max_rate)
+		config = config_template.format(bw=bw, trace=trace, topo=topo, cc=args.cc, mode=7, t_alpha=1, t_dec=4, t_inc=300, g=0.00390625, ai=ai, hai=hai, dctcp_ai=1000, has_win=1, vwin=1, us=0, u_tgt=u_tgt, mi=mi, int_multi=1, pint_log_base=pint_log_base, pint_prob=pint_prob, ack_prio=1, link_down=args.down, failure=failure, kmax_map=kmax_map, kmin_map=kmin_map, pmax_map=pmax_map, buffer_size=bfsz, enable_tr=enable_tr, poseidon_m=poseidon_m, poseidon_min_rate=poseidon_min_rate, poseidon_max_rate=poseidon_max_rate, out_dir=out_dir, seed=seed)
 	elif args.cc == "hpccPint":
 		ai = 10 * bw / 25;
 		if args.hpai > 0:
@@ -161,13 +175,47 @@ if __name__ == "__main__":
 			cc += "ai%d"%ai
 		cc += "log%.3f"%pint_log_base
 		cc += "p%.3f"%pint_prob
-		config_name = "mix/config_%s_%s_%s%s.txt"%(topo, trace, cc, failure)
-		config = config_template.format(bw=bw, trace=trace, topo=topo, cc=cc, mode=10, t_alpha=1, t_dec=4, t_inc=300, g=0.00390625, ai=ai, hai=hai, dctcp_ai=1000, has_win=1, vwin=1, us=1, u_tgt=u_tgt, mi=mi, int_multi=int_multi, pint_log_base=pint_log_base, pint_prob=pint_prob, ack_prio=0, link_down=args.down, failure=failure, kmax_map=kmax_map, kmin_map=kmin_map, pmax_map=pmax_map, buffer_size=bfsz, enable_tr=enable_tr, poseidon_m=poseidon_m, poseidon_min_rate=poseidon_min_rate, poseidon_max_rate=poseidon_max_rate)
+		config_name = "%s/config_%s_%s_%s%s.txt"%(out_dir, topo, trace, cc, failure)
+		config = config_template.format(bw=bw, trace=trace, topo=topo, cc=cc, mode=10, t_alpha=1, t_dec=4, t_inc=300, g=0.00390625, ai=ai, hai=hai, dctcp_ai=1000, has_win=1, vwin=1, us=1, u_tgt=u_tgt, mi=mi, int_multi=int_multi, pint_log_base=pint_log_base, pint_prob=pint_prob, ack_prio=0, link_down=args.down, failure=failure, kmax_map=kmax_map, kmin_map=kmin_map, pmax_map=pmax_map, buffer_size=bfsz, enable_tr=enable_tr, poseidon_m=poseidon_m, poseidon_min_rate=poseidon_min_rate, poseidon_max_rate=poseidon_max_rate, out_dir=out_dir, seed=seed)
 	else:
 		print("unknown cc:", args.cc)
 		sys.exit(1)
 
+	return config_name, config
+
+if __name__ == "__main__":
+	args = get_parser().parse_args()
+	config_name, config = gen_config(args)
+
 	with open(config_name, "w") as file:
 		file.write(config)
 	
-	os.system("./waf --run 'scratch/third %s'"%(config_name))
+	if not args.cache:
+		os.system("./waf --run 'scratch/third %s'"%(config_name))
+		sys.exit(0)
+
+	# the binary must be up to date before it is hashed into the key
+	if subprocess.call(["./waf", "build"], stdout=sys.stderr) != 0:
+		sys.exit(1)
+	cache = result_cache.ResultCache(args.cache, int(args.cache_budget * (1 << 30)))
+	key = cache.key(config, result_cache.binary_digest("build/scratch/third", "build"))
+	out = getattr(sys.stdout, 'buffer', sys.stdout)
+	cached = cache.lookup(key, config)
+	if cached is not None:
+		result_cache.replay_stdout(cached, config, out)
+		sys.exit(0)
+
+	# run and tee the stdout (stderr merged, as in sweep.py) into a file for the cache
+	env = dict(os.environ)
+	env['LD_LIBRARY_PATH'] = "build" + (':' + env['LD_LIBRARY_PATH'] if env.get('LD_LIBRARY_PATH') else '')
+	stdout_name = config_name + ".stdout"
+	with open(stdout_name, "wb") as f:
+		proc = subprocess.Popen(["build/scratch/third", config_name], stdout=subprocess.PIPE, stderr=subprocess.STDOUT, env=env)
+		for line in iter(proc.stdout.readline, b''):
+			out.write(line)
+			f.write(line)
+		ret = proc.wait()
+	if ret == 0:
+		cache.store(key, config, stdout_name)
+	os.remove(stdout_name)
+	sys.exit(ret)
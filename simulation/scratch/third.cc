@@ -20,7 +20,12 @@
 #include <iostream>
 #include <fstream>
 #include <unordered_map>
+#include <set>
 #include <time.h> 
+#include <sstream>
+#include <unistd.h>
+#include <fcntl.h>
+#include <sys/wait.h>
 #include "ns3/core-module.h"
 #include "ns3/qbb-helper.h"
 #include "ns3/point-to-point-helper.h"
@@ -34,8 +39,10 @@
 #include <ns3/rdma-client.h>
 #include <ns3/rdma-client-helper.h>
 #include <ns3/rdma-driver.h>
+#include <ns3/rdma-cc.h>
 #include <ns3/switch-node.h>
 #include <ns3/sim-setting.h>
+#include <ns3/mpi-interface.h>
 
 using namespace ns3;
 using namespace std;
@@ -71,17 +78,29 @@ uint32_t int_multi = 1;
 bool rate_bound = true;
 
 uint32_t ack_high_prio = 0;
-uint64_t link_down_time = 0;
-uint32_t link_down_A = 0, link_down_B = 0;
+struct LinkEvent{
+	uint64_t time; // us after 2s
+	bool up; // bring the link up, or take it down
+	uint32_t a, b;
+};
+vector<LinkEvent> link_events;
 
 uint32_t enable_trace = 1;
 
 uint32_t buffer_size = 16;
 
+string mmu_policy = "dt";
+map<uint32_t, double> mmu_alpha; // by qIndex, 1 if not set
+uint32_t mmu_static_threshold = 100; // KB
+uint32_t mmu_egress_pool = 0; // MB, 0 for buffer_size
+
 uint32_t qlen_dump_interval = 100000000, qlen_mon_interval = 100;
 uint64_t qlen_mon_start = 2000000000, qlen_mon_end = 2100000000;
 string qlen_mon_file;
 
+string drop_summary_file;
+uint32_t drop_ring_size = 0;
+
 unordered_map<uint64_t, uint32_t> rate2kmax, rate2kmin;
 unordered_map<uint64_t, double> rate2pmax;
 
@@ -89,13 +108,86 @@ double poseidon_para_m = 0.25;
 double poseidon_min_rate = 0.1 * 1000000000.0;
 double poseidon_max_rate = 100 * 1000000000.0;
 
+uint32_t rng_seed = 1;
+
+string cc_trace_file;
+uint32_t cc_trace_interval = 250;
+
+string scheduler_type = "ns3::MapScheduler";
+bool event_pool = false;
+bool packet_pool = false;
+string event_trace_file;
+
+string partition_by = "none";
+uint32_t threads = 0;
+
+/*
+ * Checkpoint (CHECKPOINT_TIME): the run stops at that time, and forks a process that resumes from its
+ * state (topology, routes, qps, switch buffers, pending events) for the config, and one per FORK_VARIANT,
+ * with its own values of some RdmaHw parameters, that writes its outputs to <output file>.<variant name>,
+ * which start with what the run wrote up to the checkpoint. At most one process per CPU runs at once.
+ */
+double checkpoint_time = 0;
+struct ForkVariant{
+	string name;
+	vector<pair<string, string> > params; // config key, value
+};
+vector<ForkVariant> fork_variants;
+
+// the config keys that a FORK_VARIANT may change, and their RdmaHw attribute
+const char *fork_keys[][2] = {
+	{"POSEIDON_M", "PoseidonParaM"},
+	{"POSEIDON_MIN_RATE", "PoseidonMinRate"},
+	{"POSEIDON_MAX_RATE", "PoseidonMaxRate"},
+	{"U_TARGET", "TargetUtil"},
+	{"MI_THRESH", "MiThresh"},
+	{"FAST_REACT", "FastReact"},
+	{"SAMPLE_FEEDBACK", "SampleFeedback"},
+	{"MULTI_RATE", "MultiRate"},
+	{"RATE_BOUND", "RateBound"},
+	{"VAR_WIN", "VarWin"},
+	{"EWMA_GAIN", "EwmaGain"},
+	{"RATE_AI", "RateAI"},
+	{"RATE_HAI", "RateHAI"},
+	{"MIN_RATE", "MinRate"},
+	{"DCTCP_RATE_AI", "DctcpRateAI"},
+	{"RATE_DECREASE_INTERVAL", "RateDecreaseInterval"},
+	{"ALPHA_RESUME_INTERVAL", "AlphaResumInterval"},
+	{"RP_TIMER", "RPTimer"},
+	{"FAST_RECOVERY_TIMES", "FastRecoveryTimes"},
+	{"CLAMP_TARGET_RATE", "ClampTargetRate"},
+};
+const char* fork_key_attribute(const string &key){
+	for (uint32_t i = 0; i < sizeof(fork_keys) / sizeof(fork_keys[0]); i++)
+		if (key == fork_keys[i][0])
+			return fork_keys[i][1];
+	return NULL;
+}
+
 /************************************************
  * Runtime varibles
  ***********************************************/
-std::ifstream topof, flowf, tracef;
+std::ifstream topof, tracef;
 
 NodeContainer n;
 
+/*
+ * Partitioned run (PARTITION rack or pod): the nodes are split among the MPI ranks, each rank runs
+ * the events of its nodes, and the packets of the links between ranks go through QbbRemoteChannel.
+ * The simultaneous events run in the order of ContextEventOrder, which does not depend on the split,
+ * so each node runs the same events in the same order with any number of ranks, and the outputs,
+ * merged by rank 0 after the run, are the same as those of the run without PARTITION, whose
+ * DefaultSimulatorImpl runs the simultaneous events in that order too (ContextOrder).
+ * With THREADS, the nodes are split the same way among the threads of a ParallelSimulatorImpl in a
+ * single process instead.
+ */
+bool partitioned = false;
+uint32_t rank_id = 0, rank_num = 1;
+vector<uint32_t> node_rank; // the rank that runs each node
+uint32_t part_num = 1; // the number of ranks, or of threads
+vector<uint32_t> node_system; // the system id of each node: its rank, or its thread
+uint32_t output_sub = 0; // orders the outputs of an event on several ranks, see monitor_buffer
+
 uint64_t nic_rate;
 
 uint64_t maxRtt, maxBdp;
@@ -108,14 +200,31 @@ struct Interface{
 
 	Interface() : idx(0), up(false){}
 };
-map<Ptr<Node>, map<Ptr<Node>, Interface> > nbr2if;
-// Mapping destination to next hop for each node: <node, <dest, <nexthop0, ...> > >
-map<Ptr<Node>, map<Ptr<Node>, vector<Ptr<Node> > > > nextHop;
-map<Ptr<Node>, map<Ptr<Node>, uint64_t> > pairDelay;
-map<Ptr<Node>, map<Ptr<Node>, uint64_t> > pairTxDelay;
-map<uint32_t, map<uint32_t, uint64_t> > pairBw;
-map<Ptr<Node>, map<Ptr<Node>, uint64_t> > pairBdp;
-map<uint32_t, map<uint32_t, uint64_t> > pairRtt;
+// nbr2if[a][b]: the interface of node a to its neighbor b, by node id
+vector<map<uint32_t, Interface> > nbr2if;
+
+/*
+ * Routes are computed over node ids, with one BFS per root instead of one per host:
+ * the BFS from a host with a single link to a switch (its ToR) is the BFS from that switch
+ * plus the first hop, so all hosts of a ToR share it. Other hosts are roots themselves.
+ */
+struct PathInfo{
+	int dis; // hops, -1 if unreachable
+	uint64_t delay, txDelay, bw;
+};
+vector<uint32_t> host_root; // node id -> the root of the host
+vector<int> root_idx; // node id -> index in roots, -1 if not a root
+vector<uint32_t> roots;
+vector<vector<uint32_t> > root_hosts; // hosts of each root
+vector<int> root_dis; // [b * node_num + x]: the hops from roots[b] to node x, -1 if unreachable
+vector<uint32_t> root_pos; // same index, the position of switch x in the BFS queue from roots[b]
+vector<PathInfo> root_path; // [a * roots.size() + b]: the BFS from roots[b], seen at roots[a]
+vector<vector<uint32_t> > root_nexthop; // same index, the next hops of roots[a] toward roots[b], only for host roots[a]
+vector<set<uint32_t> > host_route; // host_route[i]: the hosts that host i needs a routing entry for
+PathInfo GetPath(uint32_t i, uint32_t j);
+uint64_t GetPairRtt(uint32_t i, uint32_t j);
+uint64_t GetPairBdp(uint32_t i, uint32_t j);
+void AddHostRoute(uint32_t src, uint32_t dst);
 
 std::vector<Ipv4Address> serverAddress;
 
@@ -123,25 +232,129 @@ std::vector<Ipv4Address> serverAddress;
 std::unordered_map<uint32_t, unordered_map<uint32_t, uint16_t> > portNumder;
 
 struct FlowInput{
-	uint32_t src, dst, pg, maxPacketCount, port, dport;
-	double start_time;
+	uint32_t src, dst, pg, dport;
+	uint64_t size; // bytes
+	uint64_t start; // ns
 	uint32_t idx;
 };
 FlowInput flow_input = {0};
 uint32_t flow_num;
 
+/*
+ * Buffered reader of FLOW_FILE, which is read as the simulation goes. The file is either text:
+ *	<number of flows>
+ *	<src> <dst> <pg> <dport> <size (B)> <start time (s)>	(one line per flow)
+ * or binary: a FlowFileHeader, then the FlowFormat records (see trace-format.h).
+ * Flows must be in order of start time.
+ */
+struct FlowReader{
+	static const size_t bufSize = 1 << 20;
+	FILE *f;
+	bool binary;
+	std::vector<char> buf;
+	size_t pos, len;
+
+	FlowReader() : f(NULL), binary(false), pos(0), len(0) {}
+
+	// make sure the buffer has at least 'need' bytes from pos, unless the file ends
+	void Fill(size_t need){
+		if (len - pos >= need || f == NULL)
+			return;
+		memmove(&buf[0], &buf[pos], len - pos);
+		len -= pos;
+		pos = 0;
+		len += fread(&buf[len], 1, bufSize - len, f);
+		buf[len] = 0;
+	}
+	// open the file, return the number of flows
+	uint32_t Open(const char *path){
+		f = fopen(path, "rb");
+		NS_ASSERT_MSG(f != NULL, "Cannot open FLOW_FILE");
+		buf.resize(bufSize + 1);
+		pos = len = 0;
+		Fill(sizeof(FlowFileHeader));
+		FlowFileHeader h;
+		binary = false;
+		if (len >= sizeof(h)){
+			memcpy(&h, &buf[0], sizeof(h));
+			binary = h.magic == FlowFileHeader::MAGIC;
+		}
+		if (binary){
+			pos += sizeof(h);
+			return h.nFlow;
+		}
+		return ReadUint();
+	}
+	uint64_t ReadUint(){
+		char *end;
+		uint64_t v = strtoull(&buf[pos], &end, 10);
+		pos = end - &buf[0];
+		return v;
+	}
+	// read the next flow
+	void Read(FlowInput &in){
+		if (binary){
+			FlowFormat r;
+			Fill(sizeof(r));
+			NS_ASSERT_MSG(len - pos >= sizeof(r), "FLOW_FILE ends before all flows are read");
+			memcpy(&r, &buf[pos], sizeof(r));
+			pos += sizeof(r);
+			in.src = r.src;
+			in.dst = r.dst;
+			in.pg = r.pg;
+			in.dport = r.dport;
+			in.size = r.size;
+			in.start = r.start;
+		}else {
+			Fill(1024); // much longer than a line
+			in.src = ReadUint();
+			in.dst = ReadUint();
+			in.pg = ReadUint();
+			in.dport = ReadUint();
+			in.size = ReadUint();
+			char *end;
+			in.start = Seconds(strtod(&buf[pos], &end)).GetNanoSeconds();
+			pos = end - &buf[0];
+		}
+	}
+	void Close(){
+		if (f != NULL)
+			fclose(f);
+		f = NULL;
+		std::vector<char>().swap(buf);
+	}
+};
+FlowReader flowf;
+
 void ReadFlowInput(){
 	if (flow_input.idx < flow_num){
-		flowf >> flow_input.src >> flow_input.dst >> flow_input.pg >> flow_input.dport >> flow_input.maxPacketCount >> flow_input.start_time;
+		uint64_t last = flow_input.start;
+		flowf.Read(flow_input);
 		NS_ASSERT(n.Get(flow_input.src)->GetNodeType() == 0 && n.Get(flow_input.dst)->GetNodeType() == 0);
+		NS_ASSERT_MSG(flow_input.start >= last, "Flows in FLOW_FILE must be in order of start time");
 	}
 }
+
+// start a flow by adding its qp to the sender's RdmaHw directly, no Application is needed
+void StartFlow(FlowInput f, uint16_t port){
+	// every rank schedules the flows, the rank of the sender starts them
+	if (node_rank[f.src] != rank_id)
+		return;
+	Ptr<RdmaHw> rdma = n.Get(f.src)->GetObject<RdmaDriver>()->m_rdma;
+	uint32_t win = has_win ? (global_t == 1 ? maxBdp : GetPairBdp(f.src, f.dst)) : 0;
+	uint64_t baseRtt = global_t == 1 ? maxRtt : GetPairRtt(f.src, f.dst);
+	rdma->AddQueuePair(f.size, f.pg, serverAddress[f.src], serverAddress[f.dst], port, f.dport, win, baseRtt, Callback<void>());
+}
+
+// start all flows of the current time, then schedule itself at the start time of the next flow
 void ScheduleFlowInputs(){
-	while (flow_input.idx < flow_num && Seconds(flow_input.start_time) == Simulator::Now()){
-		uint32_t port = portNumder[flow_input.src][flow_input.dst]++; // get a new port number 
-		RdmaClientHelper clientHelper(flow_input.pg, serverAddress[flow_input.src], serverAddress[flow_input.dst], port, flow_input.dport, flow_input.maxPacketCount, has_win?(global_t==1?maxBdp:pairBdp[n.Get(flow_input.src)][n.Get(flow_input.dst)]):0, global_t==1?maxRtt:pairRtt[flow_input.src][flow_input.dst]);
-		ApplicationContainer appCon = clientHelper.Install(n.Get(flow_input.src));
-		appCon.Start(Time(0));
+	while (flow_input.idx < flow_num && NanoSeconds(flow_input.start) == Simulator::Now()){
+		auto port_it = portNumder[flow_input.src].insert(make_pair(flow_input.dst, 10000)).first; // each host pair use port number from 10000
+		uint32_t port = port_it->second++; // get a new port number 
+		// routes of the hosts are only installed for the pairs in use
+		AddHostRoute(flow_input.src, flow_input.dst);
+		AddHostRoute(flow_input.dst, flow_input.src);
+		Simulator::ScheduleWithContext(flow_input.src, Time(0), &StartFlow, flow_input, port);
 
 		// get the next flow input
 		flow_input.idx++;
@@ -150,9 +363,9 @@ void ScheduleFlowInputs(){
 
 	// schedule the next time to run this function
 	if (flow_input.idx < flow_num){
-		Simulator::Schedule(Seconds(flow_input.start_time)-Simulator::Now(), ScheduleFlowInputs);
+		Simulator::Schedule(NanoSeconds(flow_input.start)-Simulator::Now(), ScheduleFlowInputs);
 	}else { // no more flows, close the file
-		flowf.close();
+		flowf.Close();
 	}
 }
 
@@ -166,169 +379,358 @@ uint32_t ip_to_node_id(Ipv4Address ip){
 
 void qp_finish(FILE* fout, Ptr<RdmaQueuePair> q){
 	uint32_t sid = ip_to_node_id(q->sip), did = ip_to_node_id(q->dip);
-	uint64_t base_rtt = pairRtt[sid][did], b = pairBw[sid][did];
+	uint64_t base_rtt = GetPairRtt(sid, did), b = GetPath(sid, did).bw;
 	uint32_t total_bytes = q->m_size + ((q->m_size-1) / packet_payload_size + 1) * (CustomHeader::GetStaticWholeHeaderSize() - IntHeader::GetStaticSize()); // translate to the minimum bytes required (with header but no INT)
 	uint64_t standalone_fct = base_rtt + total_bytes * 8000000000lu / b;
 	// sip, dip, sport, dport, size (B), start_time, fct (ns), standalone_fct (ns)
 	fprintf(fout, "%08x %08x %u %u %lu %lu %lu %lu\n", q->sip.Get(), q->dip.Get(), q->sport, q->dport, q->m_size, q->startTime.GetTimeStep(), (Simulator::Now() - q->startTime).GetTimeStep(), standalone_fct);
 	fflush(fout);
+	// the receiver reclaims its rxQp by itself when it has all the data
+}
 
-	// remove rxQp from the receiver
-	Ptr<Node> dstNode = n.Get(did);
-	Ptr<RdmaDriver> rdma = dstNode->GetObject<RdmaDriver> ();
-	rdma->m_rdma->DeleteRxQp(q->sip.Get(), q->m_pg, q->sport);
+void cc_trace(FILE* fout, const CcTraceFormat &tr){
+	fwrite(&tr, sizeof(tr), 1, fout);
 }
 
 void get_pfc(FILE* fout, Ptr<QbbNetDevice> dev, uint32_t type){
 	fprintf(fout, "%lu %u %u %u %u\n", Simulator::Now().GetTimeStep(), dev->GetNode()->GetId(), dev->GetNode()->GetNodeType(), dev->GetIfIndex(), type);
 }
 
-struct QlenDistribution{
-	vector<uint32_t> cnt; // cnt[i] is the number of times that the queue len is i KB
-
-	void add(uint32_t qlen){
-		uint32_t kb = qlen / 1000;
-		if (cnt.size() < kb+1)
-			cnt.resize(kb+1);
-		cnt[kb]++;
-	}
-};
-map<uint32_t, map<uint32_t, QlenDistribution> > queue_result;
+/*
+ * The qlen output: every qlen_dump_interval, the distributions of the queue length of the ports of the switches,
+ * which the SwitchMmu of each switch counts as if it sampled its ports every qlen_mon_interval ns from qlen_mon_start
+ * to qlen_mon_end, but only does when a queue length changes.
+ */
+// the first dump time from t on, which is a sampling time, 0 if none
+uint64_t next_qlen_dump(uint64_t t){
+	uint64_t last = qlen_mon_end > qlen_mon_start ? qlen_mon_start + (qlen_mon_end - qlen_mon_start + qlen_mon_interval - 1) / qlen_mon_interval * qlen_mon_interval : qlen_mon_start;
+	t = std::max(t, qlen_mon_start);
+	for (t = (t + qlen_dump_interval - 1) / qlen_dump_interval * qlen_dump_interval; t <= last; t += qlen_dump_interval)
+		if ((t - qlen_mon_start) % qlen_mon_interval == 0)
+			return t;
+	return 0;
+}
 void monitor_buffer(FILE* qlen_output, NodeContainer *n){
+	if (rank_id == 0)
+		fprintf(qlen_output, "time: %lu\n", Simulator::Now().GetTimeStep());
 	for (uint32_t i = 0; i < n->GetN(); i++){
-		if (n->Get(i)->GetNodeType() == 1){ // is switch
+		if (n->Get(i)->GetNodeType() == 1 && node_rank[i] == rank_id){ // is switch of this rank
 			Ptr<SwitchNode> sw = DynamicCast<SwitchNode>(n->Get(i));
-			if (queue_result.find(i) == queue_result.end())
-				queue_result[i];
+			// the switches of all ranks are merged in order of id
+			output_sub = i + 1;
 			for (uint32_t j = 1; j < sw->GetNDevices(); j++){
-				uint32_t size = 0;
-				for (uint32_t k = 0; k < SwitchMmu::qCnt; k++)
-					size += sw->m_mmu->egress_bytes[j][k];
-				queue_result[i][j].add(size);
+				const vector<uint32_t> &dist = sw->m_mmu->GetQlenDistribution(j);
+				fprintf(qlen_output, "%u %u", i, j);
+				for (uint32_t k = 0; k < dist.size(); k++)
+					fprintf(qlen_output, " %u", dist[k]);
+				fprintf(qlen_output, "\n");
 			}
 		}
 	}
-	if (Simulator::Now().GetTimeStep() % qlen_dump_interval == 0){
-		fprintf(qlen_output, "time: %lu\n", Simulator::Now().GetTimeStep());
-		for (auto &it0 : queue_result)
-			for (auto &it1 : it0.second){
-				fprintf(qlen_output, "%u %u", it0.first, it1.first);
-				auto &dist = it1.second.cnt;
-				for (uint32_t i = 0; i < dist.size(); i++)
-					fprintf(qlen_output, " %u", dist[i]);
-				fprintf(qlen_output, "\n");
-			}
-		fflush(qlen_output);
+	output_sub = 0;
+	fflush(qlen_output);
+	uint64_t next = next_qlen_dump(Simulator::Now().GetTimeStep() + 1);
+	if (next > 0)
+		Simulator::Schedule(NanoSeconds(next) - Simulator::Now(), &monitor_buffer, qlen_output, n);
+}
+
+// the drops of the switches at the end of the run, see DropSummaryHeader
+void drop_summary(FILE* drop_output, NodeContainer *n){
+	for (uint32_t i = 0; i < n->GetN(); i++){
+		if (n->Get(i)->GetNodeType() == 1 && node_rank[i] == rank_id){ // is switch of this rank
+			Ptr<SwitchNode> sw = DynamicCast<SwitchNode>(n->Get(i));
+			output_sub = i + 1;
+			sw->m_mmu->SerializeDrops(drop_output);
+		}
 	}
-	if (Simulator::Now().GetTimeStep() < qlen_mon_end)
-		Simulator::Schedule(NanoSeconds(qlen_mon_interval), &monitor_buffer, qlen_output, n);
+	output_sub = 0;
+	fflush(drop_output);
 }
 
-void CalculateRoute(Ptr<Node> host){
-	// queue for the BFS.
-	vector<Ptr<Node> > q;
-	// Distance from the host to each node.
-	map<Ptr<Node>, int> dis;
-	map<Ptr<Node>, uint64_t> delay;
-	map<Ptr<Node>, uint64_t> txDelay;
-	map<Ptr<Node>, uint64_t> bw;
-	// init BFS.
-	q.push_back(host);
-	dis[host] = 0;
-	delay[host] = 0;
-	txDelay[host] = 0;
-	bw[host] = 0xfffffffffffffffflu;
-	// BFS.
-	for (int i = 0; i < (int)q.size(); i++){
-		Ptr<Node> now = q[i];
-		int d = dis[now];
-		for (auto it = nbr2if[now].begin(); it != nbr2if[now].end(); it++){
+// BFS from root, fill the path info of the nodes reached, and the position of the switches in the BFS queue
+void CalculateRoute(uint32_t root, vector<PathInfo> &info, vector<uint32_t> &q, vector<uint32_t> &pos){
+	for (uint32_t i = 0; i < q.size(); i++)
+		info[q[i]].dis = -1;
+	// queue for the BFS, it ends with the hosts reached (which are not enqueued for the BFS itself)
+	q.clear();
+	q.push_back(root);
+	info[root].dis = 0;
+	info[root].delay = 0;
+	info[root].txDelay = 0;
+	info[root].bw = 0xfffffffffffffffflu;
+	uint32_t nq = 1; // number of nodes enqueued for the BFS
+	for (uint32_t i = 0; i < nq; i++){
+		uint32_t now = q[i];
+		pos[now] = i;
+		for (auto &it : nbr2if[now]){
 			// skip down link
-			if (!it->second.up)
+			if (!it.second.up)
 				continue;
-			Ptr<Node> next = it->first;
+			uint32_t next = it.first;
 			// If 'next' have not been visited.
-			if (dis.find(next) == dis.end()){
-				dis[next] = d + 1;
-				delay[next] = delay[now] + it->second.delay;
-				txDelay[next] = txDelay[now] + packet_payload_size * 1000000000lu * 8 / it->second.bw;
-				bw[next] = std::min(bw[now], it->second.bw);
+			if (info[next].dis < 0){
+				info[next].dis = info[now].dis + 1;
+				info[next].delay = info[now].delay + it.second.delay;
+				info[next].txDelay = info[now].txDelay + packet_payload_size * 1000000000lu * 8 / it.second.bw;
+				info[next].bw = std::min(info[now].bw, it.second.bw);
 				// we only enqueue switch, because we do not want packets to go through host as middle point
-				if (next->GetNodeType() == 1)
-					q.push_back(next);
+				q.push_back(next);
+				if (n.Get(next)->GetNodeType() == 1)
+					std::swap(q[nq++], q.back());
 			}
-			// if 'now' is on the shortest path from 'next' to 'host'.
-			if (d + 1 == dis[next]){
-				nextHop[next][host].push_back(now);
+		}
+	}
+}
+
+// the next hops of a node toward the root of a BFS, in the order of the BFS queue
+void GetNextHops(uint32_t node, const int *dis, const uint32_t *pos, vector<uint32_t> &nexts){
+	nexts.clear();
+	for (auto &it : nbr2if[node]){
+		uint32_t prev = it.first;
+		// 'prev' is on the shortest path from 'node' to the root, and is the root or a switch
+		if (it.second.up && dis[prev] >= 0 && dis[prev] + 1 == dis[node] && (dis[prev] == 0 || n.Get(prev)->GetNodeType() == 1))
+			nexts.push_back(prev);
+	}
+	std::sort(nexts.begin(), nexts.end(), [pos](uint32_t a, uint32_t b){ return pos[a] < pos[b]; });
+}
+
+// find the root of each host
+void FindRoots(NodeContainer &n){
+	uint32_t node_num = n.GetN();
+	host_root.assign(node_num, 0);
+	root_idx.assign(node_num, -1);
+	roots.clear();
+	root_hosts.clear();
+	for (uint32_t i = 0; i < node_num; i++){
+		if (n.Get(i)->GetNodeType() != 0)
+			continue;
+		uint32_t nup = 0, nbr = 0;
+		for (auto &it : nbr2if[i]) if (it.second.up){
+			nup++;
+			nbr = it.first;
+		}
+		host_root[i] = (nup == 1 && n.Get(nbr)->GetNodeType() == 1) ? nbr : i;
+	}
+	for (uint32_t i = 0; i < node_num; i++){
+		if (n.Get(i)->GetNodeType() != 0)
+			continue;
+		uint32_t r = host_root[i];
+		if (root_idx[r] < 0){
+			root_idx[r] = roots.size();
+			roots.push_back(r);
+			root_hosts.push_back(vector<uint32_t>());
+		}
+		root_hosts[root_idx[r]].push_back(i);
+	}
+	uint32_t nr = roots.size();
+	root_dis.assign(nr * node_num, -1);
+	root_pos.assign(nr * node_num, 0);
+	root_path.assign(nr * nr, PathInfo());
+	root_nexthop.assign(nr * nr, vector<uint32_t>());
+}
+
+// set the routing entries of switch node toward the hosts of roots[b], from the BFS from roots[b]
+void SetSwitchRoute(uint32_t node, uint32_t b, vector<uint32_t> &nexts){
+	uint32_t node_num = n.GetN();
+	vector<int> intfs;
+	if (root_dis[b * node_num + node] >= 0){
+		GetNextHops(node, &root_dis[b * node_num], &root_pos[b * node_num], nexts);
+		for (uint32_t next : nexts)
+			intfs.push_back(nbr2if[node][next].idx);
+	}
+	Ptr<SwitchNode> sw = DynamicCast<SwitchNode>(n.Get(node));
+	for (uint32_t dst : root_hosts[b])
+		sw->SetTableEntry(serverAddress[dst], intfs);
+}
+
+// BFS from roots[b], and set the routing entries of all switches toward the hosts of roots[b]
+void UpdateRoot(uint32_t b, vector<PathInfo> &info, vector<uint32_t> &q, vector<uint32_t> &pos){
+	uint32_t node_num = n.GetN(), nr = roots.size();
+	uint32_t root = roots[b];
+	CalculateRoute(root, info, q, pos);
+	int *dis = &root_dis[b * node_num];
+	uint32_t *p = &root_pos[b * node_num];
+	for (uint32_t i = 0; i < node_num; i++){
+		dis[i] = info[i].dis;
+		p[i] = pos[i];
+	}
+	for (uint32_t a = 0; a < nr; a++){
+		root_path[a * nr + b] = info[roots[a]];
+		root_nexthop[a * nr + b].clear();
+		if (n.Get(roots[a])->GetNodeType() == 0 && roots[a] != root && dis[roots[a]] >= 0){
+			GetNextHops(roots[a], dis, p, root_nexthop[a * nr + b]);
+		}
+	}
+	vector<uint32_t> nexts;
+	vector<int> intfs;
+	for (uint32_t node = 0; node < node_num; node++){
+		if (n.Get(node)->GetNodeType() != 1)
+			continue;
+		if (node == root){ // the ToR of the hosts
+			Ptr<SwitchNode> sw = DynamicCast<SwitchNode>(n.Get(node));
+			for (uint32_t dst : root_hosts[b]){
+				intfs.assign(1, nbr2if[node][dst].idx);
+				sw->SetTableEntry(serverAddress[dst], intfs);
 			}
+			continue;
 		}
+		SetSwitchRoute(node, b, nexts);
 	}
-	for (auto it : delay)
-		pairDelay[it.first][host] = it.second;
-	for (auto it : txDelay)
-		pairTxDelay[it.first][host] = it.second;
-	for (auto it : bw)
-		pairBw[it.first->GetId()][host->GetId()] = it.second;
 }
 
 void CalculateRoutes(NodeContainer &n){
-	for (int i = 0; i < (int)n.GetN(); i++){
-		Ptr<Node> node = n.Get(i);
-		if (node->GetNodeType() == 0)
-			CalculateRoute(node);
+	FindRoots(n);
+	uint32_t node_num = n.GetN();
+	vector<PathInfo> info(node_num);
+	for (uint32_t i = 0; i < node_num; i++)
+		info[i].dis = -1;
+	vector<uint32_t> q, pos(node_num);
+	for (uint32_t b = 0; b < roots.size(); b++)
+		UpdateRoot(b, info, q, pos);
+}
+
+// the path from host i to host j, as seen by the BFS from j
+PathInfo GetPath(uint32_t i, uint32_t j){
+	PathInfo res = {0, 0, 0, 0xfffffffffffffffflu};
+	if (i == j)
+		return res;
+	uint32_t ri = host_root[i], rj = host_root[j];
+	res = root_path[root_idx[ri] * roots.size() + root_idx[rj]];
+	if (res.dis < 0){
+		res.dis = -1;
+		res.delay = res.txDelay = res.bw = 0;
+		return res;
+	}
+	if (rj != j){ // first hop, from j to its ToR
+		Interface &e = nbr2if[j][rj];
+		res.dis++;
+		res.delay += e.delay;
+		res.txDelay += packet_payload_size * 1000000000lu * 8 / e.bw;
+		res.bw = std::min(res.bw, e.bw);
+	}
+	if (ri != i){ // last hop, from the ToR of i to i
+		Interface &e = nbr2if[ri][i];
+		res.dis++;
+		res.delay += e.delay;
+		res.txDelay += packet_payload_size * 1000000000lu * 8 / e.bw;
+		res.bw = std::min(res.bw, e.bw);
+	}
+	return res;
+}
+
+uint64_t GetPairRtt(uint32_t i, uint32_t j){
+	PathInfo p = GetPath(i, j);
+	return p.delay * 2 + p.txDelay;
+}
+
+uint64_t GetPairBdp(uint32_t i, uint32_t j){
+	PathInfo p = GetPath(i, j);
+	uint64_t rtt = p.delay * 2 + p.txDelay;
+	return rtt * p.bw / 1000000000/8;
+}
+
+// set the routing entries of host src toward host dst, no entry if unreachable. Return if the entries changed
+bool SetHostRoute(uint32_t src, uint32_t dst){
+	Ptr<RdmaHw> rdma = n.Get(src)->GetObject<RdmaDriver>()->m_rdma;
+	uint32_t rs = host_root[src], rd = host_root[dst];
+	uint32_t a = root_idx[rs], b = root_idx[rd];
+	vector<int> intfs;
+	if (root_path[a * roots.size() + b].dis >= 0){
+		if (rs != src) // all through its ToR
+			intfs.push_back(nbr2if[src][rs].idx);
+		else
+			for (uint32_t next : root_nexthop[a * roots.size() + b])
+				intfs.push_back(nbr2if[src][next].idx);
 	}
+	uint32_t dip = serverAddress[dst].Get();
+	auto it = rdma->m_rtTable.find(dip);
+	if (intfs.empty()){
+		if (it == rdma->m_rtTable.end())
+			return false;
+		rdma->m_rtTable.erase(it);
+		return true;
+	}
+	if (it != rdma->m_rtTable.end() && it->second == intfs)
+		return false;
+	rdma->m_rtTable[dip] = intfs;
+	return true;
+}
+
+// set the routing entries of host src toward host dst, if not yet
+void AddHostRoute(uint32_t src, uint32_t dst){
+	if (src != dst && host_route[src].insert(dst).second)
+		SetHostRoute(src, dst);
 }
 
-void SetRoutingEntries(){
-	// For each node.
-	for (auto i = nextHop.begin(); i != nextHop.end(); i++){
-		Ptr<Node> node = i->first;
-		auto &table = i->second;
-		for (auto j = table.begin(); j != table.end(); j++){
-			// The destination node.
-			Ptr<Node> dst = j->first;
-			// The IP address of the dst.
-			Ipv4Address dstAddr = dst->GetObject<Ipv4>()->GetAddress(1, 0).GetLocal();
-			// The next hops towards the dst.
-			vector<Ptr<Node> > nexts = j->second;
-			for (int k = 0; k < (int)nexts.size(); k++){
-				Ptr<Node> next = nexts[k];
-				uint32_t interface = nbr2if[node][next].idx;
-				if (node->GetNodeType() == 1)
-					DynamicCast<SwitchNode>(node)->AddTableEntry(dstAddr, interface);
-				else{
-					node->GetObject<RdmaDriver>()->m_rdma->AddTableEntry(dstAddr, interface);
+/*
+ * Redo the routing after the link between a and b goes down or up.
+ * A BFS only changes if the link is (or becomes) an edge of its shortest-path DAG, i.e., the two
+ * ends are at different hops from the root. Even then, if the link is not the one through which the
+ * farther end was first reached, the BFS is the same except the next hops of the farther end, so only
+ * its entries are patched. Otherwise the BFS from that root is redone. A link of a host may change the
+ * roots, so redo all.
+ */
+void UpdateRoutes(uint32_t a, uint32_t b){
+	uint32_t node_num = n.GetN();
+	vector<bool> affected; // the roots whose BFS is redone
+	if (n.Get(a)->GetNodeType() == 0 || n.Get(b)->GetNodeType() == 0){
+		CalculateRoutes(n);
+		affected.assign(roots.size(), true);
+	}else {
+		affected.assign(roots.size(), false);
+		vector<PathInfo> info(node_num);
+		for (uint32_t i = 0; i < node_num; i++)
+			info[i].dis = -1;
+		vector<uint32_t> q, pos(node_num), nexts;
+		for (uint32_t r = 0; r < roots.size(); r++){
+			int da = root_dis[r * node_num + a], db = root_dis[r * node_num + b];
+			if (da == db) // not in the DAG, before or after
+				continue;
+			if (da >= 0 && db >= 0 && (da - db == 1 || db - da == 1)){
+				uint32_t u = da < db ? a : b, v = da < db ? b : a;
+				// with the link's new state, v is still first reached through a node before u in the BFS
+				GetNextHops(v, &root_dis[r * node_num], &root_pos[r * node_num], nexts);
+				if (nexts.size() > 0 && root_pos[r * node_num + nexts[0]] < root_pos[r * node_num + u]){
+					SetSwitchRoute(v, r, nexts);
+					continue;
 				}
 			}
+			affected[r] = true;
+			UpdateRoot(r, info, q, pos);
 		}
 	}
+
+	// reset the routing entries of the hosts, and redistribute qp on the hosts whose entries changed
+	for (uint32_t i = 0; i < node_num; i++){
+		if (n.Get(i)->GetNodeType() != 0)
+			continue;
+		bool changed = false;
+		for (uint32_t dst : host_route[i])
+			if (affected[root_idx[host_root[dst]]])
+				changed |= SetHostRoute(i, dst);
+		if (changed)
+			n.Get(i)->GetObject<RdmaDriver>()->m_rdma->RedistributeQp();
+	}
 }
 
 // take down the link between a and b, and redo the routing
-void TakeDownLink(NodeContainer n, Ptr<Node> a, Ptr<Node> b){
+void TakeDownLink(uint32_t a, uint32_t b){
 	if (!nbr2if[a][b].up)
 		return;
-	// take down link between a and b
 	nbr2if[a][b].up = nbr2if[b][a].up = false;
-	nextHop.clear();
-	CalculateRoutes(n);
-	// clear routing tables
-	for (uint32_t i = 0; i < n.GetN(); i++){
-		if (n.Get(i)->GetNodeType() == 1)
-			DynamicCast<SwitchNode>(n.Get(i))->ClearTable();
-		else
-			n.Get(i)->GetObject<RdmaDriver>()->m_rdma->ClearTable();
-	}
-	DynamicCast<QbbNetDevice>(a->GetDevice(nbr2if[a][b].idx))->TakeDown();
-	DynamicCast<QbbNetDevice>(b->GetDevice(nbr2if[b][a].idx))->TakeDown();
-	// reset routing table
-	SetRoutingEntries();
+	DynamicCast<QbbNetDevice>(n.Get(a)->GetDevice(nbr2if[a][b].idx))->TakeDown();
+	DynamicCast<QbbNetDevice>(n.Get(b)->GetDevice(nbr2if[b][a].idx))->TakeDown();
+	UpdateRoutes(a, b);
+}
 
-	// redistribute qp on each host
-	for (uint32_t i = 0; i < n.GetN(); i++){
-		if (n.Get(i)->GetNodeType() == 0)
-			n.Get(i)->GetObject<RdmaDriver>()->m_rdma->RedistributeQp();
-	}
+// bring the link between a and b back up, and redo the routing
+void BringUpLink(uint32_t a, uint32_t b){
+	if (nbr2if[a][b].up)
+		return;
+	nbr2if[a][b].up = nbr2if[b][a].up = true;
+	DynamicCast<QbbNetDevice>(n.Get(a)->GetDevice(nbr2if[a][b].idx))->TakeUp();
+	DynamicCast<QbbNetDevice>(n.Get(b)->GetDevice(nbr2if[b][a].idx))->TakeUp();
+	UpdateRoutes(a, b);
 }
 
 uint64_t get_nic_rate(NodeContainer &n){
@@ -337,6 +739,307 @@ uint64_t get_nic_rate(NodeContainer &n){
 			return DynamicCast<QbbNetDevice>(n.Get(i)->GetDevice(1))->GetDataRate().GetBitRate();
 }
 
+struct TopoLink{
+	uint32_t src, dst;
+	std::string data_rate, link_delay;
+	double error_rate;
+};
+
+/*
+ * Split the nodes among part_num ranks or threads for PARTITION, into node_system. A rack is a ToR (a switch linked to hosts) and its
+ * hosts; a pod also has the other switches linked to its ToRs, and the racks that share them. The racks
+ * or pods are given to the parts in order of node id, by blocks of about the same number of hosts, and
+ * the switches out of any of them (the core) are given to the parts in turn.
+ */
+void PartitionNodes(const vector<uint32_t> &node_type, const vector<TopoLink> &links){
+	uint32_t node_num = node_type.size();
+	vector<uint32_t> group(node_num);
+	for (uint32_t i = 0; i < node_num; i++)
+		group[i] = i;
+	auto find = [&group](uint32_t x){
+		while (group[x] != x)
+			x = group[x] = group[group[x]];
+		return x;
+	};
+	auto unite = [&group, &find](uint32_t a, uint32_t b){
+		a = find(a), b = find(b);
+		group[std::max(a, b)] = std::min(a, b);
+	};
+	vector<bool> tor(node_num, false);
+	for (const TopoLink &l : links){
+		if (node_type[l.src] != node_type[l.dst]){
+			unite(l.src, l.dst);
+			tor[node_type[l.src] == 1 ? l.src : l.dst] = true;
+		}
+	}
+	if (partition_by == "pod"){
+		for (const TopoLink &l : links)
+			if (node_type[l.src] == 1 && node_type[l.dst] == 1 && tor[l.src] != tor[l.dst])
+				unite(l.src, l.dst);
+	}
+
+	// the groups are numbered by their lowest node id, which is their root
+	vector<uint32_t> hosts(node_num, 0);
+	uint32_t host_num = 0;
+	for (uint32_t i = 0; i < node_num; i++)
+		if (node_type[i] == 0){
+			hosts[find(i)]++;
+			host_num++;
+		}
+	node_system.assign(node_num, 0);
+	uint32_t before = 0, core = 0;
+	for (uint32_t i = 0; i < node_num; i++){
+		uint32_t g = find(i);
+		if (g == i){
+			if (hosts[i] > 0){
+				node_system[i] = (uint64_t)before * part_num / host_num;
+				before += hosts[i];
+			}else
+				node_system[i] = core++ % part_num;
+		}else
+			node_system[i] = node_system[g];
+	}
+}
+
+/*
+ * The outputs of a run with several ranks or threads: each one writes the outputs of its events to
+ * <name>.part<system id>, as chunks headed by the time and uid of the event that wrote them, and rank 0 merges
+ * the parts in order of the chunk headers, which is the order of the events in the run without mpirun.
+ */
+struct OutputChunkHeader{
+	uint64_t ts, uid;
+	uint32_t sub, size;
+
+	bool operator<(const OutputChunkHeader &o) const{
+		if (ts != o.ts)
+			return ts < o.ts;
+		if (uid != o.uid)
+			return uid < o.uid;
+		return sub < o.sub;
+	}
+};
+struct PartOutput{
+	string name;
+	// by system id, only the one of this rank with MPI
+	vector<FILE*> part;
+	vector<OutputChunkHeader> head; // of the chunk in data, which is written when the next chunk starts
+	vector<vector<char> > data;
+
+	void WriteChunk(uint32_t k){
+		if (data[k].empty())
+			return;
+		head[k].size = data[k].size();
+		fwrite(&head[k], sizeof(head[k]), 1, part[k]);
+		fwrite(&data[k][0], 1, data[k].size(), part[k]);
+		data[k].clear();
+	}
+};
+vector<PartOutput*> part_outputs;
+
+ssize_t part_output_write(void *cookie, const char *buf, size_t size){
+	PartOutput *o = (PartOutput*)cookie;
+	uint32_t k = Simulator::GetSystemId();
+	NS_ASSERT_MSG(o->part[k] != NULL, "Output after the end of the run");
+	OutputChunkHeader h;
+	h.ts = Simulator::Now().GetTimeStep();
+	h.uid = Simulator::GetEventUid();
+	h.sub = output_sub;
+	if (o->data[k].empty() || o->head[k] < h || h < o->head[k]){
+		o->WriteChunk(k);
+		o->head[k] = h;
+	}
+	o->data[k].insert(o->data[k].end(), buf, buf + size);
+	return size;
+}
+
+// open an output file, which is made of parts for merge_outputs with several ranks or threads
+FILE* open_output(const string &name){
+	if (part_num == 1)
+		return fopen(name.c_str(), "w");
+	PartOutput *o = new PartOutput;
+	o->name = name;
+	o->part.assign(part_num, NULL);
+	o->head.resize(part_num);
+	o->data.resize(part_num);
+	for (uint32_t k = 0; k < part_num; k++){
+		if (rank_num > 1 && k != rank_id)
+			continue;
+		o->part[k] = fopen((name + ".part" + to_string(k)).c_str(), "wb");
+		NS_ASSERT_MSG(o->part[k] != NULL, "Cannot open " << name << ".part" << k);
+	}
+	part_outputs.push_back(o);
+	cookie_io_functions_t io = {NULL, part_output_write, NULL, NULL};
+	FILE *f = fopencookie(o, "w", io);
+	// no buffer, so that the outputs reach part_output_write in the event that writes them
+	setvbuf(f, NULL, _IONBF, 0);
+	return f;
+}
+
+// after the run, end the parts of all ranks or threads, and merge them on rank 0
+void merge_outputs(){
+	for (PartOutput *o : part_outputs)
+		for (uint32_t k = 0; k < part_num; k++)
+			if (o->part[k] != NULL){
+				o->WriteChunk(k);
+				fclose(o->part[k]);
+				o->part[k] = NULL;
+			}
+	if (rank_num > 1)
+		MpiInterface::Barrier();
+	if (rank_id != 0)
+		return;
+	for (PartOutput *o : part_outputs){
+		vector<FILE*> parts(part_num);
+		vector<OutputChunkHeader> head(part_num);
+		vector<bool> more(part_num);
+		for (uint32_t r = 0; r < part_num; r++){
+			parts[r] = fopen((o->name + ".part" + to_string(r)).c_str(), "rb");
+			NS_ASSERT_MSG(parts[r] != NULL, "Cannot open " << o->name << ".part" << r);
+			more[r] = fread(&head[r], sizeof(head[r]), 1, parts[r]) == 1;
+		}
+		FILE *out = fopen(o->name.c_str(), "wb");
+		vector<char> buf;
+		while (true){
+			int next = -1;
+			for (uint32_t r = 0; r < part_num; r++)
+				if (more[r] && (next < 0 || head[r] < head[next]))
+					next = r;
+			if (next < 0)
+				break;
+			buf.resize(head[next].size);
+			fread(&buf[0], 1, buf.size(), parts[next]);
+			fwrite(&buf[0], 1, buf.size(), out);
+			more[next] = fread(&head[next], sizeof(head[next]), 1, parts[next]) == 1;
+		}
+		fclose(out);
+		for (uint32_t r = 0; r < part_num; r++){
+			fclose(parts[r]);
+			remove((o->name + ".part" + to_string(r)).c_str());
+		}
+	}
+}
+
+/*
+ * Scheduler that records the event trace of the run into EVENT_TRACE_FILE, for the replay benchmark
+ * of utils/bench-simulator (--trace). It forwards to a scheduler of SCHEDULER_TYPE, and writes one
+ * uint64_t per operation: the timestamp (ns) of an inserted event, or EVENT_TRACE_REMOVE_NEXT when the
+ * next event is taken out to run. Remove() (unused by the model) is not recorded.
+ */
+const uint64_t EVENT_TRACE_REMOVE_NEXT = ~(uint64_t)0;
+class EventTraceScheduler : public Scheduler{
+public:
+	static TypeId GetTypeId(void){
+		static TypeId tid = TypeId("ns3::EventTraceScheduler")
+			.SetParent<Scheduler>()
+			.AddConstructor<EventTraceScheduler>();
+		return tid;
+	}
+	EventTraceScheduler(){
+		m_sched = ObjectFactory(scheduler_type).Create<Scheduler>();
+		m_file = fopen(event_trace_file.c_str(), "wb");
+		NS_ASSERT_MSG(m_file != NULL, "Cannot open EVENT_TRACE_FILE");
+	}
+	virtual ~EventTraceScheduler(){
+		fclose(m_file);
+	}
+	virtual void Insert(const Event &ev){
+		fwrite(&ev.key.m_ts, sizeof(uint64_t), 1, m_file);
+		m_sched->Insert(ev);
+	}
+	virtual bool IsEmpty(void) const{
+		return m_sched->IsEmpty();
+	}
+	virtual Event PeekNext(void) const{
+		return m_sched->PeekNext();
+	}
+	virtual Event RemoveNext(void){
+		fwrite(&EVENT_TRACE_REMOVE_NEXT, sizeof(uint64_t), 1, m_file);
+		return m_sched->RemoveNext();
+	}
+	virtual void Remove(const Event &ev){
+		m_sched->Remove(ev);
+	}
+private:
+	Ptr<Scheduler> m_sched;
+	FILE *m_file;
+};
+NS_OBJECT_ENSURE_REGISTERED(EventTraceScheduler);
+
+/*
+ * At the checkpoint, fork the process of the config, then the one of each FORK_VARIANT. The outputs
+ * (file, name) are flushed, and each variant copies them to its own files and reopens FLOW_FILE, so
+ * that it shares no file offset with the other processes. Returns the variant that this process runs
+ * (-1 for the config), or -2 in the process that forked them, once they have all ended.
+ */
+int fork_at_checkpoint(const vector<pair<FILE*, string> > &outputs, bool &failed){
+	fflush(NULL); // nothing buffered is written twice
+	vector<off_t> size(outputs.size(), 0);
+	for (uint32_t i = 0; i < outputs.size(); i++)
+		if (outputs[i].first != NULL)
+			size[i] = lseek(fileno(outputs[i].first), 0, SEEK_CUR);
+	off_t flow_pos = flowf.f != NULL ? lseek(fileno(flowf.f), 0, SEEK_CUR) : 0;
+	long jobs = std::max(sysconf(_SC_NPROCESSORS_ONLN), 1L), running = 0;
+	int status;
+	failed = false;
+	for (int v = -1; v < (int)fork_variants.size(); v++){
+		if (running == jobs){
+			wait(&status);
+			failed |= !WIFEXITED(status) || WEXITSTATUS(status) != 0;
+			running--;
+		}
+		pid_t pid = fork();
+		if (pid < 0){
+			failed = true;
+			break;
+		}
+		if (pid > 0){
+			running++;
+			continue;
+		}
+		if (v < 0)
+			return v;
+		vector<char> buf(1 << 20);
+		for (uint32_t i = 0; i < outputs.size(); i++){
+			if (outputs[i].first == NULL)
+				continue;
+			string name = outputs[i].second + "." + fork_variants[v].name;
+			int fd = open(name.c_str(), O_WRONLY | O_CREAT | O_TRUNC, 0644);
+			int in = open(outputs[i].second.c_str(), O_RDONLY);
+			NS_ASSERT_MSG(fd >= 0 && in >= 0, "Cannot copy " << outputs[i].second << " to " << name);
+			for (off_t done = 0; done < size[i]; ){
+				ssize_t r = read(in, &buf[0], std::min((off_t)buf.size(), size[i] - done));
+				if (r <= 0 || write(fd, &buf[0], r) != r)
+					break;
+				done += r;
+			}
+			close(in);
+			dup2(fd, fileno(outputs[i].first));
+			close(fd);
+		}
+		if (flowf.f != NULL){
+			int fd = open(flow_file.c_str(), O_RDONLY);
+			NS_ASSERT_MSG(fd >= 0, "Cannot open FLOW_FILE");
+			lseek(fd, flow_pos, SEEK_SET);
+			dup2(fd, fileno(flowf.f));
+			close(fd);
+		}
+		return v;
+	}
+	for (; running > 0; running--){
+		wait(&status);
+		failed |= !WIFEXITED(status) || WEXITSTATUS(status) != 0;
+	}
+	return -2;
+}
+
+// set the parameters of a FORK_VARIANT on all hosts
+void apply_fork_variant(const ForkVariant &v){
+	for (auto &p : v.params)
+		for (uint32_t i = 0; i < n.GetN(); i++)
+			if (n.Get(i)->GetNodeType() == 0)
+				n.Get(i)->GetObject<RdmaDriver>()->m_rdma->SetAttribute(fork_key_attribute(p.first), StringValue(p.second));
+}
+
 int main(int argc, char *argv[])
 {
 	clock_t begint, endt;
@@ -584,9 +1287,13 @@ int main(int argc, char *argv[])
 			}else if (key.compare("PFC_OUTPUT_FILE") == 0){
 				conf >> pfc_output_file;
 				std::cout << "PFC_OUTPUT_FILE\t\t\t\t" << pfc_output_file << '\n';
-			}else if (key.compare("LINK_DOWN") == 0){
-				conf >> link_down_time >> link_down_A >> link_down_B;
-				std::cout << "LINK_DOWN\t\t\t\t" << link_down_time << ' '<< link_down_A << ' ' << link_down_B << '\n';
+			}else if (key.compare("LINK_DOWN") == 0 || key.compare("LINK_UP") == 0){
+				LinkEvent e;
+				e.up = key.compare("LINK_UP") == 0;
+				conf >> e.time >> e.a >> e.b;
+				if (e.time > 0) // time 0 means no event
+					link_events.push_back(e);
+				std::cout << key << "\t\t\t\t" << e.time << ' '<< e.a << ' ' << e.b << '\n';
 			}else if (key.compare("ENABLE_TRACE") == 0){
 				conf >> enable_trace;
 				std::cout << "ENABLE_TRACE\t\t\t\t" << enable_trace << '\n';
@@ -629,9 +1336,36 @@ int main(int argc, char *argv[])
 			}else if (key.compare("BUFFER_SIZE") == 0){
 				conf >> buffer_size;
 				std::cout << "BUFFER_SIZE\t\t\t\t" << buffer_size << '\n';
+			}else if (key.compare("MMU_POLICY") == 0){
+				conf >> mmu_policy;
+				std::cout << "MMU_POLICY\t\t\t\t" << mmu_policy << '\n';
+			}else if (key.compare("MMU_ALPHA") == 0){
+				int n_a;
+				conf >> n_a;
+				std::cout << "MMU_ALPHA\t\t\t\t";
+				for (int i = 0; i < n_a; i++){
+					uint32_t q;
+					double a;
+					conf >> q >> a;
+					mmu_alpha[q] = a;
+					std::cout << ' ' << q << ' ' << a;
+				}
+				std::cout<<'\n';
+			}else if (key.compare("MMU_STATIC_THRESHOLD") == 0){
+				conf >> mmu_static_threshold;
+				std::cout << "MMU_STATIC_THRESHOLD\t\t\t" << mmu_static_threshold << '\n';
+			}else if (key.compare("MMU_EGRESS_POOL") == 0){
+				conf >> mmu_egress_pool;
+				std::cout << "MMU_EGRESS_POOL\t\t\t\t" << mmu_egress_pool << '\n';
 			}else if (key.compare("QLEN_MON_FILE") == 0){
 				conf >> qlen_mon_file;
 				std::cout << "QLEN_MON_FILE\t\t\t\t" << qlen_mon_file << '\n';
+			}else if (key.compare("DROP_SUMMARY_FILE") == 0){
+				conf >> drop_summary_file;
+				std::cout << "DROP_SUMMARY_FILE\t\t\t" << drop_summary_file << '\n';
+			}else if (key.compare("DROP_RING_SIZE") == 0){
+				conf >> drop_ring_size;
+				std::cout << "DROP_RING_SIZE\t\t\t\t" << drop_ring_size << '\n';
 			}else if (key.compare("QLEN_MON_START") == 0){
 				conf >> qlen_mon_start;
 				std::cout << "QLEN_MON_START\t\t\t\t" << qlen_mon_start << '\n';
@@ -667,6 +1401,60 @@ int main(int argc, char *argv[])
 				conf >> poseidon_max_rate;
 				std::cout << "POSEIDON_MAX_RATE\t\t\t\t" << poseidon_max_rate << '\n';
 			}
+			else if (key.compare("CC_TRACE_FILE") == 0){
+				conf >> cc_trace_file;
+				std::cout << "CC_TRACE_FILE\t\t\t\t" << cc_trace_file << '\n';
+			}
+			else if (key.compare("CC_TRACE_INTERVAL") == 0){
+				conf >> cc_trace_interval;
+				std::cout << "CC_TRACE_INTERVAL\t\t\t\t" << cc_trace_interval << '\n';
+			}
+			else if (key.compare("RNG_SEED") == 0){
+				conf >> rng_seed;
+				std::cout << "RNG_SEED\t\t\t\t" << rng_seed << '\n';
+			}
+			else if (key.compare("SCHEDULER_TYPE") == 0){
+				conf >> scheduler_type;
+				std::cout << "SCHEDULER_TYPE\t\t\t\t" << scheduler_type << '\n';
+			}
+			else if (key.compare("EVENT_POOL") == 0){
+				conf >> event_pool;
+				std::cout << "EVENT_POOL\t\t\t\t" << event_pool << '\n';
+			}
+			else if (key.compare("PACKET_POOL") == 0){
+				conf >> packet_pool;
+				std::cout << "PACKET_POOL\t\t\t\t" << packet_pool << '\n';
+			}
+			else if (key.compare("EVENT_TRACE_FILE") == 0){
+				conf >> event_trace_file;
+				std::cout << "EVENT_TRACE_FILE\t\t\t\t" << event_trace_file << '\n';
+			}
+			else if (key.compare("THREADS") == 0){
+				conf >> threads;
+				std::cout << "THREADS\t\t\t\t" << threads << '\n';
+			}
+			else if (key.compare("PARTITION") == 0){
+				conf >> partition_by;
+				std::cout << "PARTITION\t\t\t\t" << partition_by << '\n';
+			}
+			else if (key.compare("CHECKPOINT_TIME") == 0){
+				conf >> checkpoint_time;
+				std::cout << "CHECKPOINT_TIME\t\t\t\t" << checkpoint_time << '\n';
+			}
+			else if (key.compare("FORK_VARIANT") == 0){
+				ForkVariant v;
+				std::string line, k, val;
+				conf >> v.name;
+				std::getline(conf, line);
+				std::istringstream params(line);
+				while (params >> k >> val)
+					v.params.push_back(make_pair(k, val));
+				fork_variants.push_back(v);
+				std::cout << "FORK_VARIANT\t\t\t\t" << v.name;
+				for (auto &p : v.params)
+					std::cout << ' ' << p.first << ' ' << p.second;
+				std::cout << '\n';
+			}
 			fflush(stdout);
 		}
 		conf.close();
@@ -679,6 +1467,95 @@ int main(int argc, char *argv[])
 	}
 
 
+	if (checkpoint_time > 0 || !fork_variants.empty()){
+		const char *error = NULL;
+		if (checkpoint_time <= 0 || checkpoint_time >= simulator_stop_time)
+			error = "CHECKPOINT_TIME must be set, and before SIMULATOR_STOP_TIME";
+		else if (!event_trace_file.empty())
+			error = "EVENT_TRACE_FILE is not supported with CHECKPOINT_TIME"; // the variants would write the same file
+		for (uint32_t i = 0; i < fork_variants.size() && error == NULL; i++){
+			for (uint32_t j = 0; j < i; j++)
+				if (fork_variants[j].name == fork_variants[i].name)
+					error = "FORK_VARIANT names must differ";
+			for (auto &p : fork_variants[i].params)
+				if (fork_key_attribute(p.first) == NULL)
+					error = "FORK_VARIANT may not change this key";
+		}
+		if (error != NULL){
+			std::cout << "Error: " << error << '\n';
+			fflush(stdout);
+			return 1;
+		}
+	}
+
+	// the events of the same timestamp run by the node that scheduled them, as they do in a partitioned
+	// run, so that the plain run is the reference of the runs with any number of ranks or threads
+	Config::SetDefault("ns3::DefaultSimulatorImpl::ContextOrder", BooleanValue(true));
+	Config::SetDefault("ns3::DistributedSimulatorImpl::ContextOrder", BooleanValue(true));
+
+	// a partitioned run starts MPI, or the threads, and sets the simulator before any event is scheduled
+	if (threads > 0 && partition_by == "none")
+		partition_by = "rack";
+	if (partition_by != "none"){
+		const char *unsupported = NULL;
+		if (partition_by != "rack" && partition_by != "pod"){
+			std::cout << "Error: unknown PARTITION " << partition_by << ", must be none, rack or pod\n";
+			fflush(stdout);
+			return 1;
+		}
+		if (!link_events.empty())
+			unsupported = "LINK_DOWN/LINK_UP"; // the routes are updated on every rank at once
+		else if (!event_trace_file.empty())
+			unsupported = "EVENT_TRACE_FILE";
+		else if (checkpoint_time > 0)
+			unsupported = "CHECKPOINT_TIME"; // fork copies one thread of one rank
+		else if (threads > 1 && event_pool)
+			unsupported = "EVENT_POOL with THREADS"; // the pools are shared by the threads
+		else if (threads > 1 && packet_pool)
+			unsupported = "PACKET_POOL with THREADS";
+		if (unsupported != NULL){
+			std::cout << "Error: " << unsupported << " is not supported with PARTITION\n";
+			fflush(stdout);
+			return 1;
+		}
+		partitioned = true;
+		if (threads > 0){
+			// one process, no MPI: the links between threads are plain QbbChannels
+			part_num = threads;
+			GlobalValue::Bind("SimulatorImplementationType", StringValue("ns3::ParallelSimulatorImpl"));
+		}else{
+			MpiInterface::Enable(&argc, &argv);
+			rank_id = MpiInterface::GetSystemId();
+			rank_num = part_num = MpiInterface::GetSize();
+			if (rank_num > 1)
+				GlobalValue::Bind("SimulatorImplementationType", StringValue("ns3::DistributedSimulatorImpl"));
+		}
+	}
+
+	// the event scheduler, set before any event is scheduled
+	TypeId sched_tid;
+	if (!TypeId::LookupByNameFailSafe(scheduler_type, &sched_tid)){
+		std::cout << "Error: unknown SCHEDULER_TYPE " << scheduler_type << '\n';
+		fflush(stdout);
+		return 1;
+	}
+	const SwitchMmuPolicy *mmu_policy_p = SwitchMmuPolicy::Get(mmu_policy);
+	if (mmu_policy_p == NULL){
+		std::cout << "Error: unknown MMU_POLICY " << mmu_policy << ", must be dt, static, egress or abm\n";
+		fflush(stdout);
+		return 1;
+	}
+	for (map<uint32_t, double>::iterator it = mmu_alpha.begin(); it != mmu_alpha.end(); it++){
+		if (it->first == 0 || it->first >= SwitchMmu::qCnt || it->second <= 0){
+			std::cout << "Error: MMU_ALPHA of queue " << it->first << " must be for a queue 1 to " << SwitchMmu::qCnt - 1 << " and positive\n";
+			fflush(stdout);
+			return 1;
+		}
+	}
+	EventImpl::SetPoolEnabled(event_pool);
+	Packet::SetPoolEnabled(packet_pool);
+	Simulator::SetScheduler(ObjectFactory(event_trace_file.empty() ? scheduler_type : "ns3::EventTraceScheduler"));
+
 	bool dynamicth = use_dynamic_pfc_threshold;
 
 	Config::SetDefault("ns3::QbbNetDevice::PauseTime", UintegerValue(pause_time));
@@ -687,17 +1564,8 @@ int main(int argc, char *argv[])
 
 	// set int_multi
 	IntHop::multi = int_multi;
-	// IntHeader::mode
-	if (cc_mode == 7) // timely, use ts
-		IntHeader::mode = IntHeader::TS;
-	else if (cc_mode == 3) // hpcc, use int
-		IntHeader::mode = IntHeader::NORMAL;
-	else if (cc_mode == 10) // hpcc-pint
-		IntHeader::mode = IntHeader::PINT;
-	else if (cc_mode == 11) // poseidon, use int
-		IntHeader::mode = IntHeader::NORMAL;
-	else // others, no extra header
-		IntHeader::mode = IntHeader::NONE;
+	// IntHeader::mode, what the CC needs in the data packets
+	IntHeader::mode = RdmaCc::Get(cc_mode)->GetIntMode();
 
 	// Set Pint
 	if (cc_mode == 10){
@@ -707,13 +1575,17 @@ int main(int argc, char *argv[])
 	}
 
 	//SeedManager::SetSeed(time(NULL));
+	// seed both rand() and ns-3's RNG streams, so that sweep runs with different seeds are independent
+	srand(rng_seed);
+	SeedManager::SetRun(rng_seed);
 
 	topof.open(topology_file.c_str());
-	flowf.open(flow_file.c_str());
 	tracef.open(trace_file.c_str());
 	uint32_t node_num, switch_num, link_num, trace_num;
 	topof >> node_num >> switch_num >> link_num;
-	flowf >> flow_num;
+	nbr2if.resize(node_num);
+	host_route.resize(node_num);
+	flow_num = flowf.Open(flow_file.c_str());
 	tracef >> trace_num;
 
 
@@ -725,11 +1597,32 @@ int main(int argc, char *argv[])
 		topof >> sid;
 		node_type[sid] = 1;
 	}
+	// the links are read before the nodes are created, to split the nodes among the ranks
+	vector<TopoLink> links(link_num);
+	for (TopoLink &l : links)
+		topof >> l.src >> l.dst >> l.data_rate >> l.link_delay >> l.error_rate;
+	if (partitioned){
+		PartitionNodes(node_type, links);
+		for (uint32_t k = 0; k < part_num; k++){
+			if (threads == 0 && k != rank_id)
+				continue;
+			uint32_t local = 0, local_hosts = 0;
+			for (uint32_t i = 0; i < node_num; i++)
+				if (node_system[i] == k){
+					local++;
+					local_hosts += node_type[i] == 0;
+				}
+			printf("PARTITION: %s %u of %u runs %u nodes, %u hosts\n", threads > 0 ? "thread" : "rank", k, part_num, local, local_hosts);
+		}
+	}else
+		node_system.assign(node_num, 0);
+	// the threads share the rank, which runs all their nodes
+	node_rank = threads > 0 ? vector<uint32_t>(node_num, 0) : node_system;
 	for (uint32_t i = 0; i < node_num; i++){
 		if (node_type[i] == 0)
-			n.Add(CreateObject<Node>());
+			n.Add(CreateObject<Node>(node_system[i]));
 		else{
-			Ptr<SwitchNode> sw = CreateObject<SwitchNode>();
+			Ptr<SwitchNode> sw = CreateObject<SwitchNode>(node_system[i]);
 			n.Add(sw);
 			sw->SetAttribute("EcnEnabled", BooleanValue(enable_qcn));
 		}
@@ -764,16 +1657,15 @@ int main(int argc, char *argv[])
 	rem->SetAttribute("ErrorRate", DoubleValue(error_rate_per_link));
 	rem->SetAttribute("ErrorUnit", StringValue("ERROR_UNIT_PACKET"));
 
-	FILE *pfc_file = fopen(pfc_output_file.c_str(), "w");
+	FILE *pfc_file = open_output(pfc_output_file);
 
 	QbbHelper qbb;
 	Ipv4AddressHelper ipv4;
 	for (uint32_t i = 0; i < link_num; i++)
 	{
-		uint32_t src, dst;
-		std::string data_rate, link_delay;
-		double error_rate;
-		topof >> src >> dst >> data_rate >> link_delay >> error_rate;
+		uint32_t src = links[i].src, dst = links[i].dst;
+		std::string data_rate = links[i].data_rate, link_delay = links[i].link_delay;
+		double error_rate = links[i].error_rate;
 
 		Ptr<Node> snode = n.Get(src), dnode = n.Get(dst);
 
@@ -802,6 +1694,16 @@ int main(int argc, char *argv[])
 		// because we want our IP to be the primary IP (first in the IP address list),
 		// so that the global routing is based on our IP
 		NetDeviceContainer d = qbb.Install(snode, dnode);
+		if (partitioned && error_rate > 0){
+			// the two devices may run on different ranks, each draws its own losses
+			Ptr<RateErrorModel> rem = CreateObject<RateErrorModel>();
+			Ptr<UniformRandomVariable> uv = CreateObject<UniformRandomVariable>();
+			rem->SetRandomVariable(uv);
+			uv->SetStream(50);
+			rem->SetAttribute("ErrorRate", DoubleValue(error_rate));
+			rem->SetAttribute("ErrorUnit", StringValue("ERROR_UNIT_PACKET"));
+			DynamicCast<QbbNetDevice>(d.Get(1))->SetReceiveErrorModel(rem);
+		}
 		if (snode->GetNodeType() == 0){
 			Ptr<Ipv4> ipv4 = snode->GetObject<Ipv4>();
 			ipv4->AddInterface(d.Get(0));
@@ -814,14 +1716,14 @@ int main(int argc, char *argv[])
 		}
 
 		// used to create a graph of the topology
-		nbr2if[snode][dnode].idx = DynamicCast<QbbNetDevice>(d.Get(0))->GetIfIndex();
-		nbr2if[snode][dnode].up = true;
-		nbr2if[snode][dnode].delay = DynamicCast<QbbChannel>(DynamicCast<QbbNetDevice>(d.Get(0))->GetChannel())->GetDelay().GetTimeStep();
-		nbr2if[snode][dnode].bw = DynamicCast<QbbNetDevice>(d.Get(0))->GetDataRate().GetBitRate();
-		nbr2if[dnode][snode].idx = DynamicCast<QbbNetDevice>(d.Get(1))->GetIfIndex();
-		nbr2if[dnode][snode].up = true;
-		nbr2if[dnode][snode].delay = DynamicCast<QbbChannel>(DynamicCast<QbbNetDevice>(d.Get(1))->GetChannel())->GetDelay().GetTimeStep();
-		nbr2if[dnode][snode].bw = DynamicCast<QbbNetDevice>(d.Get(1))->GetDataRate().GetBitRate();
+		nbr2if[src][dst].idx = DynamicCast<QbbNetDevice>(d.Get(0))->GetIfIndex();
+		nbr2if[src][dst].up = true;
+		nbr2if[src][dst].delay = DynamicCast<QbbChannel>(DynamicCast<QbbNetDevice>(d.Get(0))->GetChannel())->GetDelay().GetTimeStep();
+		nbr2if[src][dst].bw = DynamicCast<QbbNetDevice>(d.Get(0))->GetDataRate().GetBitRate();
+		nbr2if[dst][src].idx = DynamicCast<QbbNetDevice>(d.Get(1))->GetIfIndex();
+		nbr2if[dst][src].up = true;
+		nbr2if[dst][src].delay = DynamicCast<QbbChannel>(DynamicCast<QbbNetDevice>(d.Get(1))->GetChannel())->GetDelay().GetTimeStep();
+		nbr2if[dst][src].bw = DynamicCast<QbbNetDevice>(d.Get(1))->GetDataRate().GetBitRate();
 
 		// This is just to set up the connectivity between nodes. The IP addresses are useless
 		char ipstring[16];
@@ -841,6 +1743,7 @@ int main(int argc, char *argv[])
 		if (n.Get(i)->GetNodeType() == 1){ // is switch
 			Ptr<SwitchNode> sw = DynamicCast<SwitchNode>(n.Get(i));
 			uint32_t shift = 3; // by default 1/8
+			sw->ConfigNPort(sw->GetNDevices()-1);
 			for (uint32_t j = 1; j < sw->GetNDevices(); j++){
 				Ptr<QbbNetDevice> dev = DynamicCast<QbbNetDevice>(sw->GetDevice(j));
 				// set ecn
@@ -861,14 +1764,27 @@ int main(int argc, char *argv[])
 					rate /= 2;
 				}
 			}
-			sw->m_mmu->ConfigNPort(sw->GetNDevices()-1);
 			sw->m_mmu->ConfigBufferSize(buffer_size* 1024 * 1024);
+			sw->m_mmu->ConfigPolicy(mmu_policy_p);
+			for (map<uint32_t, double>::iterator it = mmu_alpha.begin(); it != mmu_alpha.end(); it++)
+				sw->m_mmu->ConfigAlpha(it->first, it->second);
+			sw->m_mmu->ConfigStaticThreshold(mmu_static_threshold * 1024);
+			sw->m_mmu->ConfigEgressPool((mmu_egress_pool ? mmu_egress_pool : buffer_size) * 1024 * 1024);
+			sw->m_mmu->ConfigDropRing(drop_ring_size);
 			sw->m_mmu->node_id = sw->GetId();
+			sw->m_mmu->SetQlenMonitor(qlen_mon_start, qlen_mon_end, qlen_mon_interval);
+			sw->AssignStreams(1000 + 2 * i); // ECN marks and PINT of the switch do not depend on the other nodes
 		}
 	}
 
 	#if ENABLE_QP
-	FILE *fct_output = fopen(fct_output_file.c_str(), "w");
+	FILE *fct_output = open_output(fct_output_file);
+	FILE *cc_trace_output = NULL;
+	if (!cc_trace_file.empty()){
+		cc_trace_output = open_output(cc_trace_file);
+		if (part_num == 1)
+			setvbuf(cc_trace_output, NULL, _IOFBF, 1 << 20);
+	}
 	//
 	// install RDMA driver
 	//
@@ -902,6 +1818,11 @@ int main(int argc, char *argv[])
 			rdmaHw->SetAttribute("PoseidonMinRate", DoubleValue(poseidon_min_rate));
 			rdmaHw->SetAttribute("PoseidonMaxRate", DoubleValue(poseidon_max_rate));
 			rdmaHw->SetPintSmplThresh(pint_prob);
+			rdmaHw->AssignStreams(1000 + 2 * i);
+			if (cc_trace_output){
+				rdmaHw->SetAttribute("CcTraceInterval", UintegerValue(cc_trace_interval));
+				rdmaHw->TraceConnectWithoutContext("CcUpdate", MakeBoundCallback (cc_trace, cc_trace_output));
+			}
 			// create and install RdmaDriver
 			Ptr<RdmaDriver> rdma = CreateObject<RdmaDriver>();
 			Ptr<Node> node = n.Get(i);
@@ -921,27 +1842,42 @@ int main(int argc, char *argv[])
 	else
 		RdmaEgressQueue::ack_q_idx = 3;
 
-	// setup routing
+	// setup routing, the hosts get their entries when they start a flow
 	CalculateRoutes(n);
-	SetRoutingEntries();
 
 	//
-	// get BDP and delay
+	// get max BDP and delay
+	// the path of a host pair only depends on the roots and the links to them, so check one pair per such class
 	//
 	maxRtt = maxBdp = 0;
+	map<vector<uint64_t>, vector<uint32_t> > host_class;
 	for (uint32_t i = 0; i < node_num; i++){
 		if (n.Get(i)->GetNodeType() != 0)
 			continue;
-		for (uint32_t j = 0; j < node_num; j++){
-			if (n.Get(j)->GetNodeType() != 0)
-				continue;
-			uint64_t delay = pairDelay[n.Get(i)][n.Get(j)];
-			uint64_t txDelay = pairTxDelay[n.Get(i)][n.Get(j)];
-			uint64_t rtt = delay * 2 + txDelay;
-			uint64_t bw = pairBw[i][j];
-			uint64_t bdp = rtt * bw / 1000000000/8; 
-			pairBdp[n.Get(i)][n.Get(j)] = bdp;
-			pairRtt[i][j] = rtt;
+		uint32_t r = host_root[i];
+		vector<uint64_t> key(1, r);
+		if (r == i)
+			key.push_back(i);
+		else{
+			key.push_back(nbr2if[i][r].delay);
+			key.push_back(nbr2if[i][r].bw);
+			key.push_back(nbr2if[r][i].delay);
+			key.push_back(nbr2if[r][i].bw);
+		}
+		vector<uint32_t> &c = host_class[key];
+		if (c.size() < 2)
+			c.push_back(i);
+	}
+	for (auto &ci : host_class){
+		for (auto &cj : host_class){
+			uint32_t i = ci.second[0], j = cj.second[0];
+			if (i == j){
+				if (ci.second.size() < 2)
+					continue;
+				j = ci.second[1];
+			}
+			uint64_t rtt = GetPairRtt(i, j);
+			uint64_t bdp = GetPairBdp(i, j);
 			if (bdp > maxBdp)
 				maxBdp = bdp;
 			if (rtt > maxRtt)
@@ -976,57 +1912,64 @@ int main(int argc, char *argv[])
 		trace_nodes = NodeContainer(trace_nodes, n.Get(nid));
 	}
 
-	FILE *trace_output = fopen(trace_output_file.c_str(), "w");
+	FILE *trace_output = open_output(trace_output_file);
 	if (enable_trace)
 		qbb.EnableTracing(trace_output, trace_nodes);
 
 	// dump link speed to trace file
 	{
 		SimSetting sim_setting;
-		for (auto i: nbr2if){
-			for (auto j : i.second){
-				uint16_t node = i.first->GetId();
+		for (uint32_t i = 0; i < node_num; i++){
+			for (auto &j : nbr2if[i]){
+				uint16_t node = i;
 				uint8_t intf = j.second.idx;
-				uint64_t bps = DynamicCast<QbbNetDevice>(i.first->GetDevice(j.second.idx))->GetDataRate().GetBitRate();
+				uint64_t bps = DynamicCast<QbbNetDevice>(n.Get(i)->GetDevice(j.second.idx))->GetDataRate().GetBitRate();
 				sim_setting.port_speed[node][intf] = bps;
 			}
 		}
 		sim_setting.win = maxBdp;
-		sim_setting.Serialize(trace_output);
+		if (rank_id == 0)
+			sim_setting.Serialize(trace_output);
 	}
 
-	Ipv4GlobalRoutingHelper::PopulateRoutingTables();
-
 	NS_LOG_INFO("Create Applications.");
 
 	Time interPacketInterval = Seconds(0.0000005 / 2);
 
-	// maintain port number for each host
-	for (uint32_t i = 0; i < node_num; i++){
-		if (n.Get(i)->GetNodeType() == 0)
-			for (uint32_t j = 0; j < node_num; j++){
-				if (n.Get(j)->GetNodeType() == 0)
-					portNumder[i][j] = 10000; // each host pair use port number from 10000
-			}
-	}
-
 	flow_input.idx = 0;
 	if (flow_num > 0){
 		ReadFlowInput();
-		Simulator::Schedule(Seconds(flow_input.start_time)-Simulator::Now(), ScheduleFlowInputs);
-	}
+		Simulator::Schedule(NanoSeconds(flow_input.start)-Simulator::Now(), ScheduleFlowInputs);
+	}else
+		flowf.Close();
 
 	topof.close();
 	tracef.close();
 
-	// schedule link down
-	if (link_down_time > 0){
-		Simulator::Schedule(Seconds(2) + MicroSeconds(link_down_time), &TakeDownLink, n, n.Get(link_down_A), n.Get(link_down_B));
+	// schedule link down/up events, the events at the same time happen in the order of the config
+	for (LinkEvent &e : link_events){
+		if (e.a >= node_num || e.b >= node_num || nbr2if[e.a].count(e.b) == 0){
+			std::cout << "Error: " << (e.up ? "LINK_UP" : "LINK_DOWN") << " of " << e.a << " " << e.b << ", which is not a link in the topology\n";
+			fflush(stdout);
+			return 1;
+		}
+		if (e.up)
+			Simulator::Schedule(Seconds(2) + MicroSeconds(e.time), &BringUpLink, e.a, e.b);
+		else
+			Simulator::Schedule(Seconds(2) + MicroSeconds(e.time), &TakeDownLink, e.a, e.b);
 	}
 
 	// schedule buffer monitor
-	FILE* qlen_output = fopen(qlen_mon_file.c_str(), "w");
-	Simulator::Schedule(NanoSeconds(qlen_mon_start), &monitor_buffer, qlen_output, &n);
+	FILE* qlen_output = open_output(qlen_mon_file);
+	if (next_qlen_dump(0) > 0)
+		Simulator::Schedule(NanoSeconds(next_qlen_dump(0)), &monitor_buffer, qlen_output, &n);
+
+	// dump the drops before the end of the run, which is scheduled later at the same time
+	FILE *drop_output = NULL;
+	if (!drop_summary_file.empty()){
+		drop_output = open_output(drop_summary_file);
+		Simulator::Schedule(Seconds(simulator_stop_time), &drop_summary, drop_output, &n);
+	}
 
 	//
 	// Now, do the actual simulation.
@@ -1034,11 +1977,48 @@ int main(int argc, char *argv[])
 	std::cout << "Running Simulation.\n";
 	fflush(stdout);
 	NS_LOG_INFO("Run Simulation.");
-	Simulator::Stop(Seconds(simulator_stop_time));
+	if (checkpoint_time > 0){
+		Simulator::Stop(Seconds(checkpoint_time));
+		Simulator::Run();
+		vector<pair<FILE*, string> > outputs;
+		outputs.push_back(make_pair(pfc_file, pfc_output_file));
+		outputs.push_back(make_pair(fct_output, fct_output_file));
+		outputs.push_back(make_pair(cc_trace_output, cc_trace_file));
+		outputs.push_back(make_pair(trace_output, trace_output_file));
+		outputs.push_back(make_pair(qlen_output, qlen_mon_file));
+		outputs.push_back(make_pair(drop_output, drop_summary_file));
+		bool failed;
+		int variant = fork_at_checkpoint(outputs, failed);
+		if (variant == -2){
+			if (failed){
+				std::cout << "Error: a run from the checkpoint failed\n";
+				fflush(stdout);
+				return 1;
+			}
+			return 0;
+		}
+		if (variant >= 0){
+			apply_fork_variant(fork_variants[variant]);
+			std::cout << "FORK_VARIANT " << fork_variants[variant].name << " resumes at " << Simulator::Now().GetSeconds() << "s\n";
+			fflush(stdout);
+		}
+	}
+	Simulator::Stop(Seconds(simulator_stop_time) - Simulator::Now());
 	Simulator::Run();
+	if (part_num > 1)
+		merge_outputs();
 	Simulator::Destroy();
+	if (partitioned && threads == 0)
+		MpiInterface::Disable();
 	NS_LOG_INFO("Done.");
+	RdmaQueuePair::MemoryStats qpm = RdmaQueuePair::GetMemoryStats();
+	printf("QP memory: %lu qps (peak %lu) of %u B, %lu rx qps (peak %lu) of %u B, %lu B of slabs\n", qpm.qps, qpm.peakQps, qpm.qpBytes, qpm.rxQps, qpm.peakRxQps, qpm.rxQpBytes, qpm.slabBytes);
+	fflush(stdout);
 	fclose(trace_output);
+	if (cc_trace_output)
+		fclose(cc_trace_output);
+	if (drop_output)
+		fclose(drop_output);
 
 	endt = clock();
 	std::cout << (double)(endt - begint) / CLOCKS_PER_SEC << "\n";
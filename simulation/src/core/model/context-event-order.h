@@ -0,0 +1,66 @@
+/* -*- Mode:C++; c-file-style:"gnu"; indent-tabs-mode:nil; -*- */
+/*
+ * This program is free software; you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License version 2 as
+ * published by the Free Software Foundation;
+ *
+ * This program is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ * GNU General Public License for more details.
+ *
+ * You should have received a copy of the GNU General Public License
+ * along with this program; if not, write to the Free Software
+ * Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+ */
+
+#ifndef CONTEXT_EVENT_ORDER_H
+#define CONTEXT_EVENT_ORDER_H
+
+#include "assert.h"
+#include <stdint.h>
+#include <vector>
+
+namespace ns3 {
+
+/**
+ * \ingroup simulator
+ * \brief allocates event uids which order simultaneous events by the context that scheduled them
+ *
+ * The simulators run the events of the same timestamp by increasing uid,
+ * and by default the uids count the events in the order they are
+ * scheduled. In a distributed simulation this order depends on how the
+ * nodes are split among the ranks: an event sent by another rank is only
+ * scheduled when its message is received.
+ *
+ * The uid of an event from Allocate is the context of the event that
+ * scheduled it, plus one, in the upper 24 bits, and the number of events
+ * this context scheduled before in the lower 40 bits. The events of a node
+ * then run in the same order whichever rank the other nodes are on, as
+ * long as each rank schedules the events of the nodes it runs exactly as a
+ * sequential run would, and a sent event carries its uid to the receiver.
+ * Events scheduled out of any node (context 0xffffffff) come first.
+ */
+class ContextEventOrder
+{
+public:
+  uint64_t Allocate (uint32_t context)
+  {
+    uint32_t slot = context + 1;
+    if (slot >= m_next.size ())
+      {
+        NS_ASSERT_MSG (slot < (1 << 24), "ContextEventOrder supports contexts up to 2^24 - 2");
+        // uids 0 to 3 are reserved for the invalid, now and destroy events
+        m_next.resize (slot + 1, 4);
+      }
+    NS_ASSERT (m_next[slot] < (1ULL << 40));
+    return ((uint64_t)slot << 40) | m_next[slot]++;
+  }
+
+private:
+  std::vector<uint64_t> m_next; // next sequence number of each context, by context + 1
+};
+
+} // namespace ns3
+
+#endif /* CONTEXT_EVENT_ORDER_H */
@@ -25,6 +25,7 @@
 
 #include "ptr.h"
 #include "pointer.h"
+#include "boolean.h"
 #include "assert.h"
 #include "log.h"
 
@@ -46,6 +47,13 @@ DefaultSimulatorImpl::GetTypeId (void)
   static TypeId tid = TypeId ("ns3::DefaultSimulatorImpl")
     .SetParent<SimulatorImpl> ()
     .AddConstructor<DefaultSimulatorImpl> ()
+    .AddAttribute ("ContextOrder",
+                   "Run the events of the same timestamp by the context that scheduled them "
+                   "(see ContextEventOrder) instead of in the order they were scheduled, "
+                   "like a DistributedSimulatorImpl with the same attribute.",
+                   BooleanValue (false),
+                   MakeBooleanAccessor (&DefaultSimulatorImpl::m_contextOrder),
+                   MakeBooleanChecker ())
   ;
   return tid;
 }
@@ -61,6 +69,7 @@ DefaultSimulatorImpl::DefaultSimulatorImpl ()
   m_uid = 4;
   // before ::Run is entered, the m_currentUid will be zero
   m_currentUid = 0;
+  m_contextOrder = false;
   m_currentTs = 0;
   m_currentContext = 0xffffffff;
   m_unscheduledEvents = 0;
@@ -140,6 +149,11 @@ DefaultSimulatorImpl::ProcessOneEvent (void)
   m_currentContext = next.key.m_context;
   m_currentUid = next.key.m_uid;
   next.impl->Invoke ();
+  if (m_contextOrder)
+    {
+      // mark the event as run for IsExpired
+      next.impl->Cancel ();
+    }
   next.impl->Unref ();
 
   ProcessEventsWithContext ();
@@ -176,8 +190,7 @@ DefaultSimulatorImpl::ProcessEventsWithContext (void)
        ev.impl = event.event;
        ev.key.m_ts = m_currentTs + event.timestamp;
        ev.key.m_context = event.context;
-       ev.key.m_uid = m_uid;
-       m_uid++;
+       ev.key.m_uid = AllocateUid ();
        m_unscheduledEvents++;
        m_events->Insert (ev);
     }
@@ -236,8 +249,7 @@ DefaultSimulatorImpl::Schedule (Time const &time, EventImpl *event)
   ev.impl = event;
   ev.key.m_ts = (uint64_t) tAbsolute.GetTimeStep ();
   ev.key.m_context = GetContext ();
-  ev.key.m_uid = m_uid;
-  m_uid++;
+  ev.key.m_uid = AllocateUid ();
   m_unscheduledEvents++;
   m_events->Insert (ev);
   return EventId (event, ev.key.m_ts, ev.key.m_context, ev.key.m_uid);
@@ -256,8 +268,7 @@ DefaultSimulatorImpl::ScheduleWithContext (uint32_t context, Time const &time, E
       ev.impl = event;
       ev.key.m_ts = (uint64_t) tAbsolute.GetTimeStep ();
       ev.key.m_context = context;
-      ev.key.m_uid = m_uid;
-      m_uid++;
+      ev.key.m_uid = AllocateUid ();
       m_unscheduledEvents++;
       m_events->Insert (ev);
     }
@@ -284,8 +295,7 @@ DefaultSimulatorImpl::ScheduleWithContext (uint32_t context, Time const &time, E
   ev.impl = event;
   ev.key.m_ts = (uint64_t) tAbsolute.GetTimeStep ();
   ev.key.m_context = context;
-  ev.key.m_uid = m_uid;
-  m_uid++;
+  ev.key.m_uid = AllocateUid ();
   m_unscheduledEvents++;
   m_events->Insert (ev);
 }
@@ -302,8 +312,7 @@ DefaultSimulatorImpl::ScheduleNow (EventImpl *event)
   ev.impl = event;
   ev.key.m_ts = m_currentTs;
   ev.key.m_context = GetContext ();
-  ev.key.m_uid = m_uid;
-  m_uid++;
+  ev.key.m_uid = AllocateUid ();
   m_unscheduledEvents++;
   m_events->Insert (ev);
   return EventId (event, ev.key.m_ts, ev.key.m_context, ev.key.m_uid);
@@ -403,6 +412,15 @@ DefaultSimulatorImpl::IsExpired (const EventId &ev) const
         }
       return true;
     }
+  if (m_contextOrder)
+    {
+      // the events of the current timestamp do not run by increasing uid,
+      // ProcessOneEvent cancels them once they have run
+      return ev.PeekEventImpl () == 0 ||
+             ev.GetTs () < m_currentTs ||
+             ev.GetUid () == m_currentUid ||
+             ev.PeekEventImpl ()->IsCancelled ();
+    }
   if (ev.PeekEventImpl () == 0 ||
       ev.GetTs () < m_currentTs ||
       (ev.GetTs () == m_currentTs &&
@@ -431,4 +449,10 @@ DefaultSimulatorImpl::GetContext (void) const
   return m_currentContext;
 }
 
+uint64_t
+DefaultSimulatorImpl::GetEventUid (void) const
+{
+  return m_currentUid;
+}
+
 } // namespace ns3
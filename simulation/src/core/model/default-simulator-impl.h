@@ -24,6 +24,7 @@
 #include "simulator-impl.h"
 #include "scheduler.h"
 #include "event-impl.h"
+#include "context-event-order.h"
 #if HAVE_PTHREAD_H
 #include "system-thread.h"
 #include "ns3/system-mutex.h"
@@ -64,11 +65,16 @@ public:
   virtual void SetScheduler (ObjectFactory schedulerFactory);
   virtual uint32_t GetSystemId (void) const; 
   virtual uint32_t GetContext (void) const;
+  virtual uint64_t GetEventUid (void) const;
 
 private:
   virtual void DoDispose (void);
   void ProcessOneEvent (void);
   void ProcessEventsWithContext (void);
+  uint64_t AllocateUid (void)
+  {
+    return m_contextOrder ? m_order.Allocate (m_currentContext) : m_uid++;
+  }
  
   struct EventWithContext {
     uint32_t context;
@@ -87,8 +93,10 @@ private:
   bool m_stop;
   Ptr<Scheduler> m_events;
 
-  uint32_t m_uid;
-  uint32_t m_currentUid;
+  uint64_t m_uid;
+  uint64_t m_currentUid;
+  bool m_contextOrder;
+  ContextEventOrder m_order;
   uint64_t m_currentTs;
   uint32_t m_currentContext;
   // number of events that have been inserted but not yet scheduled,
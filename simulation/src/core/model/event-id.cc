@@ -35,7 +35,7 @@ EventId::EventId ()
   NS_LOG_FUNCTION (this);
 }
 
-EventId::EventId (const Ptr<EventImpl> &impl, uint64_t ts, uint32_t context, uint32_t uid)
+EventId::EventId (const Ptr<EventImpl> &impl, uint64_t ts, uint32_t context, uint64_t uid)
   : m_eventImpl (impl),
     m_ts (ts),
     m_context (context),
@@ -79,7 +79,7 @@ EventId::GetContext (void) const
   NS_LOG_FUNCTION (this);
   return m_context;
 }
-uint32_t 
+uint64_t 
 EventId::GetUid (void) const
 {
   NS_LOG_FUNCTION (this);
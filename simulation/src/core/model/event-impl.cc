@@ -23,8 +23,71 @@
 
 NS_LOG_COMPONENT_DEFINE ("EventImpl");
 
+namespace {
+// events are allocated in size classes of POOL_GRANULARITY bytes, the
+// classes up to POOL_CLASSES * POOL_GRANULARITY bytes are pooled
+const size_t POOL_GRANULARITY = 16;
+const size_t POOL_CLASSES = 16;
+struct FreeEvent
+{
+  FreeEvent *next;
+};
+FreeEvent *g_freeEvents[POOL_CLASSES];
+bool g_poolEnabled = false;
+} // anonymous namespace
+
 namespace ns3 {
 
+void*
+EventImpl::operator new (size_t size)
+{
+  size_t c = (size - 1) / POOL_GRANULARITY;
+  if (c >= POOL_CLASSES)
+    {
+      return ::operator new (size);
+    }
+  FreeEvent *ev = g_freeEvents[c];
+  if (ev != 0)
+    {
+      g_freeEvents[c] = ev->next;
+      return ev;
+    }
+  return ::operator new ((c + 1) * POOL_GRANULARITY);
+}
+
+void
+EventImpl::operator delete (void *p, size_t size)
+{
+  size_t c = (size - 1) / POOL_GRANULARITY;
+  if (!g_poolEnabled || c >= POOL_CLASSES)
+    {
+      ::operator delete (p);
+      return;
+    }
+  FreeEvent *ev = static_cast<FreeEvent *> (p);
+  ev->next = g_freeEvents[c];
+  g_freeEvents[c] = ev;
+}
+
+void
+EventImpl::SetPoolEnabled (bool enabled)
+{
+  NS_LOG_FUNCTION (enabled);
+  g_poolEnabled = enabled;
+  if (!enabled)
+    {
+      for (size_t c = 0; c < POOL_CLASSES; c++)
+        {
+          while (g_freeEvents[c] != 0)
+            {
+              FreeEvent *ev = g_freeEvents[c];
+              g_freeEvents[c] = ev->next;
+              ::operator delete (ev);
+            }
+        }
+    }
+}
+
 EventImpl::~EventImpl ()
 {
   NS_LOG_FUNCTION (this);
@@ -21,6 +21,7 @@
 #define EVENT_IMPL_H
 
 #include <stdint.h>
+#include <cstddef>
 #include "simple-ref-count.h"
 
 namespace ns3 {
@@ -58,6 +59,25 @@ public:
    */
   bool IsCancelled (void);
 
+  /**
+   * Events are allocated through these, so that freed events can be
+   * recycled by a pool (see SetPoolEnabled). Sizes are rounded up to
+   * a size class either way.
+   */
+  static void* operator new (size_t size);
+  static void operator delete (void *p, size_t size);
+  /**
+   * \param enabled whether freed events are kept in per-size free lists
+   *        and reused by the next allocations of the same size class.
+   *
+   * A simulation schedules and frees millions of small events of a few
+   * sizes, so recycling them saves a malloc/free pair per event and keeps
+   * the events of the pending set packed in memory. The pool is not
+   * thread-safe: only enable it when events are created and freed by one
+   * thread. Disabling the pool releases the memory it holds.
+   */
+  static void SetPoolEnabled (bool enabled);
+
 protected:
   virtual void Notify (void) = 0;
 
@@ -0,0 +1,172 @@
+/* -*- Mode:C++; c-file-style:"gnu"; indent-tabs-mode:nil; -*- */
+/*
+ * This program is free software; you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License version 2 as
+ * published by the Free Software Foundation;
+ *
+ * This program is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ * GNU General Public License for more details.
+ *
+ * You should have received a copy of the GNU General Public License
+ * along with this program; if not, write to the Free Software
+ * Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+ */
+
+#include "quad-heap-scheduler.h"
+#include "event-impl.h"
+#include "assert.h"
+#include "log.h"
+
+NS_LOG_COMPONENT_DEFINE ("QuadHeapScheduler");
+
+namespace ns3 {
+
+NS_OBJECT_ENSURE_REGISTERED (QuadHeapScheduler);
+
+TypeId
+QuadHeapScheduler::GetTypeId (void)
+{
+  static TypeId tid = TypeId ("ns3::QuadHeapScheduler")
+    .SetParent<Scheduler> ()
+    .AddConstructor<QuadHeapScheduler> ()
+  ;
+  return tid;
+}
+
+QuadHeapScheduler::QuadHeapScheduler ()
+{
+  NS_LOG_FUNCTION (this);
+  // a simulation keeps thousands of events pending, start with room for them
+  m_heap.reserve (1024);
+}
+
+QuadHeapScheduler::~QuadHeapScheduler ()
+{
+  NS_LOG_FUNCTION (this);
+}
+
+void
+QuadHeapScheduler::BottomUp (uint32_t index, const Event &ev)
+{
+  while (index > 0)
+    {
+      uint32_t parent = (index - 1) / 4;
+      if (!IsLess (ev.key, m_heap[parent].key))
+        {
+          break;
+        }
+      m_heap[index] = m_heap[parent];
+      index = parent;
+    }
+  m_heap[index] = ev;
+}
+
+void
+QuadHeapScheduler::TopDown (uint32_t index, const Event &ev)
+{
+  // ev is usually one of the latest events, which belongs near the
+  // leaves: move the hole down along the smallest children to a leaf
+  // without comparing them with ev, then move ev up from there.
+  uint32_t size = m_heap.size ();
+  while (true)
+    {
+      uint32_t first = 4 * index + 1;
+      if (first >= size)
+        {
+          break;
+        }
+      uint32_t smallest = first;
+      if (first + 4 <= size)
+        {
+          uint32_t a = IsLess (m_heap[first + 1].key, m_heap[first].key) ? first + 1 : first;
+          uint32_t b = IsLess (m_heap[first + 3].key, m_heap[first + 2].key) ? first + 3 : first + 2;
+          smallest = IsLess (m_heap[b].key, m_heap[a].key) ? b : a;
+        }
+      else
+        {
+          for (uint32_t i = first + 1; i < size; i++)
+            {
+              if (IsLess (m_heap[i].key, m_heap[smallest].key))
+                {
+                  smallest = i;
+                }
+            }
+        }
+      m_heap[index] = m_heap[smallest];
+      index = smallest;
+    }
+  BottomUp (index, ev);
+}
+
+void
+QuadHeapScheduler::Insert (const Event &ev)
+{
+  NS_LOG_FUNCTION (this << &ev);
+  m_heap.push_back (ev);
+  BottomUp (m_heap.size () - 1, ev);
+}
+
+bool
+QuadHeapScheduler::IsEmpty (void) const
+{
+  NS_LOG_FUNCTION (this);
+  return m_heap.empty ();
+}
+
+Scheduler::Event
+QuadHeapScheduler::PeekNext (void) const
+{
+  NS_LOG_FUNCTION (this);
+  NS_ASSERT (!m_heap.empty ());
+  return m_heap[0];
+}
+
+Scheduler::Event
+QuadHeapScheduler::RemoveNext (void)
+{
+  NS_LOG_FUNCTION (this);
+  NS_ASSERT (!m_heap.empty ());
+  Event next = m_heap[0];
+  Event last = m_heap.back ();
+  m_heap.pop_back ();
+  if (!m_heap.empty ())
+    {
+      TopDown (0, last);
+    }
+  return next;
+}
+
+void
+QuadHeapScheduler::Remove (const Event &ev)
+{
+  NS_LOG_FUNCTION (this << &ev);
+  uint64_t uid = ev.key.m_uid;
+  for (uint32_t i = 0; i < m_heap.size (); i++)
+    {
+      if (uid == m_heap[i].key.m_uid)
+        {
+          NS_ASSERT (m_heap[i].impl == ev.impl);
+          Event last = m_heap.back ();
+          m_heap.pop_back ();
+          if (i == m_heap.size ())
+            {
+              return;
+            }
+          // the last event may belong above or below the hole
+          if (i > 0 && IsLess (last.key, m_heap[(i - 1) / 4].key))
+            {
+              BottomUp (i, last);
+            }
+          else
+            {
+              TopDown (i, last);
+            }
+          return;
+        }
+    }
+  NS_ASSERT (false);
+}
+
+} // namespace ns3
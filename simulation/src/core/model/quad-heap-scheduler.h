@@ -0,0 +1,71 @@
+/* -*- Mode:C++; c-file-style:"gnu"; indent-tabs-mode:nil; -*- */
+/*
+ * This program is free software; you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License version 2 as
+ * published by the Free Software Foundation;
+ *
+ * This program is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ * GNU General Public License for more details.
+ *
+ * You should have received a copy of the GNU General Public License
+ * along with this program; if not, write to the Free Software
+ * Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+ */
+
+#ifndef QUAD_HEAP_SCHEDULER_H
+#define QUAD_HEAP_SCHEDULER_H
+
+#include "scheduler.h"
+#include <stdint.h>
+#include <vector>
+
+namespace ns3 {
+
+/**
+ * \ingroup scheduler
+ * \brief a 4-ary heap event scheduler
+ *
+ * The events are stored by value in one contiguous array, so, unlike the
+ * MapScheduler, inserting an event does not allocate a tree node, and
+ * the array is only reallocated when the event population grows past its
+ * capacity. The four children of a node are adjacent in the array, so a
+ * step of the top-down heapify compares keys that share one or two cache
+ * lines, and the heap is half as deep as a binary heap.
+ *
+ * Both heapify directions move a hole instead of exchanging elements.
+ * The order of events is the same as with the other schedulers: by
+ * timestamp, then by uid.
+ */
+class QuadHeapScheduler : public Scheduler
+{
+public:
+  static TypeId GetTypeId (void);
+
+  QuadHeapScheduler ();
+  virtual ~QuadHeapScheduler ();
+
+  virtual void Insert (const Event &ev);
+  virtual bool IsEmpty (void) const;
+  virtual Event PeekNext (void) const;
+  virtual Event RemoveNext (void);
+  virtual void Remove (const Event &ev);
+
+private:
+  /* Same order as operator <, with less branches. */
+  static inline bool IsLess (const EventKey &a, const EventKey &b)
+  {
+    return (a.m_ts < b.m_ts) | ((a.m_ts == b.m_ts) & (a.m_uid < b.m_uid));
+  }
+  /* Put ev in the hole at index, moving it towards the root. */
+  void BottomUp (uint32_t index, const Event &ev);
+  /* Put ev in the hole at index, which is in the subtree of index. */
+  void TopDown (uint32_t index, const Event &ev);
+
+  std::vector<Event> m_heap;
+};
+
+} // namespace ns3
+
+#endif /* QUAD_HEAP_SCHEDULER_H */
@@ -813,6 +813,12 @@ RealtimeSimulatorImpl::GetContext (void) const
   return m_currentContext;
 }
 
+uint64_t
+RealtimeSimulatorImpl::GetEventUid (void) const
+{
+  return m_currentUid;
+}
+
 void 
 RealtimeSimulatorImpl::SetSynchronizationMode (enum SynchronizationMode mode)
 {
@@ -73,6 +73,7 @@ public:
   virtual void SetScheduler (ObjectFactory schedulerFactory);
   virtual uint32_t GetSystemId (void) const; 
   virtual uint32_t GetContext (void) const;
+  virtual uint64_t GetEventUid (void) const;
 
   void ScheduleRealtimeWithContext (uint32_t context, Time const &time, EventImpl *event);
   void ScheduleRealtime (Time const &time, EventImpl *event);
@@ -101,8 +102,8 @@ private:
   // The following variables are protected using the m_mutex
   Ptr<Scheduler> m_events;
   int m_unscheduledEvents;
-  uint32_t m_uid;
-  uint32_t m_currentUid;
+  uint64_t m_uid;
+  uint64_t m_currentUid;
   uint64_t m_currentTs;
   uint32_t m_currentContext;
 
@@ -63,7 +63,7 @@ public:
   struct EventKey
   {
     uint64_t m_ts;
-    uint32_t m_uid;
+    uint64_t m_uid;
     uint32_t m_context;
   };
   /** \ingroup events */
@@ -182,6 +182,10 @@ public:
    * \return the current simulation context
    */
   virtual uint32_t GetContext (void) const = 0;
+  /**
+   * \return the uid of the event being run
+   */
+  virtual uint64_t GetEventUid (void) const = 0;
 };
 
 } // namespace ns3
@@ -302,6 +302,12 @@ Simulator::GetContext (void)
   return GetImpl ()->GetContext ();
 }
 
+uint64_t
+Simulator::GetEventUid (void)
+{
+  return GetImpl ()->GetEventUid ();
+}
+
 uint32_t
 Simulator::GetSystemId (void)
 {
@@ -748,6 +748,14 @@ public:
    */
   static uint32_t GetContext (void);
 
+  /**
+   * \returns the uid of the event being run, 0 out of Simulator::Run
+   *
+   * Together with Simulator::Now, it tells the position of the
+   * current event in the order the events run.
+   */
+  static uint64_t GetEventUid (void);
+
   /**
    * \param time delay until the event expires
    * \param event the event to schedule
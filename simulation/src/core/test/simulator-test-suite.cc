@@ -21,6 +21,7 @@
 #include "ns3/simulator.h"
 #include "ns3/list-scheduler.h"
 #include "ns3/heap-scheduler.h"
+#include "ns3/quad-heap-scheduler.h"
 #include "ns3/map-scheduler.h"
 #include "ns3/calendar-scheduler.h"
 
@@ -475,6 +476,8 @@ public:
     AddTestCase (new SimulatorEventsTestCase (factory));
     factory.SetTypeId (CalendarScheduler::GetTypeId ());
     AddTestCase (new SimulatorEventsTestCase (factory));
+    factory.SetTypeId (QuadHeapScheduler::GetTypeId ());
+    AddTestCase (new SimulatorEventsTestCase (factory));
   }
 } g_simulatorTestSuite;
 
@@ -241,7 +241,8 @@ public:
       "ns3::ListScheduler",
       "ns3::HeapScheduler",
       "ns3::MapScheduler",
-      "ns3::CalendarScheduler"
+      "ns3::CalendarScheduler",
+      "ns3::QuadHeapScheduler"
     };
     unsigned int threadcounts[] = {
       0,
@@ -26,6 +26,7 @@
 #include "ns3/node-container.h"
 #include "ns3/ptr.h"
 #include "ns3/pointer.h"
+#include "ns3/boolean.h"
 #include "ns3/assert.h"
 #include "ns3/log.h"
 
@@ -76,6 +77,13 @@ DistributedSimulatorImpl::GetTypeId (void)
   static TypeId tid = TypeId ("ns3::DistributedSimulatorImpl")
     .SetParent<Object> ()
     .AddConstructor<DistributedSimulatorImpl> ()
+    .AddAttribute ("ContextOrder",
+                   "Run the events of the same timestamp by the context that scheduled them "
+                   "(see ContextEventOrder), so that the events of each node run in the same "
+                   "order as with a DefaultSimulatorImpl with the same attribute.",
+                   BooleanValue (false),
+                   MakeBooleanAccessor (&DistributedSimulatorImpl::m_contextOrder),
+                   MakeBooleanChecker ())
   ;
   return tid;
 }
@@ -101,6 +109,7 @@ DistributedSimulatorImpl::DistributedSimulatorImpl ()
   m_uid = 4;
   // before ::Run is entered, the m_currentUid will be zero
   m_currentUid = 0;
+  m_contextOrder = false;
   m_currentTs = 0;
   m_currentContext = 0xffffffff;
   m_unscheduledEvents = 0;
@@ -244,6 +253,11 @@ DistributedSimulatorImpl::ProcessOneEvent (void)
   m_currentContext = next.key.m_context;
   m_currentUid = next.key.m_uid;
   next.impl->Invoke ();
+  if (m_contextOrder)
+    {
+      // mark the event as run for IsExpired
+      next.impl->Cancel ();
+    }
   next.impl->Unref ();
 }
 
@@ -356,8 +370,7 @@ DistributedSimulatorImpl::Schedule (Time const &time, EventImpl *event)
   ev.impl = event;
   ev.key.m_ts = static_cast<uint64_t> (tAbsolute.GetTimeStep ());
   ev.key.m_context = GetContext ();
-  ev.key.m_uid = m_uid;
-  m_uid++;
+  ev.key.m_uid = AllocateUid ();
   m_unscheduledEvents++;
   m_events->Insert (ev);
   return EventId (event, ev.key.m_ts, ev.key.m_context, ev.key.m_uid);
@@ -372,8 +385,28 @@ DistributedSimulatorImpl::ScheduleWithContext (uint32_t context, Time const &tim
   ev.impl = event;
   ev.key.m_ts = m_currentTs + time.GetTimeStep ();
   ev.key.m_context = context;
-  ev.key.m_uid = m_uid;
-  m_uid++;
+  ev.key.m_uid = AllocateUid ();
+  m_unscheduledEvents++;
+  m_events->Insert (ev);
+}
+
+uint64_t
+DistributedSimulatorImpl::AllocateRemoteUid (void)
+{
+  return m_contextOrder ? m_order.Allocate (m_currentContext) : 0;
+}
+
+void
+DistributedSimulatorImpl::ScheduleRemote (uint32_t context, uint64_t ts, uint64_t uid, EventImpl *event)
+{
+  NS_LOG_FUNCTION (this << context << ts << uid << event);
+  NS_ASSERT (ts >= m_currentTs);
+
+  Scheduler::Event ev;
+  ev.impl = event;
+  ev.key.m_ts = ts;
+  ev.key.m_context = context;
+  ev.key.m_uid = uid != 0 ? uid : AllocateUid ();
   m_unscheduledEvents++;
   m_events->Insert (ev);
 }
@@ -385,8 +418,7 @@ DistributedSimulatorImpl::ScheduleNow (EventImpl *event)
   ev.impl = event;
   ev.key.m_ts = m_currentTs;
   ev.key.m_context = GetContext ();
-  ev.key.m_uid = m_uid;
-  m_uid++;
+  ev.key.m_uid = AllocateUid ();
   m_unscheduledEvents++;
   m_events->Insert (ev);
   return EventId (event, ev.key.m_ts, ev.key.m_context, ev.key.m_uid);
@@ -482,6 +514,15 @@ DistributedSimulatorImpl::IsExpired (const EventId &ev) const
         }
       return true;
     }
+  if (m_contextOrder)
+    {
+      // the events of the current timestamp do not run by increasing uid,
+      // ProcessOneEvent cancels them once they have run
+      return ev.PeekEventImpl () == 0
+             || ev.GetTs () < m_currentTs
+             || ev.GetUid () == m_currentUid
+             || ev.PeekEventImpl ()->IsCancelled ();
+    }
   if (ev.PeekEventImpl () == 0
       || ev.GetTs () < m_currentTs
       || (ev.GetTs () == m_currentTs
@@ -510,4 +551,10 @@ DistributedSimulatorImpl::GetContext (void) const
   return m_currentContext;
 }
 
+uint64_t
+DistributedSimulatorImpl::GetEventUid (void) const
+{
+  return m_currentUid;
+}
+
 } // namespace ns3
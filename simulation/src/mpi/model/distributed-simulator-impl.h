@@ -22,6 +22,7 @@
 #include "ns3/simulator-impl.h"
 #include "ns3/scheduler.h"
 #include "ns3/event-impl.h"
+#include "ns3/context-event-order.h"
 #include "ns3/ptr.h"
 
 #include <list>
@@ -115,12 +116,33 @@ public:
   virtual void SetScheduler (ObjectFactory schedulerFactory);
   virtual uint32_t GetSystemId (void) const;
   virtual uint32_t GetContext (void) const;
+  virtual uint64_t GetEventUid (void) const;
+
+  /**
+   * \return the uid of an event that the current event schedules on
+   *          another rank, or 0 if the receiver picks the uid
+   *
+   * With ContextOrder, sending a packet to another rank takes the uid
+   * that scheduling its reception locally would have taken.
+   */
+  uint64_t AllocateRemoteUid (void);
+  /**
+   * \param context the context of the event
+   * \param ts the absolute time of the event
+   * \param uid the uid from AllocateRemoteUid on the sending rank
+   * \param event the event received from another rank
+   */
+  void ScheduleRemote (uint32_t context, uint64_t ts, uint64_t uid, EventImpl *event);
 
 private:
   virtual void DoDispose (void);
   void CalculateLookAhead (void);
 
   void ProcessOneEvent (void);
+  uint64_t AllocateUid (void)
+  {
+    return m_contextOrder ? m_order.Allocate (m_currentContext) : m_uid++;
+  }
   uint64_t NextTs (void) const;
   Time Next (void) const;
   typedef std::list<EventId> DestroyEvents;
@@ -128,8 +150,10 @@ private:
   DestroyEvents m_destroyEvents;
   bool m_stop;
   Ptr<Scheduler> m_events;
-  uint32_t m_uid;
-  uint32_t m_currentUid;
+  uint64_t m_uid;
+  uint64_t m_currentUid;
+  bool m_contextOrder;
+  ContextEventOrder m_order;
   uint64_t m_currentTs;
   uint32_t m_currentContext;
   // number of events that have been inserted but not yet scheduled,
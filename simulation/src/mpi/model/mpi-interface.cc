@@ -25,6 +25,7 @@
 
 #include "mpi-interface.h"
 #include "mpi-receiver.h"
+#include "distributed-simulator-impl.h"
 
 #include "ns3/node.h"
 #include "ns3/node-list.h"
@@ -32,6 +33,8 @@
 #include "ns3/simulator.h"
 #include "ns3/simulator-impl.h"
 #include "ns3/nstime.h"
+#include "ns3/make-event.h"
+#include "ns3/abort.h"
 
 #ifdef NS3_MPI
 #include <mpi.h>
@@ -177,12 +180,16 @@ MpiInterface::SendPacket (Ptr<Packet> p, const Time& rxTime, uint32_t node, uint
   std::list<SentBuffer>::reverse_iterator i = m_pendingTx.rbegin (); // Points to the last element
 
   uint32_t serializedSize = p->GetSerializedSize ();
-  uint8_t* buffer =  new uint8_t[serializedSize + 16];
+  NS_ABORT_MSG_IF (serializedSize + 24 > MAX_MPI_MSG_SIZE,
+                   "packet of " << serializedSize << " bytes does not fit in an MPI message");
+  uint8_t* buffer =  new uint8_t[serializedSize + 24];
   i->SetBuffer (buffer);
-  // Add the time, dest node and dest device
+  // Add the time, the uid of the rx event, dest node and dest device
   uint64_t t = rxTime.GetNanoSeconds ();
+  uint64_t uid = DynamicCast<DistributedSimulatorImpl> (Simulator::GetImplementation ())->AllocateRemoteUid ();
   uint64_t* pTime = reinterpret_cast <uint64_t *> (buffer);
   *pTime++ = t;
+  *pTime++ = uid;
   uint32_t* pData = reinterpret_cast<uint32_t *> (pTime);
   *pData++ = node;
   *pData++ = dev;
@@ -193,7 +200,7 @@ MpiInterface::SendPacket (Ptr<Packet> p, const Time& rxTime, uint32_t node, uint
   Ptr<Node> destNode = NodeList::GetNode (node);
   uint32_t nodeSysId = destNode->GetSystemId ();
 
-  MPI_Isend (reinterpret_cast<void *> (i->GetBuffer ()), serializedSize + 16, MPI_CHAR, nodeSysId,
+  MPI_Isend (reinterpret_cast<void *> (i->GetBuffer ()), serializedSize + 24, MPI_CHAR, nodeSysId,
              0, MPI_COMM_WORLD, (i->GetRequest ()));
   m_txCount++;
 #else
@@ -223,13 +230,14 @@ MpiInterface::ReceiveMessages ()
       // Get the meta data first
       uint64_t* pTime = reinterpret_cast<uint64_t *> (m_pRxBuffers[index]);
       uint64_t nanoSeconds = *pTime++;
+      uint64_t uid = *pTime++;
       uint32_t* pData = reinterpret_cast<uint32_t *> (pTime);
       uint32_t node = *pData++;
       uint32_t dev  = *pData++;
 
       Time rxTime = NanoSeconds (nanoSeconds);
 
-      count -= sizeof (nanoSeconds) + sizeof (node) + sizeof (dev);
+      count -= sizeof (nanoSeconds) + sizeof (uid) + sizeof (node) + sizeof (dev);
 
       Ptr<Packet> p = Create<Packet> (reinterpret_cast<uint8_t *> (pData), count, true);
 
@@ -249,9 +257,10 @@ MpiInterface::ReceiveMessages ()
 
       NS_ASSERT (pNode && pMpiRec);
 
-      // Schedule the rx event
-      Simulator::ScheduleWithContext (pNode->GetId (), rxTime - Simulator::Now (),
-                                      &MpiReceiver::Receive, pMpiRec, p);
+      // Schedule the rx event, with the uid the sender allocated for it
+      DynamicCast<DistributedSimulatorImpl> (Simulator::GetImplementation ())
+        ->ScheduleRemote (pNode->GetId (), rxTime.GetTimeStep (), uid,
+                          MakeEvent (&MpiReceiver::Receive, pMpiRec, p));
 
       // Re-queue the next read
       MPI_Irecv (m_pRxBuffers[index], MAX_MPI_MSG_SIZE, MPI_CHAR, MPI_ANY_SOURCE, 0,
@@ -284,6 +293,16 @@ MpiInterface::TestSendComplete ()
 #endif
 }
 
+void
+MpiInterface::Barrier ()
+{
+#ifdef NS3_MPI
+  MPI_Barrier (MPI_COMM_WORLD);
+#else
+  NS_FATAL_ERROR ("Can't use distributed simulator without MPI compiled in");
+#endif
+}
+
 void 
 MpiInterface::Disable ()
 {
@@ -118,6 +118,11 @@ public:
    * It also resets m_initialized, m_enabled
    */
   static void Disable ();
+  /**
+   * Wait until all the systems call Barrier, e.g. to read the
+   * files they wrote
+   */
+  static void Barrier ();
   /**
    * \param p packet to send
    * \param rxTime received time at destination node
@@ -0,0 +1,600 @@
+/* -*- Mode:C++; c-file-style:"gnu"; indent-tabs-mode:nil; -*- */
+/*
+ * This program is free software; you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License version 2 as
+ * published by the Free Software Foundation;
+ *
+ * This program is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ * GNU General Public License for more details.
+ *
+ * You should have received a copy of the GNU General Public License
+ * along with this program; if not, write to the Free Software
+ * Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+ */
+
+#include "parallel-simulator-impl.h"
+
+#include "ns3/simulator.h"
+#include "ns3/scheduler.h"
+#include "ns3/event-impl.h"
+#include "ns3/system-thread.h"
+#include "ns3/channel.h"
+#include "ns3/channel-list.h"
+#include "ns3/node.h"
+#include "ns3/node-list.h"
+#include "ns3/nstime.h"
+#include "ns3/abort.h"
+#include "ns3/assert.h"
+#include "ns3/log.h"
+
+#include <sched.h>
+
+NS_LOG_COMPONENT_DEFINE ("ParallelSimulatorImpl");
+
+namespace ns3 {
+
+NS_OBJECT_ENSURE_REGISTERED (ParallelSimulatorImpl);
+
+namespace {
+// the partition of the events run by the current thread
+thread_local uint32_t g_partition = 0;
+const uint64_t NO_EVENT = ~(uint64_t)0;
+}
+
+void
+ParallelSimulatorImpl::Barrier::Init (uint32_t n)
+{
+  m_n = n;
+  m_count = 0;
+  m_generation = 0;
+}
+
+void
+ParallelSimulatorImpl::Barrier::Wait (void)
+{
+  uint32_t generation = m_generation.load (std::memory_order_acquire);
+  if (m_count.fetch_add (1, std::memory_order_acq_rel) + 1 == m_n)
+    {
+      m_count.store (0, std::memory_order_relaxed);
+      m_generation.fetch_add (1, std::memory_order_release);
+      return;
+    }
+  // the windows are short, spin first; yield so that more threads than
+  // cores still make progress
+  uint32_t spins = 0;
+  while (m_generation.load (std::memory_order_acquire) == generation)
+    {
+      if (++spins > 2000)
+        {
+          sched_yield ();
+        }
+    }
+}
+
+TypeId
+ParallelSimulatorImpl::GetTypeId (void)
+{
+  static TypeId tid = TypeId ("ns3::ParallelSimulatorImpl")
+    .SetParent<SimulatorImpl> ()
+    .AddConstructor<ParallelSimulatorImpl> ()
+  ;
+  return tid;
+}
+
+ParallelSimulatorImpl::ParallelSimulatorImpl ()
+{
+  NS_LOG_FUNCTION (this);
+  m_stop = false;
+  m_lookAhead = NO_EVENT;
+  m_windowEnd = 0;
+  m_inWindow = false;
+  m_quit = false;
+  // until Run splits the nodes, all the events are in partition 0
+  m_partitions.resize (1);
+  m_partitions[0].currentTs = 0;
+  // before ::Run is entered, the current uid is zero
+  m_partitions[0].currentUid = 0;
+  m_partitions[0].currentContext = 0xffffffff;
+  g_partition = 0;
+}
+
+ParallelSimulatorImpl::~ParallelSimulatorImpl ()
+{
+  NS_LOG_FUNCTION (this);
+}
+
+void
+ParallelSimulatorImpl::DoDispose (void)
+{
+  NS_LOG_FUNCTION (this);
+  for (uint32_t i = 0; i < m_partitions.size (); i++)
+    {
+      Ptr<Scheduler> events = m_partitions[i].events;
+      while (events != 0 && !events->IsEmpty ())
+        {
+          Scheduler::Event next = events->RemoveNext ();
+          next.impl->Unref ();
+        }
+      m_partitions[i].events = 0;
+    }
+  SimulatorImpl::DoDispose ();
+}
+
+void
+ParallelSimulatorImpl::Destroy ()
+{
+  NS_LOG_FUNCTION (this);
+  while (!m_destroyEvents.empty ())
+    {
+      Ptr<EventImpl> ev = m_destroyEvents.front ().PeekEventImpl ();
+      m_destroyEvents.pop_front ();
+      NS_LOG_LOGIC ("handle destroy " << ev);
+      if (!ev->IsCancelled ())
+        {
+          ev->Invoke ();
+        }
+    }
+}
+
+void
+ParallelSimulatorImpl::SetScheduler (ObjectFactory schedulerFactory)
+{
+  NS_LOG_FUNCTION (this << schedulerFactory);
+  m_schedulerFactory = schedulerFactory;
+  for (uint32_t i = 0; i < m_partitions.size (); i++)
+    {
+      Ptr<Scheduler> scheduler = schedulerFactory.Create<Scheduler> ();
+      Ptr<Scheduler> events = m_partitions[i].events;
+      while (events != 0 && !events->IsEmpty ())
+        {
+          scheduler->Insert (events->RemoveNext ());
+        }
+      m_partitions[i].events = scheduler;
+    }
+}
+
+uint32_t
+ParallelSimulatorImpl::GetSystemId (void) const
+{
+  // the global events run on the thread of system 0
+  return g_partition == 0 ? 0 : g_partition - 1;
+}
+
+void
+ParallelSimulatorImpl::Partitions (void)
+{
+  NS_LOG_FUNCTION (this);
+  uint32_t systems = 1;
+  m_nodePartition.resize (NodeList::GetNNodes ());
+  for (uint32_t i = 0; i < NodeList::GetNNodes (); i++)
+    {
+      uint32_t systemId = NodeList::GetNode (i)->GetSystemId ();
+      m_nodePartition[i] = systemId + 1;
+      systems = std::max (systems, systemId + 1);
+    }
+  m_partitions.resize (systems + 1);
+  for (uint32_t i = 0; i <= systems; i++)
+    {
+      Partition &p = m_partitions[i];
+      if (i > 0)
+        {
+          p.events = m_schedulerFactory.Create<Scheduler> ();
+          p.currentTs = m_partitions[0].currentTs;
+          p.currentUid = 0;
+          p.currentContext = 0xffffffff;
+        }
+      p.outbox.resize (systems + 1);
+    }
+
+  // move the events scheduled for the nodes
+  std::vector<Scheduler::Event> global;
+  while (!m_partitions[0].events->IsEmpty ())
+    {
+      Scheduler::Event ev = m_partitions[0].events->RemoveNext ();
+      uint32_t to = PartitionOf (ev.key.m_context);
+      if (to == 0)
+        {
+          global.push_back (ev);
+        }
+      else
+        {
+          m_partitions[to].events->Insert (ev);
+        }
+    }
+  for (uint32_t i = 0; i < global.size (); i++)
+    {
+      m_partitions[0].events->Insert (global[i]);
+    }
+  CalculateLookAhead ();
+}
+
+void
+ParallelSimulatorImpl::CalculateLookAhead (void)
+{
+  m_lookAhead = NO_EVENT;
+  for (uint32_t i = 0; i < ChannelList::GetNChannels (); i++)
+    {
+      Ptr<Channel> channel = ChannelList::GetChannel (i);
+      bool cross = false;
+      for (uint32_t j = 1; j < channel->GetNDevices (); j++)
+        {
+          cross |= channel->GetDevice (j)->GetNode ()->GetSystemId () != channel->GetDevice (0)->GetNode ()->GetSystemId ();
+        }
+      if (!cross)
+        {
+          continue;
+        }
+      TimeValue delay;
+      if (!channel->GetAttributeFailSafe ("Delay", delay))
+        {
+          NS_FATAL_ERROR ("Channel " << i << " links nodes of different systems and has no Delay");
+        }
+      NS_ABORT_MSG_IF (delay.Get ().GetTimeStep () <= 0, "Channel " << i << " links nodes of different systems with no delay");
+      m_lookAhead = std::min (m_lookAhead, (uint64_t)delay.Get ().GetTimeStep ());
+    }
+  NS_LOG_INFO ("lookahead " << m_lookAhead << " with " << m_partitions.size () - 1 << " threads");
+}
+
+void
+ParallelSimulatorImpl::Insert (uint32_t context, uint64_t ts, uint64_t uid, EventImpl *event)
+{
+  Scheduler::Event ev;
+  ev.impl = event;
+  ev.key.m_ts = ts;
+  ev.key.m_context = context;
+  ev.key.m_uid = uid;
+  uint32_t to = PartitionOf (context);
+  if (to == g_partition || !m_inWindow)
+    {
+      m_partitions[to].events->Insert (ev);
+    }
+  else
+    {
+      NS_ASSERT_MSG (ts >= m_windowEnd, "An event for another thread is earlier than the lookahead");
+      m_partitions[g_partition].outbox[to].push_back (ev);
+    }
+}
+
+void
+ParallelSimulatorImpl::ProcessOneEvent (Partition &p)
+{
+  Scheduler::Event next = p.events->RemoveNext ();
+
+  NS_ASSERT (next.key.m_ts >= p.currentTs);
+  NS_LOG_LOGIC ("handle " << next.key.m_ts);
+  p.currentTs = next.key.m_ts;
+  p.currentContext = next.key.m_context;
+  p.currentUid = next.key.m_uid;
+  next.impl->Invoke ();
+  // mark the event as run for IsExpired
+  next.impl->Cancel ();
+  next.impl->Unref ();
+}
+
+void
+ParallelSimulatorImpl::ProcessWindow (uint32_t index)
+{
+  Partition &p = m_partitions[index];
+  while (!p.events->IsEmpty () && p.events->PeekNext ().key.m_ts < m_windowEnd)
+    {
+      ProcessOneEvent (p);
+    }
+}
+
+void
+ParallelSimulatorImpl::DrainOutboxes (uint32_t index)
+{
+  Partition &p = m_partitions[index];
+  for (uint32_t i = 0; i < m_partitions.size (); i++)
+    {
+      std::vector<Scheduler::Event> &box = m_partitions[i].outbox[index];
+      for (uint32_t j = 0; j < box.size (); j++)
+        {
+          p.events->Insert (box[j]);
+        }
+      box.clear ();
+    }
+}
+
+void
+ParallelSimulatorImpl::RunTimestamp (uint64_t ts)
+{
+  // the events of ts of all partitions, in order, on this thread
+  while (!m_stop)
+    {
+      uint32_t next = 0;
+      uint64_t nextUid = NO_EVENT;
+      for (uint32_t i = 0; i < m_partitions.size (); i++)
+        {
+          Ptr<Scheduler> events = m_partitions[i].events;
+          if (!events->IsEmpty ())
+            {
+              Scheduler::Event ev = events->PeekNext ();
+              if (ev.key.m_ts == ts && ev.key.m_uid < nextUid)
+                {
+                  next = i;
+                  nextUid = ev.key.m_uid;
+                }
+            }
+        }
+      if (nextUid == NO_EVENT)
+        {
+          break;
+        }
+      g_partition = next;
+      ProcessOneEvent (m_partitions[next]);
+    }
+  g_partition = 0;
+  m_partitions[0].currentTs = ts;
+}
+
+void
+ParallelSimulatorImpl::Worker (void)
+{
+  uint32_t index = m_nextWorker++;
+  g_partition = index;
+  while (true)
+    {
+      m_barrier.Wait ();
+      if (m_quit)
+        {
+          break;
+        }
+      ProcessWindow (index);
+      m_barrier.Wait ();
+      DrainOutboxes (index);
+      m_barrier.Wait ();
+    }
+}
+
+bool
+ParallelSimulatorImpl::IsFinished (void) const
+{
+  if (m_stop)
+    {
+      return true;
+    }
+  for (uint32_t i = 0; i < m_partitions.size (); i++)
+    {
+      if (!m_partitions[i].events->IsEmpty ())
+        {
+          return false;
+        }
+    }
+  return true;
+}
+
+void
+ParallelSimulatorImpl::Run (void)
+{
+  NS_LOG_FUNCTION (this);
+  NS_ASSERT_MSG (g_partition == 0, "Simulator::Run must be called by the main thread");
+  if (m_partitions.size () == 1)
+    {
+      Partitions ();
+    }
+  m_stop = false;
+
+  uint32_t n = m_partitions.size ();
+  m_quit = false;
+  m_barrier.Init (n - 1);
+  // the thread of Run runs partition 1, the workers take the next ones
+  m_nextWorker = 2;
+  for (uint32_t i = 2; i < n; i++)
+    {
+      m_threads.push_back (new SystemThread (MakeCallback (&ParallelSimulatorImpl::Worker, this)));
+      m_threads.back ()->Start ();
+    }
+
+  while (!m_stop)
+    {
+      uint64_t next = NO_EVENT;
+      for (uint32_t i = 1; i < n; i++)
+        {
+          if (!m_partitions[i].events->IsEmpty ())
+            {
+              next = std::min (next, m_partitions[i].events->PeekNext ().key.m_ts);
+            }
+        }
+      uint64_t global = m_partitions[0].events->IsEmpty () ? NO_EVENT : m_partitions[0].events->PeekNext ().key.m_ts;
+      if (global <= next)
+        {
+          if (global == NO_EVENT)
+            {
+              break;
+            }
+          RunTimestamp (global);
+          continue;
+        }
+      // the nodes run in parallel up to the lookahead, or the next global event
+      m_windowEnd = next + std::min (m_lookAhead, global - next);
+      m_inWindow = true;
+      m_barrier.Wait ();
+      g_partition = 1;
+      ProcessWindow (1);
+      m_barrier.Wait ();
+      m_inWindow = false;
+      DrainOutboxes (1);
+      g_partition = 0;
+      DrainOutboxes (0);
+      m_barrier.Wait ();
+    }
+
+  m_quit = true;
+  m_barrier.Wait ();
+  for (uint32_t i = 0; i < m_threads.size (); i++)
+    {
+      m_threads[i]->Join ();
+      delete m_threads[i];
+    }
+  m_threads.clear ();
+}
+
+void
+ParallelSimulatorImpl::Stop (void)
+{
+  NS_LOG_FUNCTION (this);
+  m_stop = true;
+}
+
+void
+ParallelSimulatorImpl::Stop (Time const &time)
+{
+  NS_LOG_FUNCTION (this << time.GetTimeStep ());
+  Simulator::Schedule (time, &Simulator::Stop);
+}
+
+EventId
+ParallelSimulatorImpl::Schedule (Time const &time, EventImpl *event)
+{
+  NS_LOG_FUNCTION (this << time.GetTimeStep () << event);
+  Partition &p = m_partitions[g_partition];
+  Time tAbsolute = time + TimeStep (p.currentTs);
+
+  NS_ASSERT (tAbsolute.IsPositive ());
+  NS_ASSERT (tAbsolute >= TimeStep (p.currentTs));
+  uint64_t ts = (uint64_t) tAbsolute.GetTimeStep ();
+  uint64_t uid = p.order.Allocate (p.currentContext);
+  Insert (p.currentContext, ts, uid, event);
+  return EventId (event, ts, p.currentContext, uid);
+}
+
+void
+ParallelSimulatorImpl::ScheduleWithContext (uint32_t context, Time const &time, EventImpl *event)
+{
+  NS_LOG_FUNCTION (this << context << time.GetTimeStep () << event);
+  Partition &p = m_partitions[g_partition];
+  Time tAbsolute = time + TimeStep (p.currentTs);
+  Insert (context, (uint64_t) tAbsolute.GetTimeStep (), p.order.Allocate (p.currentContext), event);
+}
+
+EventId
+ParallelSimulatorImpl::ScheduleNow (EventImpl *event)
+{
+  Partition &p = m_partitions[g_partition];
+  uint64_t uid = p.order.Allocate (p.currentContext);
+  Insert (p.currentContext, p.currentTs, uid, event);
+  return EventId (event, p.currentTs, p.currentContext, uid);
+}
+
+EventId
+ParallelSimulatorImpl::ScheduleDestroy (EventImpl *event)
+{
+  NS_ASSERT_MSG (g_partition == 0 && !m_inWindow, "Simulator::ScheduleDestroy from a node of a ParallelSimulatorImpl");
+  EventId id (Ptr<EventImpl> (event, false), m_partitions[0].currentTs, 0xffffffff, 2);
+  m_destroyEvents.push_back (id);
+  return id;
+}
+
+Time
+ParallelSimulatorImpl::Now (void) const
+{
+  // Do not add function logging here, to avoid stack overflow
+  return TimeStep (m_partitions[g_partition].currentTs);
+}
+
+Time
+ParallelSimulatorImpl::GetDelayLeft (const EventId &id) const
+{
+  if (IsExpired (id))
+    {
+      return TimeStep (0);
+    }
+  else
+    {
+      return TimeStep (id.GetTs () - m_partitions[g_partition].currentTs);
+    }
+}
+
+void
+ParallelSimulatorImpl::Remove (const EventId &id)
+{
+  if (id.GetUid () == 2)
+    {
+      // destroy events.
+      for (DestroyEvents::iterator i = m_destroyEvents.begin (); i != m_destroyEvents.end (); i++)
+        {
+          if (*i == id)
+            {
+              m_destroyEvents.erase (i);
+              break;
+            }
+        }
+      return;
+    }
+  if (IsExpired (id))
+    {
+      return;
+    }
+  uint32_t from = PartitionOf (id.GetContext ());
+  NS_ASSERT_MSG (from == g_partition || !m_inWindow, "Simulator::Remove of an event of another thread");
+  Scheduler::Event event;
+  event.impl = id.PeekEventImpl ();
+  event.key.m_ts = id.GetTs ();
+  event.key.m_context = id.GetContext ();
+  event.key.m_uid = id.GetUid ();
+  m_partitions[from].events->Remove (event);
+  event.impl->Cancel ();
+  // whenever we remove an event from the event list, we have to unref it.
+  event.impl->Unref ();
+}
+
+void
+ParallelSimulatorImpl::Cancel (const EventId &id)
+{
+  if (!IsExpired (id))
+    {
+      id.PeekEventImpl ()->Cancel ();
+    }
+}
+
+bool
+ParallelSimulatorImpl::IsExpired (const EventId &ev) const
+{
+  if (ev.GetUid () == 2)
+    {
+      if (ev.PeekEventImpl () == 0 ||
+          ev.PeekEventImpl ()->IsCancelled ())
+        {
+          return true;
+        }
+      // destroy events.
+      for (DestroyEvents::const_iterator i = m_destroyEvents.begin (); i != m_destroyEvents.end (); i++)
+        {
+          if (*i == ev)
+            {
+              return false;
+            }
+        }
+      return true;
+    }
+  // the events of the current timestamp do not run by increasing uid,
+  // ProcessOneEvent cancels them once they have run
+  const Partition &p = m_partitions[g_partition];
+  return ev.PeekEventImpl () == 0 ||
+         ev.GetTs () < p.currentTs ||
+         ev.GetUid () == p.currentUid ||
+         ev.PeekEventImpl ()->IsCancelled ();
+}
+
+Time
+ParallelSimulatorImpl::GetMaximumSimulationTime (void) const
+{
+  return TimeStep (0x7fffffffffffffffLL);
+}
+
+uint32_t
+ParallelSimulatorImpl::GetContext (void) const
+{
+  return m_partitions[g_partition].currentContext;
+}
+
+uint64_t
+ParallelSimulatorImpl::GetEventUid (void) const
+{
+  return m_partitions[g_partition].currentUid;
+}
+
+} // namespace ns3
@@ -0,0 +1,152 @@
+/* -*- Mode:C++; c-file-style:"gnu"; indent-tabs-mode:nil; -*- */
+/*
+ * This program is free software; you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License version 2 as
+ * published by the Free Software Foundation;
+ *
+ * This program is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ * GNU General Public License for more details.
+ *
+ * You should have received a copy of the GNU General Public License
+ * along with this program; if not, write to the Free Software
+ * Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+ */
+
+#ifndef PARALLEL_SIMULATOR_IMPL_H
+#define PARALLEL_SIMULATOR_IMPL_H
+
+#include "ns3/simulator-impl.h"
+#include "ns3/scheduler.h"
+#include "ns3/event-impl.h"
+#include "ns3/context-event-order.h"
+#include "ns3/object-factory.h"
+#include "ns3/ptr.h"
+
+#include <atomic>
+#include <list>
+#include <vector>
+
+namespace ns3 {
+
+class SystemThread;
+
+/**
+ * \ingroup mpi
+ *
+ * \brief simulator implementation that runs the nodes on threads, with
+ * conservative time windows
+ *
+ * The nodes are split among the threads by their system id: the nodes of
+ * system id k run on thread k, thread 0 being the one that calls Run. The
+ * lookahead is the smallest "Delay" of the channels between nodes of
+ * different systems. From the earliest pending event at T, the threads run
+ * the events of their nodes before T + lookahead in parallel: an event that
+ * a node schedules for a node of another thread is at least one lookahead
+ * later, so it is put in the outbox of the target thread, a buffer that
+ * only the sending thread writes during the window and only the target
+ * thread reads after it, and needs no lock.
+ *
+ * The events out of any node (context 0xffffffff, like the ones scheduled
+ * before Run) may read or change the state of all nodes: a window ends at
+ * the earliest of them, and the events of that timestamp then run on the
+ * calling thread, in order.
+ *
+ * The simultaneous events run in the order of ContextEventOrder, so each
+ * node runs the same events in the same order as with a DefaultSimulatorImpl
+ * with ContextOrder, with any number of threads. The models must not share
+ * state between the nodes of different threads; in particular a channel
+ * between two threads must not share the packet with the receiver, see
+ * QbbChannel::TransmitStart.
+ *
+ * Stop (void) called by a node takes effect at the end of the window, and
+ * Remove of an event of another thread is not supported.
+ */
+class ParallelSimulatorImpl : public SimulatorImpl
+{
+public:
+  static TypeId GetTypeId (void);
+
+  ParallelSimulatorImpl ();
+  ~ParallelSimulatorImpl ();
+
+  // virtual from SimulatorImpl
+  virtual void Destroy ();
+  virtual bool IsFinished (void) const;
+  virtual void Stop (void);
+  virtual void Stop (Time const &time);
+  virtual EventId Schedule (Time const &time, EventImpl *event);
+  virtual void ScheduleWithContext (uint32_t context, Time const &time, EventImpl *event);
+  virtual EventId ScheduleNow (EventImpl *event);
+  virtual EventId ScheduleDestroy (EventImpl *event);
+  virtual void Remove (const EventId &ev);
+  virtual void Cancel (const EventId &ev);
+  virtual bool IsExpired (const EventId &ev) const;
+  virtual void Run (void);
+  virtual Time Now (void) const;
+  virtual Time GetDelayLeft (const EventId &id) const;
+  virtual Time GetMaximumSimulationTime (void) const;
+  virtual void SetScheduler (ObjectFactory schedulerFactory);
+  virtual uint32_t GetSystemId (void) const;
+  virtual uint32_t GetContext (void) const;
+  virtual uint64_t GetEventUid (void) const;
+
+private:
+  /* The events of the nodes of one thread, or of the global events. */
+  struct Partition
+  {
+    Ptr<Scheduler> events;
+    ContextEventOrder order; // uids of the events scheduled by the contexts of this partition
+    uint64_t currentTs;
+    uint64_t currentUid;
+    uint32_t currentContext;
+    std::vector<std::vector<Scheduler::Event> > outbox; // events for each other partition, during a window
+  };
+
+  /* Sense-reversing barrier of the threads, which spins, then yields. */
+  class Barrier
+  {
+public:
+    void Init (uint32_t n);
+    void Wait (void);
+private:
+    uint32_t m_n;
+    std::atomic<uint32_t> m_count;
+    std::atomic<uint32_t> m_generation;
+  };
+
+  virtual void DoDispose (void);
+  void Partitions (void);
+  void CalculateLookAhead (void);
+  uint32_t PartitionOf (uint32_t context) const
+  {
+    return context < m_nodePartition.size () ? m_nodePartition[context] : 0;
+  }
+  void Insert (uint32_t context, uint64_t ts, uint64_t uid, EventImpl *event);
+  void ProcessOneEvent (Partition &p);
+  void ProcessWindow (uint32_t index);
+  void DrainOutboxes (uint32_t index);
+  void RunTimestamp (uint64_t ts);
+  void Worker (void);
+
+  typedef std::list<EventId> DestroyEvents;
+
+  DestroyEvents m_destroyEvents;
+  std::atomic<bool> m_stop;
+  ObjectFactory m_schedulerFactory;
+  // partition 0 has the global events, partition k + 1 the nodes of system id k
+  std::vector<Partition> m_partitions;
+  std::vector<uint32_t> m_nodePartition; // partition of each node, by context
+  uint64_t m_lookAhead;
+  uint64_t m_windowEnd;
+  bool m_inWindow;
+  bool m_quit;
+  Barrier m_barrier;
+  std::vector<SystemThread *> m_threads;
+  std::atomic<uint32_t> m_nextWorker;
+};
+
+} // namespace ns3
+
+#endif /* PARALLEL_SIMULATOR_IMPL_H */
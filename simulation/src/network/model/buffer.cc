@@ -46,7 +46,7 @@ static struct Zeroes
 namespace ns3 {
 
 
-uint32_t Buffer::g_recommendedStart = 0;
+thread_local uint32_t Buffer::g_recommendedStart = 0;
 #ifdef BUFFER_FREE_LIST
 /* The following macros are pretty evil but they are needed to allow us to
  * keep track of 3 possible states for the g_freeList variable:
@@ -136,18 +136,78 @@ Buffer::Create (uint32_t dataSize)
   return data;
 }
 #else /* BUFFER_FREE_LIST */
+namespace {
+// with the pool enabled, data sizes are rounded up to classes of
+// POOL_GRANULARITY bytes, and the freed data of the first POOL_CLASSES
+// classes is kept for reuse
+const uint32_t POOL_GRANULARITY = 64;
+const uint32_t POOL_CLASSES = 32;
+struct FreeData
+{
+  FreeData *next;
+};
+FreeData *g_freeData[POOL_CLASSES];
+bool g_poolEnabled = false;
+} // anonymous namespace
+
 void
 Buffer::Recycle (struct Buffer::Data *data)
 {
   NS_ASSERT (data->m_count == 0);
+  // a buffer allocated before the pool was enabled may not fill its class
+  if (g_poolEnabled && data->m_size % POOL_GRANULARITY == 0
+      && data->m_size / POOL_GRANULARITY <= POOL_CLASSES)
+    {
+      uint32_t c = data->m_size / POOL_GRANULARITY - 1;
+      FreeData *free = reinterpret_cast<FreeData *> (data);
+      free->next = g_freeData[c];
+      g_freeData[c] = free;
+      return;
+    }
   Deallocate (data);
 }
 
 Buffer::Data *
 Buffer::Create (uint32_t size)
 {
+  if (g_poolEnabled)
+    {
+      uint32_t c = size == 0 ? 0 : (size - 1) / POOL_GRANULARITY;
+      if (c < POOL_CLASSES)
+        {
+          FreeData *free = g_freeData[c];
+          if (free == 0)
+            {
+              return Allocate ((c + 1) * POOL_GRANULARITY);
+            }
+          g_freeData[c] = free->next;
+          struct Buffer::Data *data = reinterpret_cast<struct Buffer::Data *> (free);
+          data->m_count = 1;
+          data->m_size = (c + 1) * POOL_GRANULARITY;
+          return data;
+        }
+    }
   return Allocate (size);
 }
+
+void
+Buffer::SetPoolEnabled (bool enabled)
+{
+  NS_LOG_FUNCTION (enabled);
+  g_poolEnabled = enabled;
+  if (!enabled)
+    {
+      for (uint32_t c = 0; c < POOL_CLASSES; c++)
+        {
+          while (g_freeData[c] != 0)
+            {
+              FreeData *free = g_freeData[c];
+              g_freeData[c] = free->next;
+              delete [] reinterpret_cast<uint8_t *> (free);
+            }
+        }
+    }
+}
 #endif /* BUFFER_FREE_LIST */
 
 struct Buffer::Data *
@@ -525,6 +525,15 @@ private:
 
   uint8_t* GetBuffer() const;
 
+  /**
+   * \param enabled whether the data of freed buffers is kept in free
+   *        lists and reused by the next buffers of the same size class.
+   *
+   * See Packet::SetPoolEnabled, which enables this pool with the others
+   * of the packets. The pool is not thread-safe.
+   */
+  static void SetPoolEnabled (bool enabled);
+
   inline Buffer (Buffer const &o);
   Buffer &operator = (Buffer const &o);
   Buffer ();
@@ -594,9 +603,9 @@ private:
   /**
    * location in a newly-allocated buffer where you should start
    * writing data. i.e., m_start should be initialized to this 
-   * value.
+   * value. Each thread learns its own.
    */
-  static uint32_t g_recommendedStart;
+  static thread_local uint32_t g_recommendedStart;
 
   /* offset to the start of the virtual zero area from the start 
    * of m_data->m_data
@@ -352,4 +352,8 @@ bool Node::SwitchReceiveFromDevice(Ptr<NetDevice> device, Ptr<Packet> packet, Cu
 void Node::SwitchNotifyDequeue(uint32_t ifIndex, uint32_t qIndex, Ptr<Packet> p){
 	NS_ASSERT_MSG(false, "Calling NotifyDequeue() on a non-switch node or this function is not implemented");
 }
+
+void Node::SwitchNotifyDrop(uint32_t ifIndex, uint32_t qIndex, Ptr<Packet> p){
+	NS_ASSERT_MSG(false, "Calling NotifyDrop() on a non-switch node or this function is not implemented");
+}
 } // namespace ns3
@@ -327,6 +327,7 @@ protected:
 public:
   virtual bool SwitchReceiveFromDevice(Ptr<NetDevice> device, Ptr<Packet> packet, CustomHeader &ch);
   virtual void SwitchNotifyDequeue(uint32_t ifIndex, uint32_t qIndex, Ptr<Packet> p);
+  virtual void SwitchNotifyDrop(uint32_t ifIndex, uint32_t qIndex, Ptr<Packet> p);
 };
 
 } // namespace ns3
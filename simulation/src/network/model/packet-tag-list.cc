@@ -66,11 +66,22 @@ PacketTagList::FreeData (struct TagData *data) const
   g_free = data;
 }
 #else
+struct PacketTagList::TagData *PacketTagList::g_free = 0;
+uint32_t PacketTagList::g_nfree = 0;
+bool PacketTagList::g_poolEnabled = false;
+
 struct PacketTagList::TagData *
 PacketTagList::AllocData (void) const
 {
   NS_LOG_FUNCTION_NOARGS ();
   struct PacketTagList::TagData *retval;
+  if (g_free != 0)
+    {
+      retval = g_free;
+      g_free = g_free->next;
+      g_nfree--;
+      return retval;
+    }
   retval = new struct PacketTagList::TagData ();
   return retval;
 }
@@ -79,7 +90,31 @@ void
 PacketTagList::FreeData (struct TagData *data) const
 {
   NS_LOG_FUNCTION (data);
-  delete data;
+  if (!g_poolEnabled)
+    {
+      delete data;
+      return;
+    }
+  g_nfree++;
+  data->next = g_free;
+  g_free = data;
+}
+
+void
+PacketTagList::SetPoolEnabled (bool enabled)
+{
+  NS_LOG_FUNCTION (enabled);
+  g_poolEnabled = enabled;
+  if (!enabled)
+    {
+      while (g_free != 0)
+        {
+          struct TagData *data = g_free;
+          g_free = data->next;
+          delete data;
+        }
+      g_nfree = 0;
+    }
 }
 #endif
 
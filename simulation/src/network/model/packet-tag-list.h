@@ -58,6 +58,12 @@ public:
 
   const struct PacketTagList::TagData *Head (void) const;
 
+  /**
+   * \param enabled whether freed tag data is kept in a free list and
+   *        reused by the next tags. See Packet::SetPoolEnabled.
+   */
+  static void SetPoolEnabled (bool enabled);
+
 private:
 
   bool Remove (TypeId tid);
@@ -66,6 +72,7 @@ private:
 
   static struct PacketTagList::TagData *g_free;
   static uint32_t g_nfree;
+  static bool g_poolEnabled;
 
   struct TagData *m_next;
 };
@@ -26,9 +26,18 @@
 
 NS_LOG_COMPONENT_DEFINE ("Packet");
 
+namespace {
+struct FreePacket
+{
+  FreePacket *next;
+};
+FreePacket *g_freePackets = 0;
+bool g_poolEnabled = false;
+} // anonymous namespace
+
 namespace ns3 {
 
-uint32_t Packet::m_globalUid = 0;
+thread_local uint32_t Packet::m_globalUid = 0;
 
 TypeId 
 ByteTagIterator::Item::GetTypeId (void) const
@@ -561,6 +570,49 @@ Packet::EnableChecking (void)
   PacketMetadata::EnableChecking ();
 }
 
+void*
+Packet::operator new (size_t size)
+{
+  if (size == sizeof (Packet) && g_freePackets != 0)
+    {
+      FreePacket *p = g_freePackets;
+      g_freePackets = p->next;
+      return p;
+    }
+  return ::operator new (size);
+}
+
+void
+Packet::operator delete (void *p, size_t size)
+{
+  if (!g_poolEnabled || size != sizeof (Packet))
+    {
+      ::operator delete (p);
+      return;
+    }
+  FreePacket *free = static_cast<FreePacket *> (p);
+  free->next = g_freePackets;
+  g_freePackets = free;
+}
+
+void
+Packet::SetPoolEnabled (bool enabled)
+{
+  NS_LOG_FUNCTION (enabled);
+  g_poolEnabled = enabled;
+  if (!enabled)
+    {
+      while (g_freePackets != 0)
+        {
+          FreePacket *p = g_freePackets;
+          g_freePackets = p->next;
+          ::operator delete (p);
+        }
+    }
+  Buffer::SetPoolEnabled (enabled);
+  PacketTagList::SetPoolEnabled (enabled);
+}
+
 uint32_t Packet::GetSerializedSize (void) const
 {
   uint32_t size = 0;
@@ -21,6 +21,7 @@
 #define PACKET_H
 
 #include <stdint.h>
+#include <cstddef>
 #include <iostream>
 #include "buffer.h"
 #include "header.h"
@@ -450,6 +451,25 @@ public:
    */
   static void EnableChecking (void);
 
+  /**
+   * Packets are allocated through these, so that freed packets can be
+   * recycled by a pool (see SetPoolEnabled).
+   */
+  static void* operator new (size_t size);
+  static void operator delete (void *p, size_t size);
+  /**
+   * \param enabled whether freed packets, the data of their buffers and
+   *        their packet tags are kept in free lists and reused by the
+   *        next packets.
+   *
+   * Every data packet and ACK of a simulation is allocated and freed
+   * once, so recycling them saves several malloc/free pairs per packet.
+   * The pools are not thread-safe: only enable them when packets are
+   * created and freed by one thread. Disabling the pools releases the
+   * memory they hold.
+   */
+  static void SetPoolEnabled (bool enabled);
+
   /**
    * For packet serializtion, the total size is checked 
    * in order to determine the size of the buffer 
@@ -588,7 +608,8 @@ private:
   /* Please see comments above about nix-vector */
   Ptr<NixVector> m_nixVector;
 
-  static uint32_t m_globalUid;
+  // per thread, the uids of the threads of a ParallelSimulatorImpl differ by their system id
+  static thread_local uint32_t m_globalUid;
 };
 
 std::ostream& operator<< (std::ostream& os, const Packet &packet);
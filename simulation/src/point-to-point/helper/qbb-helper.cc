@@ -314,6 +314,8 @@ void QbbHelper::GetTraceFromPacket(TraceFormat &tr, Ptr<QbbNetDevice> dev, Ptr<c
 	CustomHeader hdr((hasL2?CustomHeader::L2_Header:0) | CustomHeader::L3_Header | CustomHeader::L4_Header);
 	p->PeekHeader(hdr);
 
+	// the fields a packet type does not set are 0, so the trace of a run does not depend on the stack contents
+	memset(&tr, 0, sizeof(tr));
 	tr.event = event;
 	tr.node = dev->GetNode()->GetId();
 	tr.nodeType = dev->GetNode()->GetNodeType();
@@ -0,0 +1,58 @@
+#ifndef FAST_RNG_H
+#define FAST_RNG_H
+
+#include <stdint.h>
+
+namespace ns3 {
+
+/**
+ * \brief A small random generator for the draws on the packet path (xoroshiro128**)
+ *
+ * An ns-3 random variable is an object with a MRG32k3a stream, which costs several multiplications
+ * modulo a prime per draw; this one is two words of state and a few shifts, and a node can own one per
+ * model. Seed derives the state from the ns-3 seed and run and a stream number with splitmix64, so the
+ * streams of different numbers are independent and a run is reproduced by its RNG_SEED.
+ */
+class FastRng {
+public:
+	FastRng(){
+		Seed(0, 0, 0);
+	}
+	void Seed(uint64_t seed, uint64_t run, uint64_t stream){
+		uint64_t x = seed;
+		x = SplitMix64(x) ^ run;
+		x = SplitMix64(x) ^ stream;
+		m_s[0] = SplitMix64(x);
+		m_s[1] = SplitMix64(x);
+	}
+	uint64_t Next64(void){
+		uint64_t s0 = m_s[0], s1 = m_s[1];
+		uint64_t r = Rotl(s0 * 5, 7) * 9;
+		s1 ^= s0;
+		m_s[0] = Rotl(s0, 24) ^ s1 ^ (s1 << 16);
+		m_s[1] = Rotl(s1, 37);
+		return r;
+	}
+	uint32_t Next32(void){
+		return Next64() >> 32;
+	}
+	double NextDouble(void){ // in [0, 1)
+		return (Next64() >> 11) * (1.0 / 9007199254740992.0);
+	}
+private:
+	static uint64_t Rotl(uint64_t x, int k){
+		return (x << k) | (x >> (64 - k));
+	}
+	static uint64_t SplitMix64(uint64_t &x){
+		uint64_t z = (x += 0x9e3779b97f4a7c15ULL);
+		z = (z ^ (z >> 30)) * 0xbf58476d1ce4e5b9ULL;
+		z = (z ^ (z >> 27)) * 0x94d049bb133111ebULL;
+		return z ^ (z >> 31);
+	}
+
+	uint64_t m_s[2];
+};
+
+} /* namespace ns3 */
+
+#endif /* FAST_RNG_H */
@@ -0,0 +1,83 @@
+#include <string.h>
+#include "header-template.h"
+#include "ns3/assert.h"
+
+namespace ns3 {
+
+NS_OBJECT_ENSURE_REGISTERED (HeaderTemplate);
+
+TypeId HeaderTemplate::GetTypeId (void){
+	static TypeId tid = TypeId ("ns3::HeaderTemplate")
+		.SetParent<Header> ()
+		.AddConstructor<HeaderTemplate> ()
+		;
+	return tid;
+}
+TypeId HeaderTemplate::GetInstanceTypeId (void) const{
+	return GetTypeId ();
+}
+
+bool HeaderTemplate::IsEmpty (void) const{
+	return m_bytes.empty();
+}
+void HeaderTemplate::Set (Ptr<const Packet> p){
+	m_bytes.resize(p->GetSize());
+	p->CopyData(&m_bytes[0], m_bytes.size());
+}
+
+void HeaderTemplate::WriteU8 (uint32_t offset, uint8_t v){
+	NS_ASSERT (offset + 1 <= m_bytes.size());
+	m_bytes[offset] = v;
+}
+void HeaderTemplate::WriteU16 (uint32_t offset, uint16_t v){
+	NS_ASSERT (offset + 2 <= m_bytes.size());
+	m_bytes[offset] = v & 0xff;
+	m_bytes[offset + 1] = v >> 8;
+}
+void HeaderTemplate::WriteU32 (uint32_t offset, uint32_t v){
+	NS_ASSERT (offset + 4 <= m_bytes.size());
+	m_bytes[offset] = v & 0xff;
+	m_bytes[offset + 1] = (v >> 8) & 0xff;
+	m_bytes[offset + 2] = (v >> 16) & 0xff;
+	m_bytes[offset + 3] = v >> 24;
+}
+void HeaderTemplate::WriteU64 (uint32_t offset, uint64_t v){
+	NS_ASSERT (offset + 8 <= m_bytes.size());
+	for (uint32_t i = 0; i < 8; i++)
+		m_bytes[offset + i] = (v >> (8 * i)) & 0xff;
+}
+void HeaderTemplate::WriteHtonU16 (uint32_t offset, uint16_t v){
+	NS_ASSERT (offset + 2 <= m_bytes.size());
+	m_bytes[offset] = v >> 8;
+	m_bytes[offset + 1] = v & 0xff;
+}
+void HeaderTemplate::WriteHtonU32 (uint32_t offset, uint32_t v){
+	NS_ASSERT (offset + 4 <= m_bytes.size());
+	m_bytes[offset] = v >> 24;
+	m_bytes[offset + 1] = (v >> 16) & 0xff;
+	m_bytes[offset + 2] = (v >> 8) & 0xff;
+	m_bytes[offset + 3] = v & 0xff;
+}
+void HeaderTemplate::Write (uint32_t offset, const uint8_t *data, uint32_t size){
+	NS_ASSERT (offset + size <= m_bytes.size());
+	if (size > 0)
+		memcpy(&m_bytes[offset], data, size);
+}
+
+void HeaderTemplate::Print (std::ostream &os) const{
+	os << "template:" << "size=" << m_bytes.size();
+}
+uint32_t HeaderTemplate::GetSerializedSize (void) const{
+	return m_bytes.size();
+}
+void HeaderTemplate::Serialize (Buffer::Iterator start) const{
+	if (!m_bytes.empty())
+		start.Write(&m_bytes[0], m_bytes.size());
+}
+uint32_t HeaderTemplate::Deserialize (Buffer::Iterator start){
+	if (!m_bytes.empty())
+		start.Read(&m_bytes[0], m_bytes.size());
+	return m_bytes.size();
+}
+
+} // namespace ns3
@@ -0,0 +1,51 @@
+#ifndef HEADER_TEMPLATE_H
+#define HEADER_TEMPLATE_H
+
+#include <stdint.h>
+#include <vector>
+#include "ns3/header.h"
+#include "ns3/buffer.h"
+#include "ns3/packet.h"
+
+namespace ns3 {
+
+/**
+ * \brief The serialized headers of the packets of one flow
+ *
+ * The headers (ppp, ip, udp or qbb, ...) are serialized once into the
+ * template, and each packet gets them with a single copy. The fields
+ * that change from packet to packet are patched in the template before
+ * it is added. The offsets are from the start of the template.
+ *
+ * The packet metadata records the template as one header, so it is only
+ * used when the metadata is disabled (see PacketMetadata::IsEnabled).
+ */
+class HeaderTemplate : public Header
+{
+public:
+	static TypeId GetTypeId (void);
+	virtual TypeId GetInstanceTypeId (void) const;
+
+	bool IsEmpty (void) const;
+	void Set (Ptr<const Packet> p); // take all the bytes of p
+
+	void WriteU8 (uint32_t offset, uint8_t v);
+	void WriteU16 (uint32_t offset, uint16_t v); // little endian, as Buffer::Iterator::WriteU16
+	void WriteU32 (uint32_t offset, uint32_t v);
+	void WriteU64 (uint32_t offset, uint64_t v);
+	void WriteHtonU16 (uint32_t offset, uint16_t v);
+	void WriteHtonU32 (uint32_t offset, uint32_t v);
+	void Write (uint32_t offset, const uint8_t *data, uint32_t size);
+
+	virtual void Print (std::ostream &os) const;
+	virtual uint32_t GetSerializedSize (void) const;
+	virtual void Serialize (Buffer::Iterator start) const;
+	virtual uint32_t Deserialize (Buffer::Iterator start);
+
+private:
+	std::vector<uint8_t> m_bytes;
+};
+
+} // namespace ns3
+
+#endif /* HEADER_TEMPLATE_H */
@@ -8,10 +8,69 @@ namespace ns3{
 
 double Pint::log_base = 1.05;
 double Pint::log_factor = 1 / log(log_base);
+std::vector<uint64_t> Pint::pow_fx;
+std::vector<uint8_t> Pint::step_shift;
+std::vector<uint64_t> Pint::step_recip;
+std::vector<uint16_t> Pint::start;
+std::vector<double> Pint::decode_tab;
+
+/*
+ * log2 of the mantissas [2^15, 2^16] and 2^(frac * 2^-15) of the two halves of a fraction, in fixed point,
+ * which do not depend on log_base
+ */
+static int32_t log_tab[(1 << 15) + 1]; // log2(2^15 + i) in units of 2^-15
+static uint64_t exp_hi[128], exp_lo[256]; // 2^(i * 2^-7) and 2^(i * 2^-15), in units of 2^-30
+static int32_t log_1e9; // log2(1e9)
+
+static struct PintTables{
+	PintTables(){
+		for (uint32_t i = 0; i <= (1 << 15); i++)
+			log_tab[i] = (int32_t)(log2((double)((1 << 15) + i)) * (1 << Pint::log_shift));
+		for (uint32_t i = 0; i < 128; i++)
+			exp_hi[i] = (uint64_t)(pow(2, i / 128.) * (1 << 30) + 0.5);
+		for (uint32_t i = 0; i < 256; i++)
+			exp_lo[i] = (uint64_t)(pow(2, i / 32768.) * (1 << 30) + 0.5);
+		log_1e9 = (int32_t)(log2(1e9) * (1 << Pint::log_shift) + 0.5);
+		Pint::set_log_base(Pint::log_base);
+	}
+} pint_tables;
 
 void Pint::set_log_base(double base){
 	log_base = base;
 	log_factor = 1 / log(log_base);
+
+	// the powers up to the first one above any x, and at most the 65536 of a uint16_t
+	pow_fx.clear();
+	decode_tab.clear();
+	for (uint32_t p = 0; p < 65536; p++){
+		double v = pow(log_base, p);
+		pow_fx.push_back((uint64_t)(v * 65536 + 0.5));
+		decode_tab.push_back(v / max_concurrent);
+		if (v > 4294967295.)
+			break;
+	}
+	// the probability to round up is (x - base^p) / step in units of 2^-16: the step is shifted to 21 bits,
+	// so that (x - base^p) >> shift, below 2^22, times its reciprocal 2^48 / (step >> shift) fits in 64 bits
+	step_shift.assign(pow_fx.size(), 0);
+	step_recip.assign(pow_fx.size(), 0);
+	for (uint32_t p = 0; p + 1 < pow_fx.size(); p++){
+		uint64_t step = pow_fx[p + 1] - pow_fx[p];
+		if (step == 0)
+			continue; // never round up
+		int bits = 64 - __builtin_clzll(step);
+		step_shift[p] = bits > 21 ? bits - 21 : 0;
+		step_recip[p] = (1ULL << 48) / (step >> step_shift[p]);
+	}
+	// for the msb of x and the 8 bits below it, the power below the smallest such x
+	start.assign(33 * 256, 0);
+	uint32_t p = 0;
+	for (uint32_t msb = 1; msb <= 32; msb++)
+		for (uint32_t f = 0; f < 256; f++){
+			uint64_t x = msb >= 9 ? (uint64_t)(256 + f) << (msb - 9) : (256 + f) >> (9 - msb);
+			while (p + 1 < pow_fx.size() && pow_fx[p + 1] <= x << 16)
+				p++;
+			start[msb << 8 | f] = p;
+		}
 }
 
 int Pint::get_n_bits(){
@@ -25,20 +84,78 @@ int Pint::get_n_bytes(){
 	return (n_bits - 1) / 8 + 1;
 }
 
-uint16_t Pint::encode_u(double u){
+uint16_t Pint::encode_u(double u, FastRng &rng){
 	uint32_t u_toInt = ceil(u * max_concurrent); // convert u to int so that the minimum possible u value is mapped to 1
 	if (u_toInt == 0) u_toInt = 1;
-	double power = log(u_toInt) * log_factor;
-	uint16_t p_upper = ceil(power), p_lower = floor(power);
-	double upper = pow(log_base, p_upper), lower = pow(log_base, p_lower);
-	if (p_upper == p_lower)
-		upper *= log_base;
-	uint16_t p = (rand() % 65536 < (u_toInt - lower) / (upper - lower) * 65536) ? p_upper : p_lower;
-	return p;
+	return encode(u_toInt, rng);
+}
+
+uint16_t Pint::encode(uint32_t x, FastRng &rng){
+	// the power p below x, from the first one of its range
+	uint32_t msb = 32 - __builtin_clz(x);
+	uint32_t p = start[msb << 8 | ((x << (32 - msb)) >> 23 & 255)];
+	uint64_t xs = (uint64_t)x << 16;
+	while (p + 1 < pow_fx.size() && pow_fx[p + 1] <= xs)
+		p++;
+	if (p + 1 == pow_fx.size())
+		return p; // above the powers of a uint16_t
+	// p + 1 with probability (x - base^p) / (base^(p+1) - base^p)
+	uint64_t prob = ((xs - pow_fx[p]) >> step_shift[p]) * step_recip[p] >> 32;
+	return (rng.Next32() >> 16) < prob ? p + 1 : p;
 }
 
 double Pint::decode_u(uint16_t p){
+	if (p < decode_tab.size())
+		return decode_tab[p];
 	return pow(log_base, p) / max_concurrent;
 }
 
+int32_t Pint::log2_fx(uint32_t x, FastRng &rng){
+	int msb = 32 - __builtin_clz(x);
+	if (msb <= 16){
+		int sft = 16 - msb;
+		return log_tab[(x << sft) - (1 << 15)] - (sft << log_shift);
+	}
+	// keep the 16 msb, and round up with the probability of the bits below
+	int sft = msb - 16;
+	uint32_t mask = (1u << sft) - 1;
+	uint32_t mant = (x >> sft) + ((x & mask) > (rng.Next32() & mask));
+	return log_tab[mant - (1 << 15)] + (sft << log_shift);
+}
+
+uint64_t Pint::exp2_fx(int64_t e){
+	int64_t ip = e >> log_shift; // floor
+	uint32_t frac = e & ((1 << log_shift) - 1);
+	uint64_t m = exp_hi[frac >> 8] * exp_lo[frac & 255] >> 30; // 2^frac in units of 2^-30, below 2^31
+	if (ip >= 30)
+		return ip - 30 > 33 ? ~(uint64_t)0 : m << (ip - 30);
+	int64_t sft = 30 - ip;
+	if (sft >= 63)
+		return 0;
+	return (m + (1ULL << (sft - 1))) >> sft;
+}
+
+uint32_t Pint::next_u(uint32_t u, uint64_t dt, uint64_t qlen, uint32_t bytes, uint64_t T, int32_t log_T, int32_t log_B, FastRng &rng){
+	const int64_t one = 1 << log_shift;
+	uint64_t qterm = 0, byteTerm = 0, uTerm = 0;
+	if (dt > 0 && (qlen >> 8) > 0){
+		// dt * qlen / (B * T^2), the queue in 256 bytes
+		int64_t e = (int64_t)log2_fx(dt, rng) + log2_fx(qlen >> 8, rng) + log_1e9 - log_B - 2 * log_T;
+		qterm = exp2_fx(e + (8 + u_shift) * one);
+	}
+	if (bytes > 0){
+		// bytes / (B * T)
+		int64_t e = (int64_t)log2_fx(bytes, rng) + log_1e9 - log_B - log_T;
+		byteTerm = exp2_fx(e + u_shift * one);
+	}
+	uint32_t u13 = (u + 4) >> 3; // u in units of 2^-13
+	if (T > dt && u13 > 0){
+		// (T - dt) * u / T
+		int64_t e = (int64_t)log2_fx(T - dt, rng) + log2_fx(u13, rng) - log_T;
+		uTerm = exp2_fx(e + (u_shift - 13) * one);
+	}
+	uint64_t res = qterm + byteTerm + uTerm;
+	return res > 0xffffffff ? 0xffffffff : res;
+}
+
 } /* namespace ns3 */
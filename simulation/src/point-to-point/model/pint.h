@@ -2,17 +2,44 @@
 #define PINT_H
 
 #include <stdint.h>
+#include <vector>
+#include "fast-rng.h"
 
 namespace ns3{
+/**
+ * PINT's encoding of a utilization u as a power p of log_base, and the switches' approximate calc of
+ * the utilization of a port in the log domain, with tables and integer arithmetic instead of log and
+ * pow per packet. The tables of the encoding depend on log_base and are rebuilt by set_log_base. The
+ * random roundings draw from the FastRng of the caller, so a switch with its own stream encodes the
+ * same powers in any run of the same seed, whatever the other nodes do.
+ */
 class Pint{
 public:
 	static const uint32_t max_concurrent = 512; // max number of concurrent flows
 	static double log_base, log_factor; // used for PINT
-	static void set_log_base(double base);
+	static void set_log_base(double base); // also rebuilds the tables of encode and decode_u
 	static int get_n_bits();
 	static int get_n_bytes();
-	static uint16_t encode_u(double u);
+	static uint16_t encode_u(double u, FastRng &rng);
+	static uint16_t encode(uint32_t x, FastRng &rng); // of x = ceil(u * max_concurrent), at least 1
 	static double decode_u(uint16_t p);
+
+	// approximate calc of the switches, in fixed point
+	static const int log_shift = 15; // the logs are in units of 2^-log_shift
+	static const int u_shift = 16; // the utilizations are in units of 2^-u_shift
+	static int32_t log2_fx(uint32_t x, FastRng &rng); // log2(x) of x > 0 randomly rounded to its 16 most significant bits, rounded down
+	static uint64_t exp2_fx(int64_t e); // 2^(e * 2^-log_shift), rounded
+	// the utilization of a port after a packet of bytes, sent dt <= T after the previous one with qlen bytes
+	// queued, from the previous one u, for a max RTT of T ns and log_T = log2(T), log_B = log2(bytes/s of the port)
+	static uint32_t next_u(uint32_t u, uint64_t dt, uint64_t qlen, uint32_t bytes, uint64_t T, int32_t log_T, int32_t log_B, FastRng &rng);
+private:
+	// encode: the powers of log_base in units of 2^-16, for each the shift and reciprocal of the step to the
+	// next one, and the first power to look at for the 256 ranges of each msb of x
+	static std::vector<uint64_t> pow_fx;
+	static std::vector<uint8_t> step_shift;
+	static std::vector<uint64_t> step_recip;
+	static std::vector<uint16_t> start;
+	static std::vector<double> decode_tab; // log_base^p / max_concurrent
 };
 } /* namespace ns3 */
 
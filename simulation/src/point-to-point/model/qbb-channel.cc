@@ -18,12 +18,14 @@
 
 #include "qbb-channel.h"
 #include "qbb-net-device.h"
+#include "rdma-qp-tag.h"
 #include "ns3/trace-source-accessor.h"
 #include "ns3/packet.h"
 #include "ns3/simulator.h"
 #include "ns3/log.h"
 #include <iostream>
 #include <fstream>
+#include <vector>
 
 NS_LOG_COMPONENT_DEFINE ("QbbChannel");
 
@@ -80,6 +82,11 @@ QbbChannel::Attach (Ptr<QbbNetDevice> device)
       m_link[1].m_dst = m_link[0].m_src;
       m_link[0].m_state = IDLE;
       m_link[1].m_state = IDLE;
+      for (int i = 0; i < N_DEVICES; i++)
+        {
+          m_link[i].m_dstNode = m_link[i].m_dst->GetNode ()->GetId ();
+          m_link[i].m_crossSystem = m_link[i].m_src->GetNode ()->GetSystemId () != m_link[i].m_dst->GetNode ()->GetSystemId ();
+        }
     }
 
 
@@ -99,7 +106,27 @@ QbbChannel::TransmitStart (
 
   uint32_t wire = src == m_link[0].m_src ? 0 : 1;
 
-  Simulator::ScheduleWithContext (m_link[wire].m_dst->GetNode ()->GetId (),
+  if (m_link[wire].m_crossSystem)
+    {
+      // The receiver runs on another thread: it gets a copy of the packet
+      // that shares no buffer, and the event does not hold a reference to
+      // its device, so that no reference count is updated by two threads.
+      // The tx anim callback would take such references and is not called.
+      std::vector<uint8_t> bytes (p->GetSize ());
+      p->CopyData (&bytes[0], bytes.size ());
+      Ptr<Packet> copy = Create<Packet> (&bytes[0], bytes.size ());
+      RdmaQpTag tag;
+      if (p->PeekPacketTag (tag))
+        {
+          copy->AddPacketTag (tag);
+        }
+      Simulator::ScheduleWithContext (m_link[wire].m_dstNode,
+                                      txTime + m_delay, &QbbNetDevice::Receive,
+                                      PeekPointer (m_link[wire].m_dst), copy);
+      return true;
+    }
+
+  Simulator::ScheduleWithContext (m_link[wire].m_dstNode,
                                   txTime + m_delay, &QbbNetDevice::Receive,
                                   m_link[wire].m_dst, p);
 
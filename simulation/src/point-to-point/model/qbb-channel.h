@@ -156,10 +156,12 @@ private:
   class Link
   {
 public:
-    Link() : m_state (INITIALIZING), m_src (0), m_dst (0) {}
+    Link() : m_state (INITIALIZING), m_src (0), m_dst (0), m_dstNode (0), m_crossSystem (false) {}
     WireState                  m_state;
     Ptr<QbbNetDevice> m_src;
     Ptr<QbbNetDevice> m_dst;
+    uint32_t          m_dstNode;     // id of the node of m_dst
+    bool              m_crossSystem; // m_src and m_dst are on different systems (threads of a ParallelSimulatorImpl)
   };
 
   Link    m_link[N_DEVICES];
@@ -91,41 +91,11 @@ namespace ns3 {
 		return 0;
 	}
 	int RdmaEgressQueue::GetNextQindex(bool paused[]){
-		bool found = false;
-		uint32_t qIndex;
 		if (!paused[ack_q_idx] && m_ackQ->GetNPackets() > 0)
 			return -1;
 
 		// no pkt in highest priority queue, do rr for each qp
-		int res = -1024;
-		uint32_t fcount = m_qpGrp->GetN();
-		uint32_t min_finish_id = 0xffffffff;
-		for (qIndex = 1; qIndex <= fcount; qIndex++){
-			uint32_t idx = (qIndex + m_rrlast) % fcount;
-			Ptr<RdmaQueuePair> qp = m_qpGrp->Get(idx);
-			if (!paused[qp->m_pg] && qp->GetBytesLeft() > 0 && !qp->IsWinBound()){
-				if (m_qpGrp->Get(idx)->m_nextAvail.GetTimeStep() > Simulator::Now().GetTimeStep()) //not available now
-					continue;
-				res = idx;
-				break;
-			}else if (qp->IsFinished()){
-				min_finish_id = idx < min_finish_id ? idx : min_finish_id;
-			}
-		}
-
-		// clear the finished qp
-		if (min_finish_id < 0xffffffff){
-			int nxt = min_finish_id;
-			auto &qps = m_qpGrp->m_qps;
-			for (int i = min_finish_id + 1; i < fcount; i++) if (!qps[i]->IsFinished()){
-				if (i == res) // update res to the idx after removing finished qp
-					res = nxt;
-				qps[nxt] = qps[i];
-				nxt++;
-			}
-			qps.resize(nxt);
-		}
-		return res;
+		return m_qpGrp->GetNextQindex(m_rrlast, paused);
 	}
 
 	int RdmaEgressQueue::GetLastQueue(){
@@ -148,6 +118,7 @@ namespace ns3 {
 	void RdmaEgressQueue::RecoverQueue(uint32_t i){
 		NS_ASSERT_MSG(i < m_qpGrp->GetN(), "RdmaEgressQueue::RecoverQueue: qIndex >= m_qpGrp->GetN()");
 		m_qpGrp->Get(i)->snd_nxt = m_qpGrp->Get(i)->snd_una;
+		m_qpGrp->UpdateQp(m_qpGrp->Get(i));
 	}
 
 	void RdmaEgressQueue::EnqueueHighPrioQ(Ptr<Packet> p){
@@ -282,13 +253,7 @@ namespace ns3 {
 				m_rdmaPktSent(lastQp, p, m_tInterframeGap);
 			}else { // no packet to send
 				NS_LOG_INFO("PAUSE prohibits send at node " << m_node->GetId());
-				Time t = Simulator::GetMaximumSimulationTime();
-				for (uint32_t i = 0; i < m_rdmaEQ->GetFlowCount(); i++){
-					Ptr<RdmaQueuePair> qp = m_rdmaEQ->GetQp(i);
-					if (qp->GetBytesLeft() == 0)
-						continue;
-					t = Min(qp->m_nextAvail, t);
-				}
+				Time t = m_rdmaEQ->m_qpGrp->GetNextAvail();
 				if (m_nextSend.IsExpired() && t < Simulator::GetMaximumSimulationTime() && t > Simulator::Now()){
 					m_nextSend = Simulator::Schedule(t - Simulator::Now(), &QbbNetDevice::DequeueAndTransmit, this);
 				}
@@ -299,20 +264,10 @@ namespace ns3 {
 			if (p != 0){
 				m_snifferTrace(p);
 				m_promiscSnifferTrace(p);
-				Ipv4Header h;
-				Ptr<Packet> packet = p->Copy();
-				uint16_t protocol = 0;
-				ProcessHeader(packet, protocol);
-				packet->RemoveHeader(h);
 				FlowIdTag t;
 				uint32_t qIndex = m_queue->GetLastQueue();
-				if (qIndex == 0){//this is a pause or cnp, send it immediately!
-					m_node->SwitchNotifyDequeue(m_ifIndex, qIndex, p);
-					p->RemovePacketTag(t);
-				}else{
-					m_node->SwitchNotifyDequeue(m_ifIndex, qIndex, p);
-					p->RemovePacketTag(t);
-				}
+				m_node->SwitchNotifyDequeue(m_ifIndex, qIndex, p);
+				p->RemovePacketTag(t);
 				m_traceDequeue(p, qIndex);
 				TransmitStart(p);
 				return;
@@ -473,9 +428,11 @@ namespace ns3 {
 
    void QbbNetDevice::NewQp(Ptr<RdmaQueuePair> qp){
 	   qp->m_nextAvail = Simulator::Now();
+	   qp->UpdateSched();
 	   DequeueAndTransmit();
    }
    void QbbNetDevice::ReassignedQp(Ptr<RdmaQueuePair> qp){
+	   qp->UpdateSched();
 	   DequeueAndTransmit();
    }
    void QbbNetDevice::TriggerTransmit(void){
@@ -516,12 +473,21 @@ namespace ns3 {
 				if (p == 0)
 					 break;
 				m_traceDrop(p, m_queue->GetLastQueue());
+				m_node->SwitchNotifyDrop(m_ifIndex, m_queue->GetLastQueue(), p);
 			}
-			// TODO: Notify switch that this link is down
 		}
 		m_linkUp = false;
 	}
 
+	void QbbNetDevice::TakeUp(){
+		if (m_linkUp)
+			return;
+		for (uint32_t i = 0; i < qCnt; i++)
+			m_paused[i] = false;
+		m_linkUp = true;
+		DequeueAndTransmit();
+	}
+
 	void QbbNetDevice::UpdateNextAvail(Time t){
 		if (!m_nextSend.IsExpired() && t < m_nextSend.GetTs()){
 			Simulator::Cancel(m_nextSend);
@@ -0,0 +1,169 @@
+#include <ns3/simulator.h>
+#include "rdma-cc.h"
+#include "rdma-hw.h"
+#include "rdma-queue-pair.h"
+#include "switch-node.h"
+#include <map>
+
+namespace ns3 {
+
+RdmaCc::RdmaCc(uint32_t mode, IntHeader::Mode intMode) : m_mode(mode), m_intMode(intMode) {
+}
+
+RdmaCc::~RdmaCc(){
+}
+
+uint32_t RdmaCc::GetMode(void) const{
+	return m_mode;
+}
+
+IntHeader::Mode RdmaCc::GetIntMode(void) const{
+	return m_intMode;
+}
+
+uint32_t RdmaCc::GetQpState(void) const{
+	return m_mode;
+}
+
+void RdmaCc::InitQp(RdmaHw &hw, RdmaQueuePair &qp, DataRate rate) const{
+}
+
+void RdmaCc::ReceiveAck(RdmaHw &hw, Ptr<RdmaQueuePair> qp, Ptr<Packet> p, CustomHeader &ch) const{
+}
+
+void RdmaCc::ReceiveCnp(RdmaHw &hw, Ptr<RdmaQueuePair> qp) const{
+}
+
+void RdmaCc::QpComplete(RdmaHw &hw, RdmaQueuePair &qp) const{
+}
+
+void RdmaCc::SwitchDequeue(SwitchNode &sw, uint32_t ifIndex, IntHeader *ih) const{
+}
+
+/******************************
+ * Mellanox's version of DCQCN
+ *****************************/
+class RdmaCcMlx : public RdmaCc {
+public:
+	RdmaCcMlx() : RdmaCc(1, IntHeader::NONE) {}
+	virtual void InitQp(RdmaHw &hw, RdmaQueuePair &qp, DataRate rate) const{
+		qp.Mlx().m_targetRate = rate;
+	}
+	virtual void ReceiveCnp(RdmaHw &hw, Ptr<RdmaQueuePair> qp) const{
+		hw.cnp_received_mlx(qp);
+	}
+	virtual void QpComplete(RdmaHw &hw, RdmaQueuePair &qp) const{
+		Simulator::Cancel(qp.Mlx().m_eventUpdateAlpha);
+		Simulator::Cancel(qp.Mlx().m_eventDecreaseRate);
+		Simulator::Cancel(qp.Mlx().m_rpTimer);
+	}
+};
+
+/***********************
+ * High Precision CC
+ ***********************/
+class RdmaCcHp : public RdmaCc {
+public:
+	RdmaCcHp() : RdmaCc(3, IntHeader::NORMAL) {}
+	virtual void InitQp(RdmaHw &hw, RdmaQueuePair &qp, DataRate rate) const{
+		qp.Hp().m_curRate = rate;
+		if (hw.m_multipleRate){
+			for (uint32_t i = 0; i < IntHeader::maxHop; i++)
+				qp.Hp().hopState[i].Rc = rate;
+		}
+	}
+	virtual void ReceiveAck(RdmaHw &hw, Ptr<RdmaQueuePair> qp, Ptr<Packet> p, CustomHeader &ch) const{
+		hw.HandleAckHp(qp, p, ch);
+	}
+	virtual void SwitchDequeue(SwitchNode &sw, uint32_t ifIndex, IntHeader *ih) const{
+		sw.PushIntHop(ifIndex, ih);
+	}
+};
+
+/**********************
+ * TIMELY
+ *********************/
+class RdmaCcTimely : public RdmaCc {
+public:
+	RdmaCcTimely() : RdmaCc(7, IntHeader::TS) {}
+	virtual void InitQp(RdmaHw &hw, RdmaQueuePair &qp, DataRate rate) const{
+		qp.Tmly().m_curRate = rate;
+	}
+	virtual void ReceiveAck(RdmaHw &hw, Ptr<RdmaQueuePair> qp, Ptr<Packet> p, CustomHeader &ch) const{
+		hw.HandleAckTimely(qp, p, ch);
+	}
+};
+
+/**********************
+ * DCTCP
+ *********************/
+class RdmaCcDctcp : public RdmaCc {
+public:
+	RdmaCcDctcp() : RdmaCc(8, IntHeader::NONE) {}
+	virtual void ReceiveAck(RdmaHw &hw, Ptr<RdmaQueuePair> qp, Ptr<Packet> p, CustomHeader &ch) const{
+		hw.HandleAckDctcp(qp, p, ch);
+	}
+};
+
+/*********************
+ * HPCC-PINT
+ ********************/
+class RdmaCcHpPint : public RdmaCc {
+public:
+	RdmaCcHpPint() : RdmaCc(10, IntHeader::PINT) {}
+	virtual void InitQp(RdmaHw &hw, RdmaQueuePair &qp, DataRate rate) const{
+		qp.HpccPint().m_curRate = rate;
+	}
+	virtual void ReceiveAck(RdmaHw &hw, Ptr<RdmaQueuePair> qp, Ptr<Packet> p, CustomHeader &ch) const{
+		hw.HandleAckHpPint(qp, p, ch);
+	}
+	virtual void SwitchDequeue(SwitchNode &sw, uint32_t ifIndex, IntHeader *ih) const{
+		sw.UpdatePintPower(ifIndex, ih);
+	}
+};
+
+/***********************
+ * Poseidon
+ ***********************/
+class RdmaCcPoseidon : public RdmaCc {
+public:
+	RdmaCcPoseidon() : RdmaCc(11, IntHeader::NORMAL) {}
+	virtual void InitQp(RdmaHw &hw, RdmaQueuePair &qp, DataRate rate) const{
+		qp.Poseidon().m_curRate = rate / 100.0;
+	}
+	virtual void ReceiveAck(RdmaHw &hw, Ptr<RdmaQueuePair> qp, Ptr<Packet> p, CustomHeader &ch) const{
+		hw.HandleAckPoseidon(qp, p, ch);
+	}
+	virtual void SwitchDequeue(SwitchNode &sw, uint32_t ifIndex, IntHeader *ih) const{
+		sw.PushIntHop(ifIndex, ih);
+	}
+};
+
+static std::map<uint32_t, const RdmaCc*>& GetRegistry(void){
+	static const RdmaCcMlx mlx;
+	static const RdmaCcHp hp;
+	static const RdmaCcTimely timely;
+	static const RdmaCcDctcp dctcp;
+	static const RdmaCcHpPint hpPint;
+	static const RdmaCcPoseidon poseidon;
+	static std::map<uint32_t, const RdmaCc*> registry;
+	if (registry.empty()){
+		const RdmaCc *builtin[] = {&mlx, &hp, &timely, &dctcp, &hpPint, &poseidon};
+		for (uint32_t i = 0; i < sizeof(builtin) / sizeof(builtin[0]); i++)
+			registry[builtin[i]->GetMode()] = builtin[i];
+	}
+	return registry;
+}
+
+const RdmaCc* RdmaCc::Get(uint32_t mode){
+	static const RdmaCc none(0, IntHeader::NONE);
+	std::map<uint32_t, const RdmaCc*> &registry = GetRegistry();
+	std::map<uint32_t, const RdmaCc*>::iterator it = registry.find(mode);
+	return it != registry.end() ? it->second : &none;
+}
+
+void RdmaCc::Register(const RdmaCc *cc){
+	GetRegistry()[cc->GetMode()] = cc;
+}
+
+} /* namespace ns3 */
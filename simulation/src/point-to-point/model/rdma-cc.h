@@ -0,0 +1,56 @@
+#ifndef RDMA_CC_H
+#define RDMA_CC_H
+
+#include <stdint.h>
+#include <ns3/ptr.h>
+#include <ns3/packet.h>
+#include <ns3/data-rate.h>
+#include <ns3/custom-header.h>
+#include <ns3/int-header.h>
+
+namespace ns3 {
+
+class RdmaHw;
+class RdmaQueuePair;
+class SwitchNode;
+
+/**
+ * \brief The congestion control of one CC_MODE
+ *
+ * What the NICs do with the qps and the feedback of a CC, and what the switches write in the INT header
+ * of the data packets they send. RdmaHw and SwitchNode look their CC up once, when their CcMode is set,
+ * and call it on each packet without checking the mode again. The CCs have no state of their own (it is
+ * in the RdmaQueuePair, and in the RdmaHw or SwitchNode for the parameters), so one instance of each
+ * serves all the nodes and threads.
+ *
+ * A new CC, e.g. a variant of Poseidon, derives from the closest one, overrides what differs, and is
+ * registered for its CC_MODE before the nodes are created.
+ */
+class RdmaCc {
+public:
+	RdmaCc(uint32_t mode, IntHeader::Mode intMode);
+	virtual ~RdmaCc();
+
+	uint32_t GetMode(void) const;
+	IntHeader::Mode GetIntMode(void) const; // what the data packets carry, see IntHeader::mode
+	virtual uint32_t GetQpState(void) const; // the CC_MODE of the RdmaQueuePair state it uses, its own by default
+
+	// NIC
+	virtual void InitQp(RdmaHw &hw, RdmaQueuePair &qp, DataRate rate) const; // the qp starts at rate
+	virtual void ReceiveAck(RdmaHw &hw, Ptr<RdmaQueuePair> qp, Ptr<Packet> p, CustomHeader &ch) const; // ACK or NACK
+	virtual void ReceiveCnp(RdmaHw &hw, Ptr<RdmaQueuePair> qp) const; // an ACK with the CNP flag, before ReceiveAck
+	virtual void QpComplete(RdmaHw &hw, RdmaQueuePair &qp) const; // all the data is acked
+
+	// switch, when a udp packet of a data queue is sent on ifIndex
+	virtual void SwitchDequeue(SwitchNode &sw, uint32_t ifIndex, IntHeader *ih) const;
+
+	static const RdmaCc* Get(uint32_t mode); // the CC of mode, one that does nothing if none is registered
+	static void Register(const RdmaCc *cc); // replaces the CC of the same mode, the caller keeps cc alive
+private:
+	uint32_t m_mode;
+	IntHeader::Mode m_intMode;
+};
+
+} /* namespace ns3 */
+
+#endif /* RDMA_CC_H */
@@ -8,10 +8,14 @@
 #include "ns3/double.h"
 #include "ns3/data-rate.h"
 #include "ns3/pointer.h"
+#include "ns3/rng-seed-manager.h"
 #include "rdma-hw.h"
 #include "ppp-header.h"
 #include "qbb-header.h"
 #include "cn-header.h"
+#include "header-template.h"
+#include "rdma-qp-tag.h"
+#include "rdma-cc.h"
 #include <deque>
 #include <cmath>
 #include <algorithm>
@@ -35,7 +39,7 @@ TypeId RdmaHw::GetTypeId (void)
 		.AddAttribute ("CcMode",
 				"which mode of DCQCN is running",
 				UintegerValue(0),
-				MakeUintegerAccessor(&RdmaHw::m_cc_mode),
+				MakeUintegerAccessor(&RdmaHw::SetCcMode, &RdmaHw::GetCcMode),
 				MakeUintegerChecker<uint32_t>())
 		.AddAttribute("NACK Generation Interval",
 				"The NACK Generation interval",
@@ -173,7 +177,7 @@ TypeId RdmaHw::GetTypeId (void)
 				MakeDataRateAccessor(&RdmaHw::m_dctcp_rai),
 				MakeDataRateChecker())
 		.AddAttribute("PintSmplThresh",
-				"PINT's sampling threshold in rand()%65536",
+				"PINT's sampling threshold out of 65536",
 				UintegerValue(65536),
 				MakeUintegerAccessor(&RdmaHw::pint_smpl_thresh),
 				MakeUintegerChecker<uint32_t>())
@@ -192,11 +196,33 @@ TypeId RdmaHw::GetTypeId (void)
 				DoubleValue(50.0 * 1000000000.0),
 				MakeDoubleAccessor(&RdmaHw::m_poseidon_max_rate),
 				MakeDoubleChecker<double>())
+		.AddAttribute("CcTraceInterval",
+				"Sample one in this many ACKs of a qp into the CcUpdate trace. 0 means print the sampled text log to stdout instead",
+				UintegerValue(0),
+				MakeUintegerAccessor(&RdmaHw::m_ccTraceInterval),
+				MakeUintegerChecker<uint32_t>())
+		.AddTraceSource ("CcUpdate", "A sampled rate update of the CC.",
+				MakeTraceSourceAccessor (&RdmaHw::m_traceCcUpdate))
 		;
 	return tid;
 }
 
 RdmaHw::RdmaHw(){
+	m_cc = RdmaCc::Get(0);
+	m_rng.Seed(RngSeedManager::GetSeed(), RngSeedManager::GetRun(), 0);
+}
+
+int64_t RdmaHw::AssignStreams(int64_t stream){
+	m_rng.Seed(RngSeedManager::GetSeed(), RngSeedManager::GetRun(), stream);
+	return 1;
+}
+
+void RdmaHw::SetCcMode(uint32_t mode){
+	m_cc_mode = mode;
+	m_cc = RdmaCc::Get(mode);
+}
+uint32_t RdmaHw::GetCcMode(void) const{
+	return m_cc_mode;
 }
 
 void RdmaHw::SetNode(Ptr<Node> node){
@@ -232,15 +258,11 @@ uint64_t RdmaHw::GetQpKey(uint32_t dip, uint16_t sport, uint16_t pg){
 	return ((uint64_t)dip << 32) | ((uint64_t)sport << 16) | (uint64_t)pg;
 }
 Ptr<RdmaQueuePair> RdmaHw::GetQp(uint32_t dip, uint16_t sport, uint16_t pg){
-	uint64_t key = GetQpKey(dip, sport, pg);
-	auto it = m_qpMap.find(key);
-	if (it != m_qpMap.end())
-		return it->second;
-	return NULL;
+	return m_qpMap.Find(GetQpKey(dip, sport, pg));
 }
 void RdmaHw::AddQueuePair(uint64_t size, uint16_t pg, Ipv4Address sip, Ipv4Address dip, uint16_t sport, uint16_t dport, uint32_t win, uint64_t baseRtt, Callback<void> notifyAppFinish){
 	// create qp
-	Ptr<RdmaQueuePair> qp = CreateObject<RdmaQueuePair>(pg, sip, dip, sport, dport, m_cc_mode);
+	Ptr<RdmaQueuePair> qp = RdmaQueuePair::Create(pg, sip, dip, sport, dport, m_cc->GetQpState());
 	qp->SetSize(size);
 	qp->SetWin(win);
 	qp->SetBaseRtt(baseRtt);
@@ -251,27 +273,13 @@ void RdmaHw::AddQueuePair(uint64_t size, uint16_t pg, Ipv4Address sip, Ipv4Addre
 	uint32_t nic_idx = GetNicIdxOfQp(qp);
 	m_nic[nic_idx].qpGrp->AddQp(qp);
 	uint64_t key = GetQpKey(dip.Get(), sport, pg);
-	m_qpMap[key] = qp;
+	qp->m_qpId = m_qpMap.Add(key, qp);
 
 	// set init variables
 	DataRate m_bps = m_nic[nic_idx].dev->GetDataRate();
 	qp->m_rate = m_bps;
 	qp->m_max_rate = m_bps;
-	if (m_cc_mode == 1){
-		qp->mlx.m_targetRate = m_bps;
-	}else if (m_cc_mode == 3){
-		qp->hp.m_curRate = m_bps;
-		if (m_multipleRate){
-			for (uint32_t i = 0; i < IntHeader::maxHop; i++)
-				qp->hp.hopState[i].Rc = m_bps;
-		}
-	}else if (m_cc_mode == 7){
-		qp->tmly.m_curRate = m_bps;
-	}else if (m_cc_mode == 10){
-		qp->hpccPint.m_curRate = m_bps;
-	} else if (m_cc_mode == 11) {
-		qp->poseidon.m_curRate= m_bps / 100.0;
-	}
+	m_cc->InitQp(*this, *qp, m_bps);
 
 	// Notify Nic
 	m_nic[nic_idx].dev->NewQp(qp);
@@ -280,17 +288,17 @@ void RdmaHw::AddQueuePair(uint64_t size, uint16_t pg, Ipv4Address sip, Ipv4Addre
 void RdmaHw::DeleteQueuePair(Ptr<RdmaQueuePair> qp){
 	// remove qp from the m_qpMap
 	uint64_t key = GetQpKey(qp->dip.Get(), qp->sport, qp->m_pg);
-	m_qpMap.erase(key);
+	m_qpMap.Remove(key);
 }
 
 Ptr<RdmaRxQueuePair> RdmaHw::GetRxQp(uint32_t sip, uint32_t dip, uint16_t sport, uint16_t dport, uint16_t pg, bool create){
 	uint64_t key = ((uint64_t)dip << 32) | ((uint64_t)pg << 16) | (uint64_t)dport;
-	auto it = m_rxQpMap.find(key);
-	if (it != m_rxQpMap.end())
-		return it->second;
+	RdmaRxQueuePair *q = m_rxQpMap.Find(key);
+	if (q != NULL)
+		return q;
 	if (create){
 		// create new rx qp
-		Ptr<RdmaRxQueuePair> q = CreateObject<RdmaRxQueuePair>();
+		Ptr<RdmaRxQueuePair> q = Create<RdmaRxQueuePair>();
 		// init the qp
 		q->sip = sip;
 		q->dip = dip;
@@ -298,7 +306,7 @@ Ptr<RdmaRxQueuePair> RdmaHw::GetRxQp(uint32_t sip, uint32_t dip, uint16_t sport,
 		q->dport = dport;
 		q->m_ecn_source.qIndex = pg;
 		// store in map
-		m_rxQpMap[key] = q;
+		q->m_qpId = m_rxQpMap.Add(key, q);
 		return q;
 	}
 	return NULL;
@@ -313,7 +321,7 @@ uint32_t RdmaHw::GetNicIdxOfRxQp(Ptr<RdmaRxQueuePair> q){
 }
 void RdmaHw::DeleteRxQp(uint32_t dip, uint16_t pg, uint16_t dport){
 	uint64_t key = ((uint64_t)dip << 32) | ((uint64_t)pg << 16) | (uint64_t)dport;
-	m_rxQpMap.erase(key);
+	m_rxQpMap.Remove(key);
 }
 
 int RdmaHw::ReceiveUdp(Ptr<Packet> p, CustomHeader &ch){
@@ -321,8 +329,19 @@ int RdmaHw::ReceiveUdp(Ptr<Packet> p, CustomHeader &ch){
 
 	uint32_t payload_size = p->GetSize() - ch.GetSerializedSize();
 
-	// TODO find corresponding rx queue pair
-	Ptr<RdmaRxQueuePair> rxQp = GetRxQp(ch.dip, ch.sip, ch.udp.dport, ch.udp.sport, ch.udp.pg, true);
+	// the rx qp of the id in the tag, or of the key if the tag has none
+	RdmaQpTag tag;
+	bool tagged = p->PeekPacketTag(tag);
+	Ptr<RdmaRxQueuePair> rxQp = tagged ? m_rxQpMap.Get(tag.GetRxQp()) : NULL;
+	if (rxQp == NULL){
+		if (tagged && tag.GetRxQp() != 0)
+			return 0; // a late copy of data of a flow that is done, its rx qp is reclaimed
+		rxQp = GetRxQp(ch.dip, ch.sip, ch.udp.dport, ch.udp.sport, ch.udp.pg, true);
+	}
+	if (tagged){
+		rxQp->m_txQpId = tag.GetQp();
+		rxQp->m_size = tag.GetSize();
+	}
 	if (ecnbits != 0){
 		rxQp->m_ecn_source.ecnbits |= ecnbits;
 		rxQp->m_ecn_source.qfb++;
@@ -332,32 +351,33 @@ int RdmaHw::ReceiveUdp(Ptr<Packet> p, CustomHeader &ch){
 
 	int x = ReceiverCheckSeq(ch.udp.seq, rxQp, payload_size);
 	if (x == 1 || x == 2){ //generate ACK or NACK
-		qbbHeader seqh;
-		seqh.SetSeq(rxQp->ReceiverNextExpectedSeq);
-		seqh.SetPG(ch.udp.pg);
-		seqh.SetSport(ch.udp.dport);
-		seqh.SetDport(ch.udp.sport);
-		seqh.SetIntHeader(ch.udp.ih);
-		if (ecnbits)
-			seqh.SetCnp();
-
-		Ptr<Packet> newp = Create<Packet>(std::max(60-14-20-(int)seqh.GetSerializedSize(), 0));
-		newp->AddHeader(seqh);
-
-		Ipv4Header head;	// Prepare IPv4 header
-		head.SetDestination(Ipv4Address(ch.sip));
-		head.SetSource(Ipv4Address(ch.dip));
-		head.SetProtocol(x == 1 ? 0xFC : 0xFD); //ack=0xFC nack=0xFD
-		head.SetTtl(64);
-		head.SetPayloadSize(newp->GetSize());
-		head.SetIdentification(rxQp->m_ipid++);
-
-		newp->AddHeader(head);
-		AddHeader(newp, 0x800);	// Attach PPP header
+		uint8_t protocol = x == 1 ? 0xFC : 0xFD; //ack=0xFC nack=0xFD
+		Ptr<Packet> newp;
+		if (PacketMetadata::IsEnabled()){ // the metadata must list the real headers
+			newp = MakeAck(ch, rxQp->ReceiverNextExpectedSeq, protocol, ecnbits != 0, rxQp->m_ipid++);
+		}else {
+			// patch the fields of this ACK in the template of the rxQp: ip id and protocol, qbb flags and seq, INT
+			HeaderTemplate &h = rxQp->m_ackTemplate;
+			if (h.IsEmpty())
+				h.Set(MakeAck(ch, 0, protocol, false, 0));
+			uint32_t ipStart = PppHeader::GetStaticSize(), qbbStart = ipStart + 20;
+			h.WriteHtonU16(ipStart + 4, rxQp->m_ipid++);
+			h.WriteU8(ipStart + 9, protocol);
+			h.WriteU16(qbbStart + 4, ecnbits ? 1 << qbbHeader::FLAG_CNP : 0);
+			h.WriteU32(qbbStart + 8, rxQp->ReceiverNextExpectedSeq);
+			// the INT of the data packet is serialized as is, so its bytes are those of ch.udp.ih
+			h.Write(qbbStart + qbbHeader::GetBaseSize(), p->GetBuffer() + ipStart + 20 + 8 + 6, IntHeader::GetStaticSize()); // ppp, ip, udp, SeqTs, INT
+			newp = Create<Packet>();
+			newp->AddHeader(h);
+		}
+		newp->AddPacketTag(RdmaQpTag(rxQp->m_txQpId, rxQp->m_qpId, 0));
 		// send
 		uint32_t nic_idx = GetNicIdxOfRxQp(rxQp);
 		m_nic[nic_idx].dev->RdmaEnqueueHighPrioQ(newp);
 		m_nic[nic_idx].dev->TriggerTransmit();
+		// the ACK of the last data, the flow is done on this side
+		if (x == 1 && rxQp->m_size > 0 && rxQp->ReceiverNextExpectedSeq >= rxQp->m_size)
+			DeleteRxQp(rxQp->dip, ch.udp.pg, rxQp->dport);
 	}
 	return 0;
 }
@@ -389,21 +409,8 @@ int RdmaHw::ReceiveCnp(Ptr<Packet> p, CustomHeader &ch){
 	if (qp->m_rate == 0)			//lazy initialization	
 	{
 		qp->m_rate = dev->GetDataRate();
-		if (m_cc_mode == 1){
-			qp->mlx.m_targetRate = dev->GetDataRate();
-		}else if (m_cc_mode == 3){
-			qp->hp.m_curRate = dev->GetDataRate();
-			if (m_multipleRate){
-				for (uint32_t i = 0; i < IntHeader::maxHop; i++)
-					qp->hp.hopState[i].Rc = dev->GetDataRate();
-			}
-		}else if (m_cc_mode == 7){
-			qp->tmly.m_curRate = dev->GetDataRate();
-		}else if (m_cc_mode == 10){
-			qp->hpccPint.m_curRate = dev->GetDataRate();
-		}else if (m_cc_mode == 11){
-			qp->poseidon.m_curRate = dev->GetDataRate();
-		}
+		m_cc->InitQp(*this, *qp, dev->GetDataRate());
+		qp->UpdateSched();
 	}
 	return 0;
 }
@@ -414,7 +421,14 @@ int RdmaHw::ReceiveAck(Ptr<Packet> p, CustomHeader &ch){
 	uint32_t seq = ch.ack.seq;
 	uint8_t cnp = (ch.ack.flags >> qbbHeader::FLAG_CNP) & 1;
 	int i;
-	Ptr<RdmaQueuePair> qp = GetQp(ch.sip, port, qIndex);
+	// the qp of the id in the tag, or of the key if the tag has none
+	RdmaQpTag tag;
+	bool tagged = p->PeekPacketTag(tag);
+	Ptr<RdmaQueuePair> qp = tagged ? m_qpMap.Get(tag.GetQp()) : NULL;
+	if (qp == NULL)
+		qp = GetQp(ch.sip, port, qIndex);
+	else
+		qp->m_rxQpId = tag.GetRxQp();
 	if (qp == NULL){
 		std::cout << "ERROR: " << "node:" << m_node->GetId() << ' ' << (ch.l3Prot == 0xFC ? "ACK" : "NACK") << " NIC cannot find the flow\n";
 		return 0;
@@ -431,6 +445,7 @@ int RdmaHw::ReceiveAck(Ptr<Packet> p, CustomHeader &ch){
 			uint32_t goback_seq = seq / m_chunk * m_chunk;
 			qp->Acknowledge(goback_seq);
 		}
+		qp->UpdateSched();
 		if (qp->IsFinished()){
 			QpComplete(qp);
 		}
@@ -439,24 +454,12 @@ int RdmaHw::ReceiveAck(Ptr<Packet> p, CustomHeader &ch){
 		RecoverQueue(qp);
 
 	// handle cnp
-	if (cnp){
-		if (m_cc_mode == 1){ // mlx version
-			cnp_received_mlx(qp);
-		} 
-	}
+	if (cnp)
+		m_cc->ReceiveCnp(*this, qp);
 
-	if (m_cc_mode == 3){
-		HandleAckHp(qp, p, ch);
-	}else if (m_cc_mode == 7){
-		HandleAckTimely(qp, p, ch);
-	}else if (m_cc_mode == 8){
-		HandleAckDctcp(qp, p, ch);
-	}else if (m_cc_mode == 10){
-		HandleAckHpPint(qp, p, ch);
-	} else if (m_cc_mode == 11) {
-		HandleAckPoseidon(qp, p, ch);
-	}
+	m_cc->ReceiveAck(*this, qp, p, ch);
 	// ACK may advance the on-the-fly window, allowing more packets to send
+	qp->UpdateSched();
 	dev->TriggerTransmit();
 	return 0;
 }
@@ -502,6 +505,57 @@ int RdmaHw::ReceiverCheckSeq(uint32_t seq, Ptr<RdmaRxQueuePair> q, uint32_t size
 		return 3;
 	}
 }
+Ptr<Packet> RdmaHw::MakeAck(CustomHeader &ch, uint32_t seq, uint8_t protocol, bool cnp, uint16_t ipid){
+	qbbHeader seqh;
+	seqh.SetSeq(seq);
+	seqh.SetPG(ch.udp.pg);
+	seqh.SetSport(ch.udp.dport);
+	seqh.SetDport(ch.udp.sport);
+	seqh.SetIntHeader(ch.udp.ih);
+	if (cnp)
+		seqh.SetCnp();
+
+	Ptr<Packet> newp = Create<Packet>(std::max(60-14-20-(int)seqh.GetSerializedSize(), 0));
+	newp->AddHeader(seqh);
+
+	Ipv4Header head;	// Prepare IPv4 header
+	head.SetDestination(Ipv4Address(ch.sip));
+	head.SetSource(Ipv4Address(ch.dip));
+	head.SetProtocol(protocol);
+	head.SetTtl(64);
+	head.SetPayloadSize(newp->GetSize());
+	head.SetIdentification(ipid);
+
+	newp->AddHeader(head);
+	AddHeader(newp, 0x800);	// Attach PPP header
+	return newp;
+}
+void RdmaHw::AddDataHeaders(Ptr<Packet> p, Ptr<RdmaQueuePair> qp){
+	// add SeqTsHeader
+	SeqTsHeader seqTs;
+	seqTs.SetSeq (qp->snd_nxt);
+	seqTs.SetPG (qp->m_pg);
+	p->AddHeader (seqTs);
+	// add udp header
+	UdpHeader udpHeader;
+	udpHeader.SetDestinationPort (qp->dport);
+	udpHeader.SetSourcePort (qp->sport);
+	p->AddHeader (udpHeader);
+	// add ipv4 header
+	Ipv4Header ipHeader;
+	ipHeader.SetSource (qp->sip);
+	ipHeader.SetDestination (qp->dip);
+	ipHeader.SetProtocol (0x11);
+	ipHeader.SetPayloadSize (p->GetSize());
+	ipHeader.SetTtl (64);
+	ipHeader.SetTos (0);
+	ipHeader.SetIdentification (qp->m_ipid);
+	p->AddHeader(ipHeader);
+	// add ppp header
+	PppHeader ppp;
+	ppp.SetProtocol (0x0021); // EtherToPpp(0x800), see point-to-point-net-device.cc
+	p->AddHeader (ppp);
+}
 void RdmaHw::AddHeader (Ptr<Packet> p, uint16_t protocolNumber){
 	PppHeader ppp;
 	ppp.SetProtocol (EtherToPpp (protocolNumber));
@@ -518,21 +572,19 @@ uint16_t RdmaHw::EtherToPpp (uint16_t proto){
 
 void RdmaHw::RecoverQueue(Ptr<RdmaQueuePair> qp){
 	qp->snd_nxt = qp->snd_una;
+	qp->UpdateSched();
 }
 
 void RdmaHw::QpComplete(Ptr<RdmaQueuePair> qp){
 	NS_ASSERT(!m_qpCompleteCallback.IsNull());
-	if (m_cc_mode == 1){
-		Simulator::Cancel(qp->mlx.m_eventUpdateAlpha);
-		Simulator::Cancel(qp->mlx.m_eventDecreaseRate);
-		Simulator::Cancel(qp->mlx.m_rpTimer);
-	}
+	m_cc->QpComplete(*this, *qp);
 
 	// This callback will log info
 	// It may also delete the rxQp on the receiver
 	m_qpCompleteCallback(qp);
 
-	qp->m_notifyAppFinish();
+	if (!qp->m_notifyAppFinish.IsNull())
+		qp->m_notifyAppFinish();
 
 	// delete the qp
 	DeleteQueuePair(qp);
@@ -560,8 +612,10 @@ void RdmaHw::RedistributeQp(){
 	}
 
 	// redistribute qp
-	for (auto &it : m_qpMap){
-		Ptr<RdmaQueuePair> qp = it.second;
+	for (uint32_t i = 0; i < m_qpMap.GetNSlots(); i++){
+		Ptr<RdmaQueuePair> qp = m_qpMap.GetSlot(i);
+		if (qp == NULL)
+			continue;
 		uint32_t nic_idx = GetNicIdxOfQp(qp);
 		m_nic[nic_idx].qpGrp->AddQp(qp);
 		// Notify Nic
@@ -574,30 +628,31 @@ Ptr<Packet> RdmaHw::GetNxtPacket(Ptr<RdmaQueuePair> qp){
 	if (m_mtu < payload_size)
 		payload_size = m_mtu;
 	Ptr<Packet> p = Create<Packet> (payload_size);
-	// add SeqTsHeader
-	SeqTsHeader seqTs;
-	seqTs.SetSeq (qp->snd_nxt);
-	seqTs.SetPG (qp->m_pg);
-	p->AddHeader (seqTs);
-	// add udp header
-	UdpHeader udpHeader;
-	udpHeader.SetDestinationPort (qp->dport);
-	udpHeader.SetSourcePort (qp->sport);
-	p->AddHeader (udpHeader);
-	// add ipv4 header
-	Ipv4Header ipHeader;
-	ipHeader.SetSource (qp->sip);
-	ipHeader.SetDestination (qp->dip);
-	ipHeader.SetProtocol (0x11);
-	ipHeader.SetPayloadSize (p->GetSize());
-	ipHeader.SetTtl (64);
-	ipHeader.SetTos (0);
-	ipHeader.SetIdentification (qp->m_ipid);
-	p->AddHeader(ipHeader);
-	// add ppp header
-	PppHeader ppp;
-	ppp.SetProtocol (0x0021); // EtherToPpp(0x800), see point-to-point-net-device.cc
-	p->AddHeader (ppp);
+	if (PacketMetadata::IsEnabled()){ // the metadata must list the real headers
+		AddDataHeaders(p, qp);
+	}else {
+		// patch the fields of this packet in the template of the qp: ip length and id, udp length, seq,
+		// and the send time that SeqTsHeader puts in the INT
+		HeaderTemplate &h = qp->m_hdrTemplate;
+		if (h.IsEmpty()){
+			Ptr<Packet> t = Create<Packet>();
+			AddDataHeaders(t, qp);
+			h.Set(t);
+		}
+		uint32_t ipStart = PppHeader::GetStaticSize(), udpStart = ipStart + 20, seqTsStart = udpStart + 8;
+		uint32_t udpSize = 8 + SeqTsHeader::GetHeaderSize() + payload_size;
+		h.WriteHtonU16(ipStart + 2, 20 + udpSize);
+		h.WriteHtonU16(ipStart + 4, qp->m_ipid);
+		h.WriteHtonU16(udpStart + 4, udpSize);
+		h.WriteHtonU32(seqTsStart, qp->snd_nxt);
+		if (IntHeader::mode == IntHeader::TS)
+			h.WriteU64(seqTsStart + 6, Simulator::Now().GetTimeStep());
+		else if (IntHeader::mode == IntHeader::NORMAL)
+			h.WriteU64(seqTsStart + 6 + IntHeader::maxHop * 8, Simulator::Now().GetTimeStep()); // after the hops
+		p->AddHeader(h);
+	}
+
+	p->AddPacketTag(RdmaQpTag(qp->m_qpId, qp->m_rxQpId, qp->m_size));
 
 	// update state
 	qp->snd_nxt += payload_size;
@@ -610,6 +665,7 @@ Ptr<Packet> RdmaHw::GetNxtPacket(Ptr<RdmaQueuePair> qp){
 void RdmaHw::PktSent(Ptr<RdmaQueuePair> qp, Ptr<Packet> pkt, Time interframeGap){
 	qp->lastPktSize = pkt->GetSize();
 	UpdateNextAvail(qp, interframeGap, pkt->GetSize());
+	qp->UpdateSched();
 }
 
 void RdmaHw::UpdateNextAvail(Ptr<RdmaQueuePair> qp, Time interframeGap, uint32_t pkt_size){
@@ -641,79 +697,81 @@ void RdmaHw::ChangeRate(Ptr<RdmaQueuePair> qp, DataRate new_rate){
  *****************************/
 void RdmaHw::UpdateAlphaMlx(Ptr<RdmaQueuePair> q){
 	#if PRINT_LOG
-	//std::cout << Simulator::Now() << " alpha update:" << m_node->GetId() << ' ' << q->mlx.m_alpha << ' ' << (int)q->mlx.m_alpha_cnp_arrived << '\n';
-	//printf("%lu alpha update: %08x %08x %u %u %.6lf->", Simulator::Now().GetTimeStep(), q->sip.Get(), q->dip.Get(), q->sport, q->dport, q->mlx.m_alpha);
+	//std::cout << Simulator::Now() << " alpha update:" << m_node->GetId() << ' ' << q->Mlx().m_alpha << ' ' << (int)q->Mlx().m_alpha_cnp_arrived << '\n';
+	//printf("%lu alpha update: %08x %08x %u %u %.6lf->", Simulator::Now().GetTimeStep(), q->sip.Get(), q->dip.Get(), q->sport, q->dport, q->Mlx().m_alpha);
 	#endif
-	if (q->mlx.m_alpha_cnp_arrived){
-		q->mlx.m_alpha = (1 - m_g)*q->mlx.m_alpha + m_g; 	//binary feedback
+	if (q->Mlx().m_alpha_cnp_arrived){
+		q->Mlx().m_alpha = (1 - m_g)*q->Mlx().m_alpha + m_g; 	//binary feedback
 	}else {
-		q->mlx.m_alpha = (1 - m_g)*q->mlx.m_alpha; 	//binary feedback
+		q->Mlx().m_alpha = (1 - m_g)*q->Mlx().m_alpha; 	//binary feedback
 	}
 	#if PRINT_LOG
-	//printf("%.6lf\n", q->mlx.m_alpha);
+	//printf("%.6lf\n", q->Mlx().m_alpha);
 	#endif
-	q->mlx.m_alpha_cnp_arrived = false; // clear the CNP_arrived bit
+	q->Mlx().m_alpha_cnp_arrived = false; // clear the CNP_arrived bit
 	ScheduleUpdateAlphaMlx(q);
 }
 void RdmaHw::ScheduleUpdateAlphaMlx(Ptr<RdmaQueuePair> q){
-	q->mlx.m_eventUpdateAlpha = Simulator::Schedule(MicroSeconds(m_alpha_resume_interval), &RdmaHw::UpdateAlphaMlx, this, q);
+	q->Mlx().m_eventUpdateAlpha = Simulator::Schedule(MicroSeconds(m_alpha_resume_interval), &RdmaHw::UpdateAlphaMlx, this, q);
 }
 
 void RdmaHw::cnp_received_mlx(Ptr<RdmaQueuePair> q){
-	q->mlx.m_alpha_cnp_arrived = true; // set CNP_arrived bit for alpha update
-	q->mlx.m_decrease_cnp_arrived = true; // set CNP_arrived bit for rate decrease
-	if (q->mlx.m_first_cnp){
+	q->Mlx().m_alpha_cnp_arrived = true; // set CNP_arrived bit for alpha update
+	q->Mlx().m_decrease_cnp_arrived = true; // set CNP_arrived bit for rate decrease
+	if (q->Mlx().m_first_cnp){
 		// init alpha
-		q->mlx.m_alpha = 1;
-		q->mlx.m_alpha_cnp_arrived = false;
+		q->Mlx().m_alpha = 1;
+		q->Mlx().m_alpha_cnp_arrived = false;
 		// schedule alpha update
 		ScheduleUpdateAlphaMlx(q);
 		// schedule rate decrease
 		ScheduleDecreaseRateMlx(q, 1); // add 1 ns to make sure rate decrease is after alpha update
 		// set rate on first CNP
-		q->mlx.m_targetRate = q->m_rate = m_rateOnFirstCNP * q->m_rate;
-		q->mlx.m_first_cnp = false;
+		q->Mlx().m_targetRate = q->m_rate = m_rateOnFirstCNP * q->m_rate;
+		q->Mlx().m_first_cnp = false;
 	}
 }
 
 void RdmaHw::CheckRateDecreaseMlx(Ptr<RdmaQueuePair> q){
 	ScheduleDecreaseRateMlx(q, 0);
-	if (q->mlx.m_decrease_cnp_arrived){
+	if (q->Mlx().m_decrease_cnp_arrived){
 		#if PRINT_LOG
-		printf("%lu rate dec: %08x %08x %u %u (%0.3lf %.3lf)->", Simulator::Now().GetTimeStep(), q->sip.Get(), q->dip.Get(), q->sport, q->dport, q->mlx.m_targetRate.GetBitRate() * 1e-9, q->m_rate.GetBitRate() * 1e-9);
+		printf("%lu rate dec: %08x %08x %u %u (%0.3lf %.3lf)->", Simulator::Now().GetTimeStep(), q->sip.Get(), q->dip.Get(), q->sport, q->dport, q->Mlx().m_targetRate.GetBitRate() * 1e-9, q->m_rate.GetBitRate() * 1e-9);
 		#endif
 		bool clamp = true;
 		if (!m_EcnClampTgtRate){
-			if (q->mlx.m_rpTimeStage == 0)
+			if (q->Mlx().m_rpTimeStage == 0)
 				clamp = false;
 		}
 		if (clamp)
-			q->mlx.m_targetRate = q->m_rate;
-		q->m_rate = std::max(m_minRate, q->m_rate * (1 - q->mlx.m_alpha / 2));
+			q->Mlx().m_targetRate = q->m_rate;
+		q->m_rate = std::max(m_minRate, q->m_rate * (1 - q->Mlx().m_alpha / 2));
 		// reset rate increase related things
-		q->mlx.m_rpTimeStage = 0;
-		q->mlx.m_decrease_cnp_arrived = false;
-		Simulator::Cancel(q->mlx.m_rpTimer);
-		q->mlx.m_rpTimer = Simulator::Schedule(MicroSeconds(m_rpgTimeReset), &RdmaHw::RateIncEventTimerMlx, this, q);
+		q->Mlx().m_rpTimeStage = 0;
+		q->Mlx().m_decrease_cnp_arrived = false;
+		Simulator::Cancel(q->Mlx().m_rpTimer);
+		q->Mlx().m_rpTimer = Simulator::Schedule(MicroSeconds(m_rpgTimeReset), &RdmaHw::RateIncEventTimerMlx, this, q);
 		#if PRINT_LOG
-		printf("(%.3lf %.3lf)\n", q->mlx.m_targetRate.GetBitRate() * 1e-9, q->m_rate.GetBitRate() * 1e-9);
+		printf("(%.3lf %.3lf)\n", q->Mlx().m_targetRate.GetBitRate() * 1e-9, q->m_rate.GetBitRate() * 1e-9);
 		#endif
+		q->UpdateSched();
 	}
 }
 void RdmaHw::ScheduleDecreaseRateMlx(Ptr<RdmaQueuePair> q, uint32_t delta){
-	q->mlx.m_eventDecreaseRate = Simulator::Schedule(MicroSeconds(m_rateDecreaseInterval) + NanoSeconds(delta), &RdmaHw::CheckRateDecreaseMlx, this, q);
+	q->Mlx().m_eventDecreaseRate = Simulator::Schedule(MicroSeconds(m_rateDecreaseInterval) + NanoSeconds(delta), &RdmaHw::CheckRateDecreaseMlx, this, q);
 }
 
 void RdmaHw::RateIncEventTimerMlx(Ptr<RdmaQueuePair> q){
-	q->mlx.m_rpTimer = Simulator::Schedule(MicroSeconds(m_rpgTimeReset), &RdmaHw::RateIncEventTimerMlx, this, q);
+	q->Mlx().m_rpTimer = Simulator::Schedule(MicroSeconds(m_rpgTimeReset), &RdmaHw::RateIncEventTimerMlx, this, q);
 	RateIncEventMlx(q);
-	q->mlx.m_rpTimeStage++;
+	q->Mlx().m_rpTimeStage++;
+	q->UpdateSched();
 }
 void RdmaHw::RateIncEventMlx(Ptr<RdmaQueuePair> q){
 	// check which increase phase: fast recovery, active increase, hyper increase
-	if (q->mlx.m_rpTimeStage < m_rpgThreshold){ // fast recovery
+	if (q->Mlx().m_rpTimeStage < m_rpgThreshold){ // fast recovery
 		FastRecoveryMlx(q);
-	}else if (q->mlx.m_rpTimeStage == m_rpgThreshold){ // active increase
+	}else if (q->Mlx().m_rpTimeStage == m_rpgThreshold){ // active increase
 		ActiveIncreaseMlx(q);
 	}else { // hyper increase
 		HyperIncreaseMlx(q);
@@ -722,43 +780,43 @@ void RdmaHw::RateIncEventMlx(Ptr<RdmaQueuePair> q){
 
 void RdmaHw::FastRecoveryMlx(Ptr<RdmaQueuePair> q){
 	#if PRINT_LOG
-	printf("%lu fast recovery: %08x %08x %u %u (%0.3lf %.3lf)->", Simulator::Now().GetTimeStep(), q->sip.Get(), q->dip.Get(), q->sport, q->dport, q->mlx.m_targetRate.GetBitRate() * 1e-9, q->m_rate.GetBitRate() * 1e-9);
+	printf("%lu fast recovery: %08x %08x %u %u (%0.3lf %.3lf)->", Simulator::Now().GetTimeStep(), q->sip.Get(), q->dip.Get(), q->sport, q->dport, q->Mlx().m_targetRate.GetBitRate() * 1e-9, q->m_rate.GetBitRate() * 1e-9);
 	#endif
-	q->m_rate = (q->m_rate / 2) + (q->mlx.m_targetRate / 2);
+	q->m_rate = (q->m_rate / 2) + (q->Mlx().m_targetRate / 2);
 	#if PRINT_LOG
-	printf("(%.3lf %.3lf)\n", q->mlx.m_targetRate.GetBitRate() * 1e-9, q->m_rate.GetBitRate() * 1e-9);
+	printf("(%.3lf %.3lf)\n", q->Mlx().m_targetRate.GetBitRate() * 1e-9, q->m_rate.GetBitRate() * 1e-9);
 	#endif
 }
 void RdmaHw::ActiveIncreaseMlx(Ptr<RdmaQueuePair> q){
 	#if PRINT_LOG
-	printf("%lu active inc: %08x %08x %u %u (%0.3lf %.3lf)->", Simulator::Now().GetTimeStep(), q->sip.Get(), q->dip.Get(), q->sport, q->dport, q->mlx.m_targetRate.GetBitRate() * 1e-9, q->m_rate.GetBitRate() * 1e-9);
+	printf("%lu active inc: %08x %08x %u %u (%0.3lf %.3lf)->", Simulator::Now().GetTimeStep(), q->sip.Get(), q->dip.Get(), q->sport, q->dport, q->Mlx().m_targetRate.GetBitRate() * 1e-9, q->m_rate.GetBitRate() * 1e-9);
 	#endif
 	// get NIC
 	uint32_t nic_idx = GetNicIdxOfQp(q);
 	Ptr<QbbNetDevice> dev = m_nic[nic_idx].dev;
 	// increate rate
-	q->mlx.m_targetRate += m_rai;
-	if (q->mlx.m_targetRate > dev->GetDataRate())
-		q->mlx.m_targetRate = dev->GetDataRate();
-	q->m_rate = (q->m_rate / 2) + (q->mlx.m_targetRate / 2);
+	q->Mlx().m_targetRate += m_rai;
+	if (q->Mlx().m_targetRate > dev->GetDataRate())
+		q->Mlx().m_targetRate = dev->GetDataRate();
+	q->m_rate = (q->m_rate / 2) + (q->Mlx().m_targetRate / 2);
 	#if PRINT_LOG
-	printf("(%.3lf %.3lf)\n", q->mlx.m_targetRate.GetBitRate() * 1e-9, q->m_rate.GetBitRate() * 1e-9);
+	printf("(%.3lf %.3lf)\n", q->Mlx().m_targetRate.GetBitRate() * 1e-9, q->m_rate.GetBitRate() * 1e-9);
 	#endif
 }
 void RdmaHw::HyperIncreaseMlx(Ptr<RdmaQueuePair> q){
 	#if PRINT_LOG
-	printf("%lu hyper inc: %08x %08x %u %u (%0.3lf %.3lf)->", Simulator::Now().GetTimeStep(), q->sip.Get(), q->dip.Get(), q->sport, q->dport, q->mlx.m_targetRate.GetBitRate() * 1e-9, q->m_rate.GetBitRate() * 1e-9);
+	printf("%lu hyper inc: %08x %08x %u %u (%0.3lf %.3lf)->", Simulator::Now().GetTimeStep(), q->sip.Get(), q->dip.Get(), q->sport, q->dport, q->Mlx().m_targetRate.GetBitRate() * 1e-9, q->m_rate.GetBitRate() * 1e-9);
 	#endif
 	// get NIC
 	uint32_t nic_idx = GetNicIdxOfQp(q);
 	Ptr<QbbNetDevice> dev = m_nic[nic_idx].dev;
 	// increate rate
-	q->mlx.m_targetRate += m_rhai;
-	if (q->mlx.m_targetRate > dev->GetDataRate())
-		q->mlx.m_targetRate = dev->GetDataRate();
-	q->m_rate = (q->m_rate / 2) + (q->mlx.m_targetRate / 2);
+	q->Mlx().m_targetRate += m_rhai;
+	if (q->Mlx().m_targetRate > dev->GetDataRate())
+		q->Mlx().m_targetRate = dev->GetDataRate();
+	q->m_rate = (q->m_rate / 2) + (q->Mlx().m_targetRate / 2);
 	#if PRINT_LOG
-	printf("(%.3lf %.3lf)\n", q->mlx.m_targetRate.GetBitRate() * 1e-9, q->m_rate.GetBitRate() * 1e-9);
+	printf("(%.3lf %.3lf)\n", q->Mlx().m_targetRate.GetBitRate() * 1e-9, q->m_rate.GetBitRate() * 1e-9);
 	#endif
 }
 
@@ -786,24 +844,28 @@ void RdmaHw::HandleAckPoseidon(Ptr<RdmaQueuePair> qp, Ptr<Packet> p, CustomHeade
 	uint32_t next_seq = qp->snd_nxt;
 	uint64_t rtt = Simulator::Now().GetTimeStep() - ch.ack.ih.pts;
 	qp->m_rtt = rtt;
-	bool read = (rand() % 250 == 99);
-	if (qp->poseidon.m_lastUpdateSeq == 0) { // first RTT
-		qp->poseidon.m_lastUpdateSeq = next_seq;
-		qp->poseidon.m_lastUpdateTime = 0;
+	bool read = false, trace = false;
+	if (m_ccTraceInterval == 0)
+		read = (m_rng.Next32() % 250 == 99);
+	else
+		trace = (qp->Poseidon().m_ackCnt++ % m_ccTraceInterval == 0);
+	if (qp->Poseidon().m_lastUpdateSeq == 0) { // first RTT
+		qp->Poseidon().m_lastUpdateSeq = next_seq;
+		qp->Poseidon().m_lastUpdateTime = 0;
 		// store INT
 		IntHeader &ih = ch.ack.ih;
 		NS_ASSERT(ih.nhop <= IntHeader::maxHop);
 		for (uint32_t i = 0; i < ih.nhop; i++)
-			qp->poseidon.hop[i] = ih.hop[i];
+			qp->Poseidon().hop[i] = ih.hop[i];
 	} else {
 		// get MPD (max per-hop delay) from packet INT
 		IntHeader &ih = ch.ack.ih;
 
-		double mpt = CalculateTarget(qp->poseidon.m_curRate, m_poseidon_min_rate, m_poseidon_max_rate);
+		double mpt = CalculateTarget(qp->Poseidon().m_curRate, m_poseidon_min_rate, m_poseidon_max_rate);
 		double queue_length_total = 0.0;
 
 		if (ih.nhop <= IntHeader::maxHop){
-			double cwnd = 1.0 * rtt * 1e-9 / qp->poseidon.m_curRate.CalculateTxTime(qp->lastPktSize);
+			double cwnd = 1.0 * rtt * 1e-9 / qp->Poseidon().m_curRate.CalculateTxTime(qp->lastPktSize);
 
 			double mpd = 0;
 			double global_error_integral = 0.0;
@@ -843,17 +905,17 @@ void RdmaHw::HandleAckPoseidon(Ptr<RdmaQueuePair> qp, Ptr<Packet> p, CustomHeade
 				}
 
 				// record the queue length.
-				qp->poseidon.signals[i] = signal;
+				qp->Poseidon().signals[i] = signal;
 				if (read) {
-					printf("SPort: %lu %d %.10lf\n", Simulator::Now().GetTimeStep(), port, qp->poseidon.signals[i]);
+					printf("SPort: %lu %d %.10lf\n", Simulator::Now().GetTimeStep(), port, qp->Poseidon().signals[i]);
 				}
 				
 				// find the mpd.
-				if (qp->poseidon.signals[i] > mpd) {
-					mpd = qp->poseidon.signals[i];
+				if (qp->Poseidon().signals[i] > mpd) {
+					mpd = qp->Poseidon().signals[i];
 				}
 
-				qp->poseidon.hop[i] = ih.hop[i];
+				qp->Poseidon().hop[i] = ih.hop[i];
 			}
 
 			if (read) {
@@ -864,22 +926,23 @@ void RdmaHw::HandleAckPoseidon(Ptr<RdmaQueuePair> qp, Ptr<Packet> p, CustomHeade
 			double update_ratio = UpdateRate(mpd, mpt, m_poseidon_para_m, m_poseidon_min_rate, m_poseidon_max_rate);
 			if (update_ratio > 2.5) update_ratio = 2.5;
 			else if (update_ratio < 0.4) update_ratio = 0.4;
+			double clamped_ratio = update_ratio;
 			
 			if (read) {
 				printf("MPD: %.10lf ", mpd);
 				printf("Target: %.10lf\n", mpt);
 				printf("Update: %.10lf ", update_ratio);
 				printf("RTT: %.10lf us\n", rtt / 1000.0);
-				printf("Bitrate: %.10lf ", qp->poseidon.m_curRate.GetBitRate() * 1.0);
+				printf("Bitrate: %.10lf ", qp->Poseidon().m_curRate.GetBitRate() * 1.0);
 				printf("CWND: %f\n", cwnd);
 			}
 
 			if (update_ratio < 1.0) {  // multiplicative decrease
 				bool use_per_rtt_md = false;
 				if (use_per_rtt_md) {
-					if (Simulator::Now().GetTimeStep() - qp->poseidon.m_lastUpdateTime >= rtt) {
-						// printf("MD operation: %lu - %lu >= %lu\n", Simulator::Now().GetTimeStep(), qp->poseidon.m_lastUpdateTime, rtt);
-						qp->poseidon.m_lastUpdateTime = Simulator::Now().GetTimeStep();
+					if (Simulator::Now().GetTimeStep() - qp->Poseidon().m_lastUpdateTime >= rtt) {
+						// printf("MD operation: %lu - %lu >= %lu\n", Simulator::Now().GetTimeStep(), qp->Poseidon().m_lastUpdateTime, rtt);
+						qp->Poseidon().m_lastUpdateTime = Simulator::Now().GetTimeStep();
 					} else {
 						update_ratio = 1.0;
 					}
@@ -894,7 +957,7 @@ void RdmaHw::HandleAckPoseidon(Ptr<RdmaQueuePair> qp, Ptr<Packet> p, CustomHeade
 				printf("ActualUpdate: %.10f\n", update_ratio);
 			}
 			
-			DataRate new_rate = qp->poseidon.m_curRate * update_ratio;
+			DataRate new_rate = qp->Poseidon().m_curRate * update_ratio;
 			if (new_rate < m_minRate)
 				new_rate = m_minRate;
 			if (new_rate > qp->m_max_rate)
@@ -905,14 +968,35 @@ void RdmaHw::HandleAckPoseidon(Ptr<RdmaQueuePair> qp, Ptr<Packet> p, CustomHeade
 			}
 
 			ChangeRate(qp, new_rate);
-			qp->poseidon.m_curRate = new_rate;
+			qp->Poseidon().m_curRate = new_rate;
 
 			if (read) {
 				printf("Rate: %lu %08x %.10lf\n", Simulator::Now().GetTimeStep(), qp->sip.Get(), new_rate.GetBitRate()*1e-9);
 			}
+			if (trace) {
+				CcTraceFormat tr;
+				memset(&tr, 0, sizeof(tr));
+				tr.time = Simulator::Now().GetTimeStep();
+				tr.sip = qp->sip.Get();
+				tr.dip = qp->dip.Get();
+				tr.sport = qp->sport;
+				tr.dport = qp->dport;
+				tr.pg = qp->m_pg;
+				tr.nhop = ih.nhop;
+				tr.mpd = mpd;
+				tr.mpt = mpt;
+				tr.update = clamped_ratio;
+				tr.actualUpdate = update_ratio;
+				tr.rate = new_rate.GetBitRate();
+				tr.rtt = rtt;
+				tr.cwnd = cwnd;
+				for (uint32_t i = 0; i < ih.nhop && i < CcTraceFormat::maxHop; i++)
+					tr.qlen[i] = ih.hop[i].GetQlen();
+				m_traceCcUpdate(tr);
+			}
 		}
-		if (next_seq > qp->poseidon.m_lastUpdateSeq)
-			qp->poseidon.m_lastUpdateSeq = next_seq;
+		if (next_seq > qp->Poseidon().m_lastUpdateSeq)
+			qp->Poseidon().m_lastUpdateSeq = next_seq;
 	}
 }
 
@@ -922,7 +1006,7 @@ void RdmaHw::HandleAckPoseidon(Ptr<RdmaQueuePair> qp, Ptr<Packet> p, CustomHeade
 void RdmaHw::HandleAckHp(Ptr<RdmaQueuePair> qp, Ptr<Packet> p, CustomHeader &ch){
 	uint32_t ack_seq = ch.ack.seq;
 	// update rate
-	if (ack_seq > qp->hp.m_lastUpdateSeq){ // if full RTT feedback is ready, do full update
+	if (ack_seq > qp->Hp().m_lastUpdateSeq){ // if full RTT feedback is ready, do full update
 		UpdateRateHp(qp, p, ch, false);
 	}else{ // do fast react
 		FastReactHp(qp, p, ch);
@@ -932,16 +1016,16 @@ void RdmaHw::HandleAckHp(Ptr<RdmaQueuePair> qp, Ptr<Packet> p, CustomHeader &ch)
 void RdmaHw::UpdateRateHp(Ptr<RdmaQueuePair> qp, Ptr<Packet> p, CustomHeader &ch, bool fast_react){
 	uint32_t next_seq = qp->snd_nxt;
 	bool print = !fast_react || true;
-	if (qp->hp.m_lastUpdateSeq == 0){ // first RTT
-		qp->hp.m_lastUpdateSeq = next_seq;
+	if (qp->Hp().m_lastUpdateSeq == 0){ // first RTT
+		qp->Hp().m_lastUpdateSeq = next_seq;
 		// store INT
 		IntHeader &ih = ch.ack.ih;
 		NS_ASSERT(ih.nhop <= IntHeader::maxHop);
 		for (uint32_t i = 0; i < ih.nhop; i++)
-			qp->hp.hop[i] = ih.hop[i];
+			qp->Hp().hop[i] = ih.hop[i];
 		#if PRINT_LOG
 		if (print){
-			printf("%lu %s %08x %08x %u %u [%u,%u,%u]", Simulator::Now().GetTimeStep(), fast_react? "fast" : "update", qp->sip.Get(), qp->dip.Get(), qp->sport, qp->dport, qp->hp.m_lastUpdateSeq, ch.ack.seq, next_seq);
+			printf("%lu %s %08x %08x %u %u [%u,%u,%u]", Simulator::Now().GetTimeStep(), fast_react? "fast" : "update", qp->sip.Get(), qp->dip.Get(), qp->sport, qp->dport, qp->Hp().m_lastUpdateSeq, ch.ack.seq, next_seq);
 			for (uint32_t i = 0; i < ih.nhop; i++)
 				printf(" %u %lu %lu", ih.hop[i].GetQlen(), ih.hop[i].GetBytes(), ih.hop[i].GetTime());
 			printf("\n");
@@ -955,7 +1039,7 @@ void RdmaHw::UpdateRateHp(Ptr<RdmaQueuePair> qp, Ptr<Packet> p, CustomHeader &ch
 			bool inStable = false;
 			#if PRINT_LOG
 			if (print)
-				printf("%lu %s %08x %08x %u %u [%u,%u,%u]", Simulator::Now().GetTimeStep(), fast_react? "fast" : "update", qp->sip.Get(), qp->dip.Get(), qp->sport, qp->dport, qp->hp.m_lastUpdateSeq, ch.ack.seq, next_seq);
+				printf("%lu %s %08x %08x %u %u [%u,%u,%u]", Simulator::Now().GetTimeStep(), fast_react? "fast" : "update", qp->sip.Get(), qp->dip.Get(), qp->sport, qp->dport, qp->Hp().m_lastUpdateSeq, ch.ack.seq, next_seq);
 			#endif
 			// check each hop
 			double U = 0;
@@ -970,12 +1054,12 @@ void RdmaHw::UpdateRateHp(Ptr<RdmaQueuePair> qp, Ptr<Packet> p, CustomHeader &ch
 				updated[i] = updated_any = true;
 				#if PRINT_LOG
 				if (print)
-					printf(" %u(%u) %lu(%lu) %lu(%lu)", ih.hop[i].GetQlen(), qp->hp.hop[i].GetQlen(), ih.hop[i].GetBytes(), qp->hp.hop[i].GetBytes(), ih.hop[i].GetTime(), qp->hp.hop[i].GetTime());
+					printf(" %u(%u) %lu(%lu) %lu(%lu)", ih.hop[i].GetQlen(), qp->Hp().hop[i].GetQlen(), ih.hop[i].GetBytes(), qp->Hp().hop[i].GetBytes(), ih.hop[i].GetTime(), qp->Hp().hop[i].GetTime());
 				#endif
-				uint64_t tau = ih.hop[i].GetTimeDelta(qp->hp.hop[i]);;
+				uint64_t tau = ih.hop[i].GetTimeDelta(qp->Hp().hop[i]);;
 				double duration = tau * 1e-9;
-				double txRate = (ih.hop[i].GetBytesDelta(qp->hp.hop[i])) * 8 / duration;
-				double u = txRate / ih.hop[i].GetLineRate() + (double)std::min(ih.hop[i].GetQlen(), qp->hp.hop[i].GetQlen()) * qp->m_max_rate.GetBitRate() / ih.hop[i].GetLineRate() /qp->m_win;
+				double txRate = (ih.hop[i].GetBytesDelta(qp->Hp().hop[i])) * 8 / duration;
+				double u = txRate / ih.hop[i].GetLineRate() + (double)std::min(ih.hop[i].GetQlen(), qp->Hp().hop[i].GetQlen()) * qp->m_max_rate.GetBitRate() / ih.hop[i].GetLineRate() /qp->m_win;
 				#if PRINT_LOG
 				if (print)
 					printf(" %.3lf %.3lf", txRate, u);
@@ -990,9 +1074,9 @@ void RdmaHw::UpdateRateHp(Ptr<RdmaQueuePair> qp, Ptr<Packet> p, CustomHeader &ch
 					// for per hop (per hop R)
 					if (tau > qp->m_baseRtt)
 						tau = qp->m_baseRtt;
-					qp->hp.hopState[i].u = (qp->hp.hopState[i].u * (qp->m_baseRtt - tau) + u * tau) / double(qp->m_baseRtt);
+					qp->Hp().hopState[i].u = (qp->Hp().hopState[i].u * (qp->m_baseRtt - tau) + u * tau) / double(qp->m_baseRtt);
 				}
-				qp->hp.hop[i] = ih.hop[i];
+				qp->Hp().hop[i] = ih.hop[i];
 			}
 
 			DataRate new_rate;
@@ -1004,15 +1088,15 @@ void RdmaHw::UpdateRateHp(Ptr<RdmaQueuePair> qp, Ptr<Packet> p, CustomHeader &ch
 				if (updated_any){
 					if (dt > qp->m_baseRtt)
 						dt = qp->m_baseRtt;
-					qp->hp.u = (qp->hp.u * (qp->m_baseRtt - dt) + U * dt) / double(qp->m_baseRtt);
-					max_c = qp->hp.u / m_targetUtil;
+					qp->Hp().u = (qp->Hp().u * (qp->m_baseRtt - dt) + U * dt) / double(qp->m_baseRtt);
+					max_c = qp->Hp().u / m_targetUtil;
 
-					if (max_c >= 1 || qp->hp.m_incStage >= m_miThresh){
-						new_rate = qp->hp.m_curRate / max_c + m_rai;
+					if (max_c >= 1 || qp->Hp().m_incStage >= m_miThresh){
+						new_rate = qp->Hp().m_curRate / max_c + m_rai;
 						new_incStage = 0;
 					}else{
-						new_rate = qp->hp.m_curRate + m_rai;
-						new_incStage = qp->hp.m_incStage+1;
+						new_rate = qp->Hp().m_curRate + m_rai;
+						new_incStage = qp->Hp().m_incStage+1;
 					}
 					if (new_rate < m_minRate)
 						new_rate = m_minRate;
@@ -1020,11 +1104,11 @@ void RdmaHw::UpdateRateHp(Ptr<RdmaQueuePair> qp, Ptr<Packet> p, CustomHeader &ch
 						new_rate = qp->m_max_rate;
 					#if PRINT_LOG
 					if (print)
-						printf(" u=%.6lf U=%.3lf dt=%u max_c=%.3lf", qp->hp.u, U, dt, max_c);
+						printf(" u=%.6lf U=%.3lf dt=%u max_c=%.3lf", qp->Hp().u, U, dt, max_c);
 					#endif
 					#if PRINT_LOG
 					if (print)
-						printf(" rate:%.3lf->%.3lf\n", qp->hp.m_curRate.GetBitRate()*1e-9, new_rate.GetBitRate()*1e-9);
+						printf(" rate:%.3lf->%.3lf\n", qp->Hp().m_curRate.GetBitRate()*1e-9, new_rate.GetBitRate()*1e-9);
 					#endif
 				}
 			}else{
@@ -1032,13 +1116,13 @@ void RdmaHw::UpdateRateHp(Ptr<RdmaQueuePair> qp, Ptr<Packet> p, CustomHeader &ch
 				new_rate = qp->m_max_rate;
 				for (uint32_t i = 0; i < ih.nhop; i++){
 					if (updated[i]){
-						double c = qp->hp.hopState[i].u / m_targetUtil;
-						if (c >= 1 || qp->hp.hopState[i].incStage >= m_miThresh){
-							new_rate_per_hop[i] = qp->hp.hopState[i].Rc / c + m_rai;
+						double c = qp->Hp().hopState[i].u / m_targetUtil;
+						if (c >= 1 || qp->Hp().hopState[i].incStage >= m_miThresh){
+							new_rate_per_hop[i] = qp->Hp().hopState[i].Rc / c + m_rai;
 							new_incStage_per_hop[i] = 0;
 						}else{
-							new_rate_per_hop[i] = qp->hp.hopState[i].Rc + m_rai;
-							new_incStage_per_hop[i] = qp->hp.hopState[i].incStage+1;
+							new_rate_per_hop[i] = qp->Hp().hopState[i].Rc + m_rai;
+							new_incStage_per_hop[i] = qp->Hp().hopState[i].incStage+1;
 						}
 						// bound rate
 						if (new_rate_per_hop[i] < m_minRate)
@@ -1050,15 +1134,15 @@ void RdmaHw::UpdateRateHp(Ptr<RdmaQueuePair> qp, Ptr<Packet> p, CustomHeader &ch
 							new_rate = new_rate_per_hop[i];
 						#if PRINT_LOG
 						if (print)
-							printf(" [%u]u=%.6lf c=%.3lf", i, qp->hp.hopState[i].u, c);
+							printf(" [%u]u=%.6lf c=%.3lf", i, qp->Hp().hopState[i].u, c);
 						#endif
 						#if PRINT_LOG
 						if (print)
-							printf(" %.3lf->%.3lf", qp->hp.hopState[i].Rc.GetBitRate()*1e-9, new_rate.GetBitRate()*1e-9);
+							printf(" %.3lf->%.3lf", qp->Hp().hopState[i].Rc.GetBitRate()*1e-9, new_rate.GetBitRate()*1e-9);
 						#endif
 					}else{
-						if (qp->hp.hopState[i].Rc < new_rate)
-							new_rate = qp->hp.hopState[i].Rc;
+						if (qp->Hp().hopState[i].Rc < new_rate)
+							new_rate = qp->Hp().hopState[i].Rc;
 					}
 				}
 				#if PRINT_LOG
@@ -1069,23 +1153,23 @@ void RdmaHw::UpdateRateHp(Ptr<RdmaQueuePair> qp, Ptr<Packet> p, CustomHeader &ch
 				ChangeRate(qp, new_rate);
 			if (!fast_react){
 				if (updated_any){
-					qp->hp.m_curRate = new_rate;
-					qp->hp.m_incStage = new_incStage;
+					qp->Hp().m_curRate = new_rate;
+					qp->Hp().m_incStage = new_incStage;
 				}
 				if (m_multipleRate){
 					// for per hop (per hop R)
 					for (uint32_t i = 0; i < ih.nhop; i++){
 						if (updated[i]){
-							qp->hp.hopState[i].Rc = new_rate_per_hop[i];
-							qp->hp.hopState[i].incStage = new_incStage_per_hop[i];
+							qp->Hp().hopState[i].Rc = new_rate_per_hop[i];
+							qp->Hp().hopState[i].incStage = new_incStage_per_hop[i];
 						}
 					}
 				}
 			}
 		}
 		if (!fast_react){
-			if (next_seq > qp->hp.m_lastUpdateSeq)
-				qp->hp.m_lastUpdateSeq = next_seq; //+ rand() % 2 * m_mtu;
+			if (next_seq > qp->Hp().m_lastUpdateSeq)
+				qp->Hp().m_lastUpdateSeq = next_seq; //+ rand() % 2 * m_mtu;
 		}
 	}
 }
@@ -1101,7 +1185,7 @@ void RdmaHw::FastReactHp(Ptr<RdmaQueuePair> qp, Ptr<Packet> p, CustomHeader &ch)
 void RdmaHw::HandleAckTimely(Ptr<RdmaQueuePair> qp, Ptr<Packet> p, CustomHeader &ch){
 	uint32_t ack_seq = ch.ack.seq;
 	// update rate
-	if (ack_seq > qp->tmly.m_lastUpdateSeq){ // if full RTT feedback is ready, do full update
+	if (ack_seq > qp->Tmly().m_lastUpdateSeq){ // if full RTT feedback is ready, do full update
 		UpdateRateTimely(qp, p, ch, false);
 	}else{ // do fast react
 		FastReactTimely(qp, p, ch);
@@ -1111,15 +1195,15 @@ void RdmaHw::UpdateRateTimely(Ptr<RdmaQueuePair> qp, Ptr<Packet> p, CustomHeader
 	uint32_t next_seq = qp->snd_nxt;
 	uint64_t rtt = Simulator::Now().GetTimeStep() - ch.ack.ih.ts;
 	bool print = !us;
-	if (qp->tmly.m_lastUpdateSeq != 0){ // not first RTT
-		int64_t new_rtt_diff = (int64_t)rtt - (int64_t)qp->tmly.lastRtt;
-		double rtt_diff = (1 - m_tmly_alpha) * qp->tmly.rttDiff + m_tmly_alpha * new_rtt_diff;
+	if (qp->Tmly().m_lastUpdateSeq != 0){ // not first RTT
+		int64_t new_rtt_diff = (int64_t)rtt - (int64_t)qp->Tmly().lastRtt;
+		double rtt_diff = (1 - m_tmly_alpha) * qp->Tmly().rttDiff + m_tmly_alpha * new_rtt_diff;
 		double gradient = rtt_diff / m_tmly_minRtt;
 		bool inc = false;
 		double c = 0;
 		#if PRINT_LOG
 		if (print)
-			printf("%lu node:%u rtt:%lu rttDiff:%.0lf gradient:%.3lf rate:%.3lf", Simulator::Now().GetTimeStep(), m_node->GetId(), rtt, rtt_diff, gradient, qp->tmly.m_curRate.GetBitRate() * 1e-9);
+			printf("%lu node:%u rtt:%lu rttDiff:%.0lf gradient:%.3lf rate:%.3lf", Simulator::Now().GetTimeStep(), m_node->GetId(), rtt, rtt_diff, gradient, qp->Tmly().m_curRate.GetBitRate() * 1e-9);
 		#endif
 		if (rtt < m_tmly_TLow){
 			inc = true;
@@ -1135,24 +1219,24 @@ void RdmaHw::UpdateRateTimely(Ptr<RdmaQueuePair> qp, Ptr<Packet> p, CustomHeader
 			inc = false;
 		}
 		if (inc){
-			if (qp->tmly.m_incStage < 5){
-				qp->m_rate = qp->tmly.m_curRate + m_rai;
+			if (qp->Tmly().m_incStage < 5){
+				qp->m_rate = qp->Tmly().m_curRate + m_rai;
 			}else{
-				qp->m_rate = qp->tmly.m_curRate + m_rhai;
+				qp->m_rate = qp->Tmly().m_curRate + m_rhai;
 			}
 			if (qp->m_rate > qp->m_max_rate)
 				qp->m_rate = qp->m_max_rate;
 			if (!us){
-				qp->tmly.m_curRate = qp->m_rate;
-				qp->tmly.m_incStage++;
-				qp->tmly.rttDiff = rtt_diff;
+				qp->Tmly().m_curRate = qp->m_rate;
+				qp->Tmly().m_incStage++;
+				qp->Tmly().rttDiff = rtt_diff;
 			}
 		}else{
-			qp->m_rate = std::max(m_minRate, qp->tmly.m_curRate * c); 
+			qp->m_rate = std::max(m_minRate, qp->Tmly().m_curRate * c); 
 			if (!us){
-				qp->tmly.m_curRate = qp->m_rate;
-				qp->tmly.m_incStage = 0;
-				qp->tmly.rttDiff = rtt_diff;
+				qp->Tmly().m_curRate = qp->m_rate;
+				qp->Tmly().m_incStage = 0;
+				qp->Tmly().rttDiff = rtt_diff;
 			}
 		}
 		#if PRINT_LOG
@@ -1161,10 +1245,10 @@ void RdmaHw::UpdateRateTimely(Ptr<RdmaQueuePair> qp, Ptr<Packet> p, CustomHeader
 		}
 		#endif
 	}
-	if (!us && next_seq > qp->tmly.m_lastUpdateSeq){
-		qp->tmly.m_lastUpdateSeq = next_seq;
+	if (!us && next_seq > qp->Tmly().m_lastUpdateSeq){
+		qp->Tmly().m_lastUpdateSeq = next_seq;
 		// update
-		qp->tmly.lastRtt = rtt;
+		qp->Tmly().lastRtt = rtt;
 	}
 }
 void RdmaHw::FastReactTimely(Ptr<RdmaQueuePair> qp, Ptr<Packet> p, CustomHeader &ch){
@@ -1179,23 +1263,23 @@ void RdmaHw::HandleAckDctcp(Ptr<RdmaQueuePair> qp, Ptr<Packet> p, CustomHeader &
 	bool new_batch = false;
 
 	// update alpha
-	qp->dctcp.m_ecnCnt += (cnp > 0);
-	if (ack_seq > qp->dctcp.m_lastUpdateSeq){ // if full RTT feedback is ready, do alpha update
+	qp->Dctcp().m_ecnCnt += (cnp > 0);
+	if (ack_seq > qp->Dctcp().m_lastUpdateSeq){ // if full RTT feedback is ready, do alpha update
 		#if PRINT_LOG
-		printf("%lu %s %08x %08x %u %u [%u,%u,%u] %.3lf->", Simulator::Now().GetTimeStep(), "alpha", qp->sip.Get(), qp->dip.Get(), qp->sport, qp->dport, qp->dctcp.m_lastUpdateSeq, ch.ack.seq, qp->snd_nxt, qp->dctcp.m_alpha);
+		printf("%lu %s %08x %08x %u %u [%u,%u,%u] %.3lf->", Simulator::Now().GetTimeStep(), "alpha", qp->sip.Get(), qp->dip.Get(), qp->sport, qp->dport, qp->Dctcp().m_lastUpdateSeq, ch.ack.seq, qp->snd_nxt, qp->Dctcp().m_alpha);
 		#endif
 		new_batch = true;
-		if (qp->dctcp.m_lastUpdateSeq == 0){ // first RTT
-			qp->dctcp.m_lastUpdateSeq = qp->snd_nxt;
-			qp->dctcp.m_batchSizeOfAlpha = qp->snd_nxt / m_mtu + 1;
+		if (qp->Dctcp().m_lastUpdateSeq == 0){ // first RTT
+			qp->Dctcp().m_lastUpdateSeq = qp->snd_nxt;
+			qp->Dctcp().m_batchSizeOfAlpha = qp->snd_nxt / m_mtu + 1;
 		}else {
-			double frac = std::min(1.0, double(qp->dctcp.m_ecnCnt) / qp->dctcp.m_batchSizeOfAlpha);
-			qp->dctcp.m_alpha = (1 - m_g) * qp->dctcp.m_alpha + m_g * frac;
-			qp->dctcp.m_lastUpdateSeq = qp->snd_nxt;
-			qp->dctcp.m_ecnCnt = 0;
-			qp->dctcp.m_batchSizeOfAlpha = (qp->snd_nxt - ack_seq) / m_mtu + 1;
+			double frac = std::min(1.0, double(qp->Dctcp().m_ecnCnt) / qp->Dctcp().m_batchSizeOfAlpha);
+			qp->Dctcp().m_alpha = (1 - m_g) * qp->Dctcp().m_alpha + m_g * frac;
+			qp->Dctcp().m_lastUpdateSeq = qp->snd_nxt;
+			qp->Dctcp().m_ecnCnt = 0;
+			qp->Dctcp().m_batchSizeOfAlpha = (qp->snd_nxt - ack_seq) / m_mtu + 1;
 			#if PRINT_LOG
-			printf("%.3lf F:%.3lf", qp->dctcp.m_alpha, frac);
+			printf("%.3lf F:%.3lf", qp->Dctcp().m_alpha, frac);
 			#endif
 		}
 		#if PRINT_LOG
@@ -1204,26 +1288,26 @@ void RdmaHw::HandleAckDctcp(Ptr<RdmaQueuePair> qp, Ptr<Packet> p, CustomHeader &
 	}
 
 	// check cwr exit
-	if (qp->dctcp.m_caState == 1){
-		if (ack_seq > qp->dctcp.m_highSeq)
-			qp->dctcp.m_caState = 0;
+	if (qp->Dctcp().m_caState == 1){
+		if (ack_seq > qp->Dctcp().m_highSeq)
+			qp->Dctcp().m_caState = 0;
 	}
 
 	// check if need to reduce rate: ECN and not in CWR
-	if (cnp && qp->dctcp.m_caState == 0){
+	if (cnp && qp->Dctcp().m_caState == 0){
 		#if PRINT_LOG
 		printf("%lu %s %08x %08x %u %u %.3lf->", Simulator::Now().GetTimeStep(), "rate", qp->sip.Get(), qp->dip.Get(), qp->sport, qp->dport, qp->m_rate.GetBitRate()*1e-9);
 		#endif
-		qp->m_rate = std::max(m_minRate, qp->m_rate * (1 - qp->dctcp.m_alpha / 2));
+		qp->m_rate = std::max(m_minRate, qp->m_rate * (1 - qp->Dctcp().m_alpha / 2));
 		#if PRINT_LOG
 		printf("%.3lf\n", qp->m_rate.GetBitRate() * 1e-9);
 		#endif
-		qp->dctcp.m_caState = 1;
-		qp->dctcp.m_highSeq = qp->snd_nxt;
+		qp->Dctcp().m_caState = 1;
+		qp->Dctcp().m_highSeq = qp->snd_nxt;
 	}
 
 	// additive inc
-	if (qp->dctcp.m_caState == 0 && new_batch)
+	if (qp->Dctcp().m_caState == 0 && new_batch)
 		qp->m_rate = std::min(qp->m_max_rate, qp->m_rate + m_dctcp_rai);
 }
 
@@ -1235,10 +1319,10 @@ void RdmaHw::SetPintSmplThresh(double p){
 }
 void RdmaHw::HandleAckHpPint(Ptr<RdmaQueuePair> qp, Ptr<Packet> p, CustomHeader &ch){
        uint32_t ack_seq = ch.ack.seq;
-       if (rand() % 65536 >= pint_smpl_thresh)
+       if ((m_rng.Next32() >> 16) >= pint_smpl_thresh)
                return;
        // update rate
-       if (ack_seq > qp->hpccPint.m_lastUpdateSeq){ // if full RTT feedback is ready, do full update
+       if (ack_seq > qp->HpccPint().m_lastUpdateSeq){ // if full RTT feedback is ready, do full update
                UpdateRateHpPint(qp, p, ch, false);
        }else{ // do fast react
                UpdateRateHpPint(qp, p, ch, true);
@@ -1247,8 +1331,8 @@ void RdmaHw::HandleAckHpPint(Ptr<RdmaQueuePair> qp, Ptr<Packet> p, CustomHeader
 
 void RdmaHw::UpdateRateHpPint(Ptr<RdmaQueuePair> qp, Ptr<Packet> p, CustomHeader &ch, bool fast_react){
        uint32_t next_seq = qp->snd_nxt;
-       if (qp->hpccPint.m_lastUpdateSeq == 0){ // first RTT
-               qp->hpccPint.m_lastUpdateSeq = next_seq;
+       if (qp->HpccPint().m_lastUpdateSeq == 0){ // first RTT
+               qp->HpccPint().m_lastUpdateSeq = next_seq;
        }else {
                // check packet INT
                IntHeader &ih = ch.ack.ih;
@@ -1258,12 +1342,12 @@ void RdmaHw::UpdateRateHpPint(Ptr<RdmaQueuePair> qp, Ptr<Packet> p, CustomHeader
                int32_t new_incStage;
                double max_c = U / m_targetUtil;
 
-               if (max_c >= 1 || qp->hpccPint.m_incStage >= m_miThresh){
-                       new_rate = qp->hpccPint.m_curRate / max_c + m_rai;
+               if (max_c >= 1 || qp->HpccPint().m_incStage >= m_miThresh){
+                       new_rate = qp->HpccPint().m_curRate / max_c + m_rai;
                        new_incStage = 0;
                }else{
-                       new_rate = qp->hpccPint.m_curRate + m_rai;
-                       new_incStage = qp->hpccPint.m_incStage+1;
+                       new_rate = qp->HpccPint().m_curRate + m_rai;
+                       new_incStage = qp->HpccPint().m_incStage+1;
                }
                if (new_rate < m_minRate)
                        new_rate = m_minRate;
@@ -1271,12 +1355,12 @@ void RdmaHw::UpdateRateHpPint(Ptr<RdmaQueuePair> qp, Ptr<Packet> p, CustomHeader
                        new_rate = qp->m_max_rate;
                ChangeRate(qp, new_rate);
                if (!fast_react){
-                       qp->hpccPint.m_curRate = new_rate;
-                       qp->hpccPint.m_incStage = new_incStage;
+                       qp->HpccPint().m_curRate = new_rate;
+                       qp->HpccPint().m_incStage = new_incStage;
                }
                if (!fast_react){
-                       if (next_seq > qp->hpccPint.m_lastUpdateSeq)
-                               qp->hpccPint.m_lastUpdateSeq = next_seq; //+ rand() % 2 * m_mtu;
+                       if (next_seq > qp->HpccPint().m_lastUpdateSeq)
+                               qp->HpccPint().m_lastUpdateSeq = next_seq; //+ rand() % 2 * m_mtu;
                }
        }
 }
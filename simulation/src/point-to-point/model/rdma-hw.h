@@ -5,12 +5,17 @@
 #include <ns3/rdma-queue-pair.h>
 #include <ns3/node.h>
 #include <ns3/custom-header.h>
+#include <ns3/traced-callback.h>
 #include "qbb-net-device.h"
+#include "rdma-qp-table.h"
 #include <unordered_map>
 #include "pint.h"
+#include "trace-format.h"
 
 namespace ns3 {
 
+class RdmaCc;
+
 struct RdmaInterfaceMgr{
 	Ptr<QbbNetDevice> dev;
 	Ptr<RdmaQueuePairGroup> qpGrp;
@@ -31,6 +36,7 @@ public:
 	DataRate m_minRate;		//< Min sending rate
 	uint32_t m_mtu;
 	uint32_t m_cc_mode;
+	const RdmaCc *m_cc; // the CC of m_cc_mode
 	double m_nack_interval;
 	uint32_t m_chunk;
 	uint32_t m_ack_interval;
@@ -38,15 +44,19 @@ public:
 	bool m_var_win, m_fast_react;
 	bool m_rateBound;
 	std::vector<RdmaInterfaceMgr> m_nic; // list of running nic controlled by this RdmaHw
-	std::unordered_map<uint64_t, Ptr<RdmaQueuePair> > m_qpMap; // mapping from uint64_t to qp
-	std::unordered_map<uint64_t, Ptr<RdmaRxQueuePair> > m_rxQpMap; // mapping from uint64_t to rx qp
+	RdmaQpTable<RdmaQueuePair> m_qpMap; // mapping from uint64_t to qp, and from the qp ids of the packets
+	RdmaQpTable<RdmaRxQueuePair> m_rxQpMap; // mapping from uint64_t to rx qp, and from the qp ids of the packets
 	std::unordered_map<uint32_t, std::vector<int> > m_rtTable; // map from ip address (u32) to possible ECMP port (index of dev)
+	FastRng m_rng; // of PINT's sampling of the acks and of the Poseidon records sampled to stdout
 
 	// qp complete callback
 	typedef Callback<void, Ptr<RdmaQueuePair> > QpCompleteCallback;
 	QpCompleteCallback m_qpCompleteCallback;
 
+	void SetCcMode(uint32_t mode);
+	uint32_t GetCcMode(void) const;
 	void SetNode(Ptr<Node> node);
+	int64_t AssignStreams(int64_t stream); // of m_rng, returns the number of streams used
 	void Setup(QpCompleteCallback cb); // setup shared data and callbacks with the QbbNetDevice
 	static uint64_t GetQpKey(uint32_t dip, uint16_t sport, uint16_t pg); // get the lookup key for m_qpMap
 	Ptr<RdmaQueuePair> GetQp(uint32_t dip, uint16_t sport, uint16_t pg); // get the qp
@@ -56,7 +66,7 @@ public:
 
 	Ptr<RdmaRxQueuePair> GetRxQp(uint32_t sip, uint32_t dip, uint16_t sport, uint16_t dport, uint16_t pg, bool create); // get a rxQp
 	uint32_t GetNicIdxOfRxQp(Ptr<RdmaRxQueuePair> q); // get the NIC index of the rxQp
-	void DeleteRxQp(uint32_t dip, uint16_t pg, uint16_t dport);
+	void DeleteRxQp(uint32_t dip, uint16_t pg, uint16_t dport); // done by ReceiveUdp when the rx qp has all the data
 
 	int ReceiveUdp(Ptr<Packet> p, CustomHeader &ch);
 	int ReceiveCnp(Ptr<Packet> p, CustomHeader &ch);
@@ -65,6 +75,8 @@ public:
 
 	void CheckandSendQCN(Ptr<RdmaRxQueuePair> q);
 	int ReceiverCheckSeq(uint32_t seq, Ptr<RdmaRxQueuePair> q, uint32_t size);
+	Ptr<Packet> MakeAck(CustomHeader &ch, uint32_t seq, uint8_t protocol, bool cnp, uint16_t ipid); // ACK/NACK of the data packet ch, with all its headers
+	void AddDataHeaders(Ptr<Packet> p, Ptr<RdmaQueuePair> qp); // the headers of the next data packet of qp
 	void AddHeader (Ptr<Packet> p, uint16_t protocolNumber);
 	static uint16_t EtherToPpp (uint16_t protocol);
 
@@ -134,6 +146,8 @@ public:
 	double m_poseidon_para_m;
 	double m_poseidon_min_rate;
 	double m_poseidon_max_rate;
+	uint32_t m_ccTraceInterval; // emit a CcTrace record every this many ACKs of a qp; 0: print the sampled text log instead
+	TracedCallback<const CcTraceFormat&> m_traceCcUpdate;
 	void HandleAckPoseidon(Ptr<RdmaQueuePair> qp, Ptr<Packet> p, CustomHeader &ch);
 
 	/**********************
@@ -0,0 +1,134 @@
+#ifndef RDMA_QP_TABLE_H
+#define RDMA_QP_TABLE_H
+
+#include <stdint.h>
+#include <vector>
+#include "ns3/ptr.h"
+#include "ns3/assert.h"
+
+namespace ns3 {
+
+/**
+ * The qps of a RdmaHw: slots that hold them, and an open-addressing (linear probing) index from their
+ * 64-bit keys to the slots. Add gives each qp an id, its slot and the generation of the slot, which the
+ * packets carry in RdmaQpTag: Get finds the qp of an id in its slot, and returns NULL once it is removed,
+ * even if the slot holds another qp since. The freed slots are reused, so the table is as large as the
+ * most qps alive at once.
+ */
+template <typename T>
+class RdmaQpTable
+{
+public:
+	RdmaQpTable () : m_count (0), m_bits (4){
+		m_index.assign (1u << m_bits, Empty);
+	}
+
+	// the qp of an id from Add, NULL if removed, or for id 0
+	T* Get (uint64_t id) const{
+		uint32_t slot = (uint32_t)id;
+		if (slot >= m_slots.size () || m_gen[slot] != (uint32_t)(id >> 32))
+			return NULL;
+		return PeekPointer (m_slots[slot]);
+	}
+
+	// the qp of a key, NULL if none
+	T* Find (uint64_t key) const{
+		for (uint32_t i = Home (key); m_index[i] != Empty; i = (i + 1) & Mask ()){
+			if (m_keys[m_index[i]] == key)
+				return PeekPointer (m_slots[m_index[i]]);
+		}
+		return NULL;
+	}
+
+	// add a qp of a key not in the table, returns its id, which is never 0
+	uint64_t Add (uint64_t key, Ptr<T> qp){
+		NS_ASSERT (Find (key) == NULL);
+		uint32_t slot;
+		if (!m_free.empty ()){
+			slot = m_free.back ();
+			m_free.pop_back ();
+		}else {
+			slot = m_slots.size ();
+			m_slots.push_back (NULL);
+			m_keys.push_back (0);
+			m_gen.push_back (0);
+		}
+		m_slots[slot] = qp;
+		m_keys[slot] = key;
+		m_gen[slot]++;
+		if (++m_count * 2 > m_index.size ()) // keep the index at most half full
+			Grow ();
+		else
+			Insert (slot);
+		return ((uint64_t)m_gen[slot] << 32) | slot;
+	}
+
+	// remove the qp of a key, if any
+	void Remove (uint64_t key){
+		uint32_t i = Home (key);
+		while (m_index[i] != Empty && m_keys[m_index[i]] != key)
+			i = (i + 1) & Mask ();
+		if (m_index[i] == Empty)
+			return;
+		uint32_t slot = m_index[i];
+		m_slots[slot] = NULL;
+		m_free.push_back (slot);
+		m_count--;
+		// backward shift: move up the entries after the hole that may not be found through it
+		uint32_t hole = i;
+		for (uint32_t j = (i + 1) & Mask (); m_index[j] != Empty; j = (j + 1) & Mask ()){
+			uint32_t home = Home (m_keys[m_index[j]]);
+			if (((j - home) & Mask ()) >= ((j - hole) & Mask ())){
+				m_index[hole] = m_index[j];
+				hole = j;
+			}
+		}
+		m_index[hole] = Empty;
+	}
+
+	// the slots, in order, which are NULL if free
+	uint32_t GetNSlots (void) const{
+		return m_slots.size ();
+	}
+	T* GetSlot (uint32_t slot) const{
+		return PeekPointer (m_slots[slot]);
+	}
+
+private:
+	static const uint32_t Empty = 0xffffffff;
+
+	uint32_t Mask (void) const{
+		return m_index.size () - 1;
+	}
+	uint32_t Home (uint64_t key) const{
+		return (key * 0x9e3779b97f4a7c15ull) >> (64 - m_bits);
+	}
+	void Insert (uint32_t slot){
+		uint32_t i = Home (m_keys[slot]);
+		while (m_index[i] != Empty)
+			i = (i + 1) & Mask ();
+		m_index[i] = slot;
+	}
+	void Grow (void){
+		m_bits++;
+		m_index.assign (1u << m_bits, Empty);
+		for (uint32_t s = 0; s < m_slots.size (); s++)
+			if (m_slots[s] != NULL)
+				Insert (s);
+	}
+
+	std::vector<Ptr<T> > m_slots;
+	std::vector<uint64_t> m_keys; // of the qp in each slot
+	std::vector<uint32_t> m_gen; // of each slot, incremented on each Add
+	std::vector<uint32_t> m_free; // the free slots
+	std::vector<uint32_t> m_index; // slots, at the position of their key or after it
+	uint32_t m_count; // number of qps
+	uint32_t m_bits; // log2 of the size of m_index
+};
+
+template <typename T>
+const uint32_t RdmaQpTable<T>::Empty;
+
+} // namespace ns3
+
+#endif /* RDMA_QP_TABLE_H */
@@ -0,0 +1,49 @@
+#include "rdma-qp-tag.h"
+
+namespace ns3 {
+
+NS_OBJECT_ENSURE_REGISTERED (RdmaQpTag);
+
+TypeId RdmaQpTag::GetTypeId (void){
+	static TypeId tid = TypeId ("ns3::RdmaQpTag")
+		.SetParent<Tag> ()
+		.AddConstructor<RdmaQpTag> ()
+		;
+	return tid;
+}
+TypeId RdmaQpTag::GetInstanceTypeId (void) const{
+	return GetTypeId ();
+}
+uint32_t RdmaQpTag::GetSerializedSize (void) const{
+	return 24;
+}
+void RdmaQpTag::Serialize (TagBuffer buf) const{
+	buf.WriteU64 (m_qp);
+	buf.WriteU64 (m_rxQp);
+	buf.WriteU64 (m_size);
+}
+void RdmaQpTag::Deserialize (TagBuffer buf){
+	m_qp = buf.ReadU64 ();
+	m_rxQp = buf.ReadU64 ();
+	m_size = buf.ReadU64 ();
+}
+void RdmaQpTag::Print (std::ostream &os) const{
+	os << "qp=" << m_qp << " rxQp=" << m_rxQp << " size=" << m_size;
+}
+
+RdmaQpTag::RdmaQpTag () : m_qp (0), m_rxQp (0), m_size (0){
+}
+RdmaQpTag::RdmaQpTag (uint64_t qp, uint64_t rxQp, uint64_t size) : m_qp (qp), m_rxQp (rxQp), m_size (size){
+}
+
+uint64_t RdmaQpTag::GetQp (void) const{
+	return m_qp;
+}
+uint64_t RdmaQpTag::GetRxQp (void) const{
+	return m_rxQp;
+}
+uint64_t RdmaQpTag::GetSize (void) const{
+	return m_size;
+}
+
+} // namespace ns3
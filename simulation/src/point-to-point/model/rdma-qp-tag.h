@@ -0,0 +1,38 @@
+#ifndef RDMA_QP_TAG_H
+#define RDMA_QP_TAG_H
+
+#include <stdint.h>
+#include "ns3/tag.h"
+
+namespace ns3 {
+
+/**
+ * The ids of the qps of a flow in their RdmaQpTable, carried by its data packets and ACKs/NACKs so that
+ * the receiving RdmaHw finds its qp without hashing: the id of the sender's qp, the id of the receiver's
+ * rx qp (0 until the sender learns it from an ACK), and the size of the flow, so that the receiver
+ * reclaims its rx qp once it has all the data. A packet may lose the tag, e.g. between MPI ranks: then
+ * the qps are looked up by their keys.
+ */
+class RdmaQpTag : public Tag
+{
+public:
+	static TypeId GetTypeId (void);
+	virtual TypeId GetInstanceTypeId (void) const;
+	virtual uint32_t GetSerializedSize (void) const;
+	virtual void Serialize (TagBuffer buf) const;
+	virtual void Deserialize (TagBuffer buf);
+	virtual void Print (std::ostream &os) const;
+	RdmaQpTag ();
+	RdmaQpTag (uint64_t qp, uint64_t rxQp, uint64_t size);
+
+	uint64_t GetQp (void) const;
+	uint64_t GetRxQp (void) const;
+	uint64_t GetSize (void) const;
+private:
+	uint64_t m_qp, m_rxQp;
+	uint64_t m_size;
+};
+
+} // namespace ns3
+
+#endif /* RDMA_QP_TAG_H */
@@ -1,23 +1,176 @@
+#include <algorithm>
+#include <atomic>
+#include <new>
 #include <ns3/hash.h>
 #include <ns3/uinteger.h>
 #include <ns3/seq-ts-header.h>
 #include <ns3/udp-header.h>
 #include <ns3/ipv4-header.h>
 #include <ns3/simulator.h>
+#include <ns3/assert.h>
 #include "ns3/ppp-header.h"
 #include "rdma-queue-pair.h"
 
 namespace ns3 {
 
 /**************************
- * RdmaQueuePair
+ * slab of the qps
  *************************/
-TypeId RdmaQueuePair::GetTypeId (void)
-{
-	static TypeId tid = TypeId ("ns3::RdmaQueuePair")
-		.SetParent<Object> ()
+namespace {
+
+/*
+ * Blocks of fixed sizes, carved from chunks of slabChunkBlocks blocks, which are kept until the end of the
+ * process: a freed block is reused by the next qp of its size. Each block starts with its size, for Free.
+ * The lists are per thread, as the qps of a node are made and freed by the thread that runs the node.
+ */
+const uint32_t slabChunkBlocks = 256;
+const uint32_t slabHeader = 8; // keeps the blocks 8-byte aligned
+
+struct SlabList{
+	uint32_t size;
+	void *free; // the freed blocks, each pointing to the next
+};
+thread_local std::vector<SlabList> slabLists;
+
+std::atomic<uint64_t> slabBytes(0);
+std::atomic<uint64_t> qpCount(0), qpLive(0), qpPeak(0);
+std::atomic<uint64_t> rxQpCount(0), rxQpLive(0), rxQpPeak(0);
+std::atomic<uint32_t> qpBlockSize(0);
+
+void* SlabAlloc(uint32_t size){
+	size = (size + slabHeader + 7) / 8 * 8;
+	uint32_t i = 0;
+	while (i < slabLists.size() && slabLists[i].size != size)
+		i++;
+	if (i == slabLists.size()){
+		SlabList l = {size, NULL};
+		slabLists.push_back(l);
+	}
+	SlabList &l = slabLists[i];
+	if (l.free == NULL){
+		char *chunk = (char*)::operator new((size_t)size * slabChunkBlocks);
+		slabBytes += (uint64_t)size * slabChunkBlocks;
+		for (uint32_t j = slabChunkBlocks; j-- > 0; ){
+			*(void**)(chunk + (size_t)j * size) = l.free;
+			l.free = chunk + (size_t)j * size;
+		}
+	}
+	char *block = (char*)l.free;
+	l.free = *(void**)block;
+	*(uint32_t*)block = size;
+	return block + slabHeader;
+}
+
+void SlabFree(void *p){
+	if (p == NULL)
+		return;
+	char *block = (char*)p - slabHeader;
+	uint32_t size = *(uint32_t*)block;
+	uint32_t i = 0;
+	while (i < slabLists.size() && slabLists[i].size != size)
+		i++;
+	if (i == slabLists.size()){ // freed by another thread than the one that made it
+		SlabList l = {size, NULL};
+		slabLists.push_back(l);
+	}
+	*(void**)block = slabLists[i].free;
+	slabLists[i].free = block;
+}
+
+void CountNew(std::atomic<uint64_t> &count, std::atomic<uint64_t> &live, std::atomic<uint64_t> &peak){
+	count++;
+	uint64_t n = ++live, p = peak;
+	while (n > p && !peak.compare_exchange_weak(p, n))
 		;
-	return tid;
+}
+
+} // anonymous namespace
+
+/**************************
+ * RdmaQueuePair
+ *************************/
+RdmaQueuePair::MlxState::MlxState(){
+	m_alpha = 1;
+	m_alpha_cnp_arrived = false;
+	m_first_cnp = true;
+	m_decrease_cnp_arrived = false;
+	m_rpTimeStage = 0;
+}
+
+RdmaQueuePair::HpState::HpState(){
+	m_lastUpdateSeq = 0;
+	for (uint32_t i = 0; i < sizeof(keep) / sizeof(keep[0]); i++)
+		keep[i] = 0;
+	m_incStage = 0;
+	m_lastGap = 0;
+	u = 1;
+	for (uint32_t i = 0; i < IntHeader::maxHop; i++){
+		hopState[i].u = 1;
+		hopState[i].incStage = 0;
+	}
+}
+
+RdmaQueuePair::TmlyState::TmlyState(){
+	m_lastUpdateSeq = 0;
+	m_incStage = 0;
+	lastRtt = 0;
+	rttDiff = 0;
+}
+
+RdmaQueuePair::DctcpState::DctcpState(){
+	m_lastUpdateSeq = 0;
+	m_caState = 0;
+	m_highSeq = 0;
+	m_alpha = 1;
+	m_ecnCnt = 0;
+	m_batchSizeOfAlpha = 0;
+}
+
+RdmaQueuePair::HpccPintState::HpccPintState(){
+	m_lastUpdateSeq = 0;
+	m_incStage = 0;
+}
+
+RdmaQueuePair::PoseidonState::PoseidonState(){
+	m_lastUpdateSeq = 0;
+	m_lastUpdateTime = 0;
+	m_ackCnt = 0;
+	for (uint32_t i = 0; i < IntHeader::maxHop; i++){
+		signals[i] = 0;
+	}
+}
+
+uint32_t RdmaQueuePair::GetCcStateSize(uint32_t ccmode){
+	switch (ccmode){
+		case 1: return sizeof(MlxState);
+		case 3: return sizeof(HpState);
+		case 7: return sizeof(TmlyState);
+		case 8: return sizeof(DctcpState);
+		case 10: return sizeof(HpccPintState);
+		case 11: return sizeof(PoseidonState);
+		default: return 0;
+	}
+}
+
+void* RdmaQueuePair::operator new(size_t size, uint32_t ccmode){
+	uint32_t block = size + GetCcStateSize(ccmode);
+	qpBlockSize = block;
+	CountNew(qpCount, qpLive, qpPeak);
+	return SlabAlloc(block);
+}
+
+void RdmaQueuePair::operator delete(void *p){
+	if (p != NULL)
+		qpLive--;
+	SlabFree(p);
+}
+
+void RdmaQueuePair::operator delete(void *p, uint32_t ccmode){
+	operator delete(p);
+}
+
+Ptr<RdmaQueuePair> RdmaQueuePair::Create(uint16_t pg, Ipv4Address _sip, Ipv4Address _dip, uint16_t _sport, uint16_t _dport, uint32_t ccmode){
+	return Ptr<RdmaQueuePair>(new (ccmode) RdmaQueuePair(pg, _sip, _dip, _sport, _dport, ccmode), false);
 }
 
 RdmaQueuePair::RdmaQueuePair(uint16_t pg, Ipv4Address _sip, Ipv4Address _dip, uint16_t _sport, uint16_t _dport, uint32_t ccmode){
@@ -38,44 +191,46 @@ RdmaQueuePair::RdmaQueuePair(uint16_t pg, Ipv4Address _sip, Ipv4Address _dip, ui
 	m_nextAvail = Time(0);
 	m_rtt = 0;
 	m_cc_mode = ccmode;
-	mlx.m_alpha = 1;
-	mlx.m_alpha_cnp_arrived = false;
-	mlx.m_first_cnp = true;
-	mlx.m_decrease_cnp_arrived = false;
-	mlx.m_rpTimeStage = 0;
-	hp.m_lastUpdateSeq = 0;
-	for (uint32_t i = 0; i < sizeof(hp.keep) / sizeof(hp.keep[0]); i++)
-		hp.keep[i] = 0;
-	hp.m_incStage = 0;
-	hp.m_lastGap = 0;
-	hp.u = 1;
-	for (uint32_t i = 0; i < IntHeader::maxHop; i++){
-		hp.hopState[i].u = 1;
-		hp.hopState[i].incStage = 0;
+	m_qpId = m_rxQpId = 0;
+	switch (m_cc_mode){
+		case 1: new (GetCcState()) MlxState; break;
+		case 3: new (GetCcState()) HpState; break;
+		case 7: new (GetCcState()) TmlyState; break;
+		case 8: new (GetCcState()) DctcpState; break;
+		case 10: new (GetCcState()) HpccPintState; break;
+		case 11: new (GetCcState()) PoseidonState; break;
 	}
 
-	tmly.m_lastUpdateSeq = 0;
-	tmly.m_incStage = 0;
-	tmly.lastRtt = 0;
-	tmly.rttDiff = 0;
-
-	dctcp.m_lastUpdateSeq = 0;
-	dctcp.m_caState = 0;
-	dctcp.m_highSeq = 0;
-	dctcp.m_alpha = 1;
-	dctcp.m_ecnCnt = 0;
-	dctcp.m_batchSizeOfAlpha = 0;
-
-	hpccPint.m_lastUpdateSeq = 0;
-	hpccPint.m_incStage = 0;
+	m_grp = NULL;
+	m_grpIdx = 0;
+	m_grpSeq = 0;
+	m_schedGen = 0;
+	m_schedState = SchedNone;
+}
 
-	poseidon.m_lastUpdateSeq = 0;
-	poseidon.m_lastUpdateTime = 0;
-	for (uint32_t i = 0; i < IntHeader::maxHop; i++){
-		poseidon.signals[i] = 0;
+RdmaQueuePair::~RdmaQueuePair(){
+	switch (m_cc_mode){
+		case 1: Mlx().~MlxState(); break;
+		case 3: Hp().~HpState(); break;
+		case 7: Tmly().~TmlyState(); break;
+		case 8: Dctcp().~DctcpState(); break;
+		case 10: HpccPint().~HpccPintState(); break;
+		case 11: Poseidon().~PoseidonState(); break;
 	}
 }
 
+RdmaQueuePair::MemoryStats RdmaQueuePair::GetMemoryStats(void){
+	MemoryStats m;
+	m.qps = qpCount;
+	m.peakQps = qpPeak;
+	m.rxQps = rxQpCount;
+	m.peakRxQps = rxQpPeak;
+	m.qpBytes = qpBlockSize;
+	m.rxQpBytes = sizeof(RdmaRxQueuePair);
+	m.slabBytes = slabBytes;
+	return m;
+}
+
 void RdmaQueuePair::SetSize(uint64_t size){
 	m_size = size;
 }
@@ -143,7 +298,7 @@ uint64_t RdmaQueuePair::GetWin(){
 	if (m_var_win){
 		if (m_cc_mode == 11) {
 			// Poseidon does not assume the RTT is always 0.
-			w = m_rtt * 1e-9 / poseidon.m_curRate.CalculateTxTime(lastPktSize) * 1098.0;
+			w = m_rtt * 1e-9 / Poseidon().m_curRate.CalculateTxTime(lastPktSize) * 1098.0;
 		} else {
 			// HPCC assumes the RTT is always 0.
 			w = m_win * m_rate.GetBitRate() / m_max_rate.GetBitRate();
@@ -161,7 +316,7 @@ uint64_t RdmaQueuePair::HpGetCurWin(){
 		return 0;
 	uint64_t w;
 	if (m_var_win){
-		w = m_win * hp.m_curRate.GetBitRate() / m_max_rate.GetBitRate();
+		w = m_win * Hp().m_curRate.GetBitRate() / m_max_rate.GetBitRate();
 		if (w == 0)
 			w = 1; // must > 0
 	}else{
@@ -174,15 +329,23 @@ bool RdmaQueuePair::IsFinished(){
 	return snd_una >= m_size;
 }
 
+void RdmaQueuePair::UpdateSched(void){
+	if (m_grp != NULL)
+		m_grp->UpdateQp(this);
+}
+
 /*********************
  * RdmaRxQueuePair
  ********************/
-TypeId RdmaRxQueuePair::GetTypeId (void)
-{
-	static TypeId tid = TypeId ("ns3::RdmaRxQueuePair")
-		.SetParent<Object> ()
-		;
-	return tid;
+void* RdmaRxQueuePair::operator new(size_t size){
+	CountNew(rxQpCount, rxQpLive, rxQpPeak);
+	return SlabAlloc(size);
+}
+
+void RdmaRxQueuePair::operator delete(void *p){
+	if (p != NULL)
+		rxQpLive--;
+	SlabFree(p);
 }
 
 RdmaRxQueuePair::RdmaRxQueuePair(){
@@ -192,6 +355,8 @@ RdmaRxQueuePair::RdmaRxQueuePair(){
 	m_nackTimer = Time(0);
 	m_milestone_rx = 0;
 	m_lastNACK = 0;
+	m_qpId = m_txQpId = 0;
+	m_size = 0;
 }
 
 uint32_t RdmaRxQueuePair::GetHash(void){
@@ -221,6 +386,8 @@ TypeId RdmaQueuePairGroup::GetTypeId (void)
 }
 
 RdmaQueuePairGroup::RdmaQueuePairGroup(void){
+	m_seq = 0;
+	m_nTimed = m_nBlocked = 0;
 }
 
 uint32_t RdmaQueuePairGroup::GetN(void){
@@ -236,6 +403,11 @@ Ptr<RdmaQueuePair> RdmaQueuePairGroup::operator[](uint32_t idx){
 }
 
 void RdmaQueuePairGroup::AddQp(Ptr<RdmaQueuePair> qp){
+	NS_ASSERT_MSG(qp->m_pg < qCnt, "RdmaQueuePairGroup::AddQp: pg >= qCnt");
+	qp->m_grp = this;
+	qp->m_grpIdx = m_qps.size();
+	qp->m_grpSeq = m_seq++;
+	qp->m_schedState = RdmaQueuePair::SchedNone; // classified by the NIC on NewQp or ReassignedQp, when the qp is set up
 	m_qps.push_back(qp);
 }
 
@@ -246,7 +418,156 @@ void RdmaQueuePairGroup::AddRxQp(Ptr<RdmaRxQueuePair> rxQp){
 #endif
 
 void RdmaQueuePairGroup::Clear(void){
+	for (uint32_t i = 0; i < m_qps.size(); i++){
+		m_qps[i]->m_grp = NULL;
+		m_qps[i]->m_schedState = RdmaQueuePair::SchedNone;
+		m_qps[i]->m_schedGen++;
+	}
 	m_qps.clear();
+	for (uint32_t i = 0; i < qCnt; i++)
+		m_ready[i].clear();
+	m_finished.clear();
+	m_timed.clear();
+	m_blocked.clear();
+	m_nTimed = m_nBlocked = 0;
+}
+
+void RdmaQueuePairGroup::UpdateQp(Ptr<RdmaQueuePair> qp){
+	// leave the current state
+	switch (qp->m_schedState){
+		case RdmaQueuePair::SchedFinished:
+			return; // final, waits to be removed by GetNextQindex
+		case RdmaQueuePair::SchedReady:
+			m_ready[qp->m_pg].erase(qp->m_grpSeq);
+			break;
+		case RdmaQueuePair::SchedTimed:
+			m_nTimed--;
+			break;
+		case RdmaQueuePair::SchedBlocked:
+			m_nBlocked--;
+			break;
+	}
+	qp->m_schedGen++;
+
+	// enter the new state, the same conditions as the linear scan
+	if (qp->IsFinished()){
+		qp->m_schedState = RdmaQueuePair::SchedFinished;
+		m_finished.insert(qp->m_grpIdx);
+	}else if (qp->GetBytesLeft() == 0){
+		qp->m_schedState = RdmaQueuePair::SchedIdle;
+	}else if (qp->IsWinBound()){
+		qp->m_schedState = RdmaQueuePair::SchedBlocked;
+		PushEntry(m_blocked, m_nBlocked, qp);
+	}else if (qp->m_nextAvail.GetTimeStep() > Simulator::Now().GetTimeStep()){
+		qp->m_schedState = RdmaQueuePair::SchedTimed;
+		PushEntry(m_timed, m_nTimed, qp);
+	}else {
+		qp->m_schedState = RdmaQueuePair::SchedReady;
+		m_ready[qp->m_pg][qp->m_grpSeq] = PeekPointer(qp);
+	}
+}
+
+void RdmaQueuePairGroup::PushEntry(std::vector<SchedEntry> &heap, uint32_t &n, Ptr<RdmaQueuePair> qp){
+	n++;
+	if (heap.size() >= 2 * n + 64){ // mostly stale entries, drop them
+		uint32_t j = 0;
+		for (uint32_t i = 0; i < heap.size(); i++) if (heap[i].gen == heap[i].qp->m_schedGen)
+			heap[j++] = heap[i];
+		heap.erase(heap.begin() + j, heap.end());
+		std::make_heap(heap.begin(), heap.end());
+	}
+	heap.push_back(SchedEntry(qp->m_nextAvail.GetTimeStep(), qp->m_schedGen, qp));
+	std::push_heap(heap.begin(), heap.end());
+}
+
+void RdmaQueuePairGroup::PromoteTimed(void){
+	int64_t now = Simulator::Now().GetTimeStep();
+	while (!m_timed.empty() && m_timed.front().t <= now){
+		SchedEntry e = m_timed.front();
+		std::pop_heap(m_timed.begin(), m_timed.end());
+		m_timed.pop_back();
+		if (e.gen == e.qp->m_schedGen)
+			UpdateQp(e.qp);
+	}
+}
+
+int RdmaQueuePairGroup::GetNextQindex(uint32_t rrlast, bool paused[]){
+	uint32_t fcount = m_qps.size();
+	if (fcount == 0)
+		return -1024;
+	PromoteTimed();
+
+	// the first ready qp of a non-paused pg, in the order of m_qps starting from rrlast + 1
+	uint32_t start = (rrlast + 1) % fcount;
+	uint64_t startSeq = m_qps[start]->m_grpSeq;
+	RdmaQueuePair *next = NULL, *first = NULL;
+	for (uint32_t pg = 0; pg < qCnt; pg++){
+		if (paused[pg] || m_ready[pg].empty())
+			continue;
+		std::map<uint64_t, RdmaQueuePair*>::iterator it = m_ready[pg].lower_bound(startSeq);
+		if (it != m_ready[pg].end() && (next == NULL || it->first < next->m_grpSeq))
+			next = it->second;
+		if (first == NULL || m_ready[pg].begin()->first < first->m_grpSeq)
+			first = m_ready[pg].begin()->second;
+	}
+	if (next == NULL)
+		next = first;
+	int res = next == NULL ? -1024 : (int)next->m_grpIdx;
+
+	// the smallest index of the finished qps that the scan from start to res passes
+	uint32_t min_finish_id = 0xffffffff;
+	if (!m_finished.empty()){
+		std::set<uint32_t>::iterator it = m_finished.lower_bound(start);
+		if (res < 0)
+			min_finish_id = *m_finished.begin();
+		else if ((uint32_t)res >= start){
+			if (it != m_finished.end() && *it < (uint32_t)res)
+				min_finish_id = *it;
+		}else if (*m_finished.begin() < (uint32_t)res)
+			min_finish_id = *m_finished.begin();
+		else if (it != m_finished.end())
+			min_finish_id = *it;
+	}
+
+	// clear the finished qp
+	if (min_finish_id < 0xffffffff){
+		uint32_t nxt = min_finish_id;
+		for (uint32_t i = min_finish_id; i < fcount; i++){
+			Ptr<RdmaQueuePair> qp = m_qps[i];
+			if (qp->m_schedState == RdmaQueuePair::SchedFinished){
+				qp->m_grp = NULL;
+				qp->m_schedState = RdmaQueuePair::SchedNone;
+				qp->m_schedGen++;
+				continue;
+			}
+			if ((int)i == res) // update res to the idx after removing finished qp
+				res = nxt;
+			qp->m_grpIdx = nxt;
+			m_qps[nxt++] = qp;
+		}
+		m_qps.resize(nxt);
+		m_finished.erase(m_finished.lower_bound(min_finish_id), m_finished.end());
+	}
+	return res;
+}
+
+Time RdmaQueuePairGroup::GetNextAvail(void){
+	// a ready qp has m_nextAvail <= Now()
+	for (uint32_t i = 0; i < qCnt; i++)
+		if (!m_ready[i].empty())
+			return Simulator::Now();
+	int64_t t = Simulator::GetMaximumSimulationTime().GetTimeStep();
+	std::vector<SchedEntry> *heaps[2] = {&m_timed, &m_blocked};
+	for (uint32_t i = 0; i < 2; i++){
+		std::vector<SchedEntry> &heap = *heaps[i];
+		while (!heap.empty() && heap.front().gen != heap.front().qp->m_schedGen){
+			std::pop_heap(heap.begin(), heap.end());
+			heap.pop_back();
+		}
+		if (!heap.empty() && heap.front().t < t)
+			t = heap.front().t;
+	}
+	return TimeStep(t);
 }
 
 }
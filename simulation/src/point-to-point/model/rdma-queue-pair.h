@@ -2,17 +2,28 @@
 #define RDMA_QUEUE_PAIR_H
 
 #include <ns3/object.h>
+#include <ns3/simple-ref-count.h>
+#include <ns3/assert.h>
 #include <ns3/packet.h>
 #include <ns3/ipv4-address.h>
 #include <ns3/data-rate.h>
 #include <ns3/event-id.h>
 #include <ns3/custom-header.h>
 #include <ns3/int-header.h>
+#include <ns3/header-template.h>
 #include <vector>
+#include <map>
+#include <set>
 
 namespace ns3 {
 
-class RdmaQueuePair : public Object {
+class RdmaQueuePairGroup;
+
+/*
+ * A qp only holds the state of its CC (m_cc_mode), right after the qp in the same block, which comes from
+ * a slab of blocks of that size. Use Create, and the accessor of the CC, e.g. Hp() for CC_MODE 3.
+ */
+class RdmaQueuePair : public SimpleRefCount<RdmaQueuePair> {
 public:
 	Time startTime;
 	Ipv4Address sip, dip;
@@ -31,12 +42,15 @@ public:
 	Callback<void> m_notifyAppFinish;
 	uint64_t m_rtt; 
 	uint32_t m_cc_mode;
+	HeaderTemplate m_hdrTemplate; // headers of the data packets, built on the first one
+	uint64_t m_qpId; // in the RdmaQpTable of the sender
+	uint64_t m_rxQpId; // of the rx qp in the RdmaQpTable of the receiver, 0 until an ACK tells it
 
 	/******************************
 	 * runtime states
 	 *****************************/
 	DataRate m_rate;	//< Current rate
-	struct {
+	struct MlxState{ // CC_MODE 1
 		DataRate m_targetRate;	//< Target rate
 		EventId m_eventUpdateAlpha;
 		double m_alpha;
@@ -46,8 +60,9 @@ public:
 		bool m_decrease_cnp_arrived; // indicate if CNP arrived in the last slot
 		uint32_t m_rpTimeStage;
 		EventId m_rpTimer;
-	} mlx;
-	struct {
+		MlxState();
+	};
+	struct HpState{ // CC_MODE 3
 		uint32_t m_lastUpdateSeq;
 		DataRate m_curRate;
 		IntHop hop[IntHeader::maxHop];
@@ -60,40 +75,64 @@ public:
 			DataRate Rc;
 			uint32_t incStage;
 		}hopState[IntHeader::maxHop];
-	} hp;
-	struct{
+		HpState();
+	};
+	struct TmlyState{ // CC_MODE 7
 		uint32_t m_lastUpdateSeq;
 		DataRate m_curRate;
 		uint32_t m_incStage;
 		uint64_t lastRtt;
 		double rttDiff;
-	} tmly;
-	struct{
+		TmlyState();
+	};
+	struct DctcpState{ // CC_MODE 8
 		uint32_t m_lastUpdateSeq;
 		uint32_t m_caState;
 		uint32_t m_highSeq; // when to exit cwr
 		double m_alpha;
 		uint32_t m_ecnCnt;
 		uint32_t m_batchSizeOfAlpha;
-	} dctcp;
-	struct{
+		DctcpState();
+	};
+	struct HpccPintState{ // CC_MODE 10
 		uint32_t m_lastUpdateSeq;
 		DataRate m_curRate;
 		uint32_t m_incStage;
-	}hpccPint;
-	struct {
+		HpccPintState();
+	};
+	struct PoseidonState{ // CC_MODE 11
 		uint32_t m_lastUpdateSeq;
 		uint64_t m_lastUpdateTime;
 		DataRate m_curRate;
 		IntHop hop[IntHeader::maxHop];
 		double signals[IntHeader::maxHop];
-	} poseidon;
+		uint32_t m_ackCnt; // number of ACKs received, for sampling the CC trace
+		PoseidonState();
+	};
+	MlxState& Mlx(void) { NS_ASSERT(m_cc_mode == 1); return *(MlxState*)GetCcState(); }
+	HpState& Hp(void) { NS_ASSERT(m_cc_mode == 3); return *(HpState*)GetCcState(); }
+	TmlyState& Tmly(void) { NS_ASSERT(m_cc_mode == 7); return *(TmlyState*)GetCcState(); }
+	DctcpState& Dctcp(void) { NS_ASSERT(m_cc_mode == 8); return *(DctcpState*)GetCcState(); }
+	HpccPintState& HpccPint(void) { NS_ASSERT(m_cc_mode == 10); return *(HpccPintState*)GetCcState(); }
+	PoseidonState& Poseidon(void) { NS_ASSERT(m_cc_mode == 11); return *(PoseidonState*)GetCcState(); }
+
+	/******************************
+	 * scheduling states, maintained by the RdmaQueuePairGroup holding the qp
+	 *****************************/
+	enum {SchedNone = 0, SchedIdle, SchedReady, SchedTimed, SchedBlocked, SchedFinished};
+	RdmaQueuePairGroup *m_grp; // the group holding this qp, NULL if none
+	uint32_t m_grpIdx; // index in m_grp->m_qps
+	uint64_t m_grpSeq; // order in m_grp->m_qps, increasing with m_grpIdx
+	uint32_t m_schedGen; // changes on each re-classification, to detect stale heap entries
+	uint8_t m_schedState;
 
 	/***********
 	 * methods
 	 **********/
-	static TypeId GetTypeId (void);
-	RdmaQueuePair(uint16_t pg, Ipv4Address _sip, Ipv4Address _dip, uint16_t _sport, uint16_t _dport, uint32_t ccmode);
+	static Ptr<RdmaQueuePair> Create(uint16_t pg, Ipv4Address _sip, Ipv4Address _dip, uint16_t _sport, uint16_t _dport, uint32_t ccmode);
+	~RdmaQueuePair();
+	static void operator delete(void *p);
+	static uint32_t GetCcStateSize(uint32_t ccmode);
 	void SetSize(uint64_t size);
 	void SetWin(uint32_t win);
 	void SetBaseRtt(uint64_t baseRtt);
@@ -108,9 +147,25 @@ public:
 	uint64_t GetWin(); // window size calculated from m_rate
 	bool IsFinished();
 	uint64_t HpGetCurWin(); // window size calculated from hp.m_curRate, used by HPCC
+	void UpdateSched(void); // re-classify in its group, call after changing the seq, window, rate or m_nextAvail
+
+	// the memory of the qps of the run, for the report at the end
+	struct MemoryStats{
+		uint64_t qps, peakQps; // number of qps made, most alive at once
+		uint64_t rxQps, peakRxQps;
+		uint32_t qpBytes, rxQpBytes; // of the block of a qp (with the state of its CC) and of a rx qp
+		uint64_t slabBytes; // reserved for all of them
+	};
+	static MemoryStats GetMemoryStats(void);
+
+private:
+	RdmaQueuePair(uint16_t pg, Ipv4Address _sip, Ipv4Address _dip, uint16_t _sport, uint16_t _dport, uint32_t ccmode);
+	static void* operator new(size_t size, uint32_t ccmode);
+	static void operator delete(void *p, uint32_t ccmode);
+	void* GetCcState(void) { return this + 1; }
 };
 
-class RdmaRxQueuePair : public Object { // Rx side queue pair
+class RdmaRxQueuePair : public SimpleRefCount<RdmaRxQueuePair> { // Rx side queue pair, from the slab as the qps
 public:
 	struct ECNAccount{
 		uint16_t qIndex;
@@ -129,16 +184,44 @@ public:
 	int32_t m_milestone_rx;
 	uint32_t m_lastNACK;
 	EventId QcnTimerEvent; // if destroy this rxQp, remember to cancel this timer
+	HeaderTemplate m_ackTemplate; // headers of the ACKs/NACKs, built on the first one
+	uint64_t m_qpId; // in the RdmaQpTable of the receiver
+	uint64_t m_txQpId; // of the qp in the RdmaQpTable of the sender, 0 if unknown
+	uint64_t m_size; // of the flow, 0 if unknown
 
-	static TypeId GetTypeId (void);
 	RdmaRxQueuePair();
 	uint32_t GetHash(void);
+	static void* operator new(size_t size);
+	static void operator delete(void *p);
 };
 
+/*
+ * The qps of a NIC, and the round-robin scheduler over them.
+ * Instead of scanning all qps on each dequeue, each qp is kept in one of:
+ *   - m_ready: per pg, the qps that can send now, ordered as in m_qps
+ *   - m_timed: min-heap by m_nextAvail of the qps only limited by their rate
+ *   - m_blocked: min-heap by m_nextAvail of the window-bound qps (only needed for the wakeup time)
+ *   - m_finished: index of the finished qps, which are removed lazily, as the linear scan did
+ * or none of them if it has nothing to send. Heap entries are invalidated by m_schedGen.
+ */
 class RdmaQueuePairGroup : public Object {
 public:
+	static const uint32_t qCnt = 8; // number of pg, same as QbbNetDevice::qCnt
+	struct SchedEntry{
+		int64_t t; // m_nextAvail
+		uint32_t gen;
+		Ptr<RdmaQueuePair> qp;
+		SchedEntry(int64_t _t, uint32_t _gen, Ptr<RdmaQueuePair> _qp) : t(_t), gen(_gen), qp(_qp) {}
+		bool operator<(const SchedEntry &a) const { return t > a.t; } // so that std heap is a min-heap
+	};
+
 	std::vector<Ptr<RdmaQueuePair> > m_qps;
 	//std::vector<Ptr<RdmaRxQueuePair> > m_rxQps;
+	uint64_t m_seq; // m_grpSeq of the next added qp
+	std::map<uint64_t, RdmaQueuePair*> m_ready[qCnt]; // m_grpSeq -> qp
+	std::set<uint32_t> m_finished;
+	std::vector<SchedEntry> m_timed, m_blocked;
+	uint32_t m_nTimed, m_nBlocked; // number of valid entries in m_timed and m_blocked
 
 	static TypeId GetTypeId (void);
 	RdmaQueuePairGroup(void);
@@ -148,6 +231,12 @@ public:
 	void AddQp(Ptr<RdmaQueuePair> qp);
 	//void AddRxQp(Ptr<RdmaRxQueuePair> rxQp);
 	void Clear(void);
+
+	void UpdateQp(Ptr<RdmaQueuePair> qp); // re-classify a qp of this group
+	int GetNextQindex(uint32_t rrlast, bool paused[]); // next qp to send after rrlast in round-robin, -1024 if none; removes finished qps
+	Time GetNextAvail(void); // soonest m_nextAvail of the qps with bytes left, Now() if one can send now
+	void PushEntry(std::vector<SchedEntry> &heap, uint32_t &n, Ptr<RdmaQueuePair> qp);
+	void PromoteTimed(void); // move the qps whose m_nextAvail has come from m_timed
 };
 
 }
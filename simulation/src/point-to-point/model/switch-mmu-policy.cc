@@ -0,0 +1,93 @@
+#include "switch-mmu-policy.h"
+#include "switch-mmu.h"
+#include <algorithm>
+#include <map>
+
+namespace ns3 {
+
+SwitchMmuPolicy::SwitchMmuPolicy(const std::string &name) : m_name(name) {
+}
+
+SwitchMmuPolicy::~SwitchMmuPolicy(){
+}
+
+const std::string& SwitchMmuPolicy::GetName(void) const{
+	return m_name;
+}
+
+uint32_t SwitchMmuPolicy::GetPfcThreshold(const SwitchMmu &mmu, uint32_t port, uint32_t qIndex) const{
+	return mmu.ScaleAlpha(mmu.shared_free_bytes, qIndex) >> mmu.pfc_a_shift[port];
+}
+
+bool SwitchMmuPolicy::CheckEgressAdmission(const SwitchMmu &mmu, uint32_t port, uint32_t qIndex, uint32_t psize) const{
+	return true;
+}
+
+/******************************
+ * Static threshold
+ *****************************/
+class SwitchMmuPolicyStatic : public SwitchMmuPolicy {
+public:
+	SwitchMmuPolicyStatic() : SwitchMmuPolicy("static") {}
+	virtual uint32_t GetPfcThreshold(const SwitchMmu &mmu, uint32_t port, uint32_t qIndex) const{
+		// the same for all the queues, as long as the shared buffer has room
+		return std::min(mmu.static_threshold, mmu.shared_free_bytes);
+	}
+};
+
+/******************************
+ * Egress pool, dynamic threshold
+ *****************************/
+class SwitchMmuPolicyEgress : public SwitchMmuPolicy {
+public:
+	SwitchMmuPolicyEgress(const std::string &name = "egress") : SwitchMmuPolicy(name) {}
+	virtual bool CheckEgressAdmission(const SwitchMmu &mmu, uint32_t port, uint32_t qIndex, uint32_t psize) const{
+		if (mmu.egress_used_bytes + psize > mmu.egress_pool)
+			return false;
+		return mmu.egress_bytes[port][qIndex] + psize <= GetEgressThreshold(mmu, port, qIndex);
+	}
+protected:
+	// the bytes the egress queue (port, qIndex) may hold
+	virtual uint32_t GetEgressThreshold(const SwitchMmu &mmu, uint32_t port, uint32_t qIndex) const{
+		return mmu.ScaleAlpha(mmu.egress_pool - mmu.egress_used_bytes, qIndex);
+	}
+};
+
+/******************************
+ * ABM: the egress threshold of a priority is shared by its active queues
+ *****************************/
+class SwitchMmuPolicyAbm : public SwitchMmuPolicyEgress {
+public:
+	SwitchMmuPolicyAbm() : SwitchMmuPolicyEgress("abm") {}
+protected:
+	virtual uint32_t GetEgressThreshold(const SwitchMmu &mmu, uint32_t port, uint32_t qIndex) const{
+		uint32_t n = std::max(mmu.egress_active[qIndex], 1u);
+		return SwitchMmuPolicyEgress::GetEgressThreshold(mmu, port, qIndex) / n;
+	}
+};
+
+static std::map<std::string, const SwitchMmuPolicy*>& GetRegistry(void){
+	static const SwitchMmuPolicy dt("dt");
+	static const SwitchMmuPolicyStatic st;
+	static const SwitchMmuPolicyEgress egress;
+	static const SwitchMmuPolicyAbm abm;
+	static std::map<std::string, const SwitchMmuPolicy*> registry;
+	if (registry.empty()){
+		const SwitchMmuPolicy *builtin[] = {&dt, &st, &egress, &abm};
+		for (uint32_t i = 0; i < sizeof(builtin) / sizeof(builtin[0]); i++)
+			registry[builtin[i]->GetName()] = builtin[i];
+	}
+	return registry;
+}
+
+const SwitchMmuPolicy* SwitchMmuPolicy::Get(const std::string &name){
+	std::map<std::string, const SwitchMmuPolicy*> &registry = GetRegistry();
+	std::map<std::string, const SwitchMmuPolicy*>::iterator it = registry.find(name);
+	return it != registry.end() ? it->second : NULL;
+}
+
+void SwitchMmuPolicy::Register(const SwitchMmuPolicy *policy){
+	GetRegistry()[policy->GetName()] = policy;
+}
+
+} /* namespace ns3 */
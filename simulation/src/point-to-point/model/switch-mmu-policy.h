@@ -0,0 +1,44 @@
+#ifndef SWITCH_MMU_POLICY_H
+#define SWITCH_MMU_POLICY_H
+
+#include <stdint.h>
+#include <string>
+
+namespace ns3 {
+
+class SwitchMmu;
+
+/**
+ * \brief The buffer admission policy of a SwitchMmu
+ *
+ * The thresholds of the ingress queues, above which they are paused by PFC, and the admission of the
+ * packets to the egress queues. The base class is the dynamic threshold of the shared buffer ("dt"):
+ * an ingress queue may use alpha[qIndex] >> pfc_a_shift[port] of the shared bytes left, and the egress
+ * queues take all the packets. The policies read the counters of the SwitchMmu, which keeps the bytes
+ * left in the shared buffer and in the egress pool as the queues change, and have no state of their own,
+ * so one instance of each serves all the switches and threads.
+ *
+ * A new policy derives from the closest one, overrides what differs, and is registered under its name
+ * before the switches are configured.
+ */
+class SwitchMmuPolicy {
+public:
+	SwitchMmuPolicy(const std::string &name);
+	virtual ~SwitchMmuPolicy();
+
+	const std::string& GetName(void) const;
+
+	// the shared bytes the ingress queue (port, qIndex) may use before it is paused
+	virtual uint32_t GetPfcThreshold(const SwitchMmu &mmu, uint32_t port, uint32_t qIndex) const;
+	// whether a packet of psize bytes may join the egress queue (port, qIndex), otherwise it is dropped
+	virtual bool CheckEgressAdmission(const SwitchMmu &mmu, uint32_t port, uint32_t qIndex, uint32_t psize) const;
+
+	static const SwitchMmuPolicy* Get(const std::string &name); // the policy of name, NULL if none is registered
+	static void Register(const SwitchMmuPolicy *policy); // replaces the policy of the same name, the caller keeps it alive
+private:
+	std::string m_name;
+};
+
+} /* namespace ns3 */
+
+#endif /* SWITCH_MMU_POLICY_H */
@@ -9,7 +9,7 @@
 #include "ns3/global-value.h"
 #include "ns3/boolean.h"
 #include "ns3/simulator.h"
-#include "ns3/random-variable.h"
+#include "ns3/rng-seed-manager.h"
 #include "switch-mmu.h"
 
 NS_LOG_COMPONENT_DEFINE("SwitchMmu");
@@ -26,42 +26,53 @@ namespace ns3 {
 		reserve = 4 * 1024;
 		resume_offset = 3 * 1024;
 
+		policy = SwitchMmuPolicy::Get("dt");
+		for (uint32_t i = 0; i < qCnt; i++)
+			alpha[i] = 1 << alphaShift;
+		static_threshold = buffer_size;
+		egress_pool = buffer_size;
+
 		// headroom
 		shared_used_bytes = 0;
-		memset(hdrm_bytes, 0, sizeof(hdrm_bytes));
-		memset(ingress_bytes, 0, sizeof(ingress_bytes));
-		memset(paused, 0, sizeof(paused));
-		memset(egress_bytes, 0, sizeof(egress_bytes));
+		total_hdrm = total_rsrv = 0;
+		shared_free_bytes = buffer_size;
+		egress_used_bytes = 0;
+		for (uint32_t i = 0; i < qCnt; i++)
+			egress_active[i] = 0;
+		hdrm_bytes = ingress_bytes = paused = egress_bytes = NULL;
+		drop_total = 0;
+		drop_ring_size = 0;
+		m_rng.Seed(RngSeedManager::GetSeed(), RngSeedManager::GetRun(), 0);
 	}
 	bool SwitchMmu::CheckIngressAdmission(uint32_t port, uint32_t qIndex, uint32_t psize){
-		if (psize + hdrm_bytes[port][qIndex] > headroom[port] && psize + GetSharedUsed(port, qIndex) > GetPfcThreshold(port)){
-			printf("%lu %u Drop: queue:%u,%u: Headroom full\n", Simulator::Now().GetTimeStep(), node_id, port, qIndex);
-			for (uint32_t i = 1; i < 64; i++)
-				printf("(%u,%u)", hdrm_bytes[i][3], ingress_bytes[i][3]);
-			printf("\n");
-			return false;
-		}
-		return true;
+		return !(psize + hdrm_bytes[port][qIndex] > headroom[port] && psize + GetSharedUsed(port, qIndex) > GetPfcThreshold(port, qIndex));
 	}
 	bool SwitchMmu::CheckEgressAdmission(uint32_t port, uint32_t qIndex, uint32_t psize){
-		return true;
+		return policy->CheckEgressAdmission(*this, port, qIndex, psize);
 	}
 	void SwitchMmu::UpdateIngressAdmission(uint32_t port, uint32_t qIndex, uint32_t psize){
 		uint32_t new_bytes = ingress_bytes[port][qIndex] + psize;
 		if (new_bytes <= reserve){
 			ingress_bytes[port][qIndex] += psize;
 		}else {
-			uint32_t thresh = GetPfcThreshold(port);
+			uint32_t thresh = GetPfcThreshold(port, qIndex);
 			if (new_bytes - reserve > thresh){
 				hdrm_bytes[port][qIndex] += psize;
 			}else {
+				uint32_t to_shared = std::min(psize, new_bytes - reserve);
 				ingress_bytes[port][qIndex] += psize;
-				shared_used_bytes += std::min(psize, new_bytes - reserve);
+				shared_used_bytes += to_shared;
+				shared_free_bytes -= to_shared;
 			}
 		}
 	}
 	void SwitchMmu::UpdateEgressAdmission(uint32_t port, uint32_t qIndex, uint32_t psize){
+		if (egress_bytes[port][qIndex] == 0)
+			egress_active[qIndex]++;
 		egress_bytes[port][qIndex] += psize;
+		egress_used_bytes += psize;
+		if (!qlen_mon.empty())
+			QlenChange(port, qlen_mon[port].bytes + psize);
 	}
 	void SwitchMmu::RemoveFromIngressAdmission(uint32_t port, uint32_t qIndex, uint32_t psize){
 		uint32_t from_hdrm = std::min(hdrm_bytes[port][qIndex], psize);
@@ -69,18 +80,24 @@ namespace ns3 {
 		hdrm_bytes[port][qIndex] -= from_hdrm;
 		ingress_bytes[port][qIndex] -= psize - from_hdrm;
 		shared_used_bytes -= from_shared;
+		shared_free_bytes += from_shared;
 	}
 	void SwitchMmu::RemoveFromEgressAdmission(uint32_t port, uint32_t qIndex, uint32_t psize){
 		egress_bytes[port][qIndex] -= psize;
+		egress_used_bytes -= psize;
+		if (egress_bytes[port][qIndex] == 0)
+			egress_active[qIndex]--;
+		if (!qlen_mon.empty())
+			QlenChange(port, qlen_mon[port].bytes - psize);
 	}
 	bool SwitchMmu::CheckShouldPause(uint32_t port, uint32_t qIndex){
-		return !paused[port][qIndex] && (hdrm_bytes[port][qIndex] > 0 || GetSharedUsed(port, qIndex) >= GetPfcThreshold(port));
+		return !paused[port][qIndex] && (hdrm_bytes[port][qIndex] > 0 || GetSharedUsed(port, qIndex) >= GetPfcThreshold(port, qIndex));
 	}
 	bool SwitchMmu::CheckShouldResume(uint32_t port, uint32_t qIndex){
 		if (!paused[port][qIndex])
 			return false;
 		uint32_t shared_used = GetSharedUsed(port, qIndex);
-		return hdrm_bytes[port][qIndex] == 0 && (shared_used == 0 || shared_used + resume_offset <= GetPfcThreshold(port));
+		return hdrm_bytes[port][qIndex] == 0 && (shared_used == 0 || shared_used + resume_offset <= GetPfcThreshold(port, qIndex));
 	}
 	void SwitchMmu::SetPause(uint32_t port, uint32_t qIndex){
 		paused[port][qIndex] = true;
@@ -89,8 +106,8 @@ namespace ns3 {
 		paused[port][qIndex] = false;
 	}
 
-	uint32_t SwitchMmu::GetPfcThreshold(uint32_t port){
-		return (buffer_size - total_hdrm - total_rsrv - shared_used_bytes) >> pfc_a_shift[port];
+	uint32_t SwitchMmu::GetPfcThreshold(uint32_t port, uint32_t qIndex){
+		return policy->GetPfcThreshold(*this, port, qIndex);
 	}
 	uint32_t SwitchMmu::GetSharedUsed(uint32_t port, uint32_t qIndex){
 		uint32_t used = ingress_bytes[port][qIndex];
@@ -99,32 +116,176 @@ namespace ns3 {
 	bool SwitchMmu::ShouldSendCN(uint32_t ifindex, uint32_t qIndex){
 		if (qIndex == 0)
 			return false;
-		if (egress_bytes[ifindex][qIndex] > kmax[ifindex])
+		uint32_t q = egress_bytes[ifindex][qIndex];
+		if (q > kmax[ifindex])
 			return true;
-		if (egress_bytes[ifindex][qIndex] > kmin[ifindex]){
-			double p = pmax[ifindex] * double(egress_bytes[ifindex][qIndex] - kmin[ifindex]) / (kmax[ifindex] - kmin[ifindex]);
-			if (UniformVariable(0, 1).GetValue() < p)
-				return true;
+		if (q > kmin[ifindex]){
+			// marked with probability pmax * (q - kmin) / (kmax - kmin): a uniform u of 32 bits is below
+			// 2^32 times that, compared without a division
+			uint64_t u = m_rng.Next32();
+			return u * (kmax[ifindex] - kmin[ifindex]) < (q - kmin[ifindex]) * red_pmax[ifindex];
 		}
 		return false;
 	}
+	int64_t SwitchMmu::AssignStreams(int64_t stream){
+		m_rng.Seed(RngSeedManager::GetSeed(), RngSeedManager::GetRun(), stream);
+		return 1;
+	}
 	void SwitchMmu::ConfigEcn(uint32_t port, uint32_t _kmin, uint32_t _kmax, double _pmax){
 		kmin[port] = _kmin * 1000;
 		kmax[port] = _kmax * 1000;
 		pmax[port] = _pmax;
+		red_pmax[port] = uint64_t(_pmax * 4294967296.0 + 0.5);
 	}
 	void SwitchMmu::ConfigHdrm(uint32_t port, uint32_t size){
+		total_hdrm += size - headroom[port];
 		headroom[port] = size;
+		shared_free_bytes = buffer_size - total_hdrm - total_rsrv - shared_used_bytes;
 	}
 	void SwitchMmu::ConfigNPort(uint32_t n_port){
+		uint32_t n = n_port + 1;
+		pfc_a_shift.assign(n, 0);
+		headroom.assign(n, 0);
+		kmin.assign(n, 0);
+		kmax.assign(n, 0);
+		pmax.assign(n, 0);
+		red_pmax.assign(n, 0);
 		total_hdrm = 0;
-		total_rsrv = 0;
-		for (uint32_t i = 1; i <= n_port; i++){
-			total_hdrm += headroom[i];
-			total_rsrv += reserve;
-		}
+		total_rsrv = n_port * reserve;
+		shared_free_bytes = buffer_size - total_hdrm - total_rsrv - shared_used_bytes;
+		m_queueBytes.assign(4 * n * qCnt, 0);
+		drop_packets.assign(DropReasonCount * n * qCnt, 0);
+		drop_bytes.assign(DropReasonCount * n * qCnt, 0);
+		hdrm_bytes = (uint32_t (*)[qCnt])&m_queueBytes[0];
+		ingress_bytes = hdrm_bytes + n;
+		paused = ingress_bytes + n;
+		egress_bytes = paused + n;
 	}
 	void SwitchMmu::ConfigBufferSize(uint32_t size){
 		buffer_size = size;
+		shared_free_bytes = buffer_size - total_hdrm - total_rsrv - shared_used_bytes;
+	}
+	void SwitchMmu::ConfigPolicy(const SwitchMmuPolicy *_policy){
+		policy = _policy;
+	}
+	void SwitchMmu::ConfigAlpha(uint32_t qIndex, double _alpha){
+		alpha[qIndex] = uint32_t(_alpha * (1 << alphaShift) + 0.5);
+	}
+	void SwitchMmu::ConfigStaticThreshold(uint32_t size){
+		static_threshold = size;
+	}
+	void SwitchMmu::ConfigEgressPool(uint32_t size){
+		egress_pool = size;
+	}
+	void SwitchMmu::ConfigDropRing(uint32_t size){
+		drop_ring_size = size;
+		drop_ring.clear();
+		drop_ring.reserve(size);
+	}
+	void SwitchMmu::RecordDrop(uint32_t inPort, uint32_t outPort, uint32_t qIndex, uint32_t psize, DropReason reason){
+		uint32_t port = reason == DropHeadroom ? inPort : outPort;
+		uint32_t i = (reason * headroom.size() + port) * qCnt + qIndex;
+		if (drop_total == 0)
+			printf("%lu %u Drop: queue:%u,%u: %s, the next drops of the switch are only counted\n", Simulator::Now().GetTimeStep(), node_id, port, qIndex, reason == DropHeadroom ? "Headroom full" : "Egress full");
+		drop_packets[i]++;
+		drop_bytes[i] += psize;
+		if (drop_ring_size > 0){
+			DropSnapshotFormat d;
+			memset(&d, 0, sizeof(d));
+			d.time = Simulator::Now().GetTimeStep();
+			d.inPort = inPort;
+			d.outPort = outPort;
+			d.qIndex = qIndex;
+			d.reason = reason;
+			d.size = psize;
+			d.hdrm = hdrm_bytes[inPort][qIndex];
+			d.ingress = ingress_bytes[inPort][qIndex];
+			d.egress = egress_bytes[outPort][qIndex];
+			d.sharedUsed = shared_used_bytes;
+			d.egressUsed = egress_used_bytes;
+			d.threshold = GetPfcThreshold(inPort, qIndex);
+			if (drop_ring.size() < drop_ring_size)
+				drop_ring.push_back(d);
+			else
+				drop_ring[drop_total % drop_ring_size] = d;
+		}
+		drop_total++;
+	}
+	uint64_t SwitchMmu::GetDropPackets(uint32_t port, uint32_t qIndex, DropReason reason) const{
+		return drop_packets[(reason * headroom.size() + port) * qCnt + qIndex];
+	}
+	uint64_t SwitchMmu::GetDropBytes(uint32_t port, uint32_t qIndex, DropReason reason) const{
+		return drop_bytes[(reason * headroom.size() + port) * qCnt + qIndex];
+	}
+	void SwitchMmu::SerializeDrops(FILE *file){
+		if (drop_total == 0)
+			return;
+		std::vector<DropCountFormat> counts;
+		for (uint32_t i = 0; i < drop_packets.size(); i++){
+			if (drop_packets[i] == 0)
+				continue;
+			DropCountFormat c;
+			memset(&c, 0, sizeof(c));
+			c.port = i / qCnt % headroom.size();
+			c.qIndex = i % qCnt;
+			c.reason = i / qCnt / headroom.size();
+			c.packets = drop_packets[i];
+			c.bytes = drop_bytes[i];
+			counts.push_back(c);
+		}
+		DropSummaryHeader h;
+		h.magic = DropSummaryHeader::MAGIC;
+		h.node = node_id;
+		h.nCount = counts.size();
+		h.nSnapshot = drop_ring.size();
+		h.nDrop = drop_total;
+		fwrite(&h, sizeof(h), 1, file);
+		fwrite(&counts[0], sizeof(DropCountFormat), counts.size(), file);
+		if (!drop_ring.empty()){
+			// oldest first: once the ring is full, the oldest is the next one to be replaced
+			uint32_t first = drop_ring.size() < drop_ring_size ? 0 : drop_total % drop_ring_size;
+			fwrite(&drop_ring[first], sizeof(DropSnapshotFormat), drop_ring.size() - first, file);
+			fwrite(&drop_ring[0], sizeof(DropSnapshotFormat), first, file);
+		}
+	}
+	void SwitchMmu::SetQlenMonitor(uint64_t start, uint64_t end, uint64_t interval){
+		qlen_mon_start = start;
+		qlen_mon_last = end > start ? start + (end - start + interval - 1) / interval * interval : start;
+		qlen_mon_interval = interval;
+		qlen_mon.resize(headroom.size());
+		for (uint32_t i = 0; i < qlen_mon.size(); i++){
+			qlen_mon[i].bytes = 0;
+			for (uint32_t j = 0; j < qCnt; j++)
+				qlen_mon[i].bytes += egress_bytes[i][j];
+			qlen_mon[i].since = Simulator::Now().GetTimeStep();
+			qlen_mon[i].cnt.clear();
+		}
+	}
+	const std::vector<uint32_t>& SwitchMmu::GetQlenDistribution(uint32_t port){
+		// a sampling time at Now sees the queues as they are now
+		CountQlen(qlen_mon[port], Simulator::Now().GetTimeStep() + 1);
+		return qlen_mon[port].cnt;
+	}
+	void SwitchMmu::QlenChange(uint32_t port, uint32_t bytes){
+		QlenMonitor &m = qlen_mon[port];
+		// the KB of the port changes: the sampling times so far saw the previous one
+		if (bytes / 1000 != m.bytes / 1000)
+			CountQlen(m, Simulator::Now().GetTimeStep());
+		m.bytes = bytes;
+	}
+	void SwitchMmu::CountQlen(QlenMonitor &m, uint64_t until){
+		uint64_t a = std::max(m.since, qlen_mon_start), b = std::min(until, qlen_mon_last + 1);
+		if (a < b){
+			// the number of sampling times in [a, b)
+			uint64_t n = (b - qlen_mon_start + qlen_mon_interval - 1) / qlen_mon_interval - (a - qlen_mon_start + qlen_mon_interval - 1) / qlen_mon_interval;
+			if (n > 0){
+				uint32_t kb = m.bytes / 1000;
+				if (m.cnt.size() < kb + 1)
+					m.cnt.resize(kb + 1);
+				m.cnt[kb] += n;
+			}
+		}
+		if (until > m.since)
+			m.since = until;
 	}
 }
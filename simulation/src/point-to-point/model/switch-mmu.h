@@ -2,7 +2,11 @@
 #define SWITCH_MMU_H
 
 #include <unordered_map>
+#include <vector>
 #include <ns3/node.h>
+#include "switch-mmu-policy.h"
+#include "trace-format.h"
+#include "fast-rng.h"
 
 namespace ns3 {
 
@@ -10,7 +14,6 @@ class Packet;
 
 class SwitchMmu: public Object{
 public:
-	static const uint32_t pCnt = 257;	// Number of ports used
 	static const uint32_t qCnt = 8;	// Number of queues/priorities used
 
 	static TypeId GetTypeId (void);
@@ -31,34 +34,84 @@ public:
 	//void GetPauseClasses(uint32_t port, uint32_t qIndex);
 	//bool GetResumeClasses(uint32_t port, uint32_t qIndex);
 
-	uint32_t GetPfcThreshold(uint32_t port);
+	uint32_t GetPfcThreshold(uint32_t port, uint32_t qIndex);
 	uint32_t GetSharedUsed(uint32_t port, uint32_t qIndex);
 
 	bool ShouldSendCN(uint32_t ifindex, uint32_t qIndex);
+	// give ShouldSendCN its own stream of the ns-3 seed, whose draws only depend on this switch; returns the number of streams used
+	int64_t AssignStreams(int64_t stream);
 
 	void ConfigEcn(uint32_t port, uint32_t _kmin, uint32_t _kmax, double _pmax);
 	void ConfigHdrm(uint32_t port, uint32_t size);
-	void ConfigNPort(uint32_t n_port);
+	void ConfigNPort(uint32_t n_port); // first: sizes the state of the ports 0 (unused) to n_port
 	void ConfigBufferSize(uint32_t size);
+	void ConfigPolicy(const SwitchMmuPolicy *_policy);
+	void ConfigAlpha(uint32_t qIndex, double _alpha);
+	void ConfigStaticThreshold(uint32_t size);
+	void ConfigEgressPool(uint32_t size);
+
+	// alpha[qIndex] * bytes
+	uint32_t ScaleAlpha(uint32_t bytes, uint32_t qIndex) const{
+		return uint64_t(bytes) * alpha[qIndex] >> alphaShift;
+	}
+
+	// drops of the admission control, counted by port and queue, with snapshots of the last ones
+	void ConfigDropRing(uint32_t size); // keep the snapshots of the last size drops, none by default
+	void RecordDrop(uint32_t inPort, uint32_t outPort, uint32_t qIndex, uint32_t psize, DropReason reason);
+	uint64_t GetDropPackets(uint32_t port, uint32_t qIndex, DropReason reason) const;
+	uint64_t GetDropBytes(uint32_t port, uint32_t qIndex, DropReason reason) const;
+	void SerializeDrops(FILE *file); // the block of the switch in the DROP_SUMMARY_FILE, nothing if no drop
+
+	// queue length monitor: for each port, at how many of the sampling times start + k * interval (up to the
+	// first one at or after end) its queues held i KB in total, counted when the length changes
+	void SetQlenMonitor(uint64_t start, uint64_t end, uint64_t interval);
+	const std::vector<uint32_t>& GetQlenDistribution(uint32_t port); // with the sampling times up to Now
 
 	// config
 	uint32_t node_id;
 	uint32_t buffer_size;
-	uint32_t pfc_a_shift[pCnt];
+	std::vector<uint32_t> pfc_a_shift;
 	uint32_t reserve;
-	uint32_t headroom[pCnt];
+	std::vector<uint32_t> headroom;
 	uint32_t resume_offset;
-	uint32_t kmin[pCnt], kmax[pCnt];
-	double pmax[pCnt];
+	std::vector<uint32_t> kmin, kmax;
+	std::vector<double> pmax;
+	std::vector<uint64_t> red_pmax; // pmax * 2^32, so that the RED slope is red_pmax / (kmax - kmin) in units of 2^-32 per byte
 	uint32_t total_hdrm;
 	uint32_t total_rsrv;
+	const SwitchMmuPolicy *policy;
+	static const uint32_t alphaShift = 16;
+	uint32_t alpha[qCnt]; // of the dynamic thresholds of each queue, in units of 2^-alphaShift
+	uint32_t static_threshold; // of the "static" policy
+	uint32_t egress_pool; // the bytes of all the egress queues, for the egress policies
 
-	// runtime
+	// runtime, the rows [port][qIndex] of m_queueBytes
 	uint32_t shared_used_bytes;
-	uint32_t hdrm_bytes[pCnt][qCnt];
-	uint32_t ingress_bytes[pCnt][qCnt];
-	uint32_t paused[pCnt][qCnt];
-	uint32_t egress_bytes[pCnt][qCnt];
+	uint32_t shared_free_bytes; // buffer_size - total_hdrm - total_rsrv - shared_used_bytes
+	uint32_t egress_used_bytes;
+	uint32_t egress_active[qCnt]; // the number of egress queues of each priority that hold bytes
+	uint32_t (*hdrm_bytes)[qCnt];
+	uint32_t (*ingress_bytes)[qCnt];
+	uint32_t (*paused)[qCnt];
+	uint32_t (*egress_bytes)[qCnt];
+	std::vector<uint32_t> m_queueBytes; // the counters of all the queues, in one block
+
+	std::vector<uint64_t> drop_packets, drop_bytes; // [reason][port][qIndex]
+	uint64_t drop_total;
+	uint32_t drop_ring_size;
+	std::vector<DropSnapshotFormat> drop_ring; // once full, drop_total % drop_ring_size is the oldest
+
+	FastRng m_rng; // of ShouldSendCN
+
+	struct QlenMonitor{
+		uint32_t bytes; // of all the queues of the port
+		uint64_t since; // the sampling times before it are counted
+		std::vector<uint32_t> cnt; // cnt[i] is the number of sampling times at which the queues held i KB
+	};
+	std::vector<QlenMonitor> qlen_mon; // by port, empty if not monitored
+	uint64_t qlen_mon_start, qlen_mon_last, qlen_mon_interval; // the first and last sampling times, and the interval
+	void QlenChange(uint32_t port, uint32_t bytes);
+	void CountQlen(QlenMonitor &m, uint64_t until); // the sampling times from m.since to until (excluded)
 };
 
 } /* namespace ns3 */
@@ -6,11 +6,14 @@
 #include "ns3/boolean.h"
 #include "ns3/uinteger.h"
 #include "ns3/double.h"
+#include "ns3/rng-seed-manager.h"
 #include "switch-node.h"
 #include "qbb-net-device.h"
 #include "ppp-header.h"
 #include "ns3/int-header.h"
+#include "rdma-cc.h"
 #include <cmath>
+#include <algorithm>
 
 namespace ns3 {
 
@@ -27,7 +30,7 @@ TypeId SwitchNode::GetTypeId (void)
 	.AddAttribute("CcMode",
 			"CC mode.",
 			UintegerValue(0),
-			MakeUintegerAccessor(&SwitchNode::m_ccMode),
+			MakeUintegerAccessor(&SwitchNode::SetCcMode, &SwitchNode::GetCcMode),
 			MakeUintegerChecker<uint32_t>())
 	.AddAttribute("AckHighPrio",
 			"Set high priority for ACK/NACK or not",
@@ -37,26 +40,51 @@ TypeId SwitchNode::GetTypeId (void)
 	.AddAttribute("MaxRtt",
 			"Max Rtt of the network",
 			UintegerValue(9000),
-			MakeUintegerAccessor(&SwitchNode::m_maxRtt),
+			MakeUintegerAccessor(&SwitchNode::SetMaxRtt, &SwitchNode::GetMaxRtt),
 			MakeUintegerChecker<uint32_t>())
   ;
   return tid;
 }
 
 SwitchNode::SwitchNode(){
+	Init();
+}
+
+SwitchNode::SwitchNode(uint32_t systemId) : Node(systemId){
+	Init();
+}
+
+void SwitchNode::Init(){
+	m_cc = RdmaCc::Get(0);
 	m_ecmpSeed = m_id;
 	m_node_type = 1;
 	m_mmu = CreateObject<SwitchMmu>();
-	for (uint32_t i = 0; i < pCnt; i++)
-		for (uint32_t j = 0; j < pCnt; j++)
-			for (uint32_t k = 0; k < qCnt; k++)
-				m_bytes[i][j][k] = 0;
-	for (uint32_t i = 0; i < pCnt; i++)
-		m_txBytes[i] = 0;
-	for (uint32_t i = 0; i < pCnt; i++)
-		m_lastPktSize[i] = m_lastPktTs[i] = 0;
-	for (uint32_t i = 0; i < pCnt; i++)
-		m_u[i] = 0;
+	m_rng.Seed(RngSeedManager::GetSeed(), RngSeedManager::GetRun(), 1);
+}
+
+void SwitchNode::ConfigNPort(uint32_t n_port){
+	Port p = {0, 0, 0, 0, 0};
+	m_ports.assign(n_port + 1, p);
+	for (uint32_t i = 1; i <= n_port; i++){
+		uint64_t B = DynamicCast<QbbNetDevice>(m_devices[i])->GetDataRate().GetBitRate() / 8; // Bps
+		m_ports[i].logB = (int32_t)round(log2(B) * (1 << Pint::log_shift));
+	}
+	m_mmu->ConfigNPort(n_port);
+}
+
+void SwitchNode::SetMaxRtt(uint64_t maxRtt){
+	m_maxRtt = maxRtt;
+	m_logMaxRtt = (int32_t)round(log2(maxRtt) * (1 << Pint::log_shift));
+}
+
+uint64_t SwitchNode::GetMaxRtt(void) const{
+	return m_maxRtt;
+}
+
+int64_t SwitchNode::AssignStreams(int64_t stream){
+	int64_t n = m_mmu->AssignStreams(stream);
+	m_rng.Seed(RngSeedManager::GetSeed(), RngSeedManager::GetRun(), stream + n);
+	return n + 1;
 }
 
 int SwitchNode::GetOutDev(Ptr<const Packet> p, CustomHeader &ch){
@@ -121,15 +149,18 @@ void SwitchNode::SendToDev(Ptr<Packet>p, CustomHeader &ch){
 		p->PeekPacketTag(t);
 		uint32_t inDev = t.GetFlowId();
 		if (qIndex != 0){ //not highest priority
-			if (m_mmu->CheckIngressAdmission(inDev, qIndex, p->GetSize()) && m_mmu->CheckEgressAdmission(idx, qIndex, p->GetSize())){			// Admission control
-				m_mmu->UpdateIngressAdmission(inDev, qIndex, p->GetSize());
-				m_mmu->UpdateEgressAdmission(idx, qIndex, p->GetSize());
-			}else{
+			if (!m_mmu->CheckIngressAdmission(inDev, qIndex, p->GetSize())){			// Admission control
+				m_mmu->RecordDrop(inDev, idx, qIndex, p->GetSize(), DropHeadroom);
 				return; // Drop
 			}
+			if (!m_mmu->CheckEgressAdmission(idx, qIndex, p->GetSize())){
+				m_mmu->RecordDrop(inDev, idx, qIndex, p->GetSize(), DropEgress);
+				return; // Drop
+			}
+			m_mmu->UpdateIngressAdmission(inDev, qIndex, p->GetSize());
+			m_mmu->UpdateEgressAdmission(idx, qIndex, p->GetSize());
 			CheckAndSendPfc(inDev, qIndex);
 		}
-		m_bytes[inDev][idx][qIndex] += p->GetSize();
 		m_devices[idx]->SwitchSend(qIndex, p, ch);
 	}else
 		return; // Drop
@@ -182,6 +213,14 @@ void SwitchNode::AddTableEntry(Ipv4Address &dstAddr, uint32_t intf_idx){
 	m_rtTable[dip].push_back(intf_idx);
 }
 
+void SwitchNode::SetTableEntry(Ipv4Address &dstAddr, std::vector<int> &intfs){
+	uint32_t dip = dstAddr.Get();
+	if (intfs.empty())
+		m_rtTable.erase(dip);
+	else
+		m_rtTable[dip] = intfs;
+}
+
 void SwitchNode::ClearTable(){
 	m_rtTable.clear();
 }
@@ -193,136 +232,80 @@ bool SwitchNode::SwitchReceiveFromDevice(Ptr<NetDevice> device, Ptr<Packet> pack
 }
 
 void SwitchNode::SwitchNotifyDequeue(uint32_t ifIndex, uint32_t qIndex, Ptr<Packet> p){
-	FlowIdTag t;
-	p->PeekPacketTag(t);
+	// The headers are serialized in the packet buffer (ppp, ip, udp, SeqTs, INT), and
+	// the packet is not shared once it is dequeued, so ECN and INT are written in place.
+	uint8_t* buf = p->GetBuffer();
+	uint32_t size = p->GetSize();
 	if (qIndex != 0){
+		FlowIdTag t;
+		p->PeekPacketTag(t);
 		uint32_t inDev = t.GetFlowId();
-		m_mmu->RemoveFromIngressAdmission(inDev, qIndex, p->GetSize());
-		m_mmu->RemoveFromEgressAdmission(ifIndex, qIndex, p->GetSize());
-		m_bytes[inDev][ifIndex][qIndex] -= p->GetSize();
+		m_mmu->RemoveFromIngressAdmission(inDev, qIndex, size);
+		m_mmu->RemoveFromEgressAdmission(ifIndex, qIndex, size);
 		if (m_ecnEnabled){
 			bool egressCongested = m_mmu->ShouldSendCN(ifIndex, qIndex);
 			if (egressCongested){
-				PppHeader ppp;
-				Ipv4Header h;
-				p->RemoveHeader(ppp);
-				p->RemoveHeader(h);
-				h.SetEcn((Ipv4Header::EcnType)0x03);
-				p->AddHeader(h);
-				p->AddHeader(ppp);
+				// set ECN to CE in the TOS byte; the IPv4 checksum is not computed, so it stays valid
+				buf[PppHeader::GetStaticSize() + 1] |= 0x03;
 			}
 		}
 		//CheckAndSendPfc(inDev, qIndex);
 		CheckAndSendResume(inDev, qIndex);
 	}
-	if (1){
-		uint8_t* buf = p->GetBuffer();
-		if (buf[PppHeader::GetStaticSize() + 9] == 0x11){ // udp packet
-			IntHeader *ih = (IntHeader*)&buf[PppHeader::GetStaticSize() + 20 + 8 + 6]; // ppp, ip, udp, SeqTs, INT
-			Ptr<QbbNetDevice> dev = DynamicCast<QbbNetDevice>(m_devices[ifIndex]);
-			if (m_ccMode == 3 || m_ccMode == 11){ // HPCC and Poseidon
-				ih->PushHop(Simulator::Now().GetTimeStep(), m_txBytes[ifIndex], dev->GetQueue()->GetNBytesTotal(), dev->GetDataRate().GetBitRate());
-			}else if (m_ccMode == 10){ // HPCC-PINT
-				uint64_t t = Simulator::Now().GetTimeStep();
-				uint64_t dt = t - m_lastPktTs[ifIndex];
-				if (dt > m_maxRtt)
-					dt = m_maxRtt;
-				uint64_t B = dev->GetDataRate().GetBitRate() / 8; //Bps
-				uint64_t qlen = dev->GetQueue()->GetNBytesTotal();
-				double newU;
-
-				/**************************
-				 * approximate calc
-				 *************************/
-				int b = 20, m = 16, l = 20; // see log2apprx's paremeters
-				int sft = logres_shift(b,l);
-				double fct = 1<<sft; // (multiplication factor corresponding to sft)
-				double log_T = log2(m_maxRtt)*fct; // log2(T)*fct
-				double log_B = log2(B)*fct; // log2(B)*fct
-				double log_1e9 = log2(1e9)*fct; // log2(1e9)*fct
-				double qterm = 0;
-				double byteTerm = 0;
-				double uTerm = 0;
-				if ((qlen >> 8) > 0){
-					int log_dt = log2apprx(dt, b, m, l); // ~log2(dt)*fct
-					int log_qlen = log2apprx(qlen >> 8, b, m, l); // ~log2(qlen / 256)*fct
-					qterm = pow(2, (
-								log_dt + log_qlen + log_1e9 - log_B - 2*log_T
-								)/fct
-							) * 256;
-					// 2^((log2(dt)*fct+log2(qlen/256)*fct+log2(1e9)*fct-log2(B)*fct-2*log2(T)*fct)/fct)*256 ~= dt*qlen*1e9/(B*T^2)
-				}
-				if (m_lastPktSize[ifIndex] > 0){
-					int byte = m_lastPktSize[ifIndex];
-					int log_byte = log2apprx(byte, b, m, l);
-					byteTerm = pow(2, (
-								log_byte + log_1e9 - log_B - log_T
-								)/fct
-							);
-					// 2^((log2(byte)*fct+log2(1e9)*fct-log2(B)*fct-log2(T)*fct)/fct) ~= byte*1e9 / (B*T)
-				}
-				if (m_maxRtt > dt && m_u[ifIndex] > 0){
-					int log_T_dt = log2apprx(m_maxRtt - dt, b, m, l); // ~log2(T-dt)*fct
-					int log_u = log2apprx(int(round(m_u[ifIndex] * 8192)), b, m, l); // ~log2(u*512)*fct
-					uTerm = pow(2, (
-								log_T_dt + log_u - log_T
-								)/fct
-							) / 8192;
-					// 2^((log2(T-dt)*fct+log2(u*512)*fct-log2(T)*fct)/fct)/512 = (T-dt)*u/T
-				}
-				newU = qterm+byteTerm+uTerm;
-
-				#if 0
-				/**************************
-				 * accurate calc
-				 *************************/
-				double weight_ewma = double(dt) / m_maxRtt;
-				double u;
-				if (m_lastPktSize[ifIndex] == 0)
-					u = 0;
-				else{
-					double txRate = m_lastPktSize[ifIndex] / double(dt); // B/ns
-					u = (qlen / m_maxRtt + txRate) * 1e9 / B;
-				}
-				newU = m_u[ifIndex] * (1 - weight_ewma) + u * weight_ewma;
-				printf(" %lf\n", newU);
-				#endif
-
-				/************************
-				 * update PINT header
-				 ***********************/
-				uint16_t power = Pint::encode_u(newU);
-				if (power > ih->GetPower())
-					ih->SetPower(power);
-
-				m_u[ifIndex] = newU;
-			}
-		}
+	if (buf[PppHeader::GetStaticSize() + 9] == 0x11){ // udp packet
+		IntHeader *ih = (IntHeader*)&buf[PppHeader::GetStaticSize() + 20 + 8 + 6]; // ppp, ip, udp, SeqTs, INT
+		m_cc->SwitchDequeue(*this, ifIndex, ih);
+	}
+	m_ports[ifIndex].txBytes += size;
+	m_ports[ifIndex].lastPktSize = size;
+	m_ports[ifIndex].lastPktTs = Simulator::Now().GetTimeStep();
+}
+
+void SwitchNode::SwitchNotifyDrop(uint32_t ifIndex, uint32_t qIndex, Ptr<Packet> p){
+	// release the buffer taken in SendToDev
+	if (qIndex != 0){
+		FlowIdTag t;
+		p->PeekPacketTag(t);
+		uint32_t inDev = t.GetFlowId();
+		m_mmu->RemoveFromIngressAdmission(inDev, qIndex, p->GetSize());
+		m_mmu->RemoveFromEgressAdmission(ifIndex, qIndex, p->GetSize());
+		CheckAndSendResume(inDev, qIndex);
 	}
-	m_txBytes[ifIndex] += p->GetSize();
-	m_lastPktSize[ifIndex] = p->GetSize();
-	m_lastPktTs[ifIndex] = Simulator::Now().GetTimeStep();
 }
 
-int SwitchNode::logres_shift(int b, int l){
-	static int data[] = {0,0,1,2,2,3,3,3,3,4,4,4,4,4,4,4,4,5,5,5,5,5,5,5,5,5,5,5,5,5,5,5,5};
-	return l - data[b];
+void SwitchNode::SetCcMode(uint32_t mode){
+	m_ccMode = mode;
+	m_cc = RdmaCc::Get(mode);
 }
 
-int SwitchNode::log2apprx(int x, int b, int m, int l){
-	int x0 = x;
-	int msb = int(log2(x)) + 1;
-	if (msb > m){
-		x = (x >> (msb - m) << (msb - m));
-		#if 0
-		x += + (1 << (msb - m - 1));
-		#else
-		int mask = (1 << (msb-m)) - 1;
-		if ((x0 & mask) > (rand() & mask))
-			x += 1<<(msb-m);
-		#endif
-	}
-	return int(log2(x) * (1<<logres_shift(b, l)));
+uint32_t SwitchNode::GetCcMode(void) const{
+	return m_ccMode;
+}
+
+void SwitchNode::PushIntHop(uint32_t ifIndex, IntHeader *ih){
+	Ptr<QbbNetDevice> dev = DynamicCast<QbbNetDevice>(m_devices[ifIndex]);
+	ih->PushHop(Simulator::Now().GetTimeStep(), m_ports[ifIndex].txBytes, dev->GetQueue()->GetNBytesTotal(), dev->GetDataRate().GetBitRate());
+}
+
+void SwitchNode::UpdatePintPower(uint32_t ifIndex, IntHeader *ih){
+	Ptr<QbbNetDevice> dev = DynamicCast<QbbNetDevice>(m_devices[ifIndex]);
+	Port &port = m_ports[ifIndex];
+	uint64_t t = Simulator::Now().GetTimeStep();
+	uint64_t dt = t - port.lastPktTs;
+	if (dt > m_maxRtt)
+		dt = m_maxRtt;
+	uint64_t qlen = dev->GetQueue()->GetNBytesTotal();
+
+	// approximate calc in the log domain, see Pint::next_u
+	port.u = Pint::next_u(port.u, dt, qlen, port.lastPktSize, m_maxRtt, m_logMaxRtt, port.logB, m_rng);
+
+	/************************
+	 * update PINT header
+	 ***********************/
+	uint32_t u_toInt = ((uint64_t)port.u * Pint::max_concurrent + (1 << Pint::u_shift) - 1) >> Pint::u_shift; // ceil(u * max_concurrent)
+	uint16_t power = Pint::encode(std::max(u_toInt, 1u), m_rng);
+	if (power > ih->GetPower())
+		ih->SetPower(power);
 }
 
 } /* namespace ns3 */
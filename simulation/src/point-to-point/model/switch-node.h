@@ -10,49 +10,61 @@
 namespace ns3 {
 
 class Packet;
+class RdmaCc;
 
 class SwitchNode : public Node{
-	static const uint32_t pCnt = 257;	// Number of ports used
-	static const uint32_t qCnt = 8;	// Number of queues/priorities used
 	uint32_t m_ecmpSeed;
 	std::unordered_map<uint32_t, std::vector<int> > m_rtTable; // map from ip address (u32) to possible ECMP port (index of dev)
 
-	// monitor of PFC
-	uint32_t m_bytes[pCnt][pCnt][qCnt]; // m_bytes[inDev][outDev][qidx] is the bytes from inDev enqueued for outDev at qidx
-	
-	uint64_t m_txBytes[pCnt]; // counter of tx bytes
-
-	uint32_t m_lastPktSize[pCnt];
-	uint64_t m_lastPktTs[pCnt]; // ns
-	double m_u[pCnt];
+	struct Port{
+		uint64_t txBytes; // counter of tx bytes
+		uint64_t lastPktTs; // ns
+		uint32_t lastPktSize;
+		uint32_t u; // PINT's utilization, in units of 2^-Pint::u_shift
+		int32_t logB; // log2 of the bytes/s of the port, in units of 2^-Pint::log_shift
+	};
+	std::vector<Port> m_ports; // by port, from ConfigNPort
 
 protected:
 	bool m_ecnEnabled;
 	uint32_t m_ccMode;
+	const RdmaCc *m_cc; // the CC of m_ccMode
 	uint64_t m_maxRtt;
+	int32_t m_logMaxRtt; // log2(m_maxRtt), in units of 2^-Pint::log_shift
+	FastRng m_rng; // of PINT's random roundings
 
 	uint32_t m_ackHighPrio; // set high priority for ACK/NACK
 
 private:
+	void Init();
 	int GetOutDev(Ptr<const Packet>, CustomHeader &ch);
 	void SendToDev(Ptr<Packet>p, CustomHeader &ch);
 	static uint32_t EcmpHash(const uint8_t* key, size_t len, uint32_t seed);
 	void CheckAndSendPfc(uint32_t inDev, uint32_t qIndex);
 	void CheckAndSendResume(uint32_t inDev, uint32_t qIndex);
+	void SetMaxRtt(uint64_t maxRtt);
+	uint64_t GetMaxRtt(void) const;
 public:
 	Ptr<SwitchMmu> m_mmu;
 
 	static TypeId GetTypeId (void);
 	SwitchNode();
+	SwitchNode(uint32_t systemId); // for distributed simulation, systemId is the MPI rank that runs the switch
+	void ConfigNPort(uint32_t n_port); // before the MMU is configured, see SwitchMmu::ConfigNPort
 	void SetEcmpSeed(uint32_t seed);
 	void AddTableEntry(Ipv4Address &dstAddr, uint32_t intf_idx);
+	void SetTableEntry(Ipv4Address &dstAddr, std::vector<int> &intfs); // replace the entries of dstAddr, no entry if intfs is empty
 	void ClearTable();
 	bool SwitchReceiveFromDevice(Ptr<NetDevice> device, Ptr<Packet> packet, CustomHeader &ch);
 	void SwitchNotifyDequeue(uint32_t ifIndex, uint32_t qIndex, Ptr<Packet> p);
+	void SwitchNotifyDrop(uint32_t ifIndex, uint32_t qIndex, Ptr<Packet> p); // a queued packet is dropped without being sent
+	void SetCcMode(uint32_t mode);
+	uint32_t GetCcMode(void) const;
+	int64_t AssignStreams(int64_t stream); // of the MMU's ECN marking and PINT, returns the number of streams used
 
-	// for approximate calc in PINT
-	int logres_shift(int b, int l);
-	int log2apprx(int x, int b, int m, int l); // given x of at most b bits, use most significant m bits of x, calc the result in l bits
+	// INT of the packet sent on ifIndex, called by the CC
+	void PushIntHop(uint32_t ifIndex, IntHeader *ih); // HPCC and Poseidon
+	void UpdatePintPower(uint32_t ifIndex, IntHeader *ih); // HPCC-PINT
 };
 
 } /* namespace ns3 */
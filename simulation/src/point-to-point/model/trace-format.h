@@ -73,6 +73,99 @@ struct TraceFormat{
 	}
 };
 
+/*
+ * One sample of a sender's CC state on an ACK (Poseidon).
+ * The layout is fixed (104 bytes, no implicit padding), so the file can be read as an array of records.
+ */
+struct CcTraceFormat{
+	static const uint32_t maxHop = 5; // same as IntHeader::maxHop
+	uint64_t time;
+	uint32_t sip, dip;
+	uint16_t sport, dport;
+	uint16_t pg;
+	uint8_t nhop;
+	uint8_t reserved0;
+	double mpd; // max per-hop delay signal
+	double mpt; // max per-hop delay target
+	double update; // update ratio from mpd and mpt, after clamping
+	double actualUpdate; // update ratio applied, after scaling by cwnd
+	double rate; // new rate in bps
+	uint64_t rtt; // ns
+	double cwnd; // rtt in units of one packet's tx time
+	uint32_t qlen[maxHop]; // per-hop signals
+	uint32_t reserved1;
+
+	void Serialize(FILE *file){
+		fwrite(this, sizeof(CcTraceFormat), 1, file);
+	}
+	int Deserialize(FILE *file){
+		int ret = fread(this, sizeof(CcTraceFormat), 1, file);
+		return ret;
+	}
+};
+
+/*
+ * The binary FLOW_FILE: a FlowFileHeader, then nFlow FlowFormat records in order of start time.
+ */
+struct FlowFileHeader{
+	static const uint32_t MAGIC = 0x574f4c46; // "FLOW"
+	uint32_t magic;
+	uint32_t reserved;
+	uint64_t nFlow;
+};
+
+struct FlowFormat{
+	uint64_t start; // ns
+	uint64_t size; // bytes
+	uint32_t src, dst; // node id
+	uint16_t pg, dport;
+	uint32_t reserved;
+};
+
+/*
+ * The DROP_SUMMARY_FILE, written at the end of the run: for each switch that dropped packets in its
+ * admission control, in order of node id, a DropSummaryHeader, then nCount DropCountFormat records
+ * (one per port, queue and reason with drops) and nSnapshot DropSnapshotFormat records (the last drops
+ * of the switch, oldest first).
+ */
+enum DropReason{
+	DropHeadroom = 0, // the headroom of the ingress queue is full, counted on the ingress port
+	DropEgress = 1, // refused by the egress admission of the MMU policy, counted on the egress port
+	DropReasonCount = 2
+};
+
+struct DropSummaryHeader{
+	static const uint32_t MAGIC = 0x504f5244; // "DROP"
+	uint32_t magic;
+	uint32_t node;
+	uint32_t nCount;
+	uint32_t nSnapshot;
+	uint64_t nDrop; // all the drops of the switch
+};
+
+struct DropCountFormat{
+	uint16_t port;
+	uint8_t qIndex;
+	uint8_t reason;
+	uint32_t reserved;
+	uint64_t packets;
+	uint64_t bytes;
+};
+
+struct DropSnapshotFormat{
+	uint64_t time;
+	uint16_t inPort, outPort;
+	uint8_t qIndex;
+	uint8_t reason;
+	uint16_t reserved0;
+	uint32_t size;
+	uint32_t hdrm, ingress; // hdrm_bytes and ingress_bytes of the ingress queue
+	uint32_t egress; // egress_bytes of the egress queue
+	uint32_t sharedUsed, egressUsed; // of the switch
+	uint32_t threshold; // the PFC threshold of the ingress queue
+	uint32_t reserved1;
+};
+
 static inline const char* EventToStr(enum Event e){
 	switch (e){
 		case Recv:
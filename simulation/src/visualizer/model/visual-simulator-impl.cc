@@ -216,6 +216,12 @@ VisualSimulatorImpl::GetContext (void) const
   return m_simulator->GetContext ();
 }
 
+uint64_t
+VisualSimulatorImpl::GetEventUid (void) const
+{
+  return m_simulator->GetEventUid ();
+}
+
 void
 VisualSimulatorImpl::RunRealSimulator (void)
 {
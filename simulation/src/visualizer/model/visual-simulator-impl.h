@@ -67,6 +67,7 @@ public:
   virtual void SetScheduler (ObjectFactory schedulerFactory);
   virtual uint32_t GetSystemId (void) const; 
   virtual uint32_t GetContext (void) const;
+  virtual uint64_t GetEventUid (void) const;
 
   /// calls Run() in the wrapped simulator
   void RunRealSimulator (void);
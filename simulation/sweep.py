@@ -0,0 +1,105 @@
+"""Run a grid of experiments in parallel.
+
+Every point of the grid cc x poseidon_m x poseidon_min_rate x bw x trace x topo x seed gets
+its own result directory under --out (config, fct/pfc/qlen/trace outputs and stdout), and is
+run by invoking the built scratch/third binary directly, so no waf process is spawned per run.
+With --cache, runs already in the result cache (see result_cache.py) are restored instead of
+simulated.
+
+Example:
+	python sweep.py --cc poseidon hp --poseidon_m 0.1 0.25 --seeds 1 2 3 --trace trace_multi_hop_congestion_small --topo topo_racks --bw 100 -j 8
+"""
+import argparse
+import itertools
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+
+import result_cache
+import run
+
+def run_dir_name(p):
+	return "%s_%s_%s_bw%s_m%s_min%s_s%d"%(p['topo'], p['trace'], p['cc'], p['bw'], p['poseidon_m'], p['poseidon_min_rate'], p['seed'])
+
+def run_one(job):
+	"""Run one grid point. job is (params, base_args, out_root, binary, lib_dir, bin_digest)."""
+	p, base, out_root, binary, lib_dir, bin_digest = job
+	args = argparse.Namespace(**base)
+	for k in ('cc', 'poseidon_m', 'poseidon_min_rate', 'bw', 'trace', 'topo'):
+		setattr(args, k, p[k])
+	out_dir = os.path.join(out_root, run_dir_name(p))
+	if not os.path.isdir(out_dir):
+		os.makedirs(out_dir)
+	config_name, config = run.gen_config(args, out_dir=out_dir, seed=p['seed'])
+	with open(config_name, "w") as f:
+		f.write(config)
+
+	start = time.time()
+	stdout_name = os.path.join(out_dir, "stdout.txt")
+	cache = None
+	if args.cache:
+		cache = result_cache.ResultCache(args.cache, int(args.cache_budget * (1 << 30)))
+		key = cache.key(config, bin_digest)
+		cached = cache.lookup(key, config)
+		if cached is not None:
+			with open(stdout_name, "wb") as out:
+				result_cache.replay_stdout(cached, config, out)
+			return p, out_dir, 0, time.time() - start
+
+	env = dict(os.environ)
+	env['LD_LIBRARY_PATH'] = lib_dir + (':' + env['LD_LIBRARY_PATH'] if env.get('LD_LIBRARY_PATH') else '')
+	with open(stdout_name, "w") as out:
+		ret = subprocess.call([binary, config_name], stdout=out, stderr=subprocess.STDOUT, env=env)
+	if cache is not None and ret == 0:
+		cache.store(key, config, stdout_name)
+	return p, out_dir, ret, time.time() - start
+
+def get_parser():
+	parser = run.get_parser()
+	parser.description = 'run a parameter sweep in parallel'
+	# the swept dimensions accept several values
+	for action in parser._actions:
+		if action.dest in ('cc', 'poseidon_m', 'poseidon_min_rate', 'bw', 'trace', 'topo'):
+			action.nargs = '+'
+			action.default = [action.default]
+	parser.add_argument('--seeds', dest='seeds', action='store', type=int, nargs='+', default=[1], help="RNG seeds; each seed is a separate run")
+	parser.add_argument('-j', '--jobs', dest='jobs', action='store', type=int, default=multiprocessing.cpu_count(), help="number of simulations run at the same time")
+	parser.add_argument('--out', dest='out', action='store', default='sweep', help="root directory of the per-run result directories")
+	parser.add_argument('--binary', dest='binary', action='store', default='build/scratch/third', help="the simulator binary built by waf")
+	parser.add_argument('--lib_dir', dest='lib_dir', action='store', default='build', help="directory of the ns-3 shared libraries")
+	return parser
+
+if __name__ == "__main__":
+	args = get_parser().parse_args()
+	if not os.path.isfile(args.binary):
+		print("cannot find %s, please build first (./waf build)"%args.binary)
+		sys.exit(1)
+
+	base = dict(vars(args))
+	bin_digest = result_cache.binary_digest(args.binary, args.lib_dir) if args.cache else None
+	grid = []
+	for cc, m, min_rate, bw, trace, topo, seed in itertools.product(args.cc, args.poseidon_m, args.poseidon_min_rate, args.bw, args.trace, args.topo, args.seeds):
+		p = dict(cc=cc, poseidon_m=m, poseidon_min_rate=min_rate, bw=bw, trace=trace, topo=topo, seed=seed)
+		grid.append((p, base, args.out, os.path.abspath(args.binary), os.path.abspath(args.lib_dir), bin_digest))
+
+	print("%d runs, %d jobs"%(len(grid), args.jobs))
+	sys.stdout.flush()
+	if not os.path.isdir(args.out):
+		os.makedirs(args.out)
+	pool = multiprocessing.Pool(args.jobs)
+	failed = 0
+	with open(os.path.join(args.out, "summary.txt"), "w") as summary:
+		summary.write("dir\tcc\tposeidon_m\tposeidon_min_rate\tbw\ttrace\ttopo\tseed\treturn\tseconds\n")
+		for p, out_dir, ret, sec in pool.imap_unordered(run_one, grid):
+			if ret != 0:
+				failed += 1
+			print("%s: %s (%.1fs)"%("done" if ret == 0 else "FAILED", out_dir, sec))
+			sys.stdout.flush()
+			summary.write("%s\t%s\t%s\t%s\t%s\t%s\t%s\t%d\t%d\t%.1f\n"%(out_dir, p['cc'], p['poseidon_m'], p['poseidon_min_rate'], p['bw'], p['trace'], p['topo'], p['seed'], ret, sec))
+	pool.close()
+	pool.join()
+	if failed > 0:
+		print("%d runs failed"%failed)
+		sys.exit(1)
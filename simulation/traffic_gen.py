@@ -0,0 +1,234 @@
+"""Generate a FLOW_FILE for scratch/third from a flow-size CDF at a target load.
+
+The hosts and their link rates are read from a TOPOLOGY_FILE. Flow sizes are drawn from a CDF
+(mix/cdf/<name>.txt, or any file of "size(B) cdf(%)" lines), and the arrival rate is set so that
+the hosts' links are loaded at --load on average. Patterns:
+	poisson		random host pairs, Poisson arrivals
+	bursty		random host pairs, Poisson arrivals only in exponential ON periods, at the same average load
+	permutation	each host sends to one other host of a random cyclic permutation, Poisson arrivals
+	incast		Poisson incast events, --fanin random hosts each send a flow to one random host at once
+Everything is generated with NumPy arrays, and the output is either the text format or the binary
+one (FlowFileHeader + FlowFormat records, see src/point-to-point/model/trace-format.h).
+
+Example:
+	python traffic_gen.py --topo mix/topo_racks.txt --cdf web_search --load 0.5 --time 0.1 --out mix/web_50.txt
+	python traffic_gen.py --topo mix/topo_racks.txt --cdf hadoop --flows 10000000 --format binary --out mix/hadoop_10m.bin
+"""
+import argparse
+import os
+import struct
+import sys
+
+import numpy as np
+
+CDF_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mix', 'cdf')
+
+# FlowFileHeader::MAGIC and FlowFormat in trace-format.h
+FLOW_MAGIC = 0x574f4c46
+FLOW = np.dtype([('start', '<u8'), ('size', '<u8'), ('src', '<u4'), ('dst', '<u4'), ('pg', '<u2'), ('dport', '<u2'), ('reserved', '<u4')])
+assert FLOW.itemsize == 32
+
+def parse_rate(s):
+	"""Rate of a topology link, like 100Gbps, in bps."""
+	for unit, mul in (('Gbps', 1e9), ('Mbps', 1e6), ('Kbps', 1e3), ('bps', 1)):
+		if s.endswith(unit):
+			return float(s[:-len(unit)]) * mul
+	return float(s)
+
+def read_topology(path):
+	"""Return (host ids, link rate of each host in bps) of a TOPOLOGY_FILE."""
+	with open(path) as f:
+		node_num, switch_num, link_num = [int(x) for x in f.readline().split()]
+		switches = set(int(x) for x in f.readline().split())
+		bw = np.zeros(node_num)
+		for i in range(link_num):
+			fields = f.readline().split()
+			a, b, rate = int(fields[0]), int(fields[1]), parse_rate(fields[2])
+			bw[a] += rate
+			bw[b] += rate
+	hosts = np.array([i for i in range(node_num) if i not in switches], dtype=np.uint32)
+	return hosts, bw[hosts]
+
+def load_cdf(name):
+	"""Return (sizes, cdf in %) of a CDF, given by its name under mix/cdf or by path."""
+	path = name if os.path.isfile(name) else os.path.join(CDF_DIR, name + '.txt')
+	sizes, cdf = [], []
+	with open(path) as f:
+		for line in f:
+			fields = line.split()
+			if len(fields) < 2 or fields[0].startswith('#'):
+				continue
+			sizes.append(float(fields[0]))
+			cdf.append(float(fields[1]))
+	sizes, cdf = np.array(sizes), np.array(cdf)
+	assert cdf[0] == 0 and cdf[-1] == 100 and np.all(np.diff(cdf) >= 0), "a CDF goes from 0 to 100"
+	return sizes, cdf
+
+def mean_size(sizes, cdf):
+	"""Mean of the CDF, interpolating linearly between its points (as sample_sizes does)."""
+	return np.sum(np.diff(cdf) / 100. * (sizes[1:] + sizes[:-1]) / 2)
+
+def sample_sizes(rng, sizes, cdf, n):
+	return np.maximum(np.round(np.interp(rng.uniform(0, 100, n), cdf, sizes)), 1).astype(np.uint64)
+
+def poisson_arrivals(rng, rate, n = 0, duration = 0.):
+	"""Arrival times (s) of a Poisson process of rate (1/s): exactly n of them, or all within duration."""
+	if n > 0:
+		return np.cumsum(rng.exponential(1. / rate, n))
+	res = []
+	t = 0.
+	while t <= duration:
+		m = int(rate * (duration - t) + 5 * np.sqrt(rate * (duration - t)) + 16)
+		a = t + np.cumsum(rng.exponential(1. / rate, m))
+		res.append(a)
+		t = a[-1]
+	res = np.concatenate(res)
+	return res[res <= duration]
+
+def bursty_arrivals(rng, rate, on, off, n = 0, duration = 0.):
+	"""Like poisson_arrivals, but arrivals only happen in ON periods (mean on s), separated by OFF
+	periods (mean off s). The rate in ON periods is raised so that the average rate is kept."""
+	active = poisson_arrivals(rng, rate * (on + off) / on, n, duration)
+	# the ON periods covering the active time, and the OFF time before each of them
+	ons, t = [], 0.
+	last = active[-1] if len(active) > 0 else 0.
+	while t <= last:
+		d = rng.exponential(on, int((last - t) / on) + 16)
+		ons.append(d)
+		t += d.sum()
+	ons = np.cumsum(np.concatenate(ons))
+	off_before = np.concatenate([[0.], np.cumsum(rng.exponential(off, len(ons) - 1))])
+	res = active + off_before[np.searchsorted(ons, active, side = 'right')]
+	return res if n > 0 else res[res <= duration]
+
+def random_pairs(rng, hosts, n):
+	src = rng.randint(0, len(hosts), n)
+	dst = (src + rng.randint(1, len(hosts), n)) % len(hosts)
+	return hosts[src], hosts[dst]
+
+def gen_flows(args, rng, hosts, bw):
+	"""Return the flows as a FLOW array in order of start time."""
+	sizes, cdf = load_cdf(args.cdf)
+	avg = mean_size(sizes, cdf)
+	# bytes per second that loads all host links at args.load
+	Bps = args.load * bw.sum() / 8
+	if args.pattern == 'incast':
+		per_event = args.fanin * (args.incast_size if args.incast_size > 0 else avg)
+		events = poisson_arrivals(rng, Bps / per_event, (args.flows + args.fanin - 1) // args.fanin, args.time)
+		n = len(events) * args.fanin
+		t = np.repeat(events, args.fanin)
+		dst = rng.randint(0, len(hosts), len(events))
+		# fanin distinct senders per event, other than the receiver
+		src = np.empty((len(events), args.fanin), dtype=np.int64)
+		chunk = max(1, (1 << 22) // len(hosts))
+		for i in range(0, len(events), chunk):
+			r = rng.rand(min(chunk, len(events) - i), len(hosts) - 1)
+			src[i:i + chunk] = np.argpartition(r, args.fanin - 1, axis = 1)[:, :args.fanin]
+		src = (src + dst[:, None] + 1) % len(hosts)
+		src, dst = hosts[src.reshape(-1)], hosts[np.repeat(dst, args.fanin)]
+		if args.incast_size > 0:
+			size = np.full(n, args.incast_size, dtype=np.uint64)
+		else:
+			size = sample_sizes(rng, sizes, cdf, n)
+		if args.flows > 0:
+			t, src, dst, size = t[:args.flows], src[:args.flows], dst[:args.flows], size[:args.flows]
+	else:
+		rate = Bps / avg
+		if args.pattern == 'bursty':
+			t = bursty_arrivals(rng, rate, args.burst_on, args.burst_off, args.flows, args.time)
+		else:
+			t = poisson_arrivals(rng, rate, args.flows, args.time)
+		n = len(t)
+		if args.pattern == 'permutation':
+			# a random cyclic permutation, so no host sends to itself
+			order = rng.permutation(len(hosts))
+			partner = np.empty(len(hosts), dtype=np.int64)
+			partner[order] = np.roll(order, -1)
+			s = rng.randint(0, len(hosts), n)
+			src, dst = hosts[s], hosts[partner[s]]
+		else:
+			src, dst = random_pairs(rng, hosts, n)
+		size = sample_sizes(rng, sizes, cdf, n)
+	flows = np.zeros(len(t), dtype=FLOW)
+	flows['start'] = np.uint64(int(round(args.start * 1e9))) + np.round(t * 1e9).astype(np.uint64)
+	flows['size'] = size
+	flows['src'] = src
+	flows['dst'] = dst
+	flows['pg'] = args.pg
+	flows['dport'] = args.dport
+	return flows
+
+def _digits(v, width, blank = True):
+	"""The integers v as ASCII, right aligned in width columns, as an (len(v), width) uint8 array.
+	Leading zeros are blanks, unless blank is False."""
+	v = v.astype(np.uint64)
+	ten = np.uint64(10)
+	res = np.empty((len(v), width), dtype=np.uint8)
+	for i in range(width - 1, -1, -1):
+		res[:, i] = v % ten + np.uint64(48)
+		v = v // ten
+	if blank and width > 1:
+		lead = np.cumprod(res[:, :-1] == 48, axis = 1).astype(bool)
+		res[:, :-1][lead] = 32
+	return res
+
+def _char(c, n):
+	return np.full((n, 1), ord(c), dtype=np.uint8)
+
+def write_text(path, flows, chunk = 1 << 20):
+	"""Write the text FLOW_FILE: "src dst pg dport size start(s)" per line. Columns are padded with
+	blanks to a fixed width, so lines are formatted for all flows at once."""
+	ns = np.uint64(1000000000)
+	cols = [flows['src'], flows['dst'], flows['pg'], flows['dport'], flows['size'], flows['start'] // ns]
+	widths = [len(str(int(c.max()))) if len(c) > 0 else 1 for c in cols]
+	with open(path, 'wb') as f:
+		f.write(('%d\n'%len(flows)).encode())
+		for i in range(0, len(flows), chunk):
+			m = min(chunk, len(flows) - i)
+			parts = []
+			for c, w in zip(cols, widths):
+				parts += [_digits(c[i:i + m], w), _char(' ', m)]
+			parts[-1] = _char('.', m)
+			parts += [_digits(flows['start'][i:i + m] % ns, 9, False), _char('\n', m)]
+			f.write(np.hstack(parts).tobytes())
+
+def write_binary(path, flows):
+	with open(path, 'wb') as f:
+		f.write(struct.pack('<IIQ', FLOW_MAGIC, 0, len(flows)))
+		f.write(flows.tobytes())
+
+def get_parser():
+	parser = argparse.ArgumentParser(description='generate a flow file')
+	parser.add_argument('--topo', dest='topo', action='store', default='mix/topo_racks.txt', help="the topology file")
+	parser.add_argument('--pattern', dest='pattern', action='store', default='poisson', choices=['poisson', 'bursty', 'permutation', 'incast'], help="traffic pattern")
+	parser.add_argument('--cdf', dest='cdf', action='store', default='web_search', help="flow size CDF, a name under mix/cdf (web_search/hadoop/storage) or a path")
+	parser.add_argument('--load', dest='load', action='store', type=float, default=0.3, help="average load of the host links, in (0, 1]")
+	parser.add_argument('--time', dest='time', action='store', type=float, default=0.1, help="duration of the arrivals in s, when --flows is 0")
+	parser.add_argument('--flows', dest='flows', action='store', type=int, default=0, help="number of flows; 0 means all flows within --time")
+	parser.add_argument('--start', dest='start', action='store', type=float, default=2.0, help="time of the first arrival in s")
+	parser.add_argument('--burst_on', dest='burst_on', action='store', type=float, default=0.0001, help="bursty: mean ON period in s")
+	parser.add_argument('--burst_off', dest='burst_off', action='store', type=float, default=0.0009, help="bursty: mean OFF period in s")
+	parser.add_argument('--fanin', dest='fanin', action='store', type=int, default=16, help="incast: senders per event")
+	parser.add_argument('--incast_size', dest='incast_size', action='store', type=int, default=0, help="incast: bytes per sender; 0 means drawn from --cdf")
+	parser.add_argument('--pg', dest='pg', action='store', type=int, default=3, help="priority group of the flows")
+	parser.add_argument('--dport', dest='dport', action='store', type=int, default=100, help="destination port of the flows")
+	parser.add_argument('--seed', dest='seed', action='store', type=int, default=1, help="random seed")
+	parser.add_argument('--format', dest='format', action='store', default='text', choices=['text', 'binary'], help="output format")
+	parser.add_argument('--out', dest='out', action='store', default='mix/flow_gen.txt', help="output flow file")
+	return parser
+
+if __name__ == "__main__":
+	args = get_parser().parse_args()
+	hosts, bw = read_topology(args.topo)
+	if args.pattern == 'incast' and not 0 < args.fanin < len(hosts):
+		print("--fanin must be in [1, %d]"%(len(hosts) - 1))
+		sys.exit(1)
+	flows = gen_flows(args, np.random.RandomState(args.seed), hosts, bw)
+	if args.format == 'binary':
+		write_binary(args.out, flows)
+	else:
+		write_text(args.out, flows)
+	if len(flows) > 0:
+		span = (flows['start'][-1] - flows['start'][0]) / 1e9
+		load = flows['size'].sum() * 8 / (bw.sum() * span) if span > 0 else float('inf')
+		print("%d flows in %.6fs, %d hosts, offered load %.3f"%(len(flows), span, len(hosts), load))
@@ -0,0 +1,267 @@
+/* -*- Mode:C++; c-file-style:"gnu"; indent-tabs-mode:nil; -*- */
+/*
+ * This program is free software; you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License version 2 as
+ * published by the Free Software Foundation;
+ *
+ * This program is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ * GNU General Public License for more details.
+ *
+ * You should have received a copy of the GNU General Public License
+ * along with this program; if not, write to the Free Software
+ * Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+ */
+
+/*
+ * Benchmark of PINT's encoding and of the switches' approximate calc of
+ * the utilization (Pint::encode and Pint::next_u) against the original
+ * ones, which take log and pow of doubles and draw from rand() per packet.
+ * The accuracy is the error of the decoded powers and of the utilizations
+ * of a random packet sequence of a port, against the exact values; the
+ * throughput is the time per call of each implementation.
+ */
+
+#include <cmath>
+#include <cstdlib>
+#include <iostream>
+#include <vector>
+
+#include "ns3/core-module.h"
+#include "ns3/data-rate.h"
+#include "ns3/pint.h"
+#include "ns3/fast-rng.h"
+
+using namespace ns3;
+
+/*
+ * The original implementation
+ */
+static uint16_t
+RefEncodeU (double u)
+{
+  uint32_t u_toInt = ceil (u * Pint::max_concurrent);
+  if (u_toInt == 0)
+    {
+      u_toInt = 1;
+    }
+  double power = log (u_toInt) * Pint::log_factor;
+  uint16_t p_upper = ceil (power), p_lower = floor (power);
+  double upper = pow (Pint::log_base, p_upper), lower = pow (Pint::log_base, p_lower);
+  if (p_upper == p_lower)
+    {
+      upper *= Pint::log_base;
+    }
+  return (rand () % 65536 < (u_toInt - lower) / (upper - lower) * 65536) ? p_upper : p_lower;
+}
+
+static int
+RefLog2Apprx (int x)
+{
+  int x0 = x;
+  int msb = int (log2 (x)) + 1;
+  if (msb > 16)
+    {
+      x = (x >> (msb - 16) << (msb - 16));
+      int mask = (1 << (msb - 16)) - 1;
+      if ((x0 & mask) > (rand () & mask))
+        {
+          x += 1 << (msb - 16);
+        }
+    }
+  return int (log2 (x) * (1 << 15));
+}
+
+static double
+RefNextU (double u, uint64_t dt, uint64_t qlen, uint32_t bytes, uint64_t T, uint64_t B)
+{
+  double fct = 1 << 15;
+  double log_T = log2 (T) * fct;
+  double log_B = log2 (B) * fct;
+  double log_1e9 = log2 (1e9) * fct;
+  double qterm = 0, byteTerm = 0, uTerm = 0;
+  if ((qlen >> 8) > 0)
+    {
+      int log_dt = RefLog2Apprx (dt);
+      int log_qlen = RefLog2Apprx (qlen >> 8);
+      qterm = pow (2, (log_dt + log_qlen + log_1e9 - log_B - 2 * log_T) / fct) * 256;
+    }
+  if (bytes > 0)
+    {
+      int log_byte = RefLog2Apprx (bytes);
+      byteTerm = pow (2, (log_byte + log_1e9 - log_B - log_T) / fct);
+    }
+  if (T > dt && u > 0)
+    {
+      int log_T_dt = RefLog2Apprx (T - dt);
+      int log_u = RefLog2Apprx (int (round (u * 8192)));
+      uTerm = pow (2, (log_T_dt + log_u - log_T) / fct) / 8192;
+    }
+  return qterm + byteTerm + uTerm;
+}
+
+// the EWMA of the utilization, which the approximate calc computes in the log domain
+static double
+ExactNextU (double u, uint64_t dt, uint64_t qlen, uint32_t bytes, uint64_t T, uint64_t B)
+{
+  return double (dt) * qlen * 1e9 / (double (B) * T * T) + bytes * 1e9 / (double (B) * T) + double (T - dt) * u / T;
+}
+
+struct Sample
+{
+  uint64_t dt;
+  uint64_t qlen;
+  uint32_t bytes;
+};
+
+struct ErrorStat
+{
+  double sum, sumAbs, max;
+  uint64_t n;
+  ErrorStat () : sum (0), sumAbs (0), max (0), n (0) {}
+  void Add (double e)
+  {
+    sum += e;
+    sumAbs += std::fabs (e);
+    max = std::max (max, std::fabs (e));
+    n++;
+  }
+  void Print (const char *name) const
+  {
+    std::cout << name << "\tmean " << sum / n << "\tmean abs " << sumAbs / n << "\tmax abs " << max << std::endl;
+  }
+};
+
+int main (int argc, char *argv[])
+{
+  uint32_t n = 10000000;
+  double base = 1.05;
+  double maxU = 4;
+  uint32_t T = 9000;
+  std::string rate = "100Gbps";
+  uint32_t payload = 1000;
+
+  CommandLine cmd;
+  cmd.Usage ("Benchmark PINT's encoding and utilization calc against the original ones.\n"
+             "\n"
+             "The relative errors are of the decoded powers against ceil(u * 512) / 512,\n"
+             "and of the utilizations of a port against the exact EWMA.");
+  cmd.AddValue ("n",       "number of calls timed of each function (default 1E7)", n);
+  cmd.AddValue ("base",    "PINT_LOG_BASE (default 1.05)",                   base);
+  cmd.AddValue ("maxu",    "the encoded utilizations are in [0, maxu] (default 4)", maxU);
+  cmd.AddValue ("T",       "MaxRtt of the switch in ns (default 9000)",      T);
+  cmd.AddValue ("rate",    "link rate of the port (default 100Gbps)",         rate);
+  cmd.AddValue ("payload", "bytes of the packets of the port (default 1000)", payload);
+  cmd.Parse (argc, argv);
+
+  Pint::set_log_base (base);
+  FastRng rng;
+  srand (1);
+  uint64_t B = DataRate (rate).GetBitRate () / 8;
+  int32_t logT = (int32_t) round (log2 (T) * (1 << Pint::log_shift));
+  int32_t logB = (int32_t) round (log2 (B) * (1 << Pint::log_shift));
+
+  /*
+   * Accuracy of the encoding: the error of the decoded powers, whose mean
+   * is the bias of the random rounding
+   */
+  std::vector<double> us (1 << 20);
+  for (uint32_t i = 0; i < us.size (); i++)
+    {
+      us[i] = rng.NextDouble () * maxU;
+    }
+  ErrorStat encRef, encNew;
+  for (uint32_t i = 0; i < us.size (); i++)
+    {
+      double u = std::max (ceil (us[i] * Pint::max_concurrent), 1.) / Pint::max_concurrent;
+      encRef.Add (Pint::decode_u (RefEncodeU (us[i])) / u - 1);
+      encNew.Add (Pint::decode_u (Pint::encode_u (us[i], rng)) / u - 1);
+    }
+  std::cout << "encode: relative error of the decoded u over " << us.size () << " u in [0, " << maxU << "]" << std::endl;
+  encRef.Print ("  original");
+  encNew.Print ("  tables");
+
+  /*
+   * Accuracy of the calc: the utilizations of a port that sends a packet of
+   * payload bytes every dt, with a random walk of its queue
+   */
+  std::vector<Sample> samples (1 << 20);
+  double txTime = (payload + 48) * 1e9 / B; // ns, with the headers
+  uint64_t qlen = 0;
+  for (uint32_t i = 0; i < samples.size (); i++)
+    {
+      samples[i].dt = std::min ((uint64_t) (rng.NextDouble () * 2 * txTime), (uint64_t) T);
+      int64_t step = (int64_t) (rng.Next32 () % 3) - 1;
+      if (step < 0 && qlen >= payload)
+        {
+          qlen -= payload;
+        }
+      else if (step > 0 && qlen < 1000000)
+        {
+          qlen += payload;
+        }
+      samples[i].qlen = qlen;
+      samples[i].bytes = payload + 48;
+    }
+  ErrorStat calcRef, calcNew;
+  double uRef = 0, uExactRef = 0, uExactNew = 0;
+  uint32_t uNew = 0;
+  for (uint32_t i = 0; i < samples.size (); i++)
+    {
+      const Sample &s = samples[i];
+      uExactRef = ExactNextU (uRef, s.dt, s.qlen, s.bytes, T, B);
+      uExactNew = ExactNextU (uNew / 65536., s.dt, s.qlen, s.bytes, T, B);
+      uRef = RefNextU (uRef, s.dt, s.qlen, s.bytes, T, B);
+      uNew = Pint::next_u (uNew, s.dt, s.qlen, s.bytes, T, logT, logB, rng);
+      calcRef.Add (uRef / uExactRef - 1);
+      calcNew.Add (uNew / 65536. / uExactNew - 1);
+    }
+  std::cout << "next_u: relative error of a step over " << samples.size () << " packets, last utilization "
+            << uNew / 65536. << std::endl;
+  calcRef.Print ("  original");
+  calcNew.Print ("  fixed point");
+
+  /*
+   * Throughput
+   */
+  SystemWallClockMs clock;
+  uint64_t sink = 0;
+  uint32_t mask = us.size () - 1;
+  clock.Start ();
+  for (uint32_t i = 0; i < n; i++)
+    {
+      sink += RefEncodeU (us[i & mask]);
+    }
+  double encRefNs = clock.End () * 1e6 / n;
+  clock.Start ();
+  for (uint32_t i = 0; i < n; i++)
+    {
+      sink += Pint::encode_u (us[i & mask], rng);
+    }
+  double encNewNs = clock.End () * 1e6 / n;
+
+  clock.Start ();
+  double u = 0;
+  for (uint32_t i = 0; i < n; i++)
+    {
+      const Sample &s = samples[i & mask];
+      u = RefNextU (u, s.dt, s.qlen, s.bytes, T, B);
+      sink += RefEncodeU (u);
+    }
+  double calcRefNs = clock.End () * 1e6 / n;
+  clock.Start ();
+  uint32_t u16 = 0;
+  for (uint32_t i = 0; i < n; i++)
+    {
+      const Sample &s = samples[i & mask];
+      u16 = Pint::next_u (u16, s.dt, s.qlen, s.bytes, T, logT, logB, rng);
+      sink += Pint::encode (std::max ((uint32_t) (((uint64_t) u16 * Pint::max_concurrent + 65535) >> 16), 1u), rng);
+    }
+  double calcNewNs = clock.End () * 1e6 / n;
+
+  std::cout << "encode_u: original " << encRefNs << " ns, tables " << encNewNs << " ns" << std::endl;
+  std::cout << "next_u and encode: original " << calcRefNs << " ns, fixed point " << calcNewNs << " ns" << std::endl;
+  std::cout << "(" << sink << ")" << std::endl;
+  return 0;
+}
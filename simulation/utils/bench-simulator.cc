@@ -22,6 +22,8 @@
 #include <iostream>
 #include <fstream>
 #include <vector>
+#include <stdio.h>
+#include <stdlib.h>
 #include <string.h>
 
 #include "ns3/core-module.h"
@@ -124,6 +126,91 @@ Bench::Cb (void)
 }
 
 
+/*
+ * Replay of an event trace recorded by scratch/third (EVENT_TRACE_FILE):
+ * one uint64_t per scheduler operation, the timestamp (ns) of an inserted
+ * event, or REMOVE_NEXT when the next event is taken out to run. The
+ * operations are applied to a scheduler directly, with an allocated (and,
+ * when run, freed) event per insertion as in a simulation, so the events
+ * and their order are exactly those of the recorded run.
+ */
+const uint64_t REMOVE_NEXT = ~(uint64_t)0;
+
+class ReplayEvent : public EventImpl
+{
+protected:
+  virtual void Notify (void) {}
+};
+
+std::vector<uint64_t>
+ReadTrace (std::string filename)
+{
+  std::vector<uint64_t> ops;
+  FILE *f = fopen (filename.c_str (), "rb");
+  if (f == 0)
+    {
+      LOGME ("cannot open " << filename);
+      exit (1);
+    }
+  uint64_t buf[4096];
+  size_t n;
+  while ((n = fread (buf, sizeof (uint64_t), 4096, f)) > 0)
+    {
+      ops.insert (ops.end (), buf, buf + n);
+    }
+  fclose (f);
+  LOGME ("found " << ops.size () << " operations in " << filename);
+  return ops;
+}
+
+void
+ReplayTrace (const std::vector<uint64_t> &ops, ObjectFactory factory)
+{
+  Ptr<Scheduler> sched = factory.Create<Scheduler> ();
+  SystemWallClockMs time;
+  uint32_t uid = 0;
+  uint64_t inserted = 0, maxPending = 0, pending = 0;
+
+  time.Start ();
+  for (uint64_t i = 0; i < ops.size (); i++)
+    {
+      if (ops[i] == REMOVE_NEXT)
+        {
+          Scheduler::Event ev = sched->RemoveNext ();
+          ev.impl->Invoke ();
+          ev.impl->Unref ();
+          pending--;
+        }
+      else
+        {
+          Scheduler::Event ev;
+          ev.impl = new ReplayEvent ();
+          ev.key.m_ts = ops[i];
+          ev.key.m_uid = uid++;
+          ev.key.m_context = 0;
+          sched->Insert (ev);
+          inserted++;
+          if (++pending > maxPending)
+            {
+              maxPending = pending;
+            }
+        }
+    }
+  // like Simulator::Destroy, drain the events left at the end
+  while (!sched->IsEmpty ())
+    {
+      Scheduler::Event ev = sched->RemoveNext ();
+      ev.impl->Unref ();
+    }
+  double simu = time.End () / 1000.;
+
+  LOG (std::left << std::setw (2 * g_fwidth) << factory.GetTypeId ().GetName () <<
+       std::setw (g_fwidth) << simu <<
+       std::setw (g_fwidth) << (inserted / simu) <<
+       std::setw (g_fwidth) << (simu / inserted * 1e9) <<
+       std::setw (g_fwidth) << maxPending);
+}
+
 Ptr<RandomVariableStream>
 GetRandomStream (std::string filename)
 {
@@ -186,11 +273,15 @@ int main (int argc, char *argv[])
   bool schedHeap = false;
   bool schedList = false;
   bool schedMap  = true;
+  bool schedQuad = false;
+  bool schedAll  = false;
+  bool pool      = false;
 
   uint32_t pop   =  100000;
   uint32_t total = 1000000;
   uint32_t runs  =       1;
   std::string filename = "";
+  std::string tracename = "";
   
   CommandLine cmd;
   cmd.Usage ("Benchmark the simulator scheduler.\n"
@@ -200,16 +291,23 @@ int main (int argc, char *argv[])
              "  an ascii file, given by the --file=\"<filename>\" argument,\n"
              "  or standard input, by the argument --file=\"-\"\n"
              "In the case of either --file form, the input is expected\n"
-             "to be ascii, giving the relative event times in ns.");
+             "to be ascii, giving the relative event times in ns.\n"
+             "\n"
+             "With --trace=\"<filename>\", the scheduler operations of a\n"
+             "run of scratch/third (EVENT_TRACE_FILE) are replayed instead.");
   cmd.AddValue ("cal",   "use CalendarSheduler",          schedCal);
   cmd.AddValue ("heap",  "use HeapScheduler",             schedHeap);
   cmd.AddValue ("list",  "use ListSheduler",              schedList);
   cmd.AddValue ("map",   "use MapScheduler (default)",    schedMap);
+  cmd.AddValue ("quad",  "use QuadHeapScheduler",         schedQuad);
+  cmd.AddValue ("all",   "with --trace, replay on the map, heap, calendar and quad heap schedulers", schedAll);
+  cmd.AddValue ("pool",  "recycle events (EventImpl::SetPoolEnabled)", pool);
   cmd.AddValue ("debug", "enable debugging output",       g_debug);
   cmd.AddValue ("pop",   "event population size (default 1E5)",         pop);
   cmd.AddValue ("total", "total number of events to run (default 1E6)", total);
   cmd.AddValue ("runs",  "number of runs (default 1)",    runs);
   cmd.AddValue ("file",  "file of relative event times",  filename);
+  cmd.AddValue ("trace", "event trace recorded by scratch/third", tracename);
   cmd.AddValue ("prec",  "printed output precision",      g_fwidth);
   cmd.Parse (argc, argv);
   g_me = cmd.GetName () + ": ";
@@ -219,6 +317,43 @@ int main (int argc, char *argv[])
   if (schedCal)  { factory.SetTypeId ("ns3::CalendarScheduler"); }
   if (schedHeap) { factory.SetTypeId ("ns3::HeapScheduler");     }
   if (schedList) { factory.SetTypeId ("ns3::ListScheduler");     }  
+  if (schedQuad) { factory.SetTypeId ("ns3::QuadHeapScheduler"); }
+  EventImpl::SetPoolEnabled (pool);
+
+  if (tracename != "")
+    {
+      std::vector<uint64_t> ops = ReadTrace (tracename);
+      LOGME ("event pool: " << (pool ? "on" : "off"));
+      LOG ("");
+      LOG (std::left << std::setw (2 * g_fwidth) << "Scheduler" <<
+           std::setw (g_fwidth) << "Time (s)" <<
+           std::setw (g_fwidth) << "Rate (ev/s)" <<
+           std::setw (g_fwidth) << "Per (ns/ev)" <<
+           std::setw (g_fwidth) << "Max pending");
+      std::vector<std::string> types;
+      if (schedAll)
+        {
+          types.push_back ("ns3::MapScheduler");
+          types.push_back ("ns3::HeapScheduler");
+          types.push_back ("ns3::CalendarScheduler");
+          types.push_back ("ns3::QuadHeapScheduler");
+        }
+      else
+        {
+          types.push_back (factory.GetTypeId ().GetName ());
+        }
+      for (uint32_t i = 0; i < types.size (); i++)
+        {
+          factory.SetTypeId (types[i]);
+          for (uint32_t j = 0; j < runs; j++)
+            {
+              ReplayTrace (ops, factory);
+            }
+        }
+      LOG ("");
+      return 0;
+    }
+
   Simulator::SetScheduler (factory);
 
   LOGME (std::setprecision (g_fwidth - 6));
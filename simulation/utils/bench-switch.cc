@@ -0,0 +1,221 @@
+/* -*- Mode:C++; c-file-style:"gnu"; indent-tabs-mode:nil; -*- */
+/*
+ * This program is free software; you can redistribute it and/or modify
+ * it under the terms of the GNU General Public License version 2 as
+ * published by the Free Software Foundation;
+ *
+ * This program is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ * GNU General Public License for more details.
+ *
+ * You should have received a copy of the GNU General Public License
+ * along with this program; if not, write to the Free Software
+ * Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+ */
+
+/*
+ * Benchmark of the switch forwarding path: data packets built like the
+ * ones of RdmaHw::GetNxtPacket arrive on the input ports of one SwitchNode
+ * and all leave through the same output port, so they go through the
+ * ingress/egress admission, the egress queue, SwitchNotifyDequeue (ECN
+ * marking and INT) and the channel to a sink switch, which drops them.
+ * The result is the wall-clock time per forwarded packet.
+ */
+
+#include <iostream>
+#include <vector>
+
+#include "ns3/core-module.h"
+#include "ns3/network-module.h"
+#include "ns3/internet-module.h"
+#include "ns3/point-to-point-module.h"
+#include "ns3/qbb-helper.h"
+#include "ns3/switch-node.h"
+#include "ns3/int-header.h"
+#include "ns3/seq-ts-header.h"
+#include "ns3/udp-header.h"
+#include "ns3/ppp-header.h"
+
+using namespace ns3;
+
+static std::vector<std::vector<uint8_t> > g_templates; // serialized packet of each input port
+static std::vector<Ptr<QbbNetDevice> > g_inDevs;
+static Time g_interval;
+static uint32_t g_left;
+static uint64_t g_forwarded = 0;
+static uint64_t g_marked = 0;
+
+static std::vector<uint8_t>
+MakeTemplate (uint32_t payload, Ipv4Address sip, Ipv4Address dip, uint16_t sport)
+{
+  Ptr<Packet> p = Create<Packet> (payload);
+  SeqTsHeader seqTs;
+  seqTs.SetSeq (0);
+  seqTs.SetPG (3);
+  p->AddHeader (seqTs);
+  UdpHeader udpHeader;
+  udpHeader.SetDestinationPort (100);
+  udpHeader.SetSourcePort (sport);
+  p->AddHeader (udpHeader);
+  Ipv4Header ipHeader;
+  ipHeader.SetSource (sip);
+  ipHeader.SetDestination (dip);
+  ipHeader.SetProtocol (0x11);
+  ipHeader.SetPayloadSize (p->GetSize ());
+  ipHeader.SetTtl (64);
+  ipHeader.SetTos (0);
+  ipHeader.SetIdentification (0);
+  p->AddHeader (ipHeader);
+  PppHeader ppp;
+  ppp.SetProtocol (0x0021);
+  p->AddHeader (ppp);
+  std::vector<uint8_t> bytes (p->GetSize ());
+  p->CopyData (&bytes[0], bytes.size ());
+  return bytes;
+}
+
+static void
+Inject (uint32_t port)
+{
+  if (g_left == 0)
+    {
+      return;
+    }
+  g_left--;
+  // a new buffer for each packet, INT and ECN are written in place on the way out
+  Ptr<Packet> p = Create<Packet> (&g_templates[port][0], g_templates[port].size ());
+  g_inDevs[port]->Receive (p);
+  Simulator::Schedule (g_interval, &Inject, port);
+}
+
+static void
+CountTx (Ptr<const Packet> p)
+{
+  g_forwarded++;
+  if ((p->GetBuffer ()[PppHeader::GetStaticSize () + 1] & 0x03) == 0x03)
+    {
+      g_marked++;
+    }
+}
+
+int main (int argc, char *argv[])
+{
+  uint32_t ports = 4;
+  uint32_t total = 1000000;
+  uint32_t ccMode = 3;
+  uint32_t payload = 1000;
+  bool ecn = true;
+  bool pool = false;
+  double load = 1.0;
+  std::string rate = "100Gbps";
+  std::string mmu = "dt";
+
+  CommandLine cmd;
+  cmd.Usage ("Benchmark the switch forwarding path.\n"
+             "\n"
+             "--ports input ports send data packets to one output port,\n"
+             "together at --load times its line rate. The time per\n"
+             "forwarded packet includes building and receiving the packet.");
+  cmd.AddValue ("ports",   "number of input ports (default 4)",          ports);
+  cmd.AddValue ("total",   "number of packets sent (default 1E6)",       total);
+  cmd.AddValue ("cc",      "CC_MODE of the switch: 3 and 11 push INT hops, 10 PINT (default 3)", ccMode);
+  cmd.AddValue ("ecn",     "enable ECN marking, with KMIN = KMAX = 0 every queued packet is marked", ecn);
+  cmd.AddValue ("load",    "offered load of the output port (default 1)", load);
+  cmd.AddValue ("payload", "payload bytes of a packet (default 1000)",   payload);
+  cmd.AddValue ("rate",    "link rate (default 100Gbps)",                rate);
+  cmd.AddValue ("pool",    "recycle packets (Packet::SetPoolEnabled)",   pool);
+  cmd.AddValue ("mmu",     "MMU_POLICY of the switch: dt, static, egress or abm (default dt)", mmu);
+  cmd.Parse (argc, argv);
+  Packet::SetPoolEnabled (pool);
+  if (SwitchMmuPolicy::Get (mmu) == 0)
+    {
+      std::cerr << "unknown MMU policy " << mmu << std::endl;
+      return 1;
+    }
+
+  if (ccMode == 3 || ccMode == 11)
+    {
+      IntHeader::mode = IntHeader::NORMAL;
+    }
+  else if (ccMode == 10)
+    {
+      IntHeader::mode = IntHeader::PINT;
+      Pint::set_log_base (1.05);
+      IntHeader::pint_bytes = Pint::get_n_bytes ();
+    }
+  else
+    {
+      IntHeader::mode = IntHeader::NONE;
+    }
+
+  NodeContainer n;
+  Ptr<SwitchNode> sw = CreateObject<SwitchNode> ();
+  sw->SetAttribute ("EcnEnabled", BooleanValue (ecn));
+  sw->SetAttribute ("CcMode", UintegerValue (ccMode));
+  n.Add (sw);
+  Ptr<SwitchNode> sink = CreateObject<SwitchNode> ();
+  n.Add (sink);
+  NodeContainer feeders;
+  for (uint32_t i = 0; i < ports; i++)
+    {
+      feeders.Add (CreateObject<SwitchNode> ());
+    }
+  n.Add (feeders);
+  InternetStackHelper internet;
+  internet.Install (n);
+
+  QbbHelper qbb;
+  qbb.SetDeviceAttribute ("DataRate", StringValue (rate));
+  qbb.SetChannelAttribute ("Delay", StringValue ("1us"));
+  Ipv4AddressHelper ipv4;
+  ipv4.SetBase ("10.0.0.0", "255.255.255.0");
+  NetDeviceContainer out = qbb.Install (sw, sink);
+  ipv4.Assign (out);
+  for (uint32_t i = 0; i < ports; i++)
+    {
+      NetDeviceContainer d = qbb.Install (feeders.Get (i), sw);
+      ipv4.NewNetwork ();
+      ipv4.Assign (d);
+      g_inDevs.push_back (DynamicCast<QbbNetDevice> (d.Get (1)));
+    }
+
+  Ipv4Address dip ("11.0.0.1");
+  sw->AddTableEntry (dip, DynamicCast<QbbNetDevice> (out.Get (0))->GetIfIndex ());
+  sw->ConfigNPort (sw->GetNDevices () - 1);
+  for (uint32_t j = 1; j < sw->GetNDevices (); j++)
+    {
+      sw->m_mmu->ConfigEcn (j, 0, 0, 1.0);
+      sw->m_mmu->ConfigHdrm (j, 100000);
+      sw->m_mmu->pfc_a_shift[j] = 3;
+    }
+  sw->m_mmu->ConfigBufferSize (32 * 1024 * 1024);
+  sw->m_mmu->ConfigPolicy (SwitchMmuPolicy::Get (mmu));
+  sw->m_mmu->ConfigEgressPool (32 * 1024 * 1024);
+  out.Get (0)->TraceConnectWithoutContext ("PhyTxBegin", MakeCallback (&CountTx));
+
+  for (uint32_t i = 0; i < ports; i++)
+    {
+      g_templates.push_back (MakeTemplate (payload, Ipv4Address (0x0b000101 + i), dip, 10000 + i));
+    }
+  DataRate bps (rate);
+  g_interval = Seconds (bps.CalculateTxTime (g_templates[0].size ()) * ports / load);
+  g_left = total;
+  for (uint32_t i = 0; i < ports; i++)
+    {
+      // the ports send at the same time, so the output queue holds up to ports - 1 packets
+      Simulator::Schedule (Seconds (0), &Inject, i);
+    }
+
+  SystemWallClockMs clock;
+  clock.Start ();
+  Simulator::Run ();
+  uint64_t ms = clock.End ();
+  Simulator::Destroy ();
+
+  std::cout << "sent " << total << " forwarded " << g_forwarded
+            << " ecn marked " << g_marked << std::endl;
+  std::cout << "time " << ms << " ms, "
+            << (g_forwarded > 0 ? ms * 1e6 / g_forwarded : 0) << " ns/forwarded packet" << std::endl;
+  return 0;
+}